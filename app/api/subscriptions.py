@@ -1,14 +1,18 @@
 from flask import Blueprint, request, jsonify
-from datetime import date, timedelta
+from datetime import date
 import os
 import json
 
 from db_manager import DBManager
 from logging_utils import get_logger
 from tasks.update_user_status import compute_status
-from tasks_engine import enable_and_run_task_by_name
+from tasks_engine import enable_and_run_task_by_name, enqueue_task
 from communications_engine import select_comm_template_for_user, schedule_template_notification
 from core.media_jobs import insert_plex_media_job
+from core.subscription_gift_bulk import (
+    expiration_change_dedupe_key,
+    expiration_change_payload,
+)
 
 log = get_logger("api.subscriptions")
 
@@ -397,36 +401,9 @@ def update_user_expiration(user_id, new_expiration_date, reason="manual", db=Non
                     old_exp_iso = old_exp.isoformat()
                     new_exp_iso = new_exp.isoformat()
 
-                    reason_map = {
-                        "manual": "manual",
-                        "manual_update": "manual",
-                        "ui_manual": "manual",
-                        "gift": "gift",
-                        "referral_reward": "referral",
-                        "referral": "referral",
-                    }
-
-                    reason_label = reason_map.get(
-                        (reason or "").strip().lower(),
-                        (reason or "").strip().lower(),
-                    )
-
-                    payload = {
-                        "event": "expiration_change",
-                        "trigger_event": "expiration_change",
-                        "reason": reason,
-                        "expiration_change_reason": reason_label,
-                        "old_expiration_date": old_exp_iso,
-                        "new_expiration_date": new_exp_iso,
-                        "expiration_date": new_exp_iso,
-                        "expiration_change_days": abs(delta_days),
-                        "expiration_change_signed_days": delta_days,
-                        "expiration_change_direction": change_direction,
-                    }
-
-                    dedupe_key = (
-                        f"expiration_change:template:{int(selected_tpl['id'])}:"
-                        f"user:{int(user_id)}:old:{old_exp_iso}:new:{new_exp_iso}"
+                    payload = expiration_change_payload(reason, old_exp, new_exp)
+                    dedupe_key = expiration_change_dedupe_key(
+                        selected_tpl["id"], user_id, old_exp, new_exp
                     )
 
                     schedule_template_notification(
@@ -472,6 +449,84 @@ def update_user_expiration(user_id, new_expiration_date, reason="manual", db=Non
     return True, "Expiration updated"
 
 
+# ------------------------------------------------------------------
+# Gift runs (bulk, background)
+# ------------------------------------------------------------------
+
+def _queue_gift_run(db, *, target_type, target_server_id, days, reason, user_ids):
+    """
+    Crée le run avec ses cibles figées puis réveille apply_subscription_gifts.
+    Retourne l'id du run.
+    """
+    user_ids = list(dict.fromkeys(int(uid) for uid in user_ids))
+
+    cur = db.execute(
+        """
+        INSERT INTO subscription_gift_runs
+            (target_type, target_server_id, days_added, reason, users_updated,
+             status, users_total, users_processed, target_user_ids_json)
+        VALUES (?, ?, ?, ?, 0, 'queued', ?, 0, ?)
+        """,
+        (
+            target_type,
+            target_server_id,
+            days,
+            reason or None,
+            len(user_ids),
+            json.dumps(user_ids),
+        )
+    )
+
+    # SQLite: id du run créé (lastrowid de la connexion d'écriture)
+    run_id = cur.lastrowid
+    if not run_id:
+        return None
+
+    log.info(
+        f"[GIFT RUN #{run_id}] queued target={target_type} server_id={target_server_id} "
+        f"days={days} users={len(user_ids)}"
+    )
+
+    # enqueue_task (et non enable_and_run_task_by_name) : si la tâche est en
+    # train de finir, queued_count la relance pour ce nouveau run
+    task = db.query_one("SELECT id FROM tasks WHERE name = 'apply_subscription_gifts'")
+    if not task or not enqueue_task(int(task["id"])):
+        log.warning(f"[GIFT RUN #{run_id}] apply_subscription_gifts could not be enqueued immediately")
+
+    return run_id
+
+
+def _gift_run_payload(db, run_id):
+    run = db.query_one(
+        """
+        SELECT id, target_type, target_server_id, days_added, status,
+               users_total, users_processed, users_updated, last_error,
+               started_at, finished_at
+        FROM subscription_gift_runs
+        WHERE id = ?
+        """,
+        (run_id,)
+    )
+
+    if not run:
+        return None
+
+    return {
+        "status": "ok",
+        "run_id": run["id"],
+        "job_status": run["status"],
+        "users_total": run["users_total"],
+        "users_processed": run["users_processed"],
+        "users_updated": run["users_updated"],
+        "days_added": run["days_added"],
+        "target": run["target_type"],
+        "server_id": run["target_server_id"],
+        "last_error": run["last_error"],
+        "started_at": run["started_at"],
+        "finished_at": run["finished_at"],
+    }
+
+
 # ------------------------------------------------------------------
 # API
 # ------------------------------------------------------------------
@@ -520,56 +575,28 @@ def api_gift_time_to_server(server_id):
     # ✅ users + user_servers -> vodum_users + media_users
     users = db.query(
         """
-        SELECT DISTINCT vu.id, vu.expiration_date
+        SELECT DISTINCT vu.id
         FROM vodum_users vu
         JOIN media_users mu ON mu.vodum_user_id = vu.id
         WHERE mu.server_id = ?
         """,
         (server_id,)
-    )
-
-    updated = 0
-
-    for u in users:
-        try:
-            current_exp = date.fromisoformat(u["expiration_date"])
-        except Exception:
-            current_exp = date.today()
-
-        new_exp = (current_exp + timedelta(days=days)).isoformat()
-
-        ok, _ = update_user_expiration(
-            u["id"],
-            new_exp,
-            reason=reason
-        )
+    ) or []
 
-        if ok:
-            updated += 1
-
-            # ✅ Historiser le cadeau (1 ligne par user modifié)
-            db.execute(
-                """
-                INSERT INTO subscription_gifts
-                    (vodum_user_id, target_type, target_server_id, days_added, reason)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (
-                    u["id"],
-                    target_type,
-                    int(server_id) if (target_type == "server" and server_id) else None,
-                    days,
-                    reason or None,
-                )
-            )
+    # Historisé comme un run "server", appliqué en arrière-plan
+    run_id = _queue_gift_run(
+        db,
+        target_type=target_type,
+        target_server_id=int(server_id),
+        days=days,
+        reason=reason,
+        user_ids=[int(u["id"]) for u in users],
+    )
 
+    if not run_id:
+        return jsonify({"error": "failed to create gift run"}), 500
 
-    return jsonify({
-        "status": "ok",
-        "server_id": server_id,
-        "days_added": days,
-        "users_updated": updated
-    })
+    return jsonify(_gift_run_payload(db, run_id)), 202
 
 
 @subscriptions_api.route("/api/subscriptions/gift", methods=["POST"])
@@ -674,72 +701,33 @@ def api_gift_subscription():
         return jsonify({"error": "invalid target_type"}), 400
 
     # --------------------------------------------------
-    # Historique : 1 ligne par gift (RUN)
+    # Historique : 1 ligne par gift (RUN), appliqué en arrière-plan
+    # par la tâche apply_subscription_gifts
     # --------------------------------------------------
-    db.execute(
-        """
-        INSERT INTO subscription_gift_runs
-            (target_type, target_server_id, days_added, reason, users_updated)
-        VALUES (?, ?, ?, ?, 0)
-        """,
-        (target_type, target_server_id, days, reason or None)
+    run_id = _queue_gift_run(
+        db,
+        target_type=target_type,
+        target_server_id=target_server_id,
+        days=days,
+        reason=reason,
+        user_ids=[int(u["id"]) for u in users or []],
     )
 
-    # SQLite: récupère l'id du run créé
-    run_id_row = db.query_one("SELECT last_insert_rowid() AS id")
-    run_id = run_id_row["id"] if run_id_row else None
-
     if not run_id:
         return jsonify({"error": "failed to create gift run"}), 500
 
-    # --------------------------------------------------
-    # Mise à jour + détails du run (users)
-    # --------------------------------------------------
-    updated = 0
+    return jsonify(_gift_run_payload(db, run_id)), 202
 
-    for u in users:
-        try:
-            current_exp = date.fromisoformat(u["expiration_date"])
-        except Exception:
-            current_exp = date.today()
 
-        new_exp = (current_exp + timedelta(days=days)).isoformat()
-
-        ok, _msg = update_user_expiration(
-            u["id"],
-            new_exp,
-            reason=reason
-        )
-
-        if ok:
-            updated += 1
-
-            # 1 ligne par user DANS LE DETAIL du run (pas dans l’historique principal)
-            db.execute(
-                """
-                INSERT OR IGNORE INTO subscription_gift_run_users
-                    (run_id, vodum_user_id)
-                VALUES (?, ?)
-                """,
-                (run_id, u["id"])
-            )
+@subscriptions_api.route("/api/subscriptions/gifts/<int:run_id>/status", methods=["GET"])
+def api_gift_run_status(run_id):
+    db = DBManager(os.environ.get("DATABASE_PATH", "/appdata/database.db"))
+    payload = _gift_run_payload(db, run_id)
 
-    # --------------------------------------------------
-    # Update du compteur final sur le run
-    # --------------------------------------------------
-    db.execute(
-        "UPDATE subscription_gift_runs SET users_updated = ? WHERE id = ?",
-        (updated, run_id)
-    )
+    if not payload:
+        return jsonify({"status": "error", "error": "not_found"}), 404
 
-    return jsonify({
-        "status": "ok",
-        "run_id": run_id,
-        "users_updated": updated,
-        "days_added": days,
-        "target": target_type,
-        "server_id": target_server_id
-    }), 200
+    return jsonify(payload), 200
 
 
 @subscriptions_api.route("/api/subscriptions/gifts/<int:run_id>", methods=["GET"])
@@ -757,6 +745,11 @@ def api_gift_history_detail(run_id):
             r.days_added,
             r.reason,
             r.users_updated,
+            r.status AS job_status,
+            r.users_total,
+            r.users_processed,
+            r.last_error,
+            r.finished_at,
             (
                 SELECT vu.username
                 FROM subscription_gift_run_users ru
@@ -808,6 +801,11 @@ def api_gift_history():
             r.days_added,
             r.reason,
             r.users_updated,
+            r.status AS job_status,
+            r.users_total,
+            r.users_processed,
+            r.last_error,
+            r.finished_at,
             (
                 SELECT vu.username
                 FROM subscription_gift_run_users ru
@@ -18,6 +18,7 @@ from core.session_security import VodumSessionInterface
 from core.i18n import init_i18n
 from core.repair.plex_media_users_repair import run_repair_if_needed
 from core.monitoring.plex_websocket import PlexWebsocketClient
+from core.monitoring.jellyfin_websocket import JellyfinWebsocketClient
 from core.startup import StartupStep, run_startup_sequence
 from core.app_paths import update_status_path
 from core.error_reporting import (
@@ -30,7 +31,7 @@ from api.subscriptions import subscriptions_api
 from blueprints.users import users_bp
 
 from web.helpers import get_db, scheduler_db_provider, table_exists, add_log, close_db
-from web.filters import inject_brand_name, safe_datetime, cron_human, tz_filter, browser_datetime, utc_iso
+from web.filters import inject_brand_name, safe_datetime, cron_human, tz_filter, browser_datetime, utc_iso, artwork_size
 from web.security import ip_in_networks
 
 
@@ -248,6 +249,12 @@ def _reset_maintenance_on_startup(app: Flask):
     except Exception:
         get_logger("boot").exception("Failed to reset maintenance mode on startup")
 
+def _resume_subscription_gift_runs(app: Flask):
+    from core.subscription_gift_bulk import resume_pending_gift_runs
+
+    resume_pending_gift_runs(DBManager(app.config["DATABASE"]))
+
+
 def _run_one_shot_repair(app: Flask):
     boot_logger = get_logger("boot")
     with app.app_context():
@@ -278,7 +285,8 @@ def _start_plex_websocket_engine(app: Flask):
         WHERE LOWER(TRIM(type)) = 'plex'
           AND token IS NOT NULL
           AND TRIM(token) != ''
-        """
+        """,
+        decrypt_servers=True,
     )
 
     for server_row in plex_servers or []:
@@ -292,6 +300,29 @@ def _start_plex_websocket_engine(app: Flask):
             )
 
 
+def _start_jellyfin_websocket_engine(app: Flask):
+    db = DBManager(app.config["DATABASE"])
+    jellyfin_servers = db.query(
+        """
+        SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers
+        WHERE LOWER(TRIM(type)) = 'jellyfin'
+          AND token IS NOT NULL
+          AND TRIM(token) != ''
+        """,
+        decrypt_servers=True,
+    )
+
+    for server_row in jellyfin_servers or []:
+        server = dict(server_row)
+        try:
+            JellyfinWebsocketClient(server).start()
+        except Exception:
+            task_logger.exception(
+                "Unable to start Jellyfin websocket for %s",
+                server.get("name"),
+            )
+
+
 def _run_application_startup(app: Flask):
     """Declare the complete post-registration startup order in one place."""
     run_startup_sequence(
@@ -300,7 +331,9 @@ def _run_application_startup(app: Flask):
             StartupStep("admin_recovery", startup_admin_recover_if_requested),
             StartupStep("maintenance_recovery", _reset_maintenance_on_startup),
             StartupStep("one_shot_repair", _run_one_shot_repair),
+            StartupStep("subscription_gift_recovery", _resume_subscription_gift_runs, fatal=False),
             StartupStep("plex_websocket_engine", _start_plex_websocket_engine, fatal=False),
+            StartupStep("jellyfin_websocket_engine", _start_jellyfin_websocket_engine, fatal=False),
         ),
     )
 
@@ -530,6 +563,7 @@ def create_app():
     app.template_filter("tz")(tz_filter)
     app.template_filter("browser_datetime")(browser_datetime)
     app.template_filter("utc_iso")(utc_iso)
+    app.template_filter("artwork_size")(artwork_size)
 
     # DB teardown
     app.teardown_appcontext(close_db)
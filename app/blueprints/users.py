@@ -106,7 +106,8 @@ def api_servers():
         SELECT id, name, type, url, local_url, public_url, server_identifier, status, token
         FROM servers
         ORDER BY name ASC
-        """
+        """,
+        decrypt_servers=True,
     )
 
     servers = [dict(r) for r in rows]
@@ -147,7 +148,7 @@ def api_servers():
 def api_server_libraries(server_id: int):
     db = get_db()
 
-    server = db.query_one("SELECT id, name, type, token FROM servers WHERE id = ?", (server_id,))
+    server = db.query_one("SELECT id, name, type, token FROM servers WHERE id = ?", (server_id,), decrypt_servers=True)
     if not server:
         return jsonify([])
 
@@ -314,7 +315,7 @@ def api_users_create():
         except Exception:
             return jsonify({"ok": False, "error": "Invalid server_id"}), 400
 
-        srv = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id = ?", (sid,))
+        srv = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id = ?", (sid,), decrypt_servers=True)
         if not srv:
             return jsonify({"ok": False, "error": f"Server not found (id={sid})"}), 400
         servers_by_id[sid] = dict(srv)
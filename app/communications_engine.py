@@ -727,7 +727,26 @@ def attempts_satisfy_mode(db, settings: Dict, user: Dict, attempts: List[SendAtt
     return any(getattr(a, "status", None) == "sent" for a in attempts)
 
 
-def send_to_user(
+@dataclass
+class UserDelivery:
+    """Message rendu pour un utilisateur, prêt à partir sur ses canaux.
+
+    Ne contient que des données : deliver_channel() peut l'utiliser depuis
+    un thread worker sans accès à la base.
+    """
+    subject: str
+    body: str
+    attachments: List[Dict]
+    channels: List[str]
+    mode: str
+    forced: bool
+    email_recipients: List[str]
+    discord_user_id: str
+    discord_token: str
+    smtp_settings: Dict
+
+
+def prepare_user_delivery(
     *,
     db,
     settings: Dict,
@@ -737,15 +756,11 @@ def send_to_user(
     attachments: List[Dict] | None,
     forced_channels: List[str] | None = None,
     bypass_skip_never_used_accounts: bool = False,
-) -> List[SendAttempt]:
-
-    """Send according to unified rules (FIRST / ALL).
+) -> UserDelivery | List[SendAttempt]:
+    """Rendering + channel selection of send_to_user (all the DB work).
 
-    Returns the list of attempts.
-    status can be:
-    - sent
-    - failed
-    - skipped
+    Returns a UserDelivery, or the final attempts when nothing can be sent
+    (account never used, no channel available).
     """
     s = _as_dict(settings)
     u = _as_dict(user)
@@ -821,66 +836,110 @@ def send_to_user(
     if not channels_to_try:
         return [SendAttempt(channel="system", status="failed", error="No channel available")]
 
-    attempts: List[SendAttempt] = []
-
     # enrich discord token once
     s2 = enrich_discord_settings(db, s) if db is not None else s
 
-    for ch in channels_to_try:
-        if ch == "email":
-            recipients: List[str] = []
-            for r in ((u.get("email") or "").strip(), (u.get("second_email") or "").strip()):
-                if r and r not in recipients:
-                    recipients.append(r)
+    recipients: List[str] = []
+    for r in ((u.get("email") or "").strip(), (u.get("second_email") or "").strip()):
+        if r and r not in recipients:
+            recipients.append(r)
+
+    return UserDelivery(
+        subject=subject,
+        body=body,
+        attachments=list(attachments or []),
+        channels=channels_to_try,
+        mode=mode,
+        forced=bool(forced_channels),
+        email_recipients=recipients,
+        discord_user_id=(u.get("discord_user_id") or "").strip(),
+        discord_token=(s2.get("discord_bot_token_effective") or s2.get("discord_bot_token") or "").strip(),
+        smtp_settings=s2,
+    )
 
-            if not recipients:
-                attempts.append(SendAttempt(channel="email", status="failed", error="User has no email"))
-                continue
 
-            ok_any = False
-            errors: List[str] = []
-            for r in recipients:
-                ok, err = send_email(subject, body, r, s2, attachments=attachments or [])
-                if ok:
-                    ok_any = True
-                elif err:
-                    errors.append(f"{r}: {err}")
-
-            if ok_any:
-                attempts.append(
-                    SendAttempt(
-                        channel="email",
-                        status="sent",
-                        error=None if not errors else "; ".join(errors)[:1000],
-                    )
-                )
-            else:
-                attempts.append(
-                    SendAttempt(
-                        channel="email",
-                        status="failed",
-                        error=("; ".join(errors) or "Email send failed")[:1000],
-                    )
-                )
+def deliver_channel(delivery: UserDelivery, channel: str) -> SendAttempt:
+    """Send one channel of a prepared delivery (network only, no DB)."""
+    if channel == "email":
+        if not delivery.email_recipients:
+            return SendAttempt(channel="email", status="failed", error="User has no email")
+
+        ok_any = False
+        errors: List[str] = []
+        for r in delivery.email_recipients:
+            ok, err = send_email(delivery.subject, delivery.body, r, delivery.smtp_settings, attachments=delivery.attachments)
+            if ok:
+                ok_any = True
+            elif err:
+                errors.append(f"{r}: {err}")
+
+        if ok_any:
+            return SendAttempt(
+                channel="email",
+                status="sent",
+                error=None if not errors else "; ".join(errors)[:1000],
+            )
+        return SendAttempt(
+            channel="email",
+            status="failed",
+            error=("; ".join(errors) or "Email send failed")[:1000],
+        )
 
-        elif ch == "discord":
-            discord_user_id = (u.get("discord_user_id") or "").strip()
-            token = (s2.get("discord_bot_token_effective") or s2.get("discord_bot_token") or "").strip()
+    if channel == "discord":
+        if not delivery.discord_user_id:
+            return SendAttempt(channel="discord", status="failed", error="User has no discord_user_id")
 
-            if not discord_user_id:
-                attempts.append(SendAttempt(channel="discord", status="failed", error="User has no discord_user_id"))
-                continue
+        try:
+            send_discord_dm(delivery.discord_token, delivery.discord_user_id, delivery.body)
+            return SendAttempt(channel="discord", status="sent", error=None)
+        except DiscordSendError as e:
+            return SendAttempt(channel="discord", status="failed", error=str(e)[:1000])
+        except Exception as e:
+            return SendAttempt(channel="discord", status="failed", error=str(e)[:1000])
+
+    return SendAttempt(channel=channel, status="failed", error=f"Unknown channel: {channel}")
+
+
+def send_to_user(
+    *,
+    db,
+    settings: Dict,
+    user: Dict,
+    subject: str,
+    body: str,
+    attachments: List[Dict] | None,
+    forced_channels: List[str] | None = None,
+    bypass_skip_never_used_accounts: bool = False,
+) -> List[SendAttempt]:
+
+    """Send according to unified rules (FIRST / ALL).
+
+    Returns the list of attempts.
+    status can be:
+    - sent
+    - failed
+    - skipped
+    """
+    delivery = prepare_user_delivery(
+        db=db,
+        settings=settings,
+        user=user,
+        subject=subject,
+        body=body,
+        attachments=attachments,
+        forced_channels=forced_channels,
+        bypass_skip_never_used_accounts=bypass_skip_never_used_accounts,
+    )
+    if not isinstance(delivery, UserDelivery):
+        return delivery
+
+    attempts: List[SendAttempt] = []
 
-            try:
-                send_discord_dm(token, discord_user_id, body)
-                attempts.append(SendAttempt(channel="discord", status="sent", error=None))
-            except DiscordSendError as e:
-                attempts.append(SendAttempt(channel="discord", status="failed", error=str(e)[:1000]))
-            except Exception as e:
-                attempts.append(SendAttempt(channel="discord", status="failed", error=str(e)[:1000]))
+    for ch in delivery.channels:
+        attempts.append(deliver_channel(delivery, ch))
 
         # In FIRST mode, stop as soon as one channel succeeded.
-        if not forced_channels and mode == "first" and any(a.status == "sent" for a in attempts):
+        if not delivery.forced and delivery.mode == "first" and any(a.status == "sent" for a in attempts):
             break
 
     return attempts
@@ -10,9 +10,24 @@ from datetime import datetime
 from pathlib import Path
 from typing import Callable
 
+from core.sqlite_backup import (
+    CHUNKS_MEMBER,
+    FULL_BACKUP_FORMAT,
+    INCREMENTAL_BACKUP_FORMAT,
+    BACKUP_CHUNK_SIZE,
+    chunk_digests,
+    digests_fingerprint,
+    read_full_backup_digests,
+    snapshot_database,
+    write_delta,
+)
 from logging_utils import get_logger, is_debug_mode_enabled
 from secret_store import encryption_key_bytes
 
+INCREMENTAL_SUFFIX = "_incr"
+# Marqueur posé par le backup manuel : le prochain auto_backup sera complet
+FULL_BACKUP_REQUEST_FILE = ".full_backup_requested"
+
 
 @dataclass(frozen=True)
 class BackupConfig:
@@ -48,50 +63,111 @@ def _add_dir_to_zip(zipf: zipfile.ZipFile, source_dir: Path, archive_root: str)
         zipf.write(path, f"{archive_root}/{rel.as_posix()}")
 
 
-def create_backup_file(get_db: Callable[[], object], cfg: BackupConfig) -> str | None:
-    logger = get_logger("backup")
-    db = get_db()
+def is_incremental_backup(path: Path) -> bool:
+    return Path(path).stem.endswith(INCREMENTAL_SUFFIX)
 
+
+def is_incremental_archive(path: Path) -> bool:
+    """Vrai si le zip est un incrémental d'après son manifest (quel que soit son nom)."""
     try:
-        backup_dir = ensure_backup_dir(cfg)
-    except Exception:
-        logger.error("[BACKUP] Unable to prepare backup directory", exc_info=True)
+        with zipfile.ZipFile(path, "r") as zipf:
+            manifest = json.loads(zipf.read("manifest.json"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return False
+    return isinstance(manifest, dict) and manifest.get("format") == INCREMENTAL_BACKUP_FORMAT
+
+
+def request_full_backup(backup_dir: Path) -> None:
+    (Path(backup_dir) / FULL_BACKUP_REQUEST_FILE).touch()
+
+
+def consume_full_backup_request(backup_dir: Path) -> bool:
+    """Retire le marqueur de backup manuel ; True s'il était présent."""
+    try:
+        (Path(backup_dir) / FULL_BACKUP_REQUEST_FILE).unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def latest_full_backup(backup_dir: Path) -> Path | None:
+    """
+    Dernière sauvegarde complète si elle peut servir de base à un incrémental
+    (empreintes de blocs présentes), sinon None.
+    """
+    fulls = [path for path in backup_dir.glob("backup_*.zip") if not is_incremental_backup(path)]
+    latest = max(fulls, key=lambda path: path.stat().st_mtime, default=None)
+    if latest is None or read_full_backup_digests(latest) is None:
         return None
+    return latest
+
+
+def incremental_backups_since(backup_dir: Path, base_backup: Path) -> int:
+    base_mtime = base_backup.stat().st_mtime
+    return sum(
+        1
+        for path in backup_dir.glob("backup_*.zip")
+        if is_incremental_backup(path) and path.stat().st_mtime >= base_mtime
+    )
+
+
+def build_backup_archive(db_path: Path, backup_dir: Path, *, base_backup: Path | None = None) -> dict:
+    """
+    Crée backup_<ts>.zip (complète) ou backup_<ts>_incr.zip (blocs modifiés
+    depuis base_backup) à partir d'un snapshot en ligne de la base.
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database not found: {db_path}")
+
+    base_digests = read_full_backup_digests(base_backup) if base_backup else None
+    incremental = base_digests is not None
 
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    backup_filename = f"backup_{timestamp}.zip"
+    backup_filename = f"backup_{timestamp}{INCREMENTAL_SUFFIX if incremental else ''}.zip"
     backup_path = backup_dir / backup_filename
     tmp_backup_path = backup_dir / f".{backup_filename}.uploading"
+    snapshot_path = backup_dir / f".{backup_filename}.snapshot.db"
+
+    attachments_dir = _appdata_dir_from_db(db_path) / "attachments"
+    encryption_key = encryption_key_bytes()
+
+    manifest = {
+        "format": INCREMENTAL_BACKUP_FORMAT if incremental else FULL_BACKUP_FORMAT,
+        "version": 2,
+        "created_at_utc": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "database": "database.delta" if incremental else "database.db",
+        "includes": {
+            "database": True,
+            "attachments": attachments_dir.exists(),
+            "encryption_key": True,
+        },
+    }
 
     try:
-        db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
-
-        db_path = Path(cfg.database_path)
-        if not db_path.exists():
-            logger.error(f"[BACKUP] Fichier DB introuvable: {db_path}")
-            return None
-
-        appdata_dir = _appdata_dir_from_db(db_path)
-        attachments_dir = appdata_dir / "attachments"
-        encryption_key = encryption_key_bytes()
-
-        manifest = {
-            "format": "vodum-full-backup",
-            "version": 2,
-            "created_at_utc": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-            "database": "database.db",
-            "includes": {
-                "database": True,
-                "attachments": attachments_dir.exists(),
-                "encryption_key": True,
-            },
-        }
-
         if tmp_backup_path.exists():
             tmp_backup_path.unlink()
 
-        with zipfile.ZipFile(tmp_backup_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(db_path, "database.db")
+        snapshot = snapshot_database(db_path, snapshot_path)
+
+        # Deflate rapide : la base (ou le delta) est le gros du zip
+        with zipfile.ZipFile(
+            tmp_backup_path,
+            "w",
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=1,
+        ) as zipf:
+            if incremental:
+                delta = write_delta(snapshot_path, base_digests, zipf)
+                manifest["base"] = base_backup.name
+                manifest["base_fingerprint"] = digests_fingerprint(base_digests)
+                manifest["delta"] = delta
+            else:
+                zipf.write(snapshot_path, "database.db")
+                digests = chunk_digests(snapshot_path)
+                zipf.writestr(CHUNKS_MEMBER, digests)
+                manifest["chunk_size"] = BACKUP_CHUNK_SIZE
+                manifest["database_fingerprint"] = digests_fingerprint(digests)
             zipf.writestr("vodum.encryption_key", encryption_key)
             zipf.writestr("manifest.json", json.dumps(manifest, indent=2))
             _add_dir_to_zip(zipf, attachments_dir, "attachments")
@@ -100,17 +176,47 @@ def create_backup_file(get_db: Callable[[], object], cfg: BackupConfig) -> str |
             raise RuntimeError("Backup zip was created empty")
 
         os.replace(tmp_backup_path, backup_path)
+    finally:
+        for path in (tmp_backup_path, snapshot_path):
+            if path.exists():
+                path.unlink()
+
+    result = {
+        "name": backup_filename,
+        "kind": "incremental" if incremental else "full",
+        "size": backup_path.stat().st_size,
+        "snapshot_steps": snapshot["steps"],
+    }
+    if incremental:
+        result["base"] = base_backup.name
+        result["changed_chunks"] = len(manifest["delta"]["changed_chunks"])
+        result["total_chunks"] = manifest["delta"]["total_chunks"]
+    return result
+
+
+def create_backup_file(get_db: Callable[[], object], cfg: BackupConfig) -> str | None:
+    logger = get_logger("backup")
+
+    try:
+        backup_dir = ensure_backup_dir(cfg)
+    except Exception:
+        logger.error("[BACKUP] Unable to prepare backup directory", exc_info=True)
+        return None
+
+    try:
+        db_path = Path(cfg.database_path)
+        if not db_path.exists():
+            logger.error(f"[BACKUP] Fichier DB introuvable: {db_path}")
+            return None
+
+        # Sauvegarde manuelle : toujours complète (téléchargeable seule)
+        result = build_backup_archive(db_path, backup_dir)
 
-        logger.info(f"[BACKUP] Sauvegarde complète créée: {backup_filename}")
-        return backup_filename
+        logger.info(f"[BACKUP] Sauvegarde complète créée: {result['name']}")
+        return result["name"]
 
     except Exception as e:
         logger.error(f"[BACKUP] Erreur création backup: {e}", exc_info=True)
-        try:
-            if "tmp_backup_path" in locals() and tmp_backup_path.exists():
-                tmp_backup_path.unlink()
-        except Exception:
-            logger.warning("[BACKUP] Unable to remove failed temporary backup", exc_info=True)
         return None
 
 
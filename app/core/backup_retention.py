@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import json
 import time
+import zipfile
 from pathlib import Path
 
 
@@ -23,6 +25,27 @@ def safe_positive_int(value, default: int) -> int:
     return parsed if parsed >= 1 else default
 
 
+def _incremental_base_name(path: Path) -> str | None:
+    """Nom de la sauvegarde complète dont dépend un incrémental (backup_*_incr.zip)."""
+    if not path.name.endswith("_incr.zip"):
+        return None
+    try:
+        with zipfile.ZipFile(path, "r") as zipf:
+            manifest = json.loads(zipf.read("manifest.json"))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+    return str(manifest.get("base") or "") or None
+
+
+def dependent_incrementals(backup_dir: Path, full_name: str) -> list[str]:
+    """Incrémentaux présents dans backup_dir qui ont besoin de la complète full_name."""
+    return sorted(
+        path.name
+        for path in backup_dir.glob("backup_*_incr.zip")
+        if _incremental_base_name(path) == full_name
+    )
+
+
 def prune_backups(
     backup_dir: Path,
     retention_days: int,
@@ -51,15 +74,33 @@ def prune_backups(
         reverse=True,
     )
     keep_by_count = set(ordered[:retention_count])
-    deleted = 0
+    to_delete = []
 
     for path in ordered:
         try:
             too_old = path.stat().st_mtime < cutoff_ts
             exceeds_count = path not in keep_by_count
             if too_old or exceeds_count:
-                path.unlink()
-                deleted += 1
+                to_delete.append(path)
+        except OSError as exc:
+            if on_error:
+                on_error(path, exc)
+
+    # Une complète reste tant qu'un incrémental conservé en dépend
+    deleting = set(to_delete)
+    required_bases = {
+        _incremental_base_name(path)
+        for path in ordered
+        if path not in deleting
+    }
+    deleted = 0
+
+    for path in to_delete:
+        if path.name in required_bases:
+            continue
+        try:
+            path.unlink()
+            deleted += 1
         except OSError as exc:
             if on_error:
                 on_error(path, exc)
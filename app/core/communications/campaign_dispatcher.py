@@ -0,0 +1,167 @@
+"""Parallel email / Discord delivery for communication campaign targets.
+
+Each channel has its own worker pool and token bucket, so a slow SMTP
+server or a Discord rate limit only holds back its own channel. Workers
+only do network I/O (communications_engine.deliver_channel); every
+database write stays on the calling thread, which consumes completed
+attempts one by one.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+from communications_engine import SendAttempt, UserDelivery, deliver_channel
+from core.rate_limit import TokenBucket
+from core.tasks.run_metrics import RunMetricsThreadPoolExecutor
+from logging_utils import get_logger
+
+
+log = get_logger("campaign_dispatcher")
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float, minimum: float) -> float:
+    try:
+        return max(minimum, float(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+CAMPAIGN_EMAIL_WORKERS = _env_int("VODUM_CAMPAIGN_EMAIL_WORKERS", 4, 1)
+CAMPAIGN_DISCORD_WORKERS = _env_int("VODUM_CAMPAIGN_DISCORD_WORKERS", 4, 1)
+
+# Messages per second, per channel
+CAMPAIGN_EMAIL_RATE = _env_float("VODUM_CAMPAIGN_EMAIL_RATE", 5.0, 0.1)
+CAMPAIGN_DISCORD_RATE = _env_float("VODUM_CAMPAIGN_DISCORD_RATE", 2.0, 0.1)
+
+CHANNELS = ("email", "discord")
+
+
+@dataclass
+class CampaignTargetJob:
+    """One campaign target in flight."""
+    row: Dict
+    user: Dict
+    delivery: UserDelivery
+    already_sent: set
+    required_channels: List[str]
+    attempts: List[SendAttempt] = field(default_factory=list)
+    remaining: List[str] = field(default_factory=list)
+    in_flight: int = 0
+
+
+class CampaignDispatcher:
+    """
+    Dispatch rules match send_to_user:
+    - forced channels (ALL mode) are sent in parallel;
+    - FIRST mode tries the channels in order and stops at the first success.
+    """
+
+    def __init__(
+        self,
+        *,
+        email_workers: int = CAMPAIGN_EMAIL_WORKERS,
+        discord_workers: int = CAMPAIGN_DISCORD_WORKERS,
+        email_rate: float = CAMPAIGN_EMAIL_RATE,
+        discord_rate: float = CAMPAIGN_DISCORD_RATE,
+    ):
+        workers = {"email": max(1, int(email_workers)), "discord": max(1, int(discord_workers))}
+        rates = {"email": float(email_rate), "discord": float(discord_rate)}
+
+        self._pools = {
+            channel: RunMetricsThreadPoolExecutor(max_workers=workers[channel], thread_name_prefix=f"campaign-{channel}")
+            for channel in CHANNELS
+        }
+        self._buckets = {
+            channel: TokenBucket(rates[channel], max(1.0, float(workers[channel])))
+            for channel in CHANNELS
+        }
+        self._completed: "queue.Queue[Tuple[CampaignTargetJob, SendAttempt]]" = queue.Queue()
+        self._outstanding = 0
+        self.started_at = time.monotonic()
+
+    # -------------------------
+    # Workers
+    # -------------------------
+
+    def _deliver(self, job: CampaignTargetJob, channel: str) -> None:
+        try:
+            bucket = self._buckets.get(channel)
+            if bucket is not None:
+                wait = bucket.reserve()
+                if wait > 0:
+                    time.sleep(wait)
+            attempt = deliver_channel(job.delivery, channel)
+        except Exception as e:
+            log.error(f"Campaign delivery crashed on channel {channel}", exc_info=True)
+            attempt = SendAttempt(channel=channel, status="failed", error=str(e)[:1000])
+        self._completed.put((job, attempt))
+
+    def _submit(self, job: CampaignTargetJob, channel: str) -> None:
+        job.in_flight += 1
+        self._outstanding += 1
+        pool = self._pools.get(channel)
+        if pool is None:
+            self._completed.put((job, SendAttempt(channel=channel, status="failed", error=f"Unknown channel: {channel}")))
+            return
+        pool.submit(self._deliver, job, channel)
+
+    # -------------------------
+    # Calling thread
+    # -------------------------
+
+    def start(self, job: CampaignTargetJob) -> None:
+        channels = list(job.delivery.channels)
+        if job.delivery.forced or job.delivery.mode == "all":
+            job.remaining = []
+            for channel in channels:
+                self._submit(job, channel)
+        else:
+            job.remaining = channels[1:]
+            self._submit(job, channels[0])
+
+    def _advance(self, job: CampaignTargetJob, attempt: SendAttempt) -> bool:
+        """Record the attempt; True when the target has no more work."""
+        job.in_flight -= 1
+        job.attempts.append(attempt)
+
+        if attempt.status != "sent" and job.remaining:
+            self._submit(job, job.remaining.pop(0))
+            return False
+
+        return job.in_flight == 0
+
+    def completed(self) -> Iterator[Tuple[CampaignTargetJob, SendAttempt, bool]]:
+        """Yield (job, attempt, target_done) as deliveries finish."""
+        while self._outstanding:
+            job, attempt = self._completed.get()
+            self._outstanding -= 1
+            yield job, attempt, self._advance(job, attempt)
+
+    def stats(self) -> dict:
+        return {
+            "elapsed_s": round(time.monotonic() - self.started_at, 3),
+            "buckets": {channel: bucket.snapshot() for channel, bucket in self._buckets.items()},
+        }
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
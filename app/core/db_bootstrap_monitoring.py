@@ -48,6 +48,22 @@ def ensure_import_monitoring_schema(
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_tautulli_import_jobs_server ON tautulli_import_jobs(server_id);")
     conn.commit()
 
+    # High-water mark des imports Tautulli : seules les lignes session_history
+    # plus récentes sont relues au prochain import de la même source
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tautulli_import_watermarks (
+      server_id INTEGER NOT NULL,
+      pms_identifier TEXT NOT NULL,
+      last_history_id INTEGER NOT NULL DEFAULT 0,
+      last_started INTEGER,
+      options_key TEXT,
+      rows_imported INTEGER NOT NULL DEFAULT 0,
+      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+      PRIMARY KEY (server_id, pms_identifier)
+    );
+    """)
+    conn.commit()
+
     # -------------------------------------------------
     # 0.4 Monitoring snapshots table (NEW)
     # -------------------------------------------------
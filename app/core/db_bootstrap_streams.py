@@ -90,5 +90,12 @@ def ensure_stream_enforcement_schema(
     ensure_column(cursor, "stream_enforcements", "account_username", "TEXT")
     ensure_column(cursor, "stream_enforcements", "ips_json", "TEXT")
     ensure_column(cursor, "stream_enforcements", "details_json", "TEXT")
+    ensure_column(cursor, "stream_enforcement_state", "pending_action", "TEXT")
+    ensure_column(cursor, "stream_enforcement_state", "next_action_at", "TIMESTAMP")
+    ensure_column(cursor, "stream_enforcement_state", "pending_json", "TEXT")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stream_enforcement_state_next_action "
+        "ON stream_enforcement_state(next_action_at) WHERE pending_action IS NOT NULL"
+    )
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_stream_enforcements_vodum_user_created ON stream_enforcements(vodum_user_id, created_at)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_stream_enforcements_external_user_created ON stream_enforcements(external_user_id, created_at)")
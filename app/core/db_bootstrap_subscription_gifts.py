@@ -1,4 +1,4 @@
-def ensure_subscription_gift_schema(conn, cursor, *, table_exists) -> None:
+def ensure_subscription_gift_schema(conn, cursor, *, table_exists, ensure_column) -> None:
     if not table_exists(cursor, "subscription_gift_runs"):
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS subscription_gift_runs (
@@ -13,6 +13,21 @@ def ensure_subscription_gift_schema(conn, cursor, *, table_exists) -> None:
         """)
         conn.commit()
 
+    # Runs exécutés en arrière-plan (apply_subscription_gifts).
+    # Les runs historiques, appliqués de façon synchrone, sont 'success'.
+    ensure_column(cursor, "subscription_gift_runs", "status", "TEXT NOT NULL DEFAULT 'success'")
+    ensure_column(cursor, "subscription_gift_runs", "users_total", "INTEGER NOT NULL DEFAULT 0")
+    ensure_column(cursor, "subscription_gift_runs", "users_processed", "INTEGER NOT NULL DEFAULT 0")
+    ensure_column(cursor, "subscription_gift_runs", "target_user_ids_json", "TEXT NULL")
+    ensure_column(cursor, "subscription_gift_runs", "last_error", "TEXT NULL")
+    ensure_column(cursor, "subscription_gift_runs", "started_at", "TIMESTAMP NULL")
+    ensure_column(cursor, "subscription_gift_runs", "finished_at", "TIMESTAMP NULL")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_subscription_gift_runs_status
+        ON subscription_gift_runs(status, created_at)
+    """)
+    conn.commit()
+
     if not table_exists(cursor, "subscription_gift_run_users"):
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS subscription_gift_run_users (
@@ -201,6 +201,17 @@ def seed_default_tasks(conn, cursor, *, ensure_row) -> None:
     """)
     conn.commit()
 
+    # Subscription gifts (ON-DEMAND)
+    # - Enqueued by the gift API, which records the run in subscription_gift_runs.
+    ensure_row(cursor, "tasks", "name = :name", {
+        "name": "apply_subscription_gifts",
+        "description": "task_description.apply_subscription_gifts",
+        "schedule": None,
+        "enabled": 1,
+        "status": "idle"
+    })
+    conn.commit()
+
     # Ajouter la tâche send_expiration_emails si absente
     cursor.execute("""
         SELECT 1 FROM tasks WHERE name = 'send_expiration_emails'
@@ -54,3 +54,42 @@ def migrate_task_scheduler_mode(conn, cursor, *, ensure_column):
     """)
 
     conn.commit()
+
+
+def ensure_task_checkpoint_schema(conn, cursor, *, ensure_column):
+    # -------------------------------------------------
+    # Resumable cursor of long-running tasks
+    # -------------------------------------------------
+    ensure_column(cursor, "tasks", "checkpoint_json", "TEXT DEFAULT NULL")
+    conn.commit()
+
+
+def ensure_task_runs_schema(conn, cursor, *, table_exists):
+    # -------------------------------------------------
+    # Task execution metrics (p50 / p95 per task)
+    # -------------------------------------------------
+    if not table_exists(cursor, "task_runs"):
+        print("Creating table: task_runs")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS task_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            task_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            wall_ms INTEGER NOT NULL DEFAULT 0,
+            cpu_ms INTEGER NOT NULL DEFAULT 0,
+            db_ms INTEGER NOT NULL DEFAULT 0,
+            db_statements INTEGER NOT NULL DEFAULT 0,
+            http_calls INTEGER NOT NULL DEFAULT 0,
+            rows_written INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        )
+        """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_task_runs_task_name_id
+        ON task_runs(task_name, id)
+    """)
+    conn.commit()
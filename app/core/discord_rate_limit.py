@@ -0,0 +1,138 @@
+import threading
+import time
+
+
+# Au-delà de cette attente, l'envoi échoue (retry planifié) plutôt que de
+# bloquer un worker pendant des minutes.
+MAX_ROUTE_WAIT_SECONDS = 30.0
+
+# Attente appliquée sur un 429 sans retry_after exploitable
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
+
+
+def _float_header(headers, name):
+    try:
+        value = (headers or {}).get(name)
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def discord_route_key(method: str, path: str) -> str:
+    """
+    Clé de route Discord : méthode + chemin avec son paramètre majeur
+    (channel_id, guild_id...). Les limites par route sont indépendantes
+    d'un salon DM à l'autre.
+    """
+    return f"{(method or 'GET').upper()} {(path or '').strip('/')}"
+
+
+class DiscordRateLimiter:
+    """
+    Suivi des limites Discord à partir des en-têtes de réponse :
+
+    - X-RateLimit-Bucket associe une route à un bucket partagé ;
+    - X-RateLimit-Remaining = 0 + X-RateLimit-Reset-After bloquent ce bucket ;
+    - un 429 bloque sa route (ou toutes les routes si global=true) pendant
+      retry_after.
+
+    Seul le thread qui vise une route bloquée attend : les autres routes
+    (et les envois email) continuent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._route_bucket = {}
+        self._blocked_until = {}
+        self._global_until = 0.0
+
+        self.requests = 0
+        self.throttled = 0
+        self.global_throttled = 0
+        self.wait_seconds = 0.0
+
+    def _bucket_key(self, route: str) -> str:
+        bucket = self._route_bucket.get(route)
+        # Le hash de bucket est partagé entre salons : on garde le paramètre majeur
+        return f"{bucket}:{route}" if bucket else route
+
+    def wait_time(self, route: str) -> float:
+        with self._lock:
+            now = time.monotonic()
+            until = max(self._global_until, self._blocked_until.get(self._bucket_key(route), 0.0))
+            return max(0.0, until - now)
+
+    def acquire(self, route: str, max_wait: float = MAX_ROUTE_WAIT_SECONDS) -> bool:
+        """Attend que la route soit libre ; False si l'attente dépasse max_wait."""
+        wait = self.wait_time(route)
+        if wait > max_wait:
+            return False
+        if wait > 0:
+            with self._lock:
+                self.wait_seconds += wait
+            time.sleep(wait)
+        with self._lock:
+            self.requests += 1
+        return True
+
+    def update(self, route: str, response) -> float | None:
+        """
+        Met à jour les limites depuis une réponse Discord.
+        Retourne le retry_after (secondes) pour un 429, None sinon.
+        """
+        headers = getattr(response, "headers", None) or {}
+        status_code = getattr(response, "status_code", None)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = (headers.get("X-RateLimit-Bucket") or "").strip()
+            if bucket:
+                self._route_bucket[route] = bucket
+            key = self._bucket_key(route)
+
+            remaining = _float_header(headers, "X-RateLimit-Remaining")
+            reset_after = _float_header(headers, "X-RateLimit-Reset-After")
+            if remaining is not None and remaining <= 0 and reset_after:
+                self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), now + reset_after)
+
+            if status_code != 429:
+                return None
+
+            retry_after = None
+            is_global = str(headers.get("X-RateLimit-Global") or "").strip().lower() == "true"
+            try:
+                data = response.json() or {}
+                retry_after = float(data.get("retry_after"))
+                is_global = is_global or bool(data.get("global"))
+            except Exception:
+                pass
+            if retry_after is None:
+                retry_after = _float_header(headers, "Retry-After")
+            retry_after = max(0.2, retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS)
+
+            self.throttled += 1
+            if is_global:
+                self.global_throttled += 1
+                self._global_until = max(self._global_until, now + retry_after)
+            else:
+                self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), now + retry_after)
+            return retry_after
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "global_throttled": self.global_throttled,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "blocked_routes": sum(1 for until in self._blocked_until.values() if until > now),
+                "global_blocked_for_seconds": round(max(0.0, self._global_until - now), 3),
+            }
+
+
+_LIMITER = DiscordRateLimiter()
+
+
+def discord_rate_limiter() -> DiscordRateLimiter:
+    return _LIMITER
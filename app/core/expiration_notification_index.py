@@ -0,0 +1,277 @@
+"""
+Données du planning des notifications d'expiration, chargées en quelques
+requêtes ensemblistes par run de send_expiration_emails.
+
+L'ancien planning faisait, pour chaque utilisateur ayant une date
+d'expiration : une requête media_users Plex (invitation en attente), une
+jointure media_users/servers (contextes de communication), deux requêtes
+sent_emails / sent_discord et une résolution du bot Discord pour connaître
+les canaux disponibles. Cet index charge tout cela une fois :
+
+- invitations Plex en attente : un seul scan media_users type='plex' ;
+- contextes de communication : une seule jointure media_users/servers ;
+- marqueurs déjà envoyés : une jointure sent_* / vodum_users limitée à la
+  date d'expiration courante de chaque utilisateur ;
+- disponibilité des canaux : settings Discord enrichis une seule fois.
+"""
+from __future__ import annotations
+
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from discord_utils import enrich_discord_settings, is_discord_ready
+from notifications_utils import is_email_ready
+
+
+_PROVIDER_ORDER_SQL = """
+    CASE LOWER(COALESCE(s.type, ''))
+        WHEN 'plex' THEN 0
+        WHEN 'jellyfin' THEN 1
+        ELSE 2
+    END
+"""
+
+
+def _row_value(row, key, default=None):
+    try:
+        return row[key]
+    except Exception:
+        return default
+
+
+def _json_dict_or_empty(raw):
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def plex_invite_pending(rows: Iterable) -> bool:
+    """
+    True si, parmi les media_users Plex d'un utilisateur :
+    - aucun n'est accepté
+    - au moins un est encore pending
+    """
+    any_accepted = False
+    any_pending = False
+
+    for row in rows or []:
+        accepted_at = str(_row_value(row, "accepted_at") or "").strip()
+        if accepted_at:
+            any_accepted = True
+            continue
+
+        details = _json_dict_or_empty(_row_value(row, "details_json"))
+        invite_state = details.get("plex_invite_state") or {}
+
+        if isinstance(invite_state, dict) and bool(invite_state.get("is_pending")):
+            any_pending = True
+            continue
+
+        external_user_id = str(_row_value(row, "external_user_id") or "").strip()
+        email = str(_row_value(row, "email") or "").strip()
+        username = str(_row_value(row, "username") or "").strip()
+
+        if not external_user_id and (email or username):
+            any_pending = True
+
+    return any_pending and not any_accepted
+
+
+def comm_contexts_from_rows(rows: Iterable) -> List[dict]:
+    """Contextes (provider, server_id) dédoublonnés, Plex puis Jellyfin."""
+    contexts = []
+    seen = set()
+
+    for row in rows or []:
+        provider = str(_row_value(row, "provider") or "").strip().lower()
+        server_id = _row_value(row, "server_id")
+
+        if provider not in ("plex", "jellyfin"):
+            continue
+
+        key = (provider, server_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        contexts.append({
+            "provider": provider,
+            "server_id": server_id,
+        })
+
+    return contexts
+
+
+class ExpirationNotificationIndex:
+    """
+    Index en mémoire construit une fois par run de send_expiration_emails.
+
+    Les marqueurs envoyés ne sont préchargés que pour la date d'expiration
+    courante de chaque utilisateur ; une date stockée sous une forme non
+    canonique (ex. '2026-1-5') retombe sur une requête ciblée.
+    """
+
+    def __init__(self, db, settings: dict):
+        self.db = db
+        self.queries = 0
+
+        s = dict(settings or {})
+        self.email_ready = bool(is_email_ready(s))
+        self.discord_ready = bool(is_discord_ready(enrich_discord_settings(db, s)))
+
+        self._pending_plex: Set[int] = set()
+        self._contexts: Dict[int, List[dict]] = {}
+        self._sent: Dict[str, Set[Tuple[int, str]]] = {"email": set(), "discord": set()}
+
+        self._load_pending_plex()
+        self._load_contexts()
+        self._load_sent("email", "sent_emails")
+        self._load_sent("discord", "sent_discord")
+
+    # -------------------------
+    # Chargement
+    # -------------------------
+
+    def _query(self, sql: str, params=()):
+        self.queries += 1
+        return self.db.query(sql, params) or []
+
+    def _load_pending_plex(self) -> None:
+        rows = self._query(
+            """
+            SELECT vodum_user_id, accepted_at, external_user_id, details_json, email, username
+            FROM media_users
+            WHERE type = 'plex'
+              AND vodum_user_id IS NOT NULL
+            """
+        )
+        by_user: Dict[int, list] = {}
+        for row in rows:
+            by_user.setdefault(int(row["vodum_user_id"]), []).append(row)
+
+        self._pending_plex = {uid for uid, user_rows in by_user.items() if plex_invite_pending(user_rows)}
+
+    def _load_contexts(self) -> None:
+        rows = self._query(
+            f"""
+            SELECT
+                mu.vodum_user_id AS vodum_user_id,
+                LOWER(COALESCE(s.type, '')) AS provider,
+                mu.server_id AS server_id
+            FROM media_users mu
+            JOIN servers s ON s.id = mu.server_id
+            WHERE mu.vodum_user_id IS NOT NULL
+            ORDER BY mu.vodum_user_id, {_PROVIDER_ORDER_SQL}, mu.id ASC
+            """
+        )
+        by_user: Dict[int, list] = {}
+        for row in rows:
+            by_user.setdefault(int(row["vodum_user_id"]), []).append(row)
+
+        self._contexts = {uid: comm_contexts_from_rows(user_rows) for uid, user_rows in by_user.items()}
+
+    def _load_sent(self, channel: str, table: str) -> None:
+        # table est une constante interne (sent_emails / sent_discord)
+        rows = self._query(
+            f"""
+            SELECT t.user_id, t.template_type
+            FROM vodum_users u
+            JOIN {table} t
+              ON t.user_id = u.id
+             AND t.expiration_date = SUBSTR(u.expiration_date, 1, 10)
+            WHERE u.expiration_date IS NOT NULL
+            """
+        )
+        self._sent[channel] = {(int(row["user_id"]), str(row["template_type"])) for row in rows}
+
+    # -------------------------
+    # Lookups (sans requête)
+    # -------------------------
+
+    def has_pending_plex_invite(self, user_id: int) -> bool:
+        return int(user_id) in self._pending_plex
+
+    def comm_contexts(self, user_id: int) -> List[dict]:
+        return self._contexts.get(int(user_id), [])
+
+    def available_channels(self, user: dict) -> Dict[str, bool]:
+        user_email_ok = bool((user.get("email") or "").strip() or (user.get("second_email") or "").strip())
+        user_discord_ok = bool((user.get("discord_user_id") or "").strip())
+        return {
+            "email": self.email_ready and user_email_ok,
+            "discord": self.discord_ready and user_discord_ok,
+        }
+
+    def sent_channels(self, user: dict, markers: List[str], exp_iso: str) -> Tuple[bool, bool]:
+        """(email_sent, discord_sent) pour ces marqueurs et cette expiration."""
+        uid = int(user["id"])
+        keys = [marker for marker in (markers or []) if marker]
+        if not keys:
+            return False, False
+
+        if str(user.get("expiration_date") or "")[:10] != exp_iso:
+            return (
+                self._sent_fallback("sent_emails", uid, keys, exp_iso),
+                self._sent_fallback("sent_discord", uid, keys, exp_iso),
+            )
+
+        return (
+            any((uid, key) in self._sent["email"] for key in keys),
+            any((uid, key) in self._sent["discord"] for key in keys),
+        )
+
+    def _sent_fallback(self, table: str, user_id: int, keys: List[str], exp_iso: str) -> bool:
+        placeholders = ",".join("?" for _ in keys)
+        self.queries += 1
+        row = self.db.query_one(
+            f"""
+            SELECT 1
+            FROM {table}
+            WHERE user_id = ?
+              AND expiration_date = ?
+              AND template_type IN ({placeholders})
+            LIMIT 1
+            """,
+            (user_id, exp_iso, *keys),
+        )
+        return bool(row)
+
+
+def load_scheduled_by_dedupe_key(db, dedupe_keys: List[str], chunk_size: int = 500) -> Dict[str, dict]:
+    """Lignes comm_scheduled existantes pour ces dedupe_key, par paquets IN (...)."""
+    existing: Dict[str, dict] = {}
+    keys = list(dict.fromkeys(key for key in dedupe_keys if key))
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        placeholders = ",".join("?" for _ in chunk)
+        rows = db.query(
+            f"""
+            SELECT id, dedupe_key, status, attempt_count, max_attempts
+            FROM comm_scheduled
+            WHERE dedupe_key IN ({placeholders})
+            """,
+            tuple(chunk),
+        ) or []
+        for row in rows:
+            existing[row["dedupe_key"]] = dict(row)
+    return existing
+
+
+def scheduled_row_blocks_requeue(row: Optional[dict], default_max_attempts: int) -> bool:
+    """
+    Même règle que schedule_template_notification : une ligne envoyée ou
+    encore en cours (pending / retry) n'est pas touchée, seule une ligne en
+    erreur finale est relancée.
+    """
+    if not row:
+        return False
+    status = (row.get("status") or "").strip().lower()
+    if status == "sent":
+        return True
+    attempt_count = int(row.get("attempt_count") or 0)
+    max_attempts = int(row.get("max_attempts") or default_max_attempts)
+    return not (status == "error" and attempt_count >= max_attempts)
@@ -0,0 +1,52 @@
+"""
+Comptage des requêtes HTTP d'une exécution de tâche.
+
+Les sessions de core.http_security portent le hook `count_http_call` ; il
+incrémente le compteur rattaché au thread courant (mesure de tâche en cours,
+ou worker rattaché par core.tasks.run_metrics.bind_run_metrics). Sans
+compteur rattaché, le hook ne fait rien.
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+
+_http_calls = threading.local()
+
+
+class HttpCallCounter:
+    """Compteur d'une mesure, partageable avec les threads workers de la tâche."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, n=1):
+        with self._lock:
+            self.count += n
+
+
+def current_http_counter() -> HttpCallCounter | None:
+    return getattr(_http_calls, "counter", None)
+
+
+@contextmanager
+def bind_http_counter(counter: HttpCallCounter | None):
+    previous = current_http_counter()
+    _http_calls.counter = counter
+    try:
+        yield counter
+    finally:
+        _http_calls.counter = previous
+
+
+def note_http_call() -> None:
+    counter = current_http_counter()
+    if counter is not None:
+        counter.add()
+
+
+def count_http_call(response, *args, **kwargs):
+    """Hook `response` de requests : compte la réponse, sans la remplacer."""
+    note_http_call()
+    return None
@@ -5,6 +5,8 @@ from urllib.parse import urljoin, urlsplit
 import requests
 import json
 
+from core.http_metrics import count_http_call
+
 
 def url_origin(value: object) -> tuple[str, str, int] | None:
     try:
@@ -56,6 +58,8 @@ class ConfiguredHostSession(requests.Session):
             origin for origin in allowed_origins if origin is not None
         }
         self.default_timeout = default_timeout
+        # Comptage des appels dans les métriques de la tâche en cours
+        self.hooks["response"].append(count_http_call)
 
     def request(self, method, url, **kwargs):
         if self.default_timeout is not None:
@@ -95,12 +95,14 @@ def _resolve_server(db, ref: dict) -> dict:
         rows = db.query(
             "SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE lower(trim(type))=? AND trim(COALESCE(server_identifier,''))=?",
             (provider, identifier),
+            decrypt_servers=True,
         )
         if len(rows) == 1:
             return _dict(rows[0])
     rows = db.query(
         "SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE lower(trim(type))=? AND lower(trim(name))=lower(trim(?))",
         (provider, name),
+        decrypt_servers=True,
     )
     if len(rows) != 1:
         raise ValueError(f"Migration plan server could not be resolved uniquely: {provider} / {name}.")
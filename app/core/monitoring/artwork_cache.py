@@ -3,9 +3,13 @@
 from __future__ import annotations
 
 import hashlib
+import io
 import json
 import os
+import re
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
 
 
@@ -15,6 +19,17 @@ ARTWORK_CACHE_DIR = Path(
 ARTWORK_CACHE_TTL_SECONDS = int(
     os.environ.get("VODUM_ARTWORK_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
 )
+# Budget disque (octets, originaux + vignettes) ; 0 = pas de limite
+ARTWORK_CACHE_MAX_BYTES = int(
+    os.environ.get("VODUM_ARTWORK_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024))
+)
+
+# Largeurs des vignettes générées à l'écriture (px). Les templates demandent
+# la taille affichée via ?size= ; une taille plus grande sert l'original.
+ARTWORK_VARIANT_WIDTHS = (150, 300, 600)
+ARTWORK_VARIANT_JPEG_QUALITY = 85
+
+_VARIANT_STEM_RE = re.compile(r"^(?P<key>[A-Za-z0-9]+)w(?P<width>\d+)$")
 
 
 def detect_image_content_type(content: bytes) -> str | None:
@@ -42,13 +57,17 @@ def _remove_cache_pair(img_path: Path, meta_path: Path) -> None:
             pass
 
 
+def _safe_cache_key(cache_key: str) -> str:
+    return "".join(char for char in str(cache_key) if char.isalnum())
+
+
 def artwork_cache_key(*parts) -> str:
     raw = "|".join(str(part or "") for part in parts)
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
 def artwork_cache_paths(cache_key: str) -> tuple[Path | None, Path | None]:
-    safe_key = "".join(char for char in str(cache_key) if char.isalnum())
+    safe_key = _safe_cache_key(cache_key)
     if not safe_key:
         return None, None
     ARTWORK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -58,47 +77,416 @@ def artwork_cache_paths(cache_key: str) -> tuple[Path | None, Path | None]:
     )
 
 
-def read_artwork_cache(cache_key: str, *, allow_stale: bool = False) -> dict | None:
-    img_path, meta_path = artwork_cache_paths(cache_key)
-    if not img_path or not meta_path or not img_path.exists() or not meta_path.exists():
-        return None
+def _variant_cache_key(cache_key: str, width: int) -> str:
+    return f"{cache_key}w{int(width)}"
+
+
+def _remove_cache_files(safe_key: str, variants) -> None:
+    for key in [safe_key, *(_variant_cache_key(safe_key, width) for width in variants)]:
+        _remove_cache_pair(ARTWORK_CACHE_DIR / f"{key}.img", ARTWORK_CACHE_DIR / f"{key}.json")
+
+
+class ArtworkCacheIndex:
+    """
+    Index en mémoire du cache disque : clé -> type, taille, mtime, vignettes.
+
+    Chargé une fois depuis le disque (scan du répertoire, lecture des .json),
+    puis tenu à jour à chaque écriture / suppression : un HIT ne coûte plus
+    aucun appel système avant send_file. L'ordre de l'OrderedDict sert de LRU
+    pour le budget disque ; une entrée regroupe l'original et ses vignettes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._loaded = False
+        self.total_bytes = 0
+        self.evicted = 0
+
+    # -------------------------
+    # Chargement (1 fois par process)
+    # -------------------------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load()
+            self._loaded = True
+
+    @staticmethod
+    def _read_meta(path: Path) -> dict:
+        try:
+            meta = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        return meta if isinstance(meta, dict) else {}
+
+    def _load(self) -> None:
+        originals = []
+        variants = []
+        try:
+            scanned = list(os.scandir(ARTWORK_CACHE_DIR))
+        except OSError:
+            scanned = []
+
+        names = {item.name for item in scanned}
+        for item in scanned:
+            # Restes d'écriture interrompue (> 1 h) et méta sans image
+            try:
+                leftover = (
+                    item.name.endswith(".tmp") and item.stat().st_mtime < time.time() - 3600
+                ) or (item.name.endswith(".json") and f"{item.name[:-5]}.img" not in names)
+                if leftover:
+                    os.unlink(item.path)
+                    continue
+            except OSError:
+                continue
+            if not item.name.endswith(".img"):
+                continue
+            stem = item.name[:-4]
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            meta_path = ARTWORK_CACHE_DIR / f"{stem}.json"
+            meta = self._read_meta(meta_path)
+            content_type = meta.get("content_type")
+            if not content_type:
+                # Ancienne entrée sans méta lisible : on renifle la signature
+                try:
+                    with open(item.path, "rb") as handle:
+                        content_type = detect_image_content_type(handle.read(32))
+                except OSError:
+                    content_type = None
+                if not content_type:
+                    _remove_cache_pair(Path(item.path), meta_path)
+                    continue
+
+            match = _VARIANT_STEM_RE.match(stem)
+            if match and int(match.group("width")) in ARTWORK_VARIANT_WIDTHS:
+                variants.append((match.group("key"), int(match.group("width")), content_type, stat.st_size))
+            else:
+                originals.append((stat.st_mtime, stem, content_type, stat.st_size, "variants" in meta))
+
+        # Plus ancien en tête : approximation LRU au démarrage
+        for mtime, stem, content_type, size, variants_known in sorted(originals):
+            self._entries[stem] = {
+                "content_type": content_type,
+                "size": size,
+                "mtime": mtime,
+                "variants": {},
+                "variants_known": variants_known,
+            }
+            self.total_bytes += size
+
+        for stem, width, content_type, size in variants:
+            entry = self._entries.get(stem)
+            if entry is None:
+                # Vignette dont l'original a disparu
+                _remove_cache_files(f"{stem}w{width}", ())
+                continue
+            entry["variants"][width] = {"content_type": content_type, "size": size}
+            entry["size"] += size
+            self.total_bytes += size
 
+    # -------------------------
+    # Lecture
+    # -------------------------
+
+    def lookup(self, safe_key: str) -> dict | None:
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(safe_key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(safe_key)
+            return {**entry, "variants": dict(entry["variants"])}
+
+    # -------------------------
+    # Mise à jour (écriture / suppression)
+    # -------------------------
+
+    def record(self, safe_key: str, content_type: str, size: int, mtime: float) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            previous = self._entries.pop(safe_key, None)
+            variants = previous["variants"] if previous else {}
+            if previous:
+                self.total_bytes -= previous["size"]
+            entry_size = size + sum(v["size"] for v in variants.values())
+            self._entries[safe_key] = {
+                "content_type": content_type,
+                "size": entry_size,
+                "mtime": mtime,
+                "variants": variants,
+                "variants_known": False,
+            }
+            self.total_bytes += entry_size
+
+    def record_variant(self, safe_key: str, width: int, content_type: str | None, size: int | None) -> None:
+        """Ajoute (ou retire si size est None) une vignette de l'entrée."""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.get(safe_key)
+            if entry is None:
+                return
+            previous = entry["variants"].pop(width, None)
+            if previous:
+                entry["size"] -= previous["size"]
+                self.total_bytes -= previous["size"]
+            if size is not None:
+                entry["variants"][width] = {"content_type": content_type, "size": size}
+                entry["size"] += size
+                self.total_bytes += size
+
+    def mark_variants_known(self, safe_key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(safe_key)
+            if entry is not None:
+                entry["variants_known"] = True
+
+    def forget(self, safe_key: str) -> dict | None:
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._entries.pop(safe_key, None)
+            if entry is not None:
+                self.total_bytes -= entry["size"]
+            return entry
+
+    def remove(self, safe_key: str) -> bool:
+        entry = self.forget(safe_key)
+        if entry is None:
+            return False
+        _remove_cache_files(safe_key, entry["variants"])
+        return True
+
+    def evict_over_budget(self, max_bytes: int, keep: str | None = None) -> int:
+        """Supprime les entrées les moins récemment servies au-delà du budget."""
+        if max_bytes <= 0:
+            return 0
+        self._ensure_loaded()
+        evicted = []
+        with self._lock:
+            for safe_key in list(self._entries):
+                if self.total_bytes <= max_bytes:
+                    break
+                if safe_key == keep:
+                    continue
+                entry = self._entries.pop(safe_key)
+                self.total_bytes -= entry["size"]
+                evicted.append((safe_key, entry))
+            self.evicted += len(evicted)
+        for safe_key, entry in evicted:
+            _remove_cache_files(safe_key, entry["variants"])
+        return len(evicted)
+
+    def sweep_orphans(self, min_age_seconds: int = 3600) -> int:
+        """
+        Un scandir du répertoire : supprime les .tmp d'écritures interrompues,
+        les .json sans image et les images absentes de l'index (jamais servies,
+        hors budget). Seuls les fichiers plus vieux que min_age_seconds sont
+        touchés, pour ne pas gêner une écriture en cours.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            known = {
+                key: set(entry["variants"])
+                for key, entry in self._entries.items()
+            }
+
+        try:
+            scanned = list(os.scandir(ARTWORK_CACHE_DIR))
+        except OSError:
+            return 0
+
+        names = {item.name for item in scanned}
+        cutoff = time.time() - max(0, int(min_age_seconds))
+        removed = 0
+        for item in scanned:
+            name = item.name
+            if name.endswith(".tmp"):
+                orphan = True
+            elif name.endswith(".json"):
+                orphan = f"{name[:-5]}.img" not in names
+            elif name.endswith(".img"):
+                stem = name[:-4]
+                match = _VARIANT_STEM_RE.match(stem)
+                if stem in known:
+                    orphan = False
+                elif match and match.group("key") in known:
+                    orphan = int(match.group("width")) not in known[match.group("key")]
+                else:
+                    orphan = True
+            else:
+                continue
+
+            if not orphan:
+                continue
+            try:
+                if item.stat().st_mtime >= cutoff:
+                    continue
+                os.unlink(item.path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def keys_older_than(self, cutoff_ts: float) -> list[str]:
+        self._ensure_loaded()
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry["mtime"] < cutoff_ts]
+
+    def stats(self) -> dict:
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": ARTWORK_CACHE_MAX_BYTES,
+                "evicted": self.evicted,
+            }
+
+
+_INDEX = ArtworkCacheIndex()
+
+
+def artwork_cache_index() -> ArtworkCacheIndex:
+    return _INDEX
+
+
+def artwork_variant_width(value) -> int | None:
+    """Plus petite variante couvrant la largeur demandée, None pour l'original."""
     try:
-        with img_path.open("rb") as handle:
-            detected_content_type = detect_image_content_type(handle.read(32))
-    except OSError:
+        requested = int(value)
+    except (TypeError, ValueError):
         return None
-    if not detected_content_type:
-        _remove_cache_pair(img_path, meta_path)
+    if requested <= 0:
+        return None
+    for width in ARTWORK_VARIANT_WIDTHS:
+        if requested <= width:
+            return width
+    return None
+
+
+def read_artwork_cache(
+    cache_key: str,
+    *,
+    allow_stale: bool = False,
+    width: int | None = None,
+) -> dict | None:
+    safe_key = _safe_cache_key(cache_key)
+    entry = _INDEX.lookup(safe_key) if safe_key else None
+    if not entry:
         return None
 
-    age = time.time() - img_path.stat().st_mtime
-    is_stale = age > ARTWORK_CACHE_TTL_SECONDS
+    is_stale = time.time() - entry["mtime"] > ARTWORK_CACHE_TTL_SECONDS
     if is_stale and not allow_stale:
         return None
 
-    try:
-        meta = json.loads(meta_path.read_text(encoding="utf-8"))
-    except Exception:
-        meta = {}
-
-    return {
-        "path": img_path,
-        "content_type": detected_content_type,
+    cached = {
+        "path": ARTWORK_CACHE_DIR / f"{safe_key}.img",
+        "content_type": entry["content_type"],
         "is_stale": is_stale,
         "max_age": 300 if is_stale else ARTWORK_CACHE_TTL_SECONDS,
     }
+    if not width:
+        return cached
+
+    # Entrée écrite avant les variantes : génération paresseuse depuis l'original
+    if width not in entry["variants"] and not entry["variants_known"]:
+        try:
+            content = cached["path"].read_bytes()
+        except OSError:
+            return cached
+        _write_artwork_variants(
+            safe_key,
+            content,
+            {"content_type": entry["content_type"], "saved_at": int(entry["mtime"])},
+        )
+        enforce_artwork_cache_budget(keep=safe_key)
+        entry = _INDEX.lookup(safe_key) or entry
+
+    variant = entry["variants"].get(width)
+    if variant:
+        return {
+            **cached,
+            "path": ARTWORK_CACHE_DIR / f"{_variant_cache_key(safe_key, width)}.img",
+            "content_type": variant["content_type"],
+        }
+
+    # Original plus étroit que la variante (ou Pillow absent) : on sert l'original
+    return cached
 
 
 def is_artwork_cache_fresh(cache_key: str) -> bool:
     return read_artwork_cache(cache_key) is not None
 
 
-def write_artwork_cache(cache_key: str, content: bytes, content_type: str) -> bool:
-    detected_content_type = detect_image_content_type(content)
-    if not detected_content_type:
-        return False
+def forget_artwork_cache(cache_key: str) -> None:
+    """Retire une entrée de l'index (fichier disparu du disque)."""
+    safe_key = _safe_cache_key(cache_key)
+    if safe_key:
+        _INDEX.forget(safe_key)
+
+
+def remove_artwork_cache(cache_key: str) -> bool:
+    safe_key = _safe_cache_key(cache_key)
+    return _INDEX.remove(safe_key) if safe_key else False
+
+
+def enforce_artwork_cache_budget(keep: str | None = None) -> int:
+    return _INDEX.evict_over_budget(ARTWORK_CACHE_MAX_BYTES, keep=_safe_cache_key(keep) if keep else None)
+
+
+_PILLOW = None
+
+
+def _load_pillow():
+    # Pillow est optionnel : sans lui, les templates reçoivent l'original
+    global _PILLOW
+    if _PILLOW is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = False
+        _PILLOW = Image
+    return _PILLOW or None
+
+
+def _resize_image(Image, content: bytes, width: int) -> bytes | None:
+    """Redimensionne à `width` px de large, None si inutile ou impossible."""
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            if image.width <= width or getattr(image, "is_animated", False):
+                return None
+            height = max(1, round(image.height * width / image.width))
+            has_alpha = image.mode in {"RGBA", "LA"} or (
+                image.mode == "P" and "transparency" in image.info
+            )
+            resized = image.convert("RGBA" if has_alpha else "RGB").resize(
+                (width, height),
+                Image.LANCZOS,
+            )
+            output = io.BytesIO()
+            if has_alpha:
+                resized.save(output, format="PNG", optimize=True)
+            else:
+                resized.save(
+                    output,
+                    format="JPEG",
+                    quality=ARTWORK_VARIANT_JPEG_QUALITY,
+                    optimize=True,
+                    progressive=True,
+                )
+            return output.getvalue()
+    except Exception:
+        return None
 
+
+def _write_cache_pair(cache_key: str, content: bytes, meta: dict) -> bool:
     img_path, meta_path = artwork_cache_paths(cache_key)
     if not img_path or not meta_path:
         return False
@@ -106,16 +494,67 @@ def write_artwork_cache(cache_key: str, content: bytes, content_type: str) -> bo
     tmp_img_path = img_path.with_suffix(".img.tmp")
     tmp_meta_path = meta_path.with_suffix(".json.tmp")
     tmp_img_path.write_bytes(content)
-    tmp_meta_path.write_text(
-        json.dumps(
-            {
-                "content_type": detected_content_type,
-                "saved_at": int(time.time()),
-            },
-            ensure_ascii=False,
-        ),
-        encoding="utf-8",
-    )
+    tmp_meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
     os.replace(tmp_img_path, img_path)
     os.replace(tmp_meta_path, meta_path)
     return True
+
+
+def _write_artwork_variants(cache_key: str, content: bytes, meta: dict) -> list[int]:
+    """
+    Écrit les vignettes de l'original puis note la liste dans sa méta
+    (sans toucher au .img, dont le mtime porte le TTL).
+    """
+    Image = _load_pillow()
+    if Image is None:
+        # Pas de "variants" dans la méta : on retentera à la prochaine lecture
+        return []
+
+    safe_key = _safe_cache_key(cache_key)
+    written = []
+    for width in ARTWORK_VARIANT_WIDTHS:
+        variant_key = _variant_cache_key(safe_key, width)
+        resized = _resize_image(Image, content, width)
+        if not resized:
+            # Ancienne vignette d'un original remplacé : ne plus la servir
+            _remove_cache_pair(*artwork_cache_paths(variant_key))
+            _INDEX.record_variant(safe_key, width, None, None)
+            continue
+        variant_type = detect_image_content_type(resized)
+        variant_meta = {
+            "content_type": variant_type,
+            "saved_at": int(time.time()),
+            "width": width,
+        }
+        if _write_cache_pair(variant_key, resized, variant_meta):
+            _INDEX.record_variant(safe_key, width, variant_type, len(resized))
+            written.append(width)
+
+    _, meta_path = artwork_cache_paths(safe_key)
+    if meta_path and meta_path.exists():
+        tmp_meta_path = meta_path.with_suffix(".json.tmp")
+        tmp_meta_path.write_text(
+            json.dumps({**meta, "variants": written}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp_meta_path, meta_path)
+        _INDEX.mark_variants_known(safe_key)
+    return written
+
+
+def write_artwork_cache(cache_key: str, content: bytes, content_type: str) -> bool:
+    detected_content_type = detect_image_content_type(content)
+    if not detected_content_type:
+        return False
+
+    meta = {
+        "content_type": detected_content_type,
+        "saved_at": int(time.time()),
+    }
+    if not _write_cache_pair(cache_key, content, meta):
+        return False
+
+    _INDEX.record(_safe_cache_key(cache_key), detected_content_type, len(content), time.time())
+    _write_artwork_variants(cache_key, content, meta)
+    enforce_artwork_cache_budget(keep=cache_key)
+    return True
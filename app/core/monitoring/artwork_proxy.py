@@ -5,8 +5,14 @@ from __future__ import annotations
 import re
 
 from core.http_security import server_http_session
-from core.monitoring.artwork_cache import artwork_cache_key, read_artwork_cache, write_artwork_cache
-from core.plex_rate_limit import wait_for_plex_slot
+from core.monitoring.artwork_cache import (
+    artwork_cache_key,
+    artwork_variant_width,
+    detect_image_content_type,
+    read_artwork_cache,
+    write_artwork_cache,
+)
+from core.plex_rate_limit import record_plex_response, wait_for_plex_slot
 
 
 class ArtworkProxyError(Exception):
@@ -29,20 +35,31 @@ def _server_bases(server: dict) -> list[str]:
     return bases
 
 
-def _cached_result(cache_key: str, allow_stale: bool = False) -> dict | None:
-    cached = read_artwork_cache(cache_key, allow_stale=allow_stale)
-    return {"kind": "file", **cached} if cached else None
+def _cached_result(cache_key: str, allow_stale: bool = False, width: int | None = None) -> dict | None:
+    cached = read_artwork_cache(cache_key, allow_stale=allow_stale, width=width)
+    if not cached:
+        return None
+    return {
+        "kind": "file",
+        "cache_key": cache_key,
+        "cache_status": "STALE" if cached["is_stale"] else "HIT",
+        **cached,
+    }
 
 
-def _content_result(cache_key: str, response) -> dict:
+def _content_result(cache_key: str, response, width: int | None = None) -> dict:
     content_type = response.headers.get("Content-Type") or ""
     if not write_artwork_cache(cache_key, response.content, content_type):
         raise ValueError("Provider response is not a supported image")
-    cached = read_artwork_cache(cache_key)
+
+    # Servi depuis le disque pour bénéficier d'ETag / Last-Modified dès le MISS
+    cached = read_artwork_cache(cache_key, width=width)
+    if cached:
+        return {"kind": "file", "cache_key": cache_key, **cached, "cache_status": "MISS"}
     return {
         "kind": "content",
         "content": response.content,
-        "content_type": cached["content_type"] if cached else "image/jpeg",
+        "content_type": detect_image_content_type(response.content) or "image/jpeg",
     }
 
 
@@ -76,13 +93,15 @@ def fetch_monitoring_artwork(server: dict, query, timeout: int = 10) -> dict:
     if not bases:
         raise ArtworkProxyError(502, "No configured server URL")
     http = server_http_session(server)
+    # Vignette demandée par le template (?size=), distincte de w/q Jellyfin
+    variant_width = artwork_variant_width(query.get("size"))
 
     if provider == "plex":
         path = str(query.get("path") or "").strip()
         if not _safe_relative_media_path(path):
             raise ArtworkProxyError(400, "Invalid Plex artwork path")
         cache_key = artwork_cache_key("plex", server["id"], path)
-        cached = _cached_result(cache_key)
+        cached = _cached_result(cache_key, width=variant_width)
         if cached:
             return cached
         for candidate_path in _plex_candidate_paths(path):
@@ -90,11 +109,12 @@ def fetch_monitoring_artwork(server: dict, query, timeout: int = 10) -> dict:
                 try:
                     wait_for_plex_slot(base)
                     response = http.get(base + candidate_path, headers={"X-Plex-Token": token}, timeout=timeout)
+                    record_plex_response(base, response)
                     response.raise_for_status()
-                    return _content_result(cache_key, response)
+                    return _content_result(cache_key, response, variant_width)
                 except Exception:
                     continue
-        stale = _cached_result(cache_key, allow_stale=True)
+        stale = _cached_result(cache_key, allow_stale=True, width=variant_width)
         if stale:
             return stale
         raise ArtworkProxyError(502, "Plex artwork unavailable")
@@ -107,7 +127,7 @@ def fetch_monitoring_artwork(server: dict, query, timeout: int = 10) -> dict:
     width = str(query.get("w") or "120")
     quality = str(query.get("q") or "90")
     cache_key = artwork_cache_key("jellyfin", server["id"], item_id, image_type, image_index, width, quality)
-    cached = _cached_result(cache_key)
+    cached = _cached_result(cache_key, width=variant_width)
     if cached:
         return cached
     paths = [f"/Items/{item_id}/Images/{image_type}"]
@@ -125,10 +145,10 @@ def fetch_monitoring_artwork(server: dict, query, timeout: int = 10) -> dict:
                     timeout=timeout,
                 )
                 response.raise_for_status()
-                return _content_result(cache_key, response)
+                return _content_result(cache_key, response, variant_width)
             except Exception:
                 continue
-    stale = _cached_result(cache_key, allow_stale=True)
+    stale = _cached_result(cache_key, allow_stale=True, width=variant_width)
     if stale:
         return stale
     raise ArtworkProxyError(502, "Jellyfin artwork unavailable")
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import os
+from concurrent.futures import wait
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 import requests
@@ -17,6 +19,7 @@ from core.monitoring.resource_stats import (
     store_server_resource_stats as _store_server_resource_stats,
 )
 from core.providers.registry import get_provider
+from core.tasks.run_metrics import RunMetricsThreadPoolExecutor
 from logging_utils import get_logger, is_debug_mode_enabled
 from core.server_cooldown import mark_server_unreachable, clear_server_cooldown, should_skip_unreachable_server
 
@@ -29,7 +32,7 @@ _COLLECT_ERROR_THROTTLE_SECONDS = 300  # 5 minutes
 # Délai de grâce avant de considérer une session comme réellement stoppée.
 # Cela évite qu'un timeout Plex/Jellyfin fasse disparaître temporairement
 # toutes les lectures en cours.
-_SESSION_MISSING_GRACE_SECONDS = 10
+SESSION_MISSING_GRACE_SECONDS = 10
 _SESSION_MISSING_CONFIRM_POLLS = 1
 
 
@@ -92,6 +95,7 @@ def _load_single_server(db, server_id: int) -> Optional[Dict[str, Any]]:
         LIMIT 1
         """,
         (server_id,),
+        decrypt_servers=True,
     )
     return AttrDict(dict(row)) if row else None
 
@@ -104,7 +108,8 @@ def _load_all_servers(db) -> List[Dict[str, Any]]:
         FROM servers
         WHERE LOWER(TRIM(type)) IN ('plex','jellyfin')
         ORDER BY id
-        """
+        """,
+        decrypt_servers=True,
     )
     return [AttrDict(dict(r)) for r in rows]
 
@@ -316,630 +321,756 @@ def write_monitoring_snapshot(db) -> Dict[str, Any]:
         "transcodes": transcodes,
     }
 
-def collect_sessions_for_server(
-    db,
-    server_id: int,
-    provider: Optional[str] = None,
-    payload: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
+
+def _fetch_server_sessions(srv, provider_name: str) -> Dict[str, Any]:
     """
-    Collecte Now Playing pour 1 serveur.
-    - upsert media_sessions
-    - insert media_events
-    - push history sur stop
-    - met à jour servers.last_checked et servers.status
+    Partie réseau d'un poll (sessions + stats ressources), sans accès DB :
+    peut tourner en parallèle pour plusieurs serveurs.
     """
-    srv = _load_single_server(db, server_id)
+    provider_impl = get_provider(srv)
+    current = provider_impl.get_active_sessions()  # liste normalisée
 
+    try:
+        resource_stats = _collect_server_resource_stats(srv, provider_name)
+    except Exception as resource_exc:
+        resource_stats = None
+        if is_debug_mode_enabled():
+            logger.debug(
+                "server resource stats collection failed (server_id=%s): %s",
+                srv["id"],
+                str(resource_exc),
+            )
 
-    
-    if not srv:
-        raise RuntimeError(f"Server id={server_id} not found or not plex/jellyfin")
+    return {"current": current, "resource_stats": resource_stats}
 
-    provider_name = (provider or (srv["type"] if "type" in srv else None) or "").lower().strip()
-    if provider_name not in ("plex", "jellyfin"):
-        raise RuntimeError(f"Unsupported provider '{provider_name}' for server id={server_id}")
 
-    report = {"server_id": server_id, "provider": provider_name, "sessions_seen": 0, "events": 0}
-    if should_skip_unreachable_server(srv):
-        if is_debug_mode_enabled():
-            logger.debug("collect_sessions_for_server skipped: server_id=%s in cooldown", server_id)
-        return report
-        
-    # IMPORTANT : si ça plante (auth/timeout/provider bug), on marque le serveur DOWN
-    try:
-        provider_impl = get_provider(srv)
-        prev_map = _fetch_existing_sessions(db, server_id)
+def _write_server_sessions(
+    db,
+    server_id: int,
+    provider_name: str,
+    fetched: Dict[str, Any],
+    report: Dict[str, Any],
+) -> None:
+    """
+    Partie écriture d'un poll. À appeler dans db.transaction() : un seul
+    commit par poll, et un poll interrompu ne laisse pas d'état partiel.
+    """
+    current = fetched["current"]
+    resource_stats = fetched["resource_stats"]
+    report["sessions_seen"] = len(current)
 
-        current = provider_impl.get_active_sessions()  # liste normalisée
-        report["sessions_seen"] = len(current)
+    prev_map = _fetch_existing_sessions(db, server_id)
 
+    if resource_stats is not None:
         try:
-            resource_stats = _collect_server_resource_stats(srv, provider_name)
             _store_server_resource_stats(db, server_id, provider_name, resource_stats)
         except Exception as resource_exc:
             if is_debug_mode_enabled():
                 logger.debug(
-                    "server resource stats collection failed (server_id=%s): %s",
+                    "server resource stats write failed (server_id=%s): %s",
                     server_id,
                     str(resource_exc),
                 )
 
-        cur_map = {str(s["session_key"]): s for s in current if s.get("session_key")}
+    cur_map = {str(s["session_key"]): s for s in current if s.get("session_key")}
 
-        # Si le même user + même client apparaît avec une nouvelle session_key,
-        # on force la clôture de l'ancienne session immédiatement.
-        # Ça évite d'afficher 2 épisodes en cours pendant la fenêtre de grâce
-        # et ça évite aussi de fausser les pics de streams.
-        current_identities = {
-            _session_identity_key(sess)
-            for sess in cur_map.values()
-            if _session_identity_key(sess)
-        }
+    # Si le même user + même client apparaît avec une nouvelle session_key,
+    # on force la clôture de l'ancienne session immédiatement.
+    # Ça évite d'afficher 2 épisodes en cours pendant la fenêtre de grâce
+    # et ça évite aussi de fausser les pics de streams.
+    current_identities = {
+        _session_identity_key(sess)
+        for sess in cur_map.values()
+        if _session_identity_key(sess)
+    }
 
-        for old_sk, old_sess in prev_map.items():
-            if old_sk in cur_map:
-                continue
+    for old_sk, old_sess in prev_map.items():
+        if old_sk in cur_map:
+            continue
 
-            old_identity = _session_identity_key(old_sess)
-            if not old_identity or old_identity not in current_identities:
-                continue
+        old_identity = _session_identity_key(old_sess)
+        if not old_identity or old_identity not in current_identities:
+            continue
 
-            db.execute(
-                """
-                UPDATE media_sessions
-                SET
-                  missing_count = 999,
-                  last_seen_at = datetime('now', ?)
-                WHERE server_id = ?
-                  AND session_key = ?
-                """,
-                (
-                    f"-{int(_SESSION_MISSING_GRACE_SECONDS) + 1} seconds",
-                    server_id,
-                    old_sk,
-                ),
-            )
+        db.execute(
+            """
+            UPDATE media_sessions
+            SET
+              missing_count = 999,
+              last_seen_at = datetime('now', ?)
+            WHERE server_id = ?
+              AND session_key = ?
+            """,
+            (
+                f"-{int(SESSION_MISSING_GRACE_SECONDS) + 1} seconds",
+                server_id,
+                old_sk,
+            ),
+        )
 
-        # --- upsert + events (start/pause/resume/state_change)
-        for sk, sess in cur_map.items():
-            prev = prev_map.get(sk)
-            events = compute_session_events(prev, sess)
-            report["events"] += len(events)
+    # --- upsert + events (start/pause/resume/state_change)
+    for sk, sess in cur_map.items():
+        prev = prev_map.get(sk)
+        events = compute_session_events(prev, sess)
+        report["events"] += len(events)
 
-            media_user_id = resolve_media_user_id(
-                db,
-                server_id,
-                provider_name,
-                sess.get("external_user_id"),
-                sess.get("username"),
-            )
+        media_user_id = resolve_media_user_id(
+            db,
+            server_id,
+            provider_name,
+            sess.get("external_user_id"),
+            sess.get("username"),
+        )
 
 
-            started_at = _iso_now() if "start" in events else None
+        started_at = _iso_now() if "start" in events else None
 
-            artwork_refs = extract_artwork_refs(sess)
-            poster_ref_json = artwork_refs.get("poster_ref_json")
-            backdrop_ref_json = artwork_refs.get("backdrop_ref_json")
+        artwork_refs = extract_artwork_refs(sess)
+        poster_ref_json = artwork_refs.get("poster_ref_json")
+        backdrop_ref_json = artwork_refs.get("backdrop_ref_json")
 
+        db.execute(
+            """
+            INSERT INTO media_sessions (
+              server_id, provider, session_key,
+              media_user_id, external_user_id,
+              media_key, media_type, title, grandparent_title, parent_title,
+              state, progress_ms, duration_ms,
+              is_transcode, bitrate, video_codec, audio_codec,
+              client_name, client_product, device, ip,
+              started_at, last_seen_at, raw_json, poster_ref_json, backdrop_ref_json, library_section_id,
+              missing_count
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT(server_id, session_key) DO UPDATE SET
+              media_user_id=excluded.media_user_id,
+              external_user_id=excluded.external_user_id,
+
+              media_key=COALESCE(excluded.media_key, media_sessions.media_key),
+              media_type=COALESCE(excluded.media_type, media_sessions.media_type),
+              title=COALESCE(excluded.title, media_sessions.title),
+              grandparent_title=COALESCE(excluded.grandparent_title, media_sessions.grandparent_title),
+              parent_title=COALESCE(excluded.parent_title, media_sessions.parent_title),
+
+              state=excluded.state,
+              progress_ms=excluded.progress_ms,
+              duration_ms=COALESCE(excluded.duration_ms, media_sessions.duration_ms),
+
+              is_transcode=excluded.is_transcode,
+              bitrate=excluded.bitrate,
+              video_codec=excluded.video_codec,
+              audio_codec=excluded.audio_codec,
+              client_name=excluded.client_name,
+              client_product=excluded.client_product,
+              device=excluded.device,
+              ip=excluded.ip,
+
+              started_at=COALESCE(media_sessions.started_at, excluded.started_at, excluded.last_seen_at),
+              last_seen_at=excluded.last_seen_at,
+              missing_count=0,
+              raw_json=excluded.raw_json,
+              poster_ref_json=COALESCE(excluded.poster_ref_json, media_sessions.poster_ref_json),
+              backdrop_ref_json=COALESCE(excluded.backdrop_ref_json, media_sessions.backdrop_ref_json),
+              library_section_id=COALESCE(excluded.library_section_id, media_sessions.library_section_id)
+            """,
+            (
+                server_id, provider_name, sk,
+                media_user_id, sess.get("external_user_id"),
+                sess.get("media_key"), sess.get("media_type"),
+                sess.get("title"), sess.get("grandparent_title"), sess.get("parent_title"),
+                sess.get("state"), sess.get("progress_ms"), sess.get("duration_ms"),
+                int(bool(sess.get("is_transcode", 0))), sess.get("bitrate"),
+                sess.get("video_codec"), sess.get("audio_codec"),
+                sess.get("client_name"), sess.get("client_product"),
+                sess.get("device"), sess.get("ip"),
+                started_at, _iso_now(), sess.get("raw_json"), poster_ref_json, backdrop_ref_json,
+                sess.get("library_section_id"),
+            ),
+        )
+
+        if media_user_id is not None:
+            activate_subscription_on_playback(db, int(media_user_id))
+
+        for ev in events:
             db.execute(
                 """
-                INSERT INTO media_sessions (
-                  server_id, provider, session_key,
-                  media_user_id, external_user_id,
-                  media_key, media_type, title, grandparent_title, parent_title,
-                  state, progress_ms, duration_ms,
-                  is_transcode, bitrate, video_codec, audio_codec,
-                  client_name, client_product, device, ip,
-                  started_at, last_seen_at, raw_json, poster_ref_json, backdrop_ref_json, library_section_id,
-                  missing_count
+                INSERT INTO media_events (
+                  server_id, provider, event_type, ts,
+                  session_key, media_user_id, external_user_id,
+                  media_key, media_type, title,
+                  payload_json
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
-                ON CONFLICT(server_id, session_key) DO UPDATE SET
-                  media_user_id=excluded.media_user_id,
-                  external_user_id=excluded.external_user_id,
-
-                  media_key=COALESCE(excluded.media_key, media_sessions.media_key),
-                  media_type=COALESCE(excluded.media_type, media_sessions.media_type),
-                  title=COALESCE(excluded.title, media_sessions.title),
-                  grandparent_title=COALESCE(excluded.grandparent_title, media_sessions.grandparent_title),
-                  parent_title=COALESCE(excluded.parent_title, media_sessions.parent_title),
-
-                  state=excluded.state,
-                  progress_ms=excluded.progress_ms,
-                  duration_ms=COALESCE(excluded.duration_ms, media_sessions.duration_ms),
-
-                  is_transcode=excluded.is_transcode,
-                  bitrate=excluded.bitrate,
-                  video_codec=excluded.video_codec,
-                  audio_codec=excluded.audio_codec,
-                  client_name=excluded.client_name,
-                  client_product=excluded.client_product,
-                  device=excluded.device,
-                  ip=excluded.ip,
-
-                  started_at=COALESCE(media_sessions.started_at, excluded.started_at, excluded.last_seen_at),
-                  last_seen_at=excluded.last_seen_at,
-                  missing_count=0,
-                  raw_json=excluded.raw_json,
-                  poster_ref_json=COALESCE(excluded.poster_ref_json, media_sessions.poster_ref_json),
-                  backdrop_ref_json=COALESCE(excluded.backdrop_ref_json, media_sessions.backdrop_ref_json),
-                  library_section_id=COALESCE(excluded.library_section_id, media_sessions.library_section_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
-                    server_id, provider_name, sk,
-                    media_user_id, sess.get("external_user_id"),
-                    sess.get("media_key"), sess.get("media_type"),
-                    sess.get("title"), sess.get("grandparent_title"), sess.get("parent_title"),
-                    sess.get("state"), sess.get("progress_ms"), sess.get("duration_ms"),
-                    int(bool(sess.get("is_transcode", 0))), sess.get("bitrate"),
-                    sess.get("video_codec"), sess.get("audio_codec"),
-                    sess.get("client_name"), sess.get("client_product"),
-                    sess.get("device"), sess.get("ip"),
-                    started_at, _iso_now(), sess.get("raw_json"), poster_ref_json, backdrop_ref_json,
-                    sess.get("library_section_id"),
+                    server_id, provider_name, ev, _iso_now(),
+                    sk, media_user_id, sess.get("external_user_id"),
+                    sess.get("media_key"), sess.get("media_type"), sess.get("title"),
+                    json.dumps(sess, ensure_ascii=False),
                 ),
             )
 
-            if media_user_id is not None:
-                activate_subscription_on_playback(db, int(media_user_id))
-
-            for ev in events:
-                db.execute(
-                    """
-                    INSERT INTO media_events (
-                      server_id, provider, event_type, ts,
-                      session_key, media_user_id, external_user_id,
-                      media_key, media_type, title,
-                      payload_json
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        server_id, provider_name, ev, _iso_now(),
-                        sk, media_user_id, sess.get("external_user_id"),
-                        sess.get("media_key"), sess.get("media_type"), sess.get("title"),
-                        json.dumps(sess, ensure_ascii=False),
-                    ),
-                )
-
-        # --- stop + history + delete (sessions disparues)
-        for sk, prev in prev_map.items():
-            if sk in cur_map:
-                # session toujours active → reset compteur
-                db.execute("""
-                    UPDATE media_sessions
-                    SET missing_count = 0
-                    WHERE server_id=? AND session_key=?
-                """, (server_id, sk))
-                continue
-
-            # session absente → incrémente compteur
+    # --- stop + history + delete (sessions disparues)
+    for sk, prev in prev_map.items():
+        if sk in cur_map:
+            # session toujours active → reset compteur
             db.execute("""
                 UPDATE media_sessions
-                SET missing_count = COALESCE(missing_count, 0) + 1
+                SET missing_count = 0
                 WHERE server_id=? AND session_key=?
             """, (server_id, sk))
+            continue
 
-            row = db.query_one("""
-                SELECT missing_count
-                FROM media_sessions
-                WHERE server_id=? AND session_key=?
-            """, (server_id, sk))
+        # session absente → incrémente compteur
+        db.execute("""
+            UPDATE media_sessions
+            SET missing_count = COALESCE(missing_count, 0) + 1
+            WHERE server_id=? AND session_key=?
+        """, (server_id, sk))
 
-            missing = int(row["missing_count"] or 0) if row else 0
+        row = db.query_one("""
+            SELECT missing_count
+            FROM media_sessions
+            WHERE server_id=? AND session_key=?
+        """, (server_id, sk))
 
-            # tolerance: confirmed successful miss before stop/history cleanup
-            if missing < _SESSION_MISSING_CONFIRM_POLLS:
-                continue
+        missing = int(row["missing_count"] or 0) if row else 0
 
-            live = db.query_one(
-                """
-                SELECT id, server_id, provider, session_key, media_user_id, external_user_id, media_key, media_type, title, grandparent_title, parent_title, state, progress_ms, duration_ms, is_transcode, bitrate, video_codec, audio_codec, client_name, client_product, device, ip, started_at, last_seen_at, raw_json, poster_ref_json, backdrop_ref_json, library_section_id, missing_count FROM media_sessions
-                WHERE server_id=? AND session_key=?
-                """,
-                (server_id, sk),
-            )
+        # tolerance: confirmed successful miss before stop/history cleanup
+        if missing < _SESSION_MISSING_CONFIRM_POLLS:
+            continue
 
-            if live and _session_seen_recently(
-                live["last_seen_at"],
-                _SESSION_MISSING_GRACE_SECONDS,
-            ):
-                continue
+        live = db.query_one(
+            """
+            SELECT id, server_id, provider, session_key, media_user_id, external_user_id, media_key, media_type, title, grandparent_title, parent_title, state, progress_ms, duration_ms, is_transcode, bitrate, video_codec, audio_codec, client_name, client_product, device, ip, started_at, last_seen_at, raw_json, poster_ref_json, backdrop_ref_json, library_section_id, missing_count FROM media_sessions
+            WHERE server_id=? AND session_key=?
+            """,
+            (server_id, sk),
+        )
 
-            report["events"] += 1
+        if live and _session_seen_recently(
+            live["last_seen_at"],
+            SESSION_MISSING_GRACE_SECONDS,
+        ):
+            continue
 
-            db.execute(
-                """
-                INSERT INTO media_events (
-                  server_id, provider, event_type, ts,
-                  session_key, media_user_id, external_user_id,
-                  media_key, media_type, title,
-                  payload_json
-                )
-                VALUES (?, ?, 'stop', ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    server_id, provider_name, _iso_now(),
-                    sk,
-                    prev.get("media_user_id"),
-                    prev.get("external_user_id"),
-                    prev.get("media_key"),
-                    prev.get("media_type"),
-                    prev.get("title"),
-                    json.dumps(prev, ensure_ascii=False),
-                ),
+        report["events"] += 1
+
+        db.execute(
+            """
+            INSERT INTO media_events (
+              server_id, provider, event_type, ts,
+              session_key, media_user_id, external_user_id,
+              media_key, media_type, title,
+              payload_json
             )
+            VALUES (?, ?, 'stop', ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                server_id, provider_name, _iso_now(),
+                sk,
+                prev.get("media_user_id"),
+                prev.get("external_user_id"),
+                prev.get("media_key"),
+                prev.get("media_type"),
+                prev.get("title"),
+                json.dumps(prev, ensure_ascii=False),
+            ),
+        )
 
-            if live:
-                live = dict(live)
+        if live:
+            live = dict(live)
 
-                watch_ms = int(live.get("progress_ms") or 0)
-                started_at = live.get("started_at") or live.get("last_seen_at") or _iso_now()
-                stopped_at = _iso_now()
-                duration_ms = int(live.get("duration_ms") or 0)
+            watch_ms = int(live.get("progress_ms") or 0)
+            started_at = live.get("started_at") or live.get("last_seen_at") or _iso_now()
+            stopped_at = _iso_now()
+            duration_ms = int(live.get("duration_ms") or 0)
 
-                peak_bitrate = (
-                    int(live.get("bitrate") or 0)
-                    if live.get("bitrate") is not None
-                    else None
-                )
-                was_transcode = int(live.get("is_transcode") or 0)
-
-                session_key = live.get("session_key")
-                media_key = live.get("media_key")
-                external_user_id = live.get("external_user_id")
-                media_user_id = live.get("media_user_id")
-                media_type = live.get("media_type")
-                title = live.get("title")
-                grandparent_title = live.get("grandparent_title")
-                parent_title = live.get("parent_title")
-                client_name = live.get("client_name")
-                client_product = live.get("client_product")
-                device = live.get("device")
-                ip = live.get("ip")
-                raw_json = live.get("raw_json")
-                library_section_id = live.get("library_section_id")
-
-                artwork_refs = extract_artwork_refs(live)
-                poster_ref_json = artwork_refs.get("poster_ref_json")
-                backdrop_ref_json = artwork_refs.get("backdrop_ref_json")
-
-                updated = 0
-
-                # 1) D'abord, on tente une mise à jour sur la clé logique d'historique
-                #    (évite qu'un vieux record importé Tautulli soit écrasé juste parce
-                #    qu'un session_key numérique matche par hasard)
-                if (
-                    media_user_id is not None
-                    and started_at
-                    and media_key
-                    and client_name
-                ):
-                    try:
-                        cur = db.execute(
-                            """
-                            UPDATE media_session_history
-                            SET
-                              stopped_at = ?,
-                              watch_ms = CASE
-                                WHEN ? > watch_ms THEN ?
-                                ELSE watch_ms
-                              END,
-                              duration_ms = CASE
-                                WHEN ? > duration_ms THEN ?
-                                ELSE duration_ms
-                              END,
-                              peak_bitrate = COALESCE(peak_bitrate, ?),
-                              was_transcode = MAX(was_transcode, ?),
-                              media_type = COALESCE(?, media_type),
-                              title = COALESCE(?, title),
-                              grandparent_title = COALESCE(?, grandparent_title),
-                              parent_title = COALESCE(?, parent_title),
-                              raw_json = CASE
-                                WHEN ? IS NOT NULL AND LENGTH(TRIM(?)) > 10 THEN ?
-                                ELSE raw_json
-                              END,
-                              poster_ref_json = COALESCE(?, poster_ref_json),
-                              backdrop_ref_json = COALESCE(?, backdrop_ref_json),
-                              ip = COALESCE(?, ip),
-                              device = COALESCE(?, device),
-                              client_product = COALESCE(?, client_product),
-                              library_section_id = COALESCE(?, library_section_id),
-                              session_key = COALESCE(session_key, ?)
-                            WHERE server_id = ?
-                              AND media_user_id = ?
-                              AND started_at = ?
-                              AND media_key = ?
-                              AND client_name = ?
-                            """,
-                            (
-                                stopped_at,
-                                watch_ms, watch_ms,
-                                duration_ms, duration_ms,
-                                peak_bitrate,
-                                was_transcode,
-                                media_type,
-                                title,
-                                grandparent_title,
-                                parent_title,
-                                raw_json,
-                                raw_json,
-                                raw_json,
-                                poster_ref_json,
-                                backdrop_ref_json,
-                                ip,
-                                device,
-                                client_product,
-                                library_section_id,
-                                session_key,
-                                server_id,
-                                media_user_id,
-                                started_at,
-                                media_key,
-                                client_name,
-                            ),
-                        )
-                        updated = int(getattr(cur, "rowcount", 0) or 0)
-                    except Exception as e:
-                        _log_history_write_error(
-                            server_id,
-                            provider_name,
-                            "update_by_tautulli_dedup",
-                            live,
-                            e,
-                        )
-                        raise
+            peak_bitrate = (
+                int(live.get("bitrate") or 0)
+                if live.get("bitrate") is not None
+                else None
+            )
+            was_transcode = int(live.get("is_transcode") or 0)
+
+            session_key = live.get("session_key")
+            media_key = live.get("media_key")
+            external_user_id = live.get("external_user_id")
+            media_user_id = live.get("media_user_id")
+            media_type = live.get("media_type")
+            title = live.get("title")
+            grandparent_title = live.get("grandparent_title")
+            parent_title = live.get("parent_title")
+            client_name = live.get("client_name")
+            client_product = live.get("client_product")
+            device = live.get("device")
+            ip = live.get("ip")
+            raw_json = live.get("raw_json")
+            library_section_id = live.get("library_section_id")
+
+            artwork_refs = extract_artwork_refs(live)
+            poster_ref_json = artwork_refs.get("poster_ref_json")
+            backdrop_ref_json = artwork_refs.get("backdrop_ref_json")
 
-                # 2) Fallback session_key sécurisé.
-                #
-                # Avant, on cherchait seulement par server_id + session_key + media_key.
-                # C'était encore trop large : Plex peut réutiliser un session_key.
-                #
-                # On exige aussi started_at pour ne jamais modifier une ancienne lecture.
-                if (
-                    updated == 0
-                    and session_key
-                    and media_key
-                    and started_at
-                ):
-                    try:
-                        cur = db.execute(
-                            """
-                            UPDATE media_session_history
-                            SET
-                              stopped_at = ?,
-                              watch_ms = CASE
-                                WHEN ? > watch_ms THEN ?
-                                ELSE watch_ms
-                              END,
-                              duration_ms = CASE
-                                WHEN ? > duration_ms THEN ?
-                                ELSE duration_ms
-                              END,
-                              peak_bitrate = COALESCE(peak_bitrate, ?),
-                              was_transcode = MAX(was_transcode, ?),
-                              media_type = COALESCE(?, media_type),
-                              title = COALESCE(?, title),
-                              grandparent_title = COALESCE(?, grandparent_title),
-                              parent_title = COALESCE(?, parent_title),
-                              raw_json = CASE
-                                WHEN ? IS NOT NULL AND LENGTH(TRIM(?)) > 10 THEN ?
-                                ELSE raw_json
-                              END,
-                              poster_ref_json = COALESCE(?, poster_ref_json),
-                              backdrop_ref_json = COALESCE(?, backdrop_ref_json),
-                              ip = COALESCE(?, ip),
-                              device = COALESCE(?, device),
-                              client_product = COALESCE(?, client_product),
-                              library_section_id = COALESCE(?, library_section_id)
-                            WHERE server_id = ?
-                              AND session_key = ?
-                              AND media_key = ?
-                              AND started_at = ?
-                            """,
-                            (
-                                stopped_at,
-                                watch_ms, watch_ms,
-                                duration_ms, duration_ms,
-                                peak_bitrate,
-                                was_transcode,
-                                media_type,
-                                title,
-                                grandparent_title,
-                                parent_title,
-                                raw_json,
-                                raw_json,
-                                raw_json,
-                                poster_ref_json,
-                                backdrop_ref_json,
-                                ip,
-                                device,
-                                client_product,
-                                library_section_id,
-                                server_id,
-                                session_key,
-                                media_key,
-                                started_at,
-                            ),
-                        )
-                        updated = int(getattr(cur, "rowcount", 0) or 0)
-                    except Exception as e:
-                        _log_history_write_error(
-                            server_id,
-                            provider_name,
-                            "update_by_session_key_started_at",
-                            live,
-                            e,
-                        )
-                        raise
+            updated = 0
 
-                # 3) Sinon, insertion.
-                # IMPORTANT:
-                # Une nouvelle lecture doit créer une nouvelle ligne d'historique.
-                # On ne recycle plus une vieille ligne juste parce que session_key matche.
-                if updated == 0:
-                    try:
-                        db.execute(
-                            """
-                            INSERT OR IGNORE INTO media_session_history (
-                              server_id, provider,
-                              session_key, media_key, external_user_id, media_user_id,
-                              media_type, title, grandparent_title, parent_title,
-                              started_at, stopped_at,
-                              duration_ms, watch_ms,
-                              peak_bitrate, was_transcode,
-                              client_name, client_product, device, ip,
-                              raw_json, poster_ref_json, backdrop_ref_json, library_section_id
-                            )
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                server_id, provider_name,
-                                session_key, media_key, external_user_id, media_user_id,
-                                media_type, title, grandparent_title, parent_title,
-                                started_at, stopped_at,
-                                duration_ms, watch_ms,
-                                peak_bitrate, was_transcode,
-                                client_name, client_product, device, ip,
-                                raw_json, poster_ref_json, backdrop_ref_json, library_section_id,
-                            ),
-                        )
-                    except Exception as e:
-                        _log_history_write_error(
+            # 1) D'abord, on tente une mise à jour sur la clé logique d'historique
+            #    (évite qu'un vieux record importé Tautulli soit écrasé juste parce
+            #    qu'un session_key numérique matche par hasard)
+            if (
+                media_user_id is not None
+                and started_at
+                and media_key
+                and client_name
+            ):
+                try:
+                    cur = db.execute(
+                        """
+                        UPDATE media_session_history
+                        SET
+                          stopped_at = ?,
+                          watch_ms = CASE
+                            WHEN ? > watch_ms THEN ?
+                            ELSE watch_ms
+                          END,
+                          duration_ms = CASE
+                            WHEN ? > duration_ms THEN ?
+                            ELSE duration_ms
+                          END,
+                          peak_bitrate = COALESCE(peak_bitrate, ?),
+                          was_transcode = MAX(was_transcode, ?),
+                          media_type = COALESCE(?, media_type),
+                          title = COALESCE(?, title),
+                          grandparent_title = COALESCE(?, grandparent_title),
+                          parent_title = COALESCE(?, parent_title),
+                          raw_json = CASE
+                            WHEN ? IS NOT NULL AND LENGTH(TRIM(?)) > 10 THEN ?
+                            ELSE raw_json
+                          END,
+                          poster_ref_json = COALESCE(?, poster_ref_json),
+                          backdrop_ref_json = COALESCE(?, backdrop_ref_json),
+                          ip = COALESCE(?, ip),
+                          device = COALESCE(?, device),
+                          client_product = COALESCE(?, client_product),
+                          library_section_id = COALESCE(?, library_section_id),
+                          session_key = COALESCE(session_key, ?)
+                        WHERE server_id = ?
+                          AND media_user_id = ?
+                          AND started_at = ?
+                          AND media_key = ?
+                          AND client_name = ?
+                        """,
+                        (
+                            stopped_at,
+                            watch_ms, watch_ms,
+                            duration_ms, duration_ms,
+                            peak_bitrate,
+                            was_transcode,
+                            media_type,
+                            title,
+                            grandparent_title,
+                            parent_title,
+                            raw_json,
+                            raw_json,
+                            raw_json,
+                            poster_ref_json,
+                            backdrop_ref_json,
+                            ip,
+                            device,
+                            client_product,
+                            library_section_id,
+                            session_key,
+                            server_id,
+                            media_user_id,
+                            started_at,
+                            media_key,
+                            client_name,
+                        ),
+                    )
+                    updated = int(getattr(cur, "rowcount", 0) or 0)
+                except Exception as e:
+                    _log_history_write_error(
+                        server_id,
+                        provider_name,
+                        "update_by_tautulli_dedup",
+                        live,
+                        e,
+                    )
+                    raise
+
+            # 2) Fallback session_key sécurisé.
+            #
+            # Avant, on cherchait seulement par server_id + session_key + media_key.
+            # C'était encore trop large : Plex peut réutiliser un session_key.
+            #
+            # On exige aussi started_at pour ne jamais modifier une ancienne lecture.
+            if (
+                updated == 0
+                and session_key
+                and media_key
+                and started_at
+            ):
+                try:
+                    cur = db.execute(
+                        """
+                        UPDATE media_session_history
+                        SET
+                          stopped_at = ?,
+                          watch_ms = CASE
+                            WHEN ? > watch_ms THEN ?
+                            ELSE watch_ms
+                          END,
+                          duration_ms = CASE
+                            WHEN ? > duration_ms THEN ?
+                            ELSE duration_ms
+                          END,
+                          peak_bitrate = COALESCE(peak_bitrate, ?),
+                          was_transcode = MAX(was_transcode, ?),
+                          media_type = COALESCE(?, media_type),
+                          title = COALESCE(?, title),
+                          grandparent_title = COALESCE(?, grandparent_title),
+                          parent_title = COALESCE(?, parent_title),
+                          raw_json = CASE
+                            WHEN ? IS NOT NULL AND LENGTH(TRIM(?)) > 10 THEN ?
+                            ELSE raw_json
+                          END,
+                          poster_ref_json = COALESCE(?, poster_ref_json),
+                          backdrop_ref_json = COALESCE(?, backdrop_ref_json),
+                          ip = COALESCE(?, ip),
+                          device = COALESCE(?, device),
+                          client_product = COALESCE(?, client_product),
+                          library_section_id = COALESCE(?, library_section_id)
+                        WHERE server_id = ?
+                          AND session_key = ?
+                          AND media_key = ?
+                          AND started_at = ?
+                        """,
+                        (
+                            stopped_at,
+                            watch_ms, watch_ms,
+                            duration_ms, duration_ms,
+                            peak_bitrate,
+                            was_transcode,
+                            media_type,
+                            title,
+                            grandparent_title,
+                            parent_title,
+                            raw_json,
+                            raw_json,
+                            raw_json,
+                            poster_ref_json,
+                            backdrop_ref_json,
+                            ip,
+                            device,
+                            client_product,
+                            library_section_id,
                             server_id,
-                            provider_name,
-                            "insert_history",
-                            live,
-                            e,
+                            session_key,
+                            media_key,
+                            started_at,
+                        ),
+                    )
+                    updated = int(getattr(cur, "rowcount", 0) or 0)
+                except Exception as e:
+                    _log_history_write_error(
+                        server_id,
+                        provider_name,
+                        "update_by_session_key_started_at",
+                        live,
+                        e,
+                    )
+                    raise
+
+            # 3) Sinon, insertion.
+            # IMPORTANT:
+            # Une nouvelle lecture doit créer une nouvelle ligne d'historique.
+            # On ne recycle plus une vieille ligne juste parce que session_key matche.
+            if updated == 0:
+                try:
+                    db.execute(
+                        """
+                        INSERT OR IGNORE INTO media_session_history (
+                          server_id, provider,
+                          session_key, media_key, external_user_id, media_user_id,
+                          media_type, title, grandparent_title, parent_title,
+                          started_at, stopped_at,
+                          duration_ms, watch_ms,
+                          peak_bitrate, was_transcode,
+                          client_name, client_product, device, ip,
+                          raw_json, poster_ref_json, backdrop_ref_json, library_section_id
                         )
-                        raise
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            server_id, provider_name,
+                            session_key, media_key, external_user_id, media_user_id,
+                            media_type, title, grandparent_title, parent_title,
+                            started_at, stopped_at,
+                            duration_ms, watch_ms,
+                            peak_bitrate, was_transcode,
+                            client_name, client_product, device, ip,
+                            raw_json, poster_ref_json, backdrop_ref_json, library_section_id,
+                        ),
+                    )
+                except Exception as e:
+                    _log_history_write_error(
+                        server_id,
+                        provider_name,
+                        "insert_history",
+                        live,
+                        e,
+                    )
+                    raise
 
 
 
-            db.execute("DELETE FROM media_sessions WHERE server_id=? AND session_key=?", (server_id, sk))
+        db.execute("DELETE FROM media_sessions WHERE server_id=? AND session_key=?", (server_id, sk))
 
-        repaired = repair_unambiguous_library_associations(db, server_id)
-        if repaired["live"] or repaired["history"]:
-            logger.info(
-                "Repaired unambiguous library associations "
-                f"(server_id={server_id}, live={repaired['live']}, history={repaired['history']})"
+    repaired = repair_unambiguous_library_associations(db, server_id)
+    if repaired["live"] or repaired["history"]:
+        logger.info(
+            "Repaired unambiguous library associations "
+            f"(server_id={server_id}, live={repaired['live']}, history={repaired['history']})"
+        )
+
+    # OK:
+    # - si sessions actives => UP
+    # - sinon, API a répondu => UP aussi (serveur joignable, juste idle)
+    status = "up"
+    db.execute(
+        """
+        UPDATE servers
+        SET last_checked = CURRENT_TIMESTAMP,
+            status = ?,
+            cooldown_until = NULL,
+            unavailable_since = NULL,
+            last_failure = NULL
+        WHERE id = ?
+        """,
+        (status, server_id),
+    )
+
+
+def _record_collect_failure(
+    db,
+    server_id: int,
+    provider_name: str,
+    e: Exception,
+    report: Dict[str, Any],
+) -> bool:
+    """
+    Marque le serveur en échec (cooldown, statut, stats indisponibles).
+    Retourne True si des sessions récentes sont conservées (serveur laissé UP) :
+    l'appelant ne doit alors pas propager l'erreur.
+    """
+    # Throttle des erreurs (sinon spam toutes les X secondes si Jellyfin est down)
+    key = (server_id, e.__class__.__name__)
+    now = time.time()
+    last = _COLLECT_ERROR_LAST_LOG_TS.get(key, 0)
+
+    if now - last >= _COLLECT_ERROR_THROTTLE_SECONDS:
+        _COLLECT_ERROR_LAST_LOG_TS[key] = now
+        if is_debug_mode_enabled():
+            logger.exception("collect_sessions_for_server failed (server_id=%s)", server_id)
+        else:
+            logger.warning(
+                "collect_sessions_for_server failed: server_id=%s marked down and cooldown enabled: %s",
+                server_id,
+                str(e),
+            )
+    else:
+        if is_debug_mode_enabled():
+            logger.debug(
+                "collect_sessions_for_server failed (server_id=%s) [throttled]: %s",
+                server_id,
+                str(e),
             )
 
-        # OK:
-        # - si sessions actives => UP
-        # - sinon, API a répondu => UP aussi (serveur joignable, juste idle)
-        status = "up"
+
+    mark_server_unreachable(db, server_id, str(e), cooldown_seconds=300)
+    try:
+        _store_server_resource_stats(
+            db,
+            server_id,
+            provider_name,
+            {
+                "cpu_pct": None,
+                "ram_pct": None,
+                "is_available": 0,
+                "note": _classify_status_from_exception(e),
+            },
+        )
+    except Exception:
+        pass
+
+    if _has_recent_live_sessions(db, server_id, window_seconds=180):
         db.execute(
-            """
-            UPDATE servers
-            SET last_checked = CURRENT_TIMESTAMP,
-                status = ?,
-                cooldown_until = NULL,
-                unavailable_since = NULL,
-                last_failure = NULL
-            WHERE id = ?
-            """,
+            "UPDATE servers SET last_checked=CURRENT_TIMESTAMP, status='up' WHERE id=?",
+            (server_id,),
+        )
+
+        report["warning"] = str(e)
+        report["stale_sessions_kept"] = 1
+        report["status"] = "up"
+
+        return True
+
+    # Sinon, on classe intelligemment
+    status = _classify_status_from_exception(e)
+
+    if status == "unknown":
+        db.execute(
+            "UPDATE servers SET last_checked=CURRENT_TIMESTAMP WHERE id=?",
+            (server_id,),
+        )
+    else:
+        db.execute(
+            "UPDATE servers SET last_checked=CURRENT_TIMESTAMP, status=? WHERE id=?",
             (status, server_id),
         )
-        return report
 
-    except Exception as e:
-        # Throttle des erreurs (sinon spam toutes les X secondes si Jellyfin est down)
-        key = (server_id, e.__class__.__name__)
-        now = time.time()
-        last = _COLLECT_ERROR_LAST_LOG_TS.get(key, 0)
+    return False
 
-        if now - last >= _COLLECT_ERROR_THROTTLE_SECONDS:
-            _COLLECT_ERROR_LAST_LOG_TS[key] = now
-            if is_debug_mode_enabled():
-                logger.exception("collect_sessions_for_server failed (server_id=%s)", server_id)
-            else:
-                logger.warning(
-                    "collect_sessions_for_server failed: server_id=%s marked down and cooldown enabled: %s",
-                    server_id,
-                    str(e),
-                )
-        else:
-            if is_debug_mode_enabled():
-                logger.debug(
-                    "collect_sessions_for_server failed (server_id=%s) [throttled]: %s",
-                    server_id,
-                    str(e),
-                )
 
+def collect_sessions_for_server(
+    db,
+    server_id: int,
+    provider: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Collecte Now Playing pour 1 serveur.
+    - upsert media_sessions
+    - insert media_events
+    - push history sur stop
+    - met à jour servers.last_checked et servers.status
+    """
+    srv = _load_single_server(db, server_id)
 
-        mark_server_unreachable(db, server_id, str(e), cooldown_seconds=300)
-        try:
-            _store_server_resource_stats(
-                db,
-                server_id,
-                provider_name,
-                {
-                    "cpu_pct": None,
-                    "ram_pct": None,
-                    "is_available": 0,
-                    "note": _classify_status_from_exception(e),
-                },
-            )
-        except Exception:
-            pass
+    if not srv:
+        raise RuntimeError(f"Server id={server_id} not found or not plex/jellyfin")
 
-        if _has_recent_live_sessions(db, server_id, window_seconds=180):
-            db.execute(
-                "UPDATE servers SET last_checked=CURRENT_TIMESTAMP, status='up' WHERE id=?",
-                (server_id,),
-            )
+    provider_name = (provider or (srv["type"] if "type" in srv else None) or "").lower().strip()
+    if provider_name not in ("plex", "jellyfin"):
+        raise RuntimeError(f"Unsupported provider '{provider_name}' for server id={server_id}")
 
-            report["warning"] = str(e)
-            report["stale_sessions_kept"] = 1
-            report["status"] = "up"
+    report = {"server_id": server_id, "provider": provider_name, "sessions_seen": 0, "events": 0}
+    if should_skip_unreachable_server(srv):
+        if is_debug_mode_enabled():
+            logger.debug("collect_sessions_for_server skipped: server_id=%s in cooldown", server_id)
+        return report
 
+    # IMPORTANT : si ça plante (auth/timeout/provider bug), on marque le serveur DOWN
+    try:
+        # Les appels réseau (sessions, ressources) sont faits avant la transaction.
+        fetched = _fetch_server_sessions(srv, provider_name)
+        with db.transaction():
+            _write_server_sessions(db, server_id, provider_name, fetched, report)
+        return report
+
+    except Exception as e:
+        if _record_collect_failure(db, server_id, provider_name, e, report):
             return report
+        raise
 
-        # Sinon, on classe intelligemment
-        status = _classify_status_from_exception(e)
 
-        if status == "unknown":
-            db.execute(
-                "UPDATE servers SET last_checked=CURRENT_TIMESTAMP WHERE id=?",
-                (server_id,),
-            )
-        else:
-            db.execute(
-                "UPDATE servers SET last_checked=CURRENT_TIMESTAMP, status=? WHERE id=?",
-                (status, server_id),
-            )
 
-        raise
+def _collect_workers_from_env() -> int:
+    try:
+        return max(1, int(os.environ.get("VODUM_MONITOR_COLLECT_WORKERS", "8")))
+    except (TypeError, ValueError):
+        return 8
+
 
+def _collect_deadline_from_env() -> float:
+    try:
+        return max(1.0, float(os.environ.get("VODUM_MONITOR_SERVER_DEADLINE_SECONDS", "20")))
+    except (TypeError, ValueError):
+        return 20.0
 
 
 def collect_sessions(db) -> Dict[str, Any]:
     """
-    Wrapper debug (collecte tous les serveurs).
+    Collecte tous les serveurs en un cycle :
+    - appels réseau en parallèle (pool de threads borné), avec une deadline
+      par serveur : un serveur lent ou en timeout ne retarde plus les autres ;
+    - écritures de tous les serveurs dans une seule transaction (un SAVEPOINT
+      par serveur, pour qu'un échec n'annule pas le poll des autres).
     """
+    cycle_started = time.perf_counter()
     report = {"servers": 0, "sessions_seen": 0, "events": 0, "errors": []}
     servers = _load_all_servers(db)
     report["servers"] = len(servers)
 
+    targets = []
     for srv in servers:
-        server_id = int(srv["id"])
         provider_name = (srv["type"] or "").lower().strip()
+        if should_skip_unreachable_server(srv):
+            continue
+        targets.append((srv, provider_name))
+
+    fetched: Dict[int, Any] = {}
+    deadline = _collect_deadline_from_env()
+    if targets:
+        executor = RunMetricsThreadPoolExecutor(
+            max_workers=min(len(targets), _collect_workers_from_env()),
+            thread_name_prefix="monitor-collect",
+        )
+        try:
+            futures = {
+                executor.submit(_fetch_server_sessions, srv, provider_name): int(srv["id"])
+                for srv, provider_name in targets
+            }
+            # Tous les serveurs partent en même temps : la deadline par serveur
+            # borne donc aussi l'attente globale.
+            wait(futures, timeout=deadline)
+            for future, server_id in futures.items():
+                if not future.done():
+                    future.cancel()
+                    fetched[server_id] = TimeoutError(
+                        f"Session collection exceeded {deadline:g}s deadline"
+                    )
+                    continue
+                try:
+                    fetched[server_id] = future.result()
+                except Exception as e:
+                    fetched[server_id] = e
+        finally:
+            # Ne pas attendre les requêtes encore bloquées au-delà de la deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    report["fetch_ms"] = int(round((time.perf_counter() - cycle_started) * 1000.0))
+
+    with db.transaction():
+        for srv, provider_name in targets:
+            server_id = int(srv["id"])
+            result = fetched.get(server_id)
+            server_report = {"server_id": server_id, "provider": provider_name, "sessions_seen": 0, "events": 0}
+
+            try:
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    with db.transaction():
+                        _write_server_sessions(db, server_id, provider_name, result, server_report)
+                except Exception as e:
+                    if not _record_collect_failure(db, server_id, provider_name, e, server_report):
+                        raise
+            except Exception as e:
+                report["errors"].append({"server_id": server_id, "provider": provider_name, "error": str(e)})
+                continue
+
+            report["sessions_seen"] += int(server_report.get("sessions_seen", 0))
+            report["events"] += int(server_report.get("events", 0))
 
+        # -------------------------------------------------
+        # Snapshot global (for peak streams = MAX(live_sessions) over time)
+        # -------------------------------------------------
         try:
-            r = collect_sessions_for_server(db, server_id=server_id, provider=provider_name, payload=None)
-            report["sessions_seen"] += int(r.get("sessions_seen", 0))
-            report["events"] += int(r.get("events", 0))
+            with db.transaction():
+                write_monitoring_snapshot(db)
         except Exception as e:
-            report["errors"].append({"server_id": server_id, "provider": provider_name, "error": str(e)})
-
-    # -------------------------------------------------
-    # Snapshot global (for peak streams = MAX(live_sessions) over time)
-    # -------------------------------------------------
-    try:
-        write_monitoring_snapshot(db)
-    except Exception as e:
-        logger.warning(f"Could not write monitoring snapshot: {e}")
+            logger.warning(f"Could not write monitoring snapshot: {e}")
 
+    report["cycle_ms"] = int(round((time.perf_counter() - cycle_started) * 1000.0))
     return report
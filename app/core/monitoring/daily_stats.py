@@ -33,7 +33,9 @@ def _day_value(value) -> str:
 def materialize_day(db, day) -> dict:
     """Replace one daily aggregate atomically from session history."""
     day = _day_value(day)
-    rows = [dict(row) for row in (db.query(
+    # Parcours en flux : une journée chargée peut compter des dizaines de
+    # milliers de lectures, on agrège sans matérialiser la liste.
+    rows = db.iter_query(
         """
         WITH ranked AS (
           SELECT
@@ -64,14 +66,22 @@ def materialize_day(db, day) -> dict:
         SELECT * FROM ranked WHERE rn = 1
         """,
         (day, day),
-    ) or [])]
-
-    viewers = sorted({str(row["viewer_id"]) for row in rows if row.get("viewer_id")})
-    watch_ms = sum(max(0, int(row.get("watch_ms") or 0)) for row in rows)
+    )
 
+    viewer_set = set()
+    watch_ms = 0
+    sessions = 0
+    source_max_id = 0
     users = {}
     media = {}
-    for row in rows:
+    for raw_row in rows:
+        row = dict(raw_row)
+        sessions += 1
+        watch_ms += max(0, int(row.get("watch_ms") or 0))
+        source_max_id = max(source_max_id, int(row.get("id") or 0))
+        if row.get("viewer_id"):
+            viewer_set.add(str(row["viewer_id"]))
+
         viewer_id = str(row.get("viewer_id") or "unknown")
         user = users.setdefault(viewer_id, {"key": viewer_id, "username": row.get("username") or "-", "sessions": 0, "watch_ms": 0})
         user["sessions"] += 1
@@ -84,6 +94,7 @@ def materialize_day(db, day) -> dict:
         item["watch_ms"] += max(0, int(row.get("watch_ms") or 0))
         item["viewers"].add(viewer_id)
 
+    viewers = sorted(viewer_set)
     top_users = sorted(users.values(), key=lambda item: (item["watch_ms"], item["sessions"]), reverse=True)[:25]
     top_media = []
     for item in media.values():
@@ -104,10 +115,10 @@ def materialize_day(db, day) -> dict:
           top_users_json=excluded.top_users_json, top_media_json=excluded.top_media_json,
           source_max_id=excluded.source_max_id, computed_at=CURRENT_TIMESTAMP
         """,
-        (day, len(rows), watch_ms, len(viewers), _json(viewers), _json(top_users),
-         _json(top_media), max((int(row.get("id") or 0) for row in rows), default=0)),
+        (day, sessions, watch_ms, len(viewers), _json(viewers), _json(top_users),
+         _json(top_media), source_max_id),
     )
-    return {"day": day, "sessions": len(rows), "watch_ms": watch_ms, "active_users": len(viewers)}
+    return {"day": day, "sessions": sessions, "watch_ms": watch_ms, "active_users": len(viewers)}
 
 
 def refresh_recent_days(db, days: int = 31, *, today=None) -> dict:
@@ -0,0 +1,158 @@
+import json
+import uuid
+import websocket
+
+from logging_utils import get_logger
+from core.monitoring.push_channels import LiveSessionPushClient
+
+logger = get_logger("jellyfin.websocket")
+
+# Intervalle (ms) demandé à Jellyfin pour les messages "Sessions"
+SESSIONS_PUSH_INTERVAL_MS = 1500
+DEFAULT_KEEPALIVE_SECONDS = 30
+
+_FULL_REFRESH_MESSAGES = {"PlaybackStart", "PlaybackStopped"}
+
+
+def _ticks_to_ms(ticks):
+    try:
+        return int(ticks) // 10_000 if ticks is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class JellyfinWebsocketClient(LiveSessionPushClient):
+    """
+    Client /socket Jellyfin : s'abonne aux messages Sessions et réagit à
+    PlaybackStart / PlaybackStopped. Même pipeline que Plex (collector +
+    live_state), avec mises à jour incrémentales quand c'est possible.
+    """
+
+    provider = "jellyfin"
+    thread_prefix = "jellyfin-ws"
+    logger = logger
+
+    def __init__(self, server):
+        super().__init__(server)
+        self.device_id = f"vodum-monitoring-{uuid.uuid4().hex[:12]}"
+        self.keepalive_seconds = DEFAULT_KEEPALIVE_SECONDS
+
+    def _connect(self):
+        token = self.server.get("token")
+        if not token:
+            return
+
+        ws_errors = []
+        for base_url in self._candidate_bases():
+            ws_url = self._ws_base(base_url)
+            ws_url += f"/socket?api_key={token}&deviceId={self.device_id}"
+
+            logger.info(f"Connecting Jellyfin websocket: {self.server['name']} via {base_url}")
+
+            try:
+                self.ws = websocket.create_connection(ws_url, timeout=self.keepalive_seconds)
+                break
+            except Exception as e:
+                ws_errors.append(f"{base_url}: {e}")
+                logger.debug(
+                    f"Jellyfin websocket unavailable for "
+                    f"{self.server['name']} via {base_url}: {e}"
+                )
+
+        if not self.ws:
+            if ws_errors:
+                logger.debug(
+                    f"Jellyfin websocket unavailable for {self.server['name']} on all URLs: "
+                    + " | ".join(ws_errors)
+                )
+            return
+
+        self._send("SessionsStart", f"0,{SESSIONS_PUSH_INTERVAL_MS}")
+        self._on_connected()
+
+        while True:
+            try:
+                raw = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                # Pas de message pendant keepalive_seconds : on maintient la
+                # connexion (Jellyfin ferme les sockets silencieuses).
+                self._send("KeepAlive")
+                continue
+
+            if not raw:
+                continue
+
+            try:
+                data = json.loads(raw)
+            except Exception:
+                continue
+
+            self._handle_message(data)
+
+    def _send(self, message_type: str, data=None):
+        message = {"MessageType": message_type}
+        if data is not None:
+            message["Data"] = data
+        self.ws.send(json.dumps(message))
+
+    def _session_updates(self, sessions) -> list[dict]:
+        """
+        Convertit un message Sessions en (session_key, state, progress_ms),
+        avec la même clé que le provider : "<sessionId>:<itemId>".
+        """
+        updates = []
+        for s in sessions or []:
+            if not isinstance(s, dict):
+                continue
+            session_id = s.get("Id")
+            item_id = (s.get("NowPlayingItem") or {}).get("Id")
+            if not session_id or not item_id:
+                continue
+            play_state = s.get("PlayState") or {}
+            updates.append({
+                "session_key": f"{session_id}:{item_id}",
+                "state": "paused" if play_state.get("IsPaused") else "playing",
+                "progress_ms": _ticks_to_ms(play_state.get("PositionTicks")),
+            })
+        return updates
+
+    def _handle_sessions(self, sessions):
+        from core.monitoring.session_updates import known_session_keys
+
+        updates = self._session_updates(sessions)
+        current_keys = {update["session_key"] for update in updates}
+
+        # Une session connue absente du message => lecture arrêtée : le
+        # collector doit écrire stop + historique.
+        stopped = bool(known_session_keys(self.db, int(self.server["id"])) - current_keys)
+
+        if not updates and not stopped:
+            return
+        self._apply_updates(updates, force_full=stopped)
+
+    def _handle_message(self, data):
+        try:
+            if not isinstance(data, dict):
+                return
+
+            message_type = str(data.get("MessageType") or "")
+
+            if message_type == "ForceKeepAlive":
+                try:
+                    timeout = int(data.get("Data") or DEFAULT_KEEPALIVE_SECONDS)
+                except (TypeError, ValueError):
+                    timeout = DEFAULT_KEEPALIVE_SECONDS
+                self.keepalive_seconds = max(5, timeout // 2)
+                self.ws.settimeout(self.keepalive_seconds)
+                self._send("KeepAlive")
+                return
+
+            if message_type == "Sessions":
+                self._handle_sessions(data.get("Data"))
+                return
+
+            if message_type in _FULL_REFRESH_MESSAGES:
+                self._apply_updates([], force_full=True)
+
+        except Exception:
+            logger.exception("Unable to process Jellyfin websocket message")
@@ -43,4 +43,37 @@ def get_live_sessions(max_age=120):
         for key in expired:
             LIVE_SESSIONS.pop(key, None)
 
-        return deepcopy(list(LIVE_SESSIONS.values()))
\ No newline at end of file
+        return deepcopy(list(LIVE_SESSIONS.values()))
+
+def patch_live_session(server_id, session_key, fields):
+    """
+    Met à jour quelques champs d'une session déjà connue.
+    Retourne False si la session n'est pas dans le cache.
+    """
+    key = make_live_key(server_id, session_key)
+
+    with LIVE_LOCK:
+        session = LIVE_SESSIONS.get(key)
+        if session is None:
+            return False
+        session.update(fields)
+        session["last_live_update"] = int(time.time())
+        return True
+
+
+def replace_server_live_sessions(server_id, sessions):
+    """
+    Remplace toutes les sessions d'un serveur (après un refresh complet).
+    `sessions` : iterable de dicts contenant au moins session_key.
+    """
+    prefix = make_live_key(server_id, "")
+    now = int(time.time())
+
+    with LIVE_LOCK:
+        for key in [key for key in LIVE_SESSIONS if key.startswith(prefix)]:
+            LIVE_SESSIONS.pop(key, None)
+
+        for session in sessions:
+            payload = dict(session)
+            payload["last_live_update"] = now
+            LIVE_SESSIONS[make_live_key(server_id, payload["session_key"])] = payload
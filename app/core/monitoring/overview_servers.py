@@ -20,7 +20,8 @@ def load_monitoring_server_context(db, tab):
                 FROM servers
                 WHERE LOWER(TRIM(type)) IN ('plex','jellyfin')
                 ORDER BY LOWER(TRIM(type)), name
-                """
+                """,
+                decrypt_servers=True,
             )
             or []
         )
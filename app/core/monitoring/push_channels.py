@@ -0,0 +1,230 @@
+"""
+Canaux "push" (websockets) des serveurs média vers le monitoring live.
+
+- registre en mémoire des canaux connectés : monitor_enqueue_refresh s'en sert
+  pour ralentir le polling des serveurs déjà suivis en push ;
+- classe de base commune aux clients Plex / Jellyfin : reconnexion, refresh
+  complet (collector), mises à jour incrémentales et reconcile périodique.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from config import Config
+from db_manager import DBManager
+
+
+# Refresh complet (collector) au moins toutes les N secondes, même si toutes
+# les notifications ont pu être appliquées en incrémental.
+FULL_RECONCILE_SECONDS = 60
+FULL_REFRESH_MIN_INTERVAL_SECONDS = 1.0
+RECONNECT_DELAY_SECONDS = 10
+
+INCREMENTAL_STATES = {"playing", "paused", "buffering"}
+
+_CHANNELS_LOCK = threading.Lock()
+_CONNECTED_CHANNELS: dict[int, dict] = {}
+
+
+def mark_push_channel_connected(server_id: int, provider: str) -> None:
+    with _CHANNELS_LOCK:
+        _CONNECTED_CHANNELS[int(server_id)] = {
+            "provider": provider,
+            "connected_at": time.time(),
+        }
+
+
+def mark_push_channel_disconnected(server_id: int) -> None:
+    with _CHANNELS_LOCK:
+        _CONNECTED_CHANNELS.pop(int(server_id), None)
+
+
+def push_channel_connected(server_id: int) -> bool:
+    with _CHANNELS_LOCK:
+        return int(server_id) in _CONNECTED_CHANNELS
+
+
+class LiveSessionPushClient(ABC):
+    """
+    Base des clients websocket. Les sous-classes implémentent _connect()
+    (bloquant tant que la connexion vit) et appellent _apply_updates().
+    """
+
+    provider = ""
+    thread_prefix = "live-push"
+    logger = None
+
+    def __init__(self, server):
+        self.server = server
+        self.ws = None
+        self.db = DBManager(Config.DATABASE_PATH)
+        self.last_refresh_ts = 0
+        self.last_full_refresh_ts = 0
+        self._refresh_lock = threading.Lock()
+
+    def start(self):
+        thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name=f"{self.thread_prefix}-{self.server['id']}"
+        )
+        thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.ws = None
+                self._connect()
+            except Exception as e:
+                self.logger.warning(
+                    f"{self.provider.capitalize()} websocket disconnected for server "
+                    f"{self.server['name']}: {e}"
+                )
+            finally:
+                mark_push_channel_disconnected(int(self.server["id"]))
+
+            time.sleep(RECONNECT_DELAY_SECONDS)
+
+    @abstractmethod
+    def _connect(self):
+        """Ouvre le websocket et traite les messages jusqu'à la déconnexion."""
+
+    def _on_connected(self):
+        mark_push_channel_connected(int(self.server["id"]), self.provider)
+        self.logger.info(f"{self.provider.capitalize()} websocket connected: {self.server['name']}")
+        self._refresh_live_sessions()
+
+    def _candidate_bases(self):
+        bases = []
+        invalid_literals = {"", "none", "null", "undefined"}
+
+        for key in ("url", "local_url", "public_url"):
+            raw = self.server.get(key)
+            if not raw:
+                continue
+
+            base = str(raw).strip().rstrip("/")
+            if base.lower() in invalid_literals:
+                continue
+            if not (base.startswith("http://") or base.startswith("https://")):
+                continue
+            if base not in bases:
+                bases.append(base)
+
+        return bases
+
+    @staticmethod
+    def _ws_base(base_url: str) -> str:
+        return (
+            base_url
+            .replace("https://", "wss://")
+            .replace("http://", "ws://")
+        )
+
+    def _refresh_live_sessions(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+
+        try:
+            from core.monitoring.collector import collect_sessions_for_server
+            from core.monitoring.session_updates import sync_live_state_for_server
+
+            report = collect_sessions_for_server(
+                self.db,
+                int(self.server["id"]),
+                provider=self.provider,
+            )
+            self.last_full_refresh_ts = time.time()
+            sync_live_state_for_server(self.db, int(self.server["id"]))
+            self._enqueue_stream_enforcer_if_live(report)
+
+            self.logger.info(
+                f"Refreshed {report.get('sessions_seen', 0)} live sessions "
+                f"for {self.server['name']}"
+            )
+
+        except Exception:
+            self.logger.exception(
+                f"Unable to refresh live sessions for {self.server['name']}"
+            )
+        finally:
+            self._refresh_lock.release()
+
+    def _enqueue_stream_enforcer_if_live(self, report: dict):
+        try:
+            if int((report or {}).get("sessions_seen") or 0) <= 0:
+                return
+
+            row = self.db.query_one("""
+                SELECT id, enabled, status, queued_count
+                FROM tasks
+                WHERE name = 'stream_enforcer'
+                LIMIT 1
+            """)
+            if not row or not int(row["enabled"] or 0):
+                return
+            if str(row["status"] or "").lower() == "running" or int(row["queued_count"] or 0) > 0:
+                return
+
+            from tasks_engine import enqueue_task
+            enqueue_task(int(row["id"]))
+        except Exception:
+            self.logger.debug(
+                f"Unable to enqueue stream_enforcer after {self.provider} websocket refresh",
+                exc_info=True,
+            )
+
+    def _apply_incremental_updates(self, updates: list[dict]) -> bool:
+        """
+        Applique les notifications directement à media_sessions / live_state,
+        en une seule transaction par message.
+        Retourne False si un refresh complet est nécessaire (session inconnue,
+        arrêt de lecture à historiser, erreur).
+        """
+        from core.monitoring.session_updates import apply_session_state_updates
+
+        incremental = [u for u in updates if u["state"] in INCREMENTAL_STATES]
+        if not incremental:
+            return False
+
+        try:
+            known = apply_session_state_updates(
+                self.db,
+                int(self.server["id"]),
+                self.provider,
+                incremental,
+            )
+        except Exception:
+            self.logger.debug(
+                f"Incremental session update failed for {self.server['name']}",
+                exc_info=True,
+            )
+            return False
+
+        return len(incremental) == len(updates) and all(
+            update["session_key"] in known for update in incremental
+        )
+
+    def _apply_updates(self, updates: list[dict], *, force_full: bool = False):
+        """
+        Incrémental si possible, sinon refresh complet (throttlé).
+        Un reconcile complet est de toute façon fait toutes les
+        FULL_RECONCILE_SECONDS.
+        """
+        now = time.time()
+        needs_full_refresh = (
+            force_full
+            or not updates
+            or not self._apply_incremental_updates(updates)
+            or now - self.last_full_refresh_ts >= FULL_RECONCILE_SECONDS
+        )
+        if not needs_full_refresh:
+            return
+
+        if now - self.last_refresh_ts < FULL_REFRESH_MIN_INTERVAL_SECONDS:
+            return
+
+        self.last_refresh_ts = now
+        self._refresh_live_sessions()
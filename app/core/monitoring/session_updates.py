@@ -0,0 +1,223 @@
+"""
+Mises à jour incrémentales des sessions live à partir des notifications
+websocket (état / position), sans repasser par /status/sessions.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from core.monitoring.collector import SESSION_MISSING_GRACE_SECONDS
+from core.monitoring.diff import compute_session_events
+from core.monitoring.live_state import patch_live_session, replace_server_live_sessions
+
+
+LIVE_SESSION_COLUMNS = (
+    "session_key",
+    "media_user_id",
+    "external_user_id",
+    "media_key",
+    "media_type",
+    "title",
+    "grandparent_title",
+    "parent_title",
+    "state",
+    "progress_ms",
+    "duration_ms",
+    "is_transcode",
+    "client_name",
+    "client_product",
+    "device",
+    "ip",
+    "started_at",
+    "last_seen_at",
+)
+
+
+def _iso_now() -> str:
+    # Même format que le collector / CURRENT_TIMESTAMP (UTC)
+    return datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _normalize_update(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    session_key = str(update.get("session_key") or "").strip()
+    if not session_key:
+        return None
+    progress_ms = update.get("progress_ms")
+    return {
+        "session_key": session_key,
+        "state": str(update.get("state") or "").strip().lower() or "unknown",
+        "progress_ms": int(progress_ms) if progress_ms is not None else None,
+    }
+
+
+def apply_session_state_updates(
+    db,
+    server_id: int,
+    provider: str,
+    updates: List[Dict[str, Any]],
+) -> set[str]:
+    """
+    Applique une notification (liste de {session_key, state, progress_ms})
+    aux sessions déjà présentes dans media_sessions, en une seule
+    transaction, écrit les media_events (pause/resume/state_change) et met à
+    jour live_state.
+
+    Les sessions dont l'état et la position n'ont pas bougé ne sont pas
+    réécrites : sans changement, aucune transaction n'est ouverte.
+
+    Retourne les session_key connues (appliquées ou inchangées) ; pour les
+    autres, l'appelant doit faire un refresh complet (nouvelle session,
+    métadonnées à charger).
+    """
+    normalized = {}
+    for update in updates or []:
+        item = _normalize_update(update)
+        if item:
+            normalized[item["session_key"]] = item
+    if not normalized:
+        return set()
+
+    keys = list(normalized)
+    rows = db.query(
+        f"""
+        SELECT session_key, media_user_id, external_user_id, media_key,
+               media_type, title, state, progress_ms, missing_count
+        FROM media_sessions
+        WHERE server_id = ?
+          AND session_key IN ({','.join('?' for _ in keys)})
+        """,
+        (int(server_id), *keys),
+    )
+    previous = {str(r["session_key"]): dict(r) for r in rows or []}
+
+    known = set()
+    changed = []
+    for session_key, item in normalized.items():
+        prev = previous.get(session_key)
+        if not prev:
+            continue
+        known.add(session_key)
+        unchanged = (
+            (prev.get("state") or "unknown").lower() == item["state"]
+            and (item["progress_ms"] is None or item["progress_ms"] == prev.get("progress_ms"))
+            and not int(prev.get("missing_count") or 0)
+        )
+        if not unchanged:
+            changed.append((prev, item))
+
+    if not changed:
+        return known
+
+    now = _iso_now()
+    applied = []
+    with db.transaction():
+        for prev, item in changed:
+            session_key = item["session_key"]
+            cur = db.execute(
+                """
+                UPDATE media_sessions
+                SET state = ?,
+                    progress_ms = COALESCE(?, progress_ms),
+                    last_seen_at = ?,
+                    missing_count = 0
+                WHERE server_id = ? AND session_key = ?
+                """,
+                (item["state"], item["progress_ms"], now, int(server_id), session_key),
+            )
+            if not cur.rowcount:
+                # Supprimée par le collector entre la lecture et l'écriture
+                known.discard(session_key)
+                continue
+            applied.append(item)
+
+            for ev in compute_session_events(prev, {"state": item["state"]}):
+                db.execute(
+                    """
+                    INSERT INTO media_events (
+                      server_id, provider, event_type, ts,
+                      session_key, media_user_id, external_user_id,
+                      media_key, media_type, title,
+                      payload_json
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        int(server_id), provider, ev, now,
+                        session_key, prev.get("media_user_id"), prev.get("external_user_id"),
+                        prev.get("media_key"), prev.get("media_type"), prev.get("title"),
+                        json.dumps(item, ensure_ascii=False),
+                    ),
+                )
+
+    for item in applied:
+        fields: Dict[str, Any] = {"state": item["state"], "last_seen_at": now}
+        if item["progress_ms"] is not None:
+            fields["progress_ms"] = item["progress_ms"]
+        patch_live_session(server_id, item["session_key"], fields)
+    return known
+
+
+def apply_session_state_update(
+    db,
+    server_id: int,
+    provider: str,
+    session_key: str,
+    state: str,
+    progress_ms: Optional[int] = None,
+) -> bool:
+    """
+    Variante unitaire de apply_session_state_updates.
+    Retourne False si la session est inconnue.
+    """
+    update = {"session_key": session_key, "state": state, "progress_ms": progress_ms}
+    return bool(apply_session_state_updates(db, server_id, provider, [update]))
+
+
+def load_server_live_sessions(db, server_id: int) -> List[Dict[str, Any]]:
+    rows = db.query(
+        f"""
+        SELECT {', '.join(LIVE_SESSION_COLUMNS)}
+        FROM media_sessions
+        WHERE server_id = ?
+        """,
+        (int(server_id),),
+    )
+    return [dict(r) for r in rows or []]
+
+
+def sync_live_state_for_server(db, server_id: int) -> int:
+    """
+    Recharge live_state pour un serveur depuis media_sessions
+    (après un refresh complet du collector).
+    """
+    sessions = load_server_live_sessions(db, server_id)
+    for session in sessions:
+        session["server_id"] = int(server_id)
+    replace_server_live_sessions(server_id, sessions)
+    return len(sessions)
+
+
+def known_session_keys(db, server_id: int) -> set[str]:
+    """
+    Sessions du serveur dont l'absence doit déclencher un refresh complet.
+
+    Les sessions déjà absentes du dernier refresh mais encore dans le délai
+    de grâce du collector (missing_count > 0, vues il y a moins de
+    SESSION_MISSING_GRACE_SECONDS) sont exclues : leur arrêt est déjà pris
+    en compte, le collector l'historisera une fois la grâce écoulée.
+    """
+    rows = db.query(
+        """
+        SELECT session_key
+        FROM media_sessions
+        WHERE server_id = ?
+          AND NOT (
+            COALESCE(missing_count, 0) > 0
+            AND datetime(last_seen_at) >= datetime('now', ?)
+          )
+        """,
+        (int(server_id), f"-{int(SESSION_MISSING_GRACE_SECONDS)} seconds"),
+    )
+    return {str(r["session_key"]) for r in rows or []}
@@ -59,7 +59,7 @@ def _unique(values, normalizer):
     return result
 
 
-def resolve_plex_user(account, media_user_row):
+def resolve_plex_user(account, media_user_row, plex_users=None):
     details = details_json_as_dict(media_user_row)
     plex_user_details = details.get("plex_user") or {}
     plex_share_details = details.get("plex_share") or {}
@@ -89,11 +89,13 @@ def resolve_plex_user(account, media_user_row):
         normalize,
     )
 
-    try:
-        plex_users = list(account.users())
-    except Exception:
-        logger.exception("Unable to list Plex users via account.users()")
-        plex_users = []
+    # plex_users : liste déjà chargée (batch d'un même compte), sinon appel API
+    if plex_users is None:
+        try:
+            plex_users = list(account.users())
+        except Exception:
+            logger.exception("Unable to list Plex users via account.users()")
+            plex_users = []
 
     for wanted_values, attribute, normalizer in (
         (candidate_ids, "id", normalize),
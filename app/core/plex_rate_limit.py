@@ -1,11 +1,45 @@
+import os
 import time
 import threading
+from urllib.parse import urlsplit
+
 import requests
 
+from core.http_metrics import note_http_call
+from core.rate_limit import BACKOFF_MAX_SECONDS, TokenBucket
+
+
+# Budgets par défaut (requêtes / seconde, burst) :
+# - PMS : un bucket par serveur, un PMS local encaisse bien plus que 1 req/s ;
+# - plex.tv : un bucket unique partagé, l'API publique limite par compte / IP.
+DEFAULT_PMS_RATE = 10.0
+DEFAULT_PMS_BURST = 20
+DEFAULT_PLEX_TV_RATE = 1.0
+DEFAULT_PLEX_TV_BURST = 5
+
+PLEX_TV_KEY = "plex.tv"
 
 _LOCK = threading.Lock()
-_LAST_REQUEST_AT = {}
-_MIN_INTERVAL = 1.0  # 1 requête / seconde / serveur
+_BUCKETS = {}
+
+
+def _env_float(name: str, default: float, minimum: float) -> float:
+    try:
+        return max(minimum, float(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _budget_for(key: str) -> tuple[float, float]:
+    if key == PLEX_TV_KEY:
+        return (
+            _env_float("VODUM_PLEX_TV_RATE", DEFAULT_PLEX_TV_RATE, 0.1),
+            _env_float("VODUM_PLEX_TV_BURST", DEFAULT_PLEX_TV_BURST, 1.0),
+        )
+    return (
+        _env_float("VODUM_PLEX_PMS_RATE", DEFAULT_PMS_RATE, 0.1),
+        _env_float("VODUM_PLEX_PMS_BURST", DEFAULT_PMS_BURST, 1.0),
+    )
 
 
 def _normalize_server_key(server_or_url) -> str:
@@ -23,27 +57,74 @@ def _normalize_server_key(server_or_url) -> str:
     return raw.lower()
 
 
-def wait_for_plex_slot(server_or_url) -> None:
+def _is_plex_tv_url(url) -> bool:
+    try:
+        host = (urlsplit(str(url or "")).hostname or "").lower()
+    except ValueError:
+        return False
+    return host == PLEX_TV_KEY or host.endswith("." + PLEX_TV_KEY)
+
+
+def _bucket_key(server_key: str, url=None) -> str:
+    if _is_plex_tv_url(url or server_key):
+        return PLEX_TV_KEY
+    return server_key
+
+
+def _get_bucket(key: str) -> TokenBucket:
+    with _LOCK:
+        bucket = _BUCKETS.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*_budget_for(key))
+            _BUCKETS[key] = bucket
+        return bucket
+
+
+def _parse_retry_after(response):
+    try:
+        value = (getattr(response, "headers", None) or {}).get("Retry-After")
+        return min(BACKOFF_MAX_SECONDS, max(0.0, float(value))) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _acquire(key: str) -> TokenBucket:
+    bucket = _get_bucket(key)
+    wait = bucket.reserve()
+    if wait > 0:
+        time.sleep(wait)
+    return bucket
+
+
+def wait_for_plex_slot(server_or_url, url=None) -> None:
     key = _normalize_server_key(server_or_url)
     if not key:
         return
+    _acquire(_bucket_key(key, url))
+
 
-    while True:
-        with _LOCK:
-            now = time.monotonic()
-            last = _LAST_REQUEST_AT.get(key, 0.0)
-            remaining = _MIN_INTERVAL - (now - last)
+def record_plex_response(server_or_url, response, url=None) -> None:
+    """Signale une réponse Plex au limiteur (backoff adaptatif sur 429 / 503)."""
+    key = _normalize_server_key(server_or_url)
+    if not key or response is None:
+        return
+    _get_bucket(_bucket_key(key, url)).record_status(
+        getattr(response, "status_code", None),
+        _parse_retry_after(response),
+    )
 
-            if remaining <= 0:
-                _LAST_REQUEST_AT[key] = now
-                return
 
-        time.sleep(remaining)
+def plex_rate_limit_snapshot() -> dict:
+    """Métriques par bucket (attente cumulée, throttling) pour l'API d'activité."""
+    with _LOCK:
+        buckets = dict(_BUCKETS)
+    return {key: bucket.snapshot() for key, bucket in sorted(buckets.items())}
 
 
 def install_plex_rate_limit(session: requests.Session, server_or_url):
     """
-    Wrap session.request pour imposer 1 requête / seconde / serveur Plex.
+    Wrap session.request pour passer chaque requête par le token bucket du
+    serveur Plex (ou celui de plex.tv pour les appels compte / partages).
     """
     if not session or not hasattr(session, "request"):
         return session
@@ -55,8 +136,14 @@ def install_plex_rate_limit(session: requests.Session, server_or_url):
     original_request = session.request
 
     def wrapped_request(method, url, **kwargs):
-        wait_for_plex_slot(server_key)
-        return original_request(method, url, **kwargs)
+        key = _bucket_key(server_key, url) if server_key else ""
+        if not key:
+            return original_request(method, url, **kwargs)
+
+        bucket = _acquire(key)
+        response = original_request(method, url, **kwargs)
+        bucket.record_status(getattr(response, "status_code", None), _parse_retry_after(response))
+        return response
 
     session.request = wrapped_request
     session._vodum_plex_rate_limit_installed = True
@@ -65,12 +152,7 @@ def install_plex_rate_limit(session: requests.Session, server_or_url):
 
 
 def plex_get(server_or_url, path: str, **kwargs):
-    base = str(server_or_url or "").strip().rstrip("/")
-    if not base:
-        raise RuntimeError("Missing Plex base URL")
-
-    wait_for_plex_slot(base)
-    return requests.get(f"{base}{path}", **kwargs)
+    return plex_request("GET", server_or_url, path, **kwargs)
 
 
 def plex_request(method: str, server_or_url, path: str, **kwargs):
@@ -79,4 +161,7 @@ def plex_request(method: str, server_or_url, path: str, **kwargs):
         raise RuntimeError("Missing Plex base URL")
 
     wait_for_plex_slot(base)
-    return requests.request(method, f"{base}{path}", **kwargs)
\ No newline at end of file
+    response = requests.request(method, f"{base}{path}", **kwargs)
+    note_http_call()
+    record_plex_response(base, response)
+    return response
@@ -29,7 +29,8 @@ def sync_all_servers(
                cooldown_until, last_failure, last_checked, status
         FROM servers
         WHERE type = 'plex'
-        """
+        """,
+        decrypt_servers=True,
     )
     for row in servers:
         server = dict(row)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional
+
+from logging_utils import get_logger
+
+
+log = get_logger("plex_user_access_index")
+
+# Coût de l'ancien lookup par utilisateur : myPlexAccount() + account.user()
+# (liste complète des amis) + srv.sections() sur le partage du serveur.
+LEGACY_HTTP_CALLS_PER_USER = 3
+
+
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+class PlexUserAccessIndex:
+    """
+    Index en mémoire des accès bibliothèques Plex, construit une fois par run
+    de sync_plex :
+
+    - account.users() une seule fois par compte (token) ;
+    - GET plex.tv/api/servers/<machine_id>/shared_servers une seule fois par
+      serveur, qui contient les sections partagées de tous les utilisateurs.
+
+    Chaque media_user est ensuite résolu sans appel réseau.
+    """
+
+    def __init__(self):
+        self._accounts: Dict[str, Any] = {}
+        self._users_by_key: Dict[str, Dict[str, Any]] = {}
+        self._shares: Dict[str, Optional[Dict[str, List[dict]]]] = {}
+        self.http_calls = 0
+        self.resolved_users = 0
+
+    # -------------------------
+    # Chargement (1 fois par compte / serveur)
+    # -------------------------
+
+    def _account(self, plex, token: str):
+        account = self._accounts.get(token)
+        if account is None:
+            account = plex.myPlexAccount()
+            self.http_calls += 1
+            self._accounts[token] = account
+        return account
+
+    def _users(self, account, token: str) -> Dict[str, Any]:
+        users = self._users_by_key.get(token)
+        if users is not None:
+            return users
+
+        plex_users = list(account.users())
+        self.http_calls += 1
+
+        # Même règles de matching que account.user() : username, email ou title
+        users = {}
+        for plex_user in plex_users:
+            for attr in ("title", "email", "username"):
+                key = _norm(getattr(plex_user, attr, None))
+                if key:
+                    users[key] = plex_user
+        self._users_by_key[token] = users
+        log.info("[ACCESS INDEX] %s Plex user(s) indexed", len(plex_users))
+        return users
+
+    def _shared_sections(self, account, machine_id: str) -> Optional[Dict[str, List[dict]]]:
+        """{plex user id: [{"title", "key"}]} pour le serveur, None si indisponible."""
+        if machine_id in self._shares:
+            return self._shares[machine_id]
+
+        shares = None
+        try:
+            url = f"https://plex.tv/api/servers/{machine_id}/shared_servers"
+            self.http_calls += 1
+            resp = account.query(url, account._session.get)
+            root = resp if isinstance(resp, ET.Element) else ET.fromstring(resp)
+
+            shares = {}
+            for ss in root.iter("SharedServer"):
+                user_id = str(ss.attrib.get("userID") or ss.attrib.get("userId") or "").strip()
+                if not user_id:
+                    continue
+                shares[user_id] = [
+                    {"title": section.attrib.get("title"), "key": str(section.attrib.get("key"))}
+                    for section in ss.iter("Section")
+                    if section.attrib.get("key")
+                    and str(section.attrib.get("shared") or "0").strip().lower() in {"1", "true"}
+                ]
+            log.info(
+                "[ACCESS INDEX] shared_servers machine_id=%s -> %s share(s)",
+                machine_id,
+                len(shares),
+            )
+        except Exception as exc:
+            log.warning(
+                "[ACCESS INDEX] shared_servers unavailable for machine_id=%s: %s",
+                machine_id,
+                exc,
+            )
+            shares = None
+
+        self._shares[machine_id] = shares
+        return shares
+
+    # -------------------------
+    # Résolution
+    # -------------------------
+
+    def prepare(self, plex, server) -> bool:
+        """
+        Charge compte, utilisateurs et partages du serveur.
+        False si l'index est indisponible : l'appelant repasse alors par le
+        lookup individuel (plex_get_user_access).
+        """
+        token = str(server.get("token") or "")
+        machine_id = str(getattr(plex, "machineIdentifier", "") or server.get("server_identifier") or "")
+        if not machine_id:
+            return False
+
+        try:
+            account = self._account(plex, token)
+            self._users(account, token)
+        except Exception as exc:
+            log.warning("[ACCESS INDEX] Plex account users unavailable: %s", exc)
+            return False
+
+        return self._shared_sections(account, machine_id) is not None
+
+    def user_access(self, plex, server, email: str, username: str = "") -> Optional[List[dict]]:
+        """
+        Même contrat que plex_get_user_access (après prepare() réussi) :
+        - list[dict] => accès récupéré (éventuellement vide)
+        - None       => utilisateur Plex introuvable, ne rien supprimer
+
+        email / username sont ceux du media_user (compte Plex), pas de vodum_users.
+        """
+        token = str(server.get("token") or "")
+        machine_id = str(getattr(plex, "machineIdentifier", "") or server.get("server_identifier") or "")
+        users = self._users_by_key.get(token) or {}
+        shares = self._shares.get(machine_id) or {}
+
+        plex_user = (users.get(_norm(email)) if email else None) or (
+            users.get(_norm(username)) if username else None
+        )
+        if plex_user is None:
+            return None
+
+        self.resolved_users += 1
+        return list(shares.get(str(getattr(plex_user, "id", "") or ""), []))
+
+    def stats(self) -> dict:
+        legacy_calls = self.resolved_users * LEGACY_HTTP_CALLS_PER_USER
+        return {
+            "access_users_resolved": self.resolved_users,
+            "access_http_calls": self.http_calls,
+            "access_http_calls_saved": max(0, legacy_calls - self.http_calls),
+        }
@@ -169,6 +169,7 @@ def build_user_delete_check(db, user_id: int) -> dict | None:
         ORDER BY s.type,s.name,mu.id
         """,
         (int(user_id),),
+        decrypt_servers=True,
     ) or []
     protection = get_user_deletion_protection(db, user_id)
     items = []
@@ -4,7 +4,7 @@ import requests
 import time
 import xml.etree.ElementTree as ET
 from typing import Any, Dict, List, Optional
-from core.plex_rate_limit import wait_for_plex_slot
+from core.plex_rate_limit import record_plex_response, wait_for_plex_slot
 from core.http_security import server_http_session
 from core.providers.base import BaseProvider
 from logging_utils import get_logger
@@ -67,6 +67,7 @@ class PlexProvider(BaseProvider):
             try:
                 wait_for_plex_slot(base)
                 r = self.http.get(url, headers={"X-Plex-Token": token}, timeout=self.timeout)
+                record_plex_response(base, r)
                 # on veut une VRAIE réponse du serveur
                 r.raise_for_status()
                 return r.text
@@ -103,6 +104,7 @@ class PlexProvider(BaseProvider):
                     headers={"X-Plex-Token": token},
                     timeout=self.timeout,
                 )
+                record_plex_response(base, r)
                 r.raise_for_status()
                 return True
             except requests.exceptions.RequestException as e:
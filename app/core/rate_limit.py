@@ -0,0 +1,92 @@
+"""
+Token bucket générique, partagé par les limiteurs Plex (core.plex_rate_limit)
+et l'envoi des campagnes (email / Discord).
+"""
+import threading
+import time
+
+
+# Backoff adaptatif sur 429 / 503 (doublé à chaque réponse de throttling)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe avec réservation : un appelant sans jeton
+    réserve le suivant (le solde passe en négatif) puis dort hors du verrou,
+    ce qui garde l'ordre d'arrivée sans boucle d'attente.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._backoff_seconds = 0.0
+        self._blocked_until = 0.0
+
+        self.requests = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def reserve(self) -> float:
+        """Consomme un jeton et retourne le temps d'attente avant de l'utiliser."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+
+            wait = 0.0
+            if self._tokens < 0:
+                wait = -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            return wait
+
+    def record_status(self, status_code, retry_after=None) -> None:
+        with self._lock:
+            if status_code in THROTTLE_STATUS_CODES:
+                self.throttled += 1
+                self._backoff_seconds = min(
+                    BACKOFF_MAX_SECONDS,
+                    self._backoff_seconds * 2 if self._backoff_seconds else BACKOFF_BASE_SECONDS,
+                )
+                delay = max(self._backoff_seconds, float(retry_after or 0))
+                now = time.monotonic()
+                self._blocked_until = max(self._blocked_until, now + delay)
+                # Le serveur sature : on repart d'un bucket vide après la pause
+                self._refill(now)
+                self._tokens = min(self._tokens, 0.0)
+            elif self._backoff_seconds and status_code is not None and status_code < 500:
+                self._backoff_seconds = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "requests": self.requests,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+                "throttled": self.throttled,
+                "backoff_seconds": self._backoff_seconds,
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            }
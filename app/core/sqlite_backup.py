@@ -0,0 +1,150 @@
+"""
+Snapshots SQLite en ligne et deltas par blocs pour les sauvegardes.
+
+- snapshot_database : copie cohérente via l'API backup de SQLite, par lots de
+  pages. Une transaction de lecture est tenue sur la source pendant la copie :
+  en WAL les écrivains ne sont pas bloqués et la copie ne redémarre pas à
+  chaque commit concurrent.
+- Le fichier snapshot est découpé en blocs de taille fixe ; une sauvegarde
+  complète stocke l'empreinte de chaque bloc (chunks.bin), une sauvegarde
+  incrémentale ne stocke que les blocs qui diffèrent de la dernière complète.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import zipfile
+from pathlib import Path
+
+from db_manager import open_sqlite_connection
+
+
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP_SECONDS = 0.005
+
+# Taille de bloc du delta : multiple des tailles de page SQLite usuelles
+BACKUP_CHUNK_SIZE = 64 * 1024
+CHUNK_DIGEST_SIZE = 16
+
+FULL_BACKUP_FORMAT = "vodum-full-backup"
+INCREMENTAL_BACKUP_FORMAT = "vodum-incremental-backup"
+CHUNKS_MEMBER = "chunks.bin"
+DELTA_MEMBER = "database.delta"
+
+
+def snapshot_database(db_path: Path, target_path: Path) -> dict:
+    """Copie cohérente de la base en cours d'utilisation vers target_path."""
+    target_path = Path(target_path)
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        leftover = target_path.with_name(target_path.name + suffix)
+        if leftover.exists():
+            leftover.unlink()
+
+    steps = 0
+
+    def _progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    source = open_sqlite_connection(str(db_path), read_only=True, check_same_thread=False)
+    target = sqlite3.connect(str(target_path))
+    try:
+        # Fige le snapshot de lecture pour toute la durée de la copie
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(
+            target,
+            pages=BACKUP_PAGES_PER_STEP,
+            progress=_progress,
+            sleep=BACKUP_STEP_SLEEP_SECONDS,
+        )
+        source.execute("COMMIT")
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+
+    return {"steps": steps, "page_size": page_size, "page_count": page_count}
+
+
+def _iter_chunks(path: Path):
+    with open(path, "rb") as handle:
+        while True:
+            chunk = handle.read(BACKUP_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _chunk_digest(chunk: bytes) -> bytes:
+    return hashlib.blake2b(chunk, digest_size=CHUNK_DIGEST_SIZE).digest()
+
+
+def chunk_digests(path: Path) -> bytes:
+    """Empreintes concaténées des blocs du fichier (CHUNK_DIGEST_SIZE octets par bloc)."""
+    return b"".join(_chunk_digest(chunk) for chunk in _iter_chunks(path))
+
+
+def digests_fingerprint(digests: bytes) -> str:
+    return hashlib.sha256(digests).hexdigest()
+
+
+def read_full_backup_digests(backup_path: Path) -> bytes | None:
+    """Empreintes stockées dans une sauvegarde complète, None si absentes (ancien format)."""
+    try:
+        with zipfile.ZipFile(backup_path, "r") as zipf:
+            if CHUNKS_MEMBER not in zipf.namelist():
+                return None
+            return zipf.read(CHUNKS_MEMBER)
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def write_delta(snapshot_path: Path, base_digests: bytes, zipf: zipfile.ZipFile) -> dict:
+    """
+    Écrit dans zipf les blocs du snapshot qui diffèrent de la base.
+    Retourne les métadonnées du delta pour le manifest.
+    """
+    changed = []
+    digests = []
+    with zipf.open(DELTA_MEMBER, "w", force_zip64=True) as delta:
+        for index, chunk in enumerate(_iter_chunks(snapshot_path)):
+            digest = _chunk_digest(chunk)
+            digests.append(digest)
+            offset = index * CHUNK_DIGEST_SIZE
+            if base_digests[offset:offset + CHUNK_DIGEST_SIZE] != digest:
+                changed.append(index)
+                delta.write(chunk)
+
+    target_digests = b"".join(digests)
+    return {
+        "chunk_size": BACKUP_CHUNK_SIZE,
+        "database_size": snapshot_path.stat().st_size,
+        "changed_chunks": changed,
+        "total_chunks": len(digests),
+        "target_fingerprint": digests_fingerprint(target_digests),
+    }
+
+
+def apply_delta(base_db_path: Path, zipf: zipfile.ZipFile, delta_manifest: dict) -> None:
+    """Reconstruit la base sauvegardée en appliquant le delta sur la complète extraite."""
+    chunk_size = int(delta_manifest["chunk_size"])
+    database_size = int(delta_manifest["database_size"])
+    changed = [int(index) for index in delta_manifest.get("changed_chunks") or []]
+
+    with open(base_db_path, "r+b") as target, zipf.open(DELTA_MEMBER) as delta:
+        for index in changed:
+            remaining = min(chunk_size, database_size - index * chunk_size)
+            chunk = delta.read(remaining)
+            if len(chunk) != remaining:
+                raise ValueError("Incremental backup is truncated")
+            target.seek(index * chunk_size)
+            target.write(chunk)
+        target.truncate(database_size)
+        target.flush()
+        os.fsync(target.fileno())
+
+    if digests_fingerprint(chunk_digests(base_db_path)) != delta_manifest.get("target_fingerprint"):
+        raise ValueError("Incremental backup does not match its base backup")
@@ -3,6 +3,11 @@ from typing import Optional
 from core.stream_policy_utils import actor_key
 
 
+# Étape réclamée par le timer mais jamais terminée (process arrêté) : l'acteur
+# redevient planifiable après ce délai.
+CLAIMED_ACTION_TIMEOUT_SECONDS = 300
+
+
 def log_enforcement(
     db, policy_id: int, server_id: int, provider: str, session_key: str,
     vodum_user_id: Optional[int], external_user_id: str, action: str, reason: str,
@@ -71,3 +76,83 @@ def already_warned_recently(
         f"-{int(minutes)} minutes",
     ))
     return bool(row)
+
+
+def has_pending_action(db, policy_id: int, server_id: int, vodum_user_id: Optional[int],
+                       external_user_id: str) -> bool:
+    row = db.query_one("""
+        SELECT 1 FROM stream_enforcement_state
+        WHERE policy_id=? AND server_id=? AND actor_key=?
+          AND pending_action IS NOT NULL
+          AND (next_action_at IS NOT NULL OR datetime(last_seen_at) >= datetime('now', ?))
+        LIMIT 1
+    """, (
+        policy_id, server_id, actor_key(vodum_user_id, external_user_id),
+        f"-{int(CLAIMED_ACTION_TIMEOUT_SECONDS)} seconds",
+    ))
+    return bool(row)
+
+
+def schedule_pending_action(
+    db, policy_id: int, server_id: int, vodum_user_id: Optional[int],
+    external_user_id: str, action: str, delay_seconds: float, pending_json: str,
+):
+    db.execute("""
+        INSERT INTO stream_enforcement_state(
+            policy_id, server_id, actor_key, vodum_user_id, external_user_id,
+            pending_action, next_action_at, pending_json
+        ) VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?), ?)
+        ON CONFLICT(policy_id, server_id, actor_key) DO UPDATE SET
+            last_seen_at=CURRENT_TIMESTAMP,
+            pending_action=excluded.pending_action,
+            next_action_at=excluded.next_action_at,
+            pending_json=excluded.pending_json
+    """, (
+        policy_id, server_id, actor_key(vodum_user_id, external_user_id),
+        vodum_user_id, external_user_id,
+        action, f"+{max(0, int(round(delay_seconds)))} seconds", pending_json,
+    ))
+
+
+def claim_pending_action(db, state_id: int):
+    """Retire l'étape de la file (next_action_at=NULL) sans libérer l'acteur."""
+    db.execute("""
+        UPDATE stream_enforcement_state
+        SET next_action_at=NULL, last_seen_at=CURRENT_TIMESTAMP
+        WHERE id=?
+    """, (state_id,))
+
+
+def finish_pending_action(db, state_id: int):
+    """Libère l'acteur, sauf si l'étape exécutée a planifié la suivante."""
+    db.execute("""
+        UPDATE stream_enforcement_state
+        SET pending_action=NULL, pending_json=NULL
+        WHERE id=? AND next_action_at IS NULL
+    """, (state_id,))
+
+
+def load_due_pending_actions(db) -> list[dict]:
+    rows = db.query("""
+        SELECT id, policy_id, server_id, actor_key, vodum_user_id, external_user_id,
+               pending_action, next_action_at, pending_json,
+               CAST(strftime('%s', 'now') AS INTEGER)
+                 - CAST(strftime('%s', next_action_at) AS INTEGER) AS lateness_seconds
+        FROM stream_enforcement_state
+        WHERE pending_action IS NOT NULL
+          AND next_action_at <= CURRENT_TIMESTAMP
+        ORDER BY next_action_at, id
+    """)
+    return [dict(row) for row in rows]
+
+
+def seconds_until_next_pending_action(db) -> Optional[int]:
+    row = db.query_one("""
+        SELECT MAX(0, CAST(strftime('%s', MIN(next_action_at)) AS INTEGER)
+                      - CAST(strftime('%s', 'now') AS INTEGER)) AS wait_seconds
+        FROM stream_enforcement_state
+        WHERE pending_action IS NOT NULL
+    """)
+    if not row or row["wait_seconds"] is None:
+        return None
+    return int(row["wait_seconds"])
@@ -0,0 +1,61 @@
+import threading
+from typing import Callable, Optional
+
+from logging_utils import get_logger
+
+
+logger = get_logger("stream_enforcer.timer")
+
+# Réveil de sécurité même sans échéance connue (reprise après redémarrage,
+# étapes planifiées par un autre process).
+TIMER_IDLE_SECONDS = 30
+
+
+class StreamEnforcementTimer:
+    """
+    Thread dédié qui exécute les étapes d'enforcement en attente
+    (warn / recheck / pre_kill / kill), hors du worker de tâches.
+
+    `runner()` exécute les étapes échues et retourne le nombre de secondes
+    avant la prochaine échéance (None si rien n'est planifié). `wake()`
+    réveille le thread dès qu'une nouvelle étape est planifiée.
+    """
+
+    def __init__(self, runner: Callable[[], Optional[float]], *,
+                 idle_seconds: float = TIMER_IDLE_SECONDS,
+                 name: str = "stream-enforcer-timer"):
+        self._runner = runner
+        self._idle_seconds = max(1.0, float(idle_seconds))
+        self._name = name
+        self._cond = threading.Condition(threading.Lock())
+        self._woken = False
+        self._thread = None
+
+    def ensure_started(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, daemon=True, name=self._name)
+            self._thread.start()
+
+    def wake(self) -> None:
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                wait_seconds = self._runner()
+            except Exception:
+                logger.exception("Stream enforcement timer step failed")
+                wait_seconds = None
+
+            timeout = self._idle_seconds
+            if wait_seconds is not None:
+                timeout = min(timeout, max(0.0, float(wait_seconds)))
+
+            with self._cond:
+                if not self._woken and timeout > 0:
+                    self._cond.wait(timeout)
+                self._woken = False
@@ -6,6 +6,10 @@ JELLYFIN_KILL_MESSAGE_SPAM_SLEEP = 1.0
 JELLYFIN_KILL_MESSAGE_TIMEOUT_MS = 50000
 JELLYFIN_PRE_KILL_DURATION_SECONDS = 60
 JELLYFIN_PRE_KILL_INTERVAL_SECONDS = 10
+# Étape planifiée trop en retard (ex: redémarrage) => abandonnée, la
+# prochaine évaluation replanifie si la violation existe toujours.
+PENDING_ACTION_MAX_LATENESS_SECONDS = 600
+ENFORCEMENT_STEP_WORKERS = 4
 HOUSEHOLD_MEMORY_SECONDS = 300
 HOUSEHOLD_MEDIA_GRACE_SECONDS = 300
 STREAM_SYNC_GRACE_RUNS = 2
@@ -62,5 +62,5 @@ def load_server(db, server_id: int) -> Optional[dict]:
     row = db.query_one("""
         SELECT id, type, url, local_url, public_url, token, server_identifier, settings_json
         FROM servers WHERE id=? LIMIT 1
-    """, (server_id,))
+    """, (server_id,), decrypt_servers=True)
     return dict(row) if row else None
@@ -9,6 +9,11 @@ from core.stream_session_identity import household_match_score, is_probable_same
 logger = get_logger("stream_enforcer")
 RECENT_SESSION_CACHE: Dict[str, List[dict]] = {}
 
+# Le nettoyage parcourt tout le cache : au plus une fois par intervalle, et non
+# à chaque groupe évalué (une policy peut dédupliquer des centaines de groupes).
+CACHE_CLEANUP_INTERVAL_SECONDS = 1.0
+_last_cache_cleanup_ts = 0.0
+
 
 def deduplicate_household_sessions(sessions: List[dict]) -> List[dict]:
     kept = []
@@ -95,8 +100,12 @@ def deduplicate_household_sessions(sessions: List[dict]) -> List[dict]:
 
     return kept
 
-def cleanup_recent_session_cache():
+def cleanup_recent_session_cache(force: bool = False):
+    global _last_cache_cleanup_ts
     now = time.time()
+    if not force and now - _last_cache_cleanup_ts < CACHE_CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_cache_cleanup_ts = now
 
     for user_key in list(RECENT_SESSION_CACHE.keys()):
         kept = []
@@ -0,0 +1,154 @@
+from typing import Dict, List, Optional, Tuple
+
+from core.stream_media_metadata import parse_media_height
+from core.stream_policy_scope import policy_applies
+from core.stream_policy_utils import is_local_ip, normalize_user_key
+
+
+class SessionPolicyIndex:
+    """
+    Index des sessions live, construit une fois par cycle d'évaluation.
+
+    Les policies partagent les mêmes regroupements (serveur, utilisateur, IP,
+    device) au lieu de refiltrer toute la liste de sessions chacune. Les
+    listes retournées sont partagées entre policies : ne pas les modifier.
+    """
+
+    def __init__(self, sessions: List[dict]):
+        self.sessions = list(sessions or [])
+        self.by_server: Dict[int, List[dict]] = {}
+        self.by_provider: Dict[str, List[dict]] = {}
+        self.by_vodum_user: Dict[int, List[dict]] = {}
+
+        # Attributs normalisés, calculés une fois par session (clé = id(session))
+        self._ip: Dict[int, str] = {}
+        self._local_ip: Dict[str, bool] = {}
+        self._device: Dict[int, str] = {}
+        self._bitrate: Dict[int, int] = {}
+        self._height: Dict[int, Optional[int]] = {}
+
+        self._scoped_cache: Dict[tuple, List[dict]] = {}
+        self._group_cache: Dict[tuple, dict] = {}
+
+        for session in self.sessions:
+            sid = id(session)
+            self.by_server.setdefault(int(session.get("server_id", 0)), []).append(session)
+            self.by_provider.setdefault((session.get("provider") or "").strip().lower(), []).append(session)
+            if session.get("vodum_user_id") is not None:
+                self.by_vodum_user.setdefault(int(session["vodum_user_id"]), []).append(session)
+
+            self._ip[sid] = (session.get("ip") or "").strip() or "unknown"
+            self._device[sid] = (session.get("device") or session.get("client_product") or "").strip().lower()
+            try:
+                self._bitrate[sid] = int(session.get("bitrate") or 0)
+            except Exception:
+                self._bitrate[sid] = 0
+
+    # -------------------------
+    # Attributs normalisés
+    # -------------------------
+
+    def ip(self, session: dict) -> str:
+        return self._ip.get(id(session)) or (session.get("ip") or "").strip() or "unknown"
+
+    def is_local_ip(self, session: dict) -> bool:
+        # Parse ipaddress paresseux, mis en cache par IP
+        ip = self.ip(session)
+        local = self._local_ip.get(ip)
+        if local is None:
+            local = is_local_ip(ip)
+            self._local_ip[ip] = local
+        return local
+
+    def device(self, session: dict) -> str:
+        return self._device.get(id(session), "")
+
+    def bitrate(self, session: dict) -> int:
+        return self._bitrate.get(id(session), 0)
+
+    def is_transcode(self, session: dict) -> bool:
+        return int(session.get("is_transcode") or 0) == 1
+
+    def media_height(self, session: dict) -> Optional[int]:
+        # Parse du raw_json paresseux : seules les policies 4K en ont besoin
+        sid = id(session)
+        if sid not in self._height:
+            self._height[sid] = parse_media_height(session.get("provider"), session.get("raw_json"))
+        return self._height[sid]
+
+    # -------------------------
+    # Scope d'une policy
+    # -------------------------
+
+    @staticmethod
+    def scope_key(policy: dict) -> tuple:
+        return (
+            policy.get("scope_type"),
+            policy.get("scope_id"),
+            (policy.get("provider") or "").strip().lower(),
+            policy.get("server_id"),
+        )
+
+    def scoped(self, policy: dict) -> List[dict]:
+        """Sessions dans le scope de la policy (équivalent à filtrer avec policy_applies)."""
+        key = self.scope_key(policy)
+        cached = self._scoped_cache.get(key)
+        if cached is not None:
+            return cached
+
+        scope_type, scope_id, provider, server_id = key
+
+        # Candidats via l'index le plus sélectif, puis filtre exact
+        if scope_type == "user":
+            candidates = self.by_vodum_user.get(int(scope_id), []) if scope_id else []
+        elif scope_type == "server":
+            candidates = self.by_server.get(int(scope_id), []) if scope_id is not None else []
+        elif server_id:
+            candidates = self.by_server.get(int(server_id), [])
+        elif provider:
+            candidates = self.by_provider.get(provider, [])
+        else:
+            candidates = self.sessions
+
+        scoped = [s for s in candidates if policy_applies(policy, s)]
+        self._scoped_cache[key] = scoped
+        return scoped
+
+    # -------------------------
+    # Regroupements partagés entre policies de même scope
+    # -------------------------
+
+    def _grouped(self, policy: dict, name: str, key_func) -> dict:
+        key = (self.scope_key(policy), name)
+        cached = self._group_cache.get(key)
+        if cached is not None:
+            return cached
+        grouped: dict = {}
+        for session in self.scoped(policy):
+            grouped.setdefault(key_func(session), []).append(session)
+        self._group_cache[key] = grouped
+        return grouped
+
+    def by_user(self, policy: dict, *, per_server: bool = False) -> Dict[Tuple, List[dict]]:
+        """{(vodum_user_id, external_user_id, server_id|None): sessions}"""
+        if per_server:
+            return self._grouped(
+                policy, "user_server",
+                lambda s: (*normalize_user_key(s), int(s["server_id"])),
+            )
+        return self._grouped(policy, "user", lambda s: (*normalize_user_key(s), None))
+
+    def by_user_key(self, policy: dict) -> Dict[Tuple[Optional[int], str], List[dict]]:
+        return self._grouped(policy, "user_key", normalize_user_key)
+
+    def by_ip(self, policy: dict, *, per_server: bool) -> Dict[str, List[dict]]:
+        if per_server:
+            return self._grouped(policy, "ip_server", lambda s: f"{s['server_id']}|{self.ip(s)}")
+        return self._grouped(policy, "ip", self.ip)
+
+    def by_scoped_server(self, policy: dict) -> Dict[int, List[dict]]:
+        return self._grouped(policy, "server", lambda s: int(s["server_id"]))
+
+
+def build_policy_index(sessions: List[dict]) -> SessionPolicyIndex:
+    return SessionPolicyIndex(sessions)
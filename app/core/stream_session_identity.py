@@ -1,5 +1,6 @@
 import ipaddress
 from datetime import datetime
+from functools import lru_cache
 
 from logging_utils import get_logger, is_debug_mode_enabled
 
@@ -16,7 +17,14 @@ def safe_lower(value) -> str:
 def parse_datetime(value: str):
     if not value:
         return None
-    value = str(value).replace("T", " ")
+    return _parse_datetime_text(str(value))
+
+
+# Fonctions pures appelées pour chaque paire de sessions comparées : les
+# mêmes horodatages / IP reviennent pour toutes les policies d'un cycle.
+@lru_cache(maxsize=4096)
+def _parse_datetime_text(value: str):
+    value = value.replace("T", " ")
     for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
         try:
             return datetime.strptime(value, fmt)
@@ -54,6 +62,7 @@ def extract_machine_identifier(session: dict) -> str:
     return ""
 
 
+@lru_cache(maxsize=4096)
 def same_subnet(ip1: str, ip2: str) -> bool:
     try:
         first = ipaddress.ip_address(ip1)
@@ -0,0 +1,578 @@
+"""
+Application ensembliste des cadeaux d'abonnement (jours offerts).
+
+L'ancien chemin appelait update_user_expiration pour chaque utilisateur
+ciblé : relecture du user et des settings, recalcul du statut en Python,
+nettoyage des policies / jobs Plex, sélection de template et réveil des
+tâches, avec un commit par requête. Ici les utilisateurs sont traités par
+paquets de GIFT_CHUNK_SIZE, chaque paquet dans une seule transaction :
+
+- nouvelle date calculée en SQL (date(..., '+N days')) ;
+- statut recalculé en SQL avec les mêmes règles que compute_status,
+  last_status / status_changed_at seulement si le statut change ;
+- policies expired_subscription supprimées en un DELETE ... IN ;
+- réactivations : jobs Plex annulés en un UPDATE, syncs complets
+  recréés à partir d'une seule requête media_users ;
+- notifications expiration_change : templates chargés une fois par run,
+  contextes et lignes comm_scheduled existantes préchargés par paquet ;
+- détail du run et progression écrits dans la même transaction, ce qui
+  permet de reprendre un run interrompu au paquet suivant.
+
+apply_plex_access_updates et send_expiration_emails ne sont réveillées
+qu'une fois, en fin de run.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from communications_engine import schedule_template_notification
+from core.communication_template_selection import select_best_templates
+from core.expiration_notification_index import (
+    comm_contexts_from_rows,
+    load_scheduled_by_dedupe_key,
+    scheduled_row_blocks_requeue,
+)
+from core.media_jobs import insert_plex_media_job
+from logging_utils import get_logger
+from tasks_engine import enable_and_run_task_by_name, enqueue_task
+
+
+log = get_logger("subscription_gift_bulk")
+
+
+GIFT_CHUNK_SIZE = 500
+
+EXPIRATION_CHANGE_MAX_ATTEMPTS = 10
+
+REACTIVATION_CANCEL_ERROR = (
+    "Canceled because user subscription was reactivated and a full Plex sync was queued"
+)
+REACTIVATION_REPLACED_ERROR = (
+    "Canceled because user subscription was reactivated and a newer Plex sync was queued"
+)
+
+_REASON_LABELS = {
+    "manual": "manual",
+    "manual_update": "manual",
+    "ui_manual": "manual",
+    "gift": "gift",
+    "referral_reward": "referral",
+    "referral": "referral",
+}
+
+# Même ordre que compute_status : expiré, reminder, préavis, actif
+_STATUS_CASE_SQL = """
+    CASE
+        WHEN expiration_date <= :today THEN 'expired'
+        WHEN julianday(expiration_date) - julianday(:today) <= :reminder_days THEN 'reminder'
+        WHEN julianday(expiration_date) - julianday(:today) <= :preavis_days THEN 'pre_expired'
+        ELSE 'active'
+    END
+"""
+
+
+def _placeholders(values: Sequence) -> str:
+    return ",".join("?" for _ in values)
+
+
+def _named_in(prefix: str, values: Sequence) -> tuple[str, dict]:
+    names = [f"{prefix}{i}" for i in range(len(values))]
+    return ",".join(f":{name}" for name in names), dict(zip(names, values))
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value or "")[:10])
+    except ValueError:
+        return None
+
+
+def expiration_change_payload(reason: str, old_exp: date, new_exp: date) -> dict:
+    """Payload comm_scheduled d'une notification expiration_change."""
+    delta_days = (new_exp - old_exp).days
+    reason_key = (reason or "").strip().lower()
+    old_exp_iso = old_exp.isoformat()
+    new_exp_iso = new_exp.isoformat()
+
+    return {
+        "event": "expiration_change",
+        "trigger_event": "expiration_change",
+        "reason": reason,
+        "expiration_change_reason": _REASON_LABELS.get(reason_key, reason_key),
+        "old_expiration_date": old_exp_iso,
+        "new_expiration_date": new_exp_iso,
+        "expiration_date": new_exp_iso,
+        "expiration_change_days": abs(delta_days),
+        "expiration_change_signed_days": delta_days,
+        "expiration_change_direction": "increase" if delta_days > 0 else "decrease",
+    }
+
+
+def expiration_change_dedupe_key(template_id: int, user_id: int, old_exp: date, new_exp: date) -> str:
+    return (
+        f"expiration_change:template:{int(template_id)}:"
+        f"user:{int(user_id)}:old:{old_exp.isoformat()}:new:{new_exp.isoformat()}"
+    )
+
+
+def load_status_settings(db) -> Optional[Dict[str, int]]:
+    """preavis_days / reminder_days, None si indisponibles (statut inchangé)."""
+    try:
+        row = db.query_one("SELECT preavis_days, reminder_days FROM settings WHERE id = 1")
+        if not row:
+            return None
+        return {
+            "preavis_days": int(row["preavis_days"]),
+            "reminder_days": int(row["reminder_days"]),
+        }
+    except Exception:
+        log.warning("Failed to load status settings for gift run", exc_info=True)
+        return None
+
+
+class BulkGiftApplier:
+    """
+    Applique un run de cadeau paquet par paquet.
+
+    Les templates expiration_change et les seuils de statut sont chargés
+    une seule fois ; apply_chunk ne fait ensuite qu'un nombre fixe de
+    requêtes par paquet, quel que soit le nombre d'utilisateurs.
+    """
+
+    def __init__(self, db, *, run_id: int, days: int, reason: str, today: Optional[date] = None):
+        self.db = db
+        self.run_id = int(run_id)
+        self.days = int(days)
+        self.reason = reason
+        self.today = today or date.today()
+
+        self.status_settings = load_status_settings(db)
+        self.templates = [
+            dict(row)
+            for row in db.query(
+                """
+                SELECT id, key, name, enabled, trigger_event, trigger_provider, expiration_change_direction, subscription_scope, subscription_template_id, days_before, days_after, subject, body, created_at, updated_at FROM comm_templates
+                WHERE enabled = 1
+                  AND trigger_event = 'expiration_change'
+                ORDER BY id ASC
+                """
+            ) or []
+        ]
+
+        self.users_updated = 0
+        self.status_changes = 0
+        self.reactivated = 0
+        self.policies_removed = 0
+        self.plex_jobs_canceled = 0
+        self.plex_jobs_queued = 0
+        self.notifications_queued = 0
+
+    # -------------------------
+    # Paquet
+    # -------------------------
+
+    def apply_chunk(self, user_ids: Sequence[int]) -> int:
+        """
+        Applique le cadeau aux utilisateurs du paquet et avance la
+        progression du run, le tout dans une transaction.
+        Retourne le nombre d'utilisateurs mis à jour.
+        """
+        ids = [int(uid) for uid in dict.fromkeys(user_ids)]
+        if not ids:
+            return 0
+
+        db = self.db
+        today_iso = self.today.isoformat()
+        in_sql = _placeholders(ids)
+
+        with db.transaction():
+            before = {
+                int(row["id"]): dict(row)
+                for row in db.query(
+                    f"""
+                    SELECT id, expiration_date, status, subscription_template_id
+                    FROM vodum_users
+                    WHERE id IN ({in_sql})
+                    """,
+                    tuple(ids),
+                ) or []
+            }
+            found = [uid for uid in ids if uid in before]
+
+            if found:
+                self._update_expirations(found, today_iso)
+                after = {
+                    int(row["id"]): dict(row)
+                    for row in db.query(
+                        f"""
+                        SELECT id, expiration_date, status
+                        FROM vodum_users
+                        WHERE id IN ({_placeholders(found)})
+                        """,
+                        tuple(found),
+                    ) or []
+                }
+                self._after_update(found, before, after)
+
+                db.executemany(
+                    """
+                    INSERT OR IGNORE INTO subscription_gift_run_users
+                        (run_id, vodum_user_id)
+                    VALUES (?, ?)
+                    """,
+                    [(self.run_id, uid) for uid in found],
+                )
+
+            db.execute(
+                """
+                UPDATE subscription_gift_runs
+                SET users_processed = users_processed + ?,
+                    users_updated = users_updated + ?
+                WHERE id = ?
+                """,
+                (len(ids), len(found), self.run_id),
+            )
+
+        self.users_updated += len(found)
+        return len(found)
+
+    def _update_expirations(self, user_ids: List[int], today_iso: str) -> None:
+        db = self.db
+        in_sql, in_params = _named_in("u", user_ids)
+        params = {"today": today_iso, "modifier": f"+{self.days} days", **in_params}
+
+        # Date absente / illisible : le cadeau part d'aujourd'hui
+        db.execute(
+            f"""
+            UPDATE vodum_users
+            SET expiration_date = date(COALESCE(date(expiration_date), :today), :modifier)
+            WHERE id IN ({in_sql})
+            """,
+            params,
+        )
+
+        if self.status_settings is None:
+            return
+
+        params.update(self.status_settings)
+        cur = db.execute(
+            f"""
+            UPDATE vodum_users
+            SET last_status = status,
+                status = {_STATUS_CASE_SQL},
+                status_changed_at = datetime('now')
+            WHERE id IN ({in_sql})
+              AND status IS NOT {_STATUS_CASE_SQL}
+            """,
+            params,
+        )
+        self.status_changes += max(0, int(getattr(cur, "rowcount", 0) or 0))
+
+    def _after_update(self, user_ids: List[int], before: Dict[int, dict], after: Dict[int, dict]) -> None:
+        renewed = []
+        reactivated = []
+        changes = []
+
+        for uid in user_ids:
+            old = before[uid]
+            new = after.get(uid) or {}
+            new_exp = _parse_date(new.get("expiration_date"))
+            if new_exp is None:
+                continue
+
+            old_exp = _parse_date(old.get("expiration_date")) or self.today
+            old_status = (old.get("status") or "").strip().lower()
+            new_status = (new.get("status") or "").strip().lower()
+
+            if new_exp >= self.today:
+                renewed.append(uid)
+
+            if old_status == "expired" and (new_status != "expired" or new_exp >= self.today):
+                reactivated.append((uid, old.get("status"), new.get("status")))
+
+            if new_exp != old_exp:
+                changes.append((uid, old_exp, new_exp, old.get("subscription_template_id")))
+
+        self._remove_expired_subscription_policies(renewed)
+        self._queue_reactivation_syncs(reactivated)
+        self._queue_expiration_change_notifications(changes)
+
+    # -------------------------
+    # Effets de bord ensemblistes
+    # -------------------------
+
+    def _remove_expired_subscription_policies(self, user_ids: List[int]) -> None:
+        if not user_ids:
+            return
+
+        rows = self.db.query(
+            f"""
+            SELECT id, rule_value_json
+            FROM stream_policies
+            WHERE scope_type = 'user'
+              AND scope_id IN ({_placeholders(user_ids)})
+            """,
+            tuple(user_ids),
+        ) or []
+
+        policy_ids = []
+        for row in rows:
+            try:
+                rule = json.loads(row["rule_value_json"] or "{}")
+            except Exception:
+                rule = {}
+            if isinstance(rule, dict) and rule.get("system_tag") == "expired_subscription":
+                policy_ids.append(int(row["id"]))
+
+        if policy_ids:
+            self.db.execute(
+                f"DELETE FROM stream_policies WHERE id IN ({_placeholders(policy_ids)})",
+                tuple(policy_ids),
+            )
+            self.policies_removed += len(policy_ids)
+
+    def _queue_reactivation_syncs(self, reactivated: List[tuple]) -> None:
+        if not reactivated:
+            return
+
+        db = self.db
+        user_ids = [uid for uid, _old, _new in reactivated]
+        in_sql = _placeholders(user_ids)
+
+        cur = db.execute(
+            f"""
+            UPDATE media_jobs
+            SET status = 'canceled',
+                processed = 1,
+                success = 0,
+                processed_at = CURRENT_TIMESTAMP,
+                locked_by = NULL,
+                locked_until = NULL,
+                last_error = ?
+            WHERE vodum_user_id IN ({in_sql})
+              AND provider = 'plex'
+              AND action IN ('grant', 'revoke', 'sync')
+              AND (
+                    status IN ('queued', 'running')
+                 OR processed = 0
+              )
+            """,
+            (REACTIVATION_CANCEL_ERROR, *user_ids),
+        )
+        self.plex_jobs_canceled += max(0, int(getattr(cur, "rowcount", 0) or 0))
+        self.reactivated += len(user_ids)
+
+        # Même choix du media_user préféré que _queue_full_plex_sync_after_reactivation
+        rows = db.query(
+            f"""
+            SELECT
+                mu.vodum_user_id,
+                mu.server_id,
+                mu.id AS preferred_media_user_id
+            FROM media_users mu
+            JOIN servers s ON s.id = mu.server_id
+            WHERE mu.vodum_user_id IN ({in_sql})
+              AND s.type = 'plex'
+              AND mu.type = 'plex'
+            ORDER BY
+                mu.vodum_user_id ASC,
+                mu.server_id ASC,
+                CASE WHEN LOWER(COALESCE(mu.role, '')) = 'owner' THEN 1 ELSE 0 END ASC,
+                CASE WHEN TRIM(COALESCE(mu.accepted_at, '')) <> '' THEN 0 ELSE 1 END ASC,
+                CASE WHEN TRIM(COALESCE(mu.external_user_id, '')) <> '' THEN 0 ELSE 1 END ASC,
+                CASE WHEN LOWER(COALESCE(mu.role, '')) = 'unfriended' THEN 1 ELSE 0 END ASC,
+                mu.id ASC
+            """,
+            tuple(user_ids),
+        ) or []
+
+        statuses = {uid: (old_status, new_status) for uid, old_status, new_status in reactivated}
+        seen = set()
+        for row in rows:
+            uid = int(row["vodum_user_id"])
+            server_id = int(row["server_id"])
+            if (uid, server_id) in seen:
+                continue
+            seen.add((uid, server_id))
+
+            preferred_media_user_id = (
+                int(row["preferred_media_user_id"])
+                if row["preferred_media_user_id"] is not None
+                else None
+            )
+            old_status, new_status = statuses[uid]
+
+            inserted = insert_plex_media_job(
+                db,
+                action="sync",
+                vodum_user_id=uid,
+                server_id=server_id,
+                library_id=None,
+                dedupe_key=(
+                    f"plex:sync:server={server_id}:"
+                    f"media_user={preferred_media_user_id or 'none'}:reactivation"
+                ),
+                payload={
+                    "reason": self.reason,
+                    "reactivated_from_expired": True,
+                    "old_status": old_status,
+                    "new_status": new_status,
+                    "preferred_media_user_id": preferred_media_user_id,
+                },
+                cancel_reason=REACTIVATION_REPLACED_ERROR,
+            )
+            if inserted:
+                self.plex_jobs_queued += 1
+
+    def _select_template(self, contexts: List[dict], subscription_template_id, direction: str):
+        for ctx in contexts:
+            provider = ctx["provider"]
+            candidates = [
+                tpl for tpl in self.templates
+                if tpl.get("trigger_provider") in ("all", provider)
+            ]
+            selected = select_best_templates(
+                candidates,
+                trigger_event="expiration_change",
+                provider=provider,
+                subscription_template_id=subscription_template_id,
+                expiration_change_direction=direction,
+            )
+            if selected:
+                return selected[0], provider, ctx.get("server_id")
+        return None, None, None
+
+    def _queue_expiration_change_notifications(self, changes: List[tuple]) -> None:
+        if not changes or not self.templates:
+            return
+
+        db = self.db
+        user_ids = [uid for uid, _old, _new, _sub in changes]
+        rows = db.query(
+            f"""
+            SELECT
+                mu.vodum_user_id AS vodum_user_id,
+                LOWER(COALESCE(s.type, '')) AS provider,
+                mu.server_id AS server_id
+            FROM media_users mu
+            JOIN servers s ON s.id = mu.server_id
+            WHERE mu.vodum_user_id IN ({_placeholders(user_ids)})
+            ORDER BY
+                mu.vodum_user_id,
+                CASE LOWER(COALESCE(s.type, ''))
+                    WHEN 'plex' THEN 0
+                    WHEN 'jellyfin' THEN 1
+                    ELSE 2
+                END,
+                mu.id ASC
+            """,
+            tuple(user_ids),
+        ) or []
+        rows_by_user: Dict[int, list] = {}
+        for row in rows:
+            rows_by_user.setdefault(int(row["vodum_user_id"]), []).append(row)
+
+        # Même repli que update_user_expiration : sans media_users, on tente
+        # quand même un template provider=all / plex / jellyfin
+        fallback_contexts = [
+            {"provider": "plex", "server_id": None},
+            {"provider": "jellyfin", "server_id": None},
+        ]
+
+        due = []
+        for uid, old_exp, new_exp, subscription_template_id in changes:
+            direction = "increase" if new_exp > old_exp else "decrease"
+            contexts = comm_contexts_from_rows(rows_by_user.get(uid)) or fallback_contexts
+            try:
+                sub_id = int(subscription_template_id) if subscription_template_id is not None else None
+            except (TypeError, ValueError):
+                sub_id = None
+
+            tpl, provider, server_id = self._select_template(contexts, sub_id, direction)
+            if not tpl:
+                continue
+
+            due.append({
+                "template_id": int(tpl["id"]),
+                "user_id": uid,
+                "provider": provider,
+                "server_id": server_id,
+                "payload": expiration_change_payload(self.reason, old_exp, new_exp),
+                "dedupe_key": expiration_change_dedupe_key(tpl["id"], uid, old_exp, new_exp),
+            })
+
+        existing = load_scheduled_by_dedupe_key(db, [item["dedupe_key"] for item in due])
+        for item in due:
+            if scheduled_row_blocks_requeue(existing.get(item["dedupe_key"]), EXPIRATION_CHANGE_MAX_ATTEMPTS):
+                continue
+            schedule_template_notification(
+                db=db,
+                template_id=item["template_id"],
+                user_id=item["user_id"],
+                provider=item["provider"],
+                server_id=item["server_id"],
+                send_at_modifier=None,
+                payload=item["payload"],
+                dedupe_key=item["dedupe_key"],
+                max_attempts=EXPIRATION_CHANGE_MAX_ATTEMPTS,
+            )
+            self.notifications_queued += 1
+
+    # -------------------------
+    # Fin de run
+    # -------------------------
+
+    def wake_workers(self) -> None:
+        """Réveille une seule fois les tâches qui consomment ce qui a été mis en file."""
+        if self.plex_jobs_queued:
+            try:
+                enable_and_run_task_by_name("apply_plex_access_updates")
+            except Exception:
+                log.warning(
+                    f"[GIFT RUN #{self.run_id}] Failed to queue apply_plex_access_updates",
+                    exc_info=True,
+                )
+
+        if self.notifications_queued:
+            try:
+                enable_and_run_task_by_name("send_expiration_emails")
+            except Exception:
+                log.warning(
+                    f"[GIFT RUN #{self.run_id}] Failed to queue send_expiration_emails",
+                    exc_info=True,
+                )
+
+    def stats(self) -> dict:
+        return {
+            "users_updated": self.users_updated,
+            "status_changes": self.status_changes,
+            "reactivated": self.reactivated,
+            "policies_removed": self.policies_removed,
+            "plex_jobs_canceled": self.plex_jobs_canceled,
+            "plex_jobs_queued": self.plex_jobs_queued,
+            "notifications_queued": self.notifications_queued,
+        }
+
+
+def resume_pending_gift_runs(db) -> bool:
+    """
+    Remet apply_subscription_gifts en file s'il reste des runs 'queued' ou
+    'running' (run interrompu par un redémarrage). La tâche n'a pas de
+    planification : sans cela, rien ne la relancerait avant le prochain cadeau.
+    """
+    pending = db.query_one(
+        "SELECT COUNT(*) AS cnt FROM subscription_gift_runs WHERE status IN ('queued', 'running')"
+    )
+    if not pending or int(pending["cnt"] or 0) <= 0:
+        return False
+
+    task = db.query_one("SELECT id FROM tasks WHERE name = 'apply_subscription_gifts'")
+    # enqueue_task : le statut 'running' laissé par le crash n'empêche pas la mise en file
+    if not task or not enqueue_task(int(task["id"])):
+        log.warning("Pending gift runs found but apply_subscription_gifts could not be enqueued")
+        return False
+
+    log.info(f"{int(pending['cnt'])} pending gift run(s): apply_subscription_gifts enqueued")
+    return True
@@ -0,0 +1,32 @@
+import json
+
+
+def load_task_checkpoint(db, task_name: str) -> dict:
+    """Curseur de reprise d'une tâche (tasks.checkpoint_json), {} si absent."""
+    try:
+        row = db.query_one(
+            "SELECT checkpoint_json FROM tasks WHERE name = ? LIMIT 1",
+            (task_name,),
+        )
+    except Exception:
+        # Base pas encore migrée
+        return {}
+    if not row or not row["checkpoint_json"]:
+        return {}
+    try:
+        data = json.loads(row["checkpoint_json"])
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_task_checkpoint(db, task_name: str, checkpoint) -> None:
+    payload = json.dumps(checkpoint, separators=(",", ":")) if checkpoint else None
+    db.execute(
+        "UPDATE tasks SET checkpoint_json = ? WHERE name = ?",
+        (payload, task_name),
+    )
+
+
+def clear_task_checkpoint(db, task_name: str) -> None:
+    save_task_checkpoint(db, task_name, None)
@@ -1,5 +1,6 @@
 import importlib
 import time
+from contextlib import nullcontext
 
 from core.tasks.result_validation import validate_task_result
 
@@ -22,7 +23,7 @@ class TaskExecutionRunner:
     def __init__(
         self, db, load_context, mark_running, mark_success, mark_error,
         finalize, task_log, logger, debug_enabled, *, clock=time.time,
-        callable_loader=load_task_callable,
+        callable_loader=load_task_callable, run_metrics=None,
     ):
         self.db = db
         self.load_context = load_context
@@ -35,6 +36,7 @@ class TaskExecutionRunner:
         self.debug_enabled = debug_enabled
         self.clock = clock
         self.callable_loader = callable_loader
+        self.run_metrics = run_metrics
 
     def _process_result(self, task_id, task_name, result, started_at, max_duration):
         if result is not None:
@@ -81,20 +83,34 @@ class TaskExecutionRunner:
             self._finalize(task_id)
             return None
 
+        sample = None
         try:
-            result = run_func(task_id, self.db)
+            with self._measure() as sample:
+                result = run_func(task_id, self.db)
             self._process_result(task_id, task_name, result, started_at, max_duration)
             self.mark_success(task_id, task_name, schedule)
+            self._record_run(task_id, task_name, "success", sample)
             return result
         except Exception as exc:
             message = f"Error while running {task_name}: {exc}"
             self.logger.error(message, exc_info=True)
             self.task_log(task_id, "error", message)
             self.mark_error(task_id, task_name, str(exc))
+            self._record_run(task_id, task_name, "error", sample, str(exc))
             return None
         finally:
             self._finalize(task_id)
 
+    def _measure(self):
+        if self.run_metrics is None:
+            return nullcontext(None)
+        return self.run_metrics.measure()
+
+    def _record_run(self, task_id, task_name, status, sample, error=None):
+        if self.run_metrics is None or sample is None:
+            return
+        self.run_metrics.record(task_id, task_name, status, sample, error)
+
     def _finalize(self, task_id):
         try:
             self.finalize(task_id)
@@ -0,0 +1,209 @@
+import functools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from core.http_metrics import HttpCallCounter, bind_http_counter, current_http_counter
+from db_manager import DBManager
+
+
+# Historique conservé par tâche dans task_runs
+TASK_RUNS_KEEP_PER_TASK = 500
+# Fenêtre glissante utilisée pour p50 / p95
+TASK_RUNS_PERCENTILE_WINDOW = 100
+
+TASK_RUN_METRIC_COLUMNS = (
+    "wall_ms",
+    "cpu_ms",
+    "db_ms",
+    "db_statements",
+    "http_calls",
+    "rows_written",
+)
+
+
+def bind_run_metrics(fn):
+    """
+    Enveloppe `fn` pour qu'il compte, dans le thread qui l'exécute, dans la
+    mesure active du thread appelant (HTTP + instructions DB). Les compteurs
+    étant thread-local, sans cela le travail des pools d'exécution d'une
+    tâche n'apparaît pas dans task_runs.
+    """
+    http_counter = current_http_counter()
+    db_metrics = [
+        (db, metrics)
+        for db in DBManager.instances()
+        if (metrics := db.current_thread_metrics()) is not None
+    ]
+    if http_counter is None and not db_metrics:
+        return fn
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with ExitStack() as stack:
+            stack.enter_context(bind_http_counter(http_counter))
+            for db, metrics in db_metrics:
+                stack.enter_context(db.bind_thread_metrics(metrics))
+            return fn(*args, **kwargs)
+
+    return bound
+
+
+class RunMetricsThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor dont les tâches soumises comptent dans la mesure de l'appelant."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(bind_run_metrics(fn), *args, **kwargs)
+
+
+class TaskRunSample:
+    """Mesures d'une exécution de tâche (remplies à la sortie de measure())."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.wall_ms = 0
+        self.cpu_ms = 0
+        self.db_ms = 0
+        self.db_statements = 0
+        self.http_calls = 0
+        self.rows_written = 0
+
+
+class TaskRunMetricsRecorder:
+    """Measure task executions and persist them into task_runs."""
+
+    def __init__(self, db, logger, *, keep_per_task=TASK_RUNS_KEEP_PER_TASK):
+        self.db = db
+        self.logger = logger
+        self.keep_per_task = max(1, int(keep_per_task))
+
+    def _db_metrics(self):
+        capture = getattr(self.db, "capture_thread_metrics", None)
+        return capture() if capture is not None else nullcontext(None)
+
+    @contextmanager
+    def measure(self):
+        sample = TaskRunSample()
+        http_counter = HttpCallCounter()
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            with bind_http_counter(http_counter), self._db_metrics() as db_metrics:
+                try:
+                    yield sample
+                finally:
+                    if db_metrics:
+                        sample.db_ms = int(round(db_metrics["db_ms"]))
+                        sample.db_statements = int(db_metrics["statements"])
+                        sample.rows_written = int(db_metrics["rows_written"])
+        finally:
+            sample.wall_ms = int(round((time.perf_counter() - wall_started) * 1000.0))
+            sample.cpu_ms = int(round((time.thread_time() - cpu_started) * 1000.0))
+            sample.http_calls = int(http_counter.count)
+
+    def record(self, task_id, task_name, status, sample, error=None):
+        if sample is None:
+            return False
+        try:
+            self.db.execute(
+                """
+                INSERT INTO task_runs (
+                    task_id, task_name, status, started_at, finished_at,
+                    wall_ms, cpu_ms, db_ms, db_statements, http_calls,
+                    rows_written, error
+                )
+                VALUES (?, ?, ?, datetime(?, 'unixepoch'), datetime('now'), ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task_id, task_name, status, int(sample.started_at),
+                    sample.wall_ms, sample.cpu_ms, sample.db_ms,
+                    sample.db_statements, sample.http_calls, sample.rows_written,
+                    (str(error)[:1000] if error else None),
+                ),
+            )
+            self.db.execute(
+                """
+                DELETE FROM task_runs
+                WHERE task_name = ?
+                  AND id <= (
+                      SELECT id FROM task_runs
+                      WHERE task_name = ?
+                      ORDER BY id DESC
+                      LIMIT 1 OFFSET ?
+                  )
+                """,
+                (task_name, task_name, self.keep_per_task),
+            )
+            return True
+        except Exception:
+            self.logger.warning(
+                "Unable to record task run metrics | task=%s | id=%s",
+                task_name, task_id, exc_info=True,
+            )
+            return False
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    index = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, index))]
+
+
+def load_task_run_stats(db, task_names=None, window=TASK_RUNS_PERCENTILE_WINDOW) -> dict:
+    """
+    p50 / p95 glissants sur les `window` dernières exécutions de chaque tâche.
+    Retourne {task_name: {"runs", "errors", "last_wall_ms", "p50_wall_ms", ...}}.
+    """
+    params = [max(1, int(window))]
+    name_filter = ""
+    if task_names:
+        names = sorted({str(name) for name in task_names})
+        name_filter = f"WHERE task_name IN ({','.join('?' for _ in names)})"
+        params = names + params
+
+    rows = db.query(
+        f"""
+        SELECT task_name, status, {', '.join(TASK_RUN_METRIC_COLUMNS)}
+        FROM (
+            SELECT tr.*,
+                   ROW_NUMBER() OVER (PARTITION BY task_name ORDER BY id DESC) AS rn
+            FROM task_runs tr
+            {name_filter}
+        )
+        WHERE rn <= ?
+        ORDER BY task_name, rn
+        """,
+        tuple(params),
+    ) or []
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["task_name"], []).append(row)
+
+    stats = {}
+    for task_name, runs in grouped.items():
+        entry = {
+            "runs": len(runs),
+            "errors": sum(1 for run in runs if run["status"] != "success"),
+            "last_wall_ms": runs[0]["wall_ms"],
+        }
+        for column in TASK_RUN_METRIC_COLUMNS:
+            values = sorted(int(run[column] or 0) for run in runs)
+            entry[f"p50_{column}"] = _percentile(values, 50)
+            entry[f"p95_{column}"] = _percentile(values, 95)
+        stats[task_name] = entry
+    return stats
+
+
+def format_duration_ms(value) -> str:
+    if value is None:
+        return "-"
+    value = int(value)
+    if value < 1000:
+        return f"{value} ms"
+    if value < 60_000:
+        return f"{value / 1000.0:.1f} s"
+    return f"{value / 60_000.0:.1f} min"
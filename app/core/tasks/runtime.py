@@ -7,7 +7,8 @@ class SchedulerRuntime:
     """Own the scheduler lifecycle while keeping tasks_engine APIs stable."""
 
     def __init__(self, db, scheduler, cron_enabled, kick_worker, consume_dirty,
-                 auto_enable, watchdog_loop, compute_next_run, logger, debug_enabled):
+                 auto_enable, watchdog_loop, compute_next_run, logger, debug_enabled,
+                 *, wait_for_refresh=None, resync_seconds=300, cron_disabled_sleep=30):
         self.db = db
         self.scheduler = scheduler
         self.cron_enabled = cron_enabled
@@ -18,6 +19,9 @@ class SchedulerRuntime:
         self.compute_next_run = compute_next_run
         self.logger = logger
         self.debug_enabled = debug_enabled
+        self.wait_for_refresh = wait_for_refresh or self._sleep_without_signals
+        self.resync_seconds = max(1.0, float(resync_seconds))
+        self.cron_disabled_sleep = max(1.0, float(cron_disabled_sleep))
         self._start_lock = threading.Lock()
         self._started = False
 
@@ -36,21 +40,52 @@ class SchedulerRuntime:
         except Exception as exc:
             self.logger.warning("Recovery tasks failed: %s", exc, exc_info=True)
 
+    @staticmethod
+    def _sleep_without_signals(timeout):
+        time.sleep(timeout)
+        return True, set()
+
+    def _sleep_seconds(self, now, last_full_pass):
+        """
+        Sleep until the earliest due task, bounded by the periodic full
+        resync (catches edits made directly in the DB).
+        """
+        timeout = self.resync_seconds - (time.monotonic() - last_full_pass)
+        next_due = self.scheduler.next_due_at()
+        if next_due is not None:
+            timeout = min(timeout, (next_due - now).total_seconds())
+        return max(0.05, timeout)
+
     def loop(self):
         self.logger.info("VODUM scheduler started")
         self.recover_state()
+        refresh_all = True
+        refresh_ids = set()
+        last_full_pass = time.monotonic()
         while True:
             if not self.cron_enabled():
-                time.sleep(30)
+                self.wait_for_refresh(self.cron_disabled_sleep)
+                refresh_all = True
                 continue
-            self.kick_worker()
+            now = datetime.now()
+            run_auto_enable = self.consume_dirty()
+            if time.monotonic() - last_full_pass >= self.resync_seconds:
+                refresh_all = True
             try:
-                self.scheduler.tick(
-                    datetime.now(), run_auto_enable=self.consume_dirty()
-                )
+                if refresh_all or run_auto_enable:
+                    self.kick_worker()
+                    self.scheduler.tick(now, run_auto_enable=run_auto_enable)
+                    last_full_pass = time.monotonic()
+                else:
+                    due_ids = self.scheduler.pop_due_task_ids(now) | refresh_ids
+                    if due_ids:
+                        self.kick_worker()
+                        self.scheduler.tick(now, run_auto_enable=False, task_ids=due_ids)
             except Exception as exc:
                 self.logger.error("Error scheduler (global): %s", exc, exc_info=True)
-            time.sleep(30)
+            refresh_all, refresh_ids = self.wait_for_refresh(
+                self._sleep_seconds(datetime.now(), last_full_pass)
+            )
 
     def force_check_update(self):
         try:
@@ -6,12 +6,17 @@ class TaskRuntimeSignals:
 
     def __init__(self, *, auto_enable_dirty=True):
         self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
         self._forced_task_runs = set()
         self._auto_enable_dirty = bool(auto_enable_dirty)
+        self._refresh_all = False
+        self._refresh_task_ids = set()
 
     def mark_auto_enable_dirty(self):
         with self._lock:
             self._auto_enable_dirty = True
+            self._refresh_all = True
+            self._wakeup.notify_all()
 
     def consume_auto_enable_dirty(self) -> bool:
         with self._lock:
@@ -27,6 +32,8 @@ class TaskRuntimeSignals:
 
         with self._lock:
             self._forced_task_runs.add(normalized_name)
+            self._refresh_all = True
+            self._wakeup.notify_all()
 
     def consume_forced_task_run(self, task_name: str) -> bool:
         normalized_name = str(task_name or "").strip()
@@ -38,3 +45,29 @@ class TaskRuntimeSignals:
                 return False
             self._forced_task_runs.remove(normalized_name)
             return True
+
+    def request_scheduler_refresh(self, task_id=None):
+        """
+        Wake the scheduler loop. With a task_id only that task is re-read,
+        otherwise the whole enabled task list is reloaded.
+        """
+        with self._lock:
+            if task_id is None:
+                self._refresh_all = True
+            else:
+                self._refresh_task_ids.add(int(task_id))
+            self._wakeup.notify_all()
+
+    def wait_for_scheduler_refresh(self, timeout):
+        """
+        Block until a refresh is requested or the timeout expires.
+        Returns (refresh_all, task_ids) and consumes the pending requests.
+        """
+        with self._lock:
+            if not self._refresh_all and not self._refresh_task_ids:
+                self._wakeup.wait(max(0.0, float(timeout)))
+            refresh_all = self._refresh_all
+            task_ids = self._refresh_task_ids
+            self._refresh_all = False
+            self._refresh_task_ids = set()
+            return refresh_all, task_ids
@@ -1,3 +1,6 @@
+import heapq
+import threading
+
 from core.tasks.scheduler_rules import (
     normalize_counter,
     parse_scheduler_datetime,
@@ -16,7 +19,13 @@ FROM tasks WHERE enabled = 1
 
 
 class TaskScheduler:
-    """Database-backed scheduler tick, independent from its sleeping loop."""
+    """
+    Database-backed scheduler tick, independent from its sleeping loop.
+
+    Each tick also records the next due time of every idle task in an
+    in-memory priority queue, so the loop can sleep until the earliest one
+    and only re-read the rows that are actually due.
+    """
 
     def __init__(self, db, enqueue, compute_next, consume_forced, auto_enable, logger):
         self.db = db
@@ -25,20 +34,84 @@ class TaskScheduler:
         self.consume_forced = consume_forced
         self.auto_enable = auto_enable
         self.logger = logger
+        self._due_lock = threading.Lock()
+        self._due_heap = []
+        self._due_at = {}
 
-    def tick(self, now, run_auto_enable=True):
+    def tick(self, now, run_auto_enable=True, task_ids=None):
+        """
+        task_ids=None : full pass over every enabled task (rebuilds the queue).
+        task_ids=[...] : only those tasks are re-read and re-scheduled.
+        """
         if run_auto_enable:
             self.auto_enable()
         try:
-            rows = self.db.query(TASKS_FOR_SCHEDULER_SQL)
+            if task_ids is None:
+                rows = self.db.query(TASKS_FOR_SCHEDULER_SQL)
+            else:
+                task_ids = sorted({int(task_id) for task_id in task_ids})
+                if not task_ids:
+                    return True
+                placeholders = ",".join("?" for _ in task_ids)
+                rows = self.db.query(
+                    f"{TASKS_FOR_SCHEDULER_SQL} AND id IN ({placeholders})",
+                    tuple(task_ids),
+                )
         except Exception:
             self.logger.error("Scheduler unable to load enabled tasks", exc_info=True)
             return False
 
+        if task_ids is None:
+            with self._due_lock:
+                self._due_heap = []
+                self._due_at = {}
+        else:
+            # Tâches désactivées / supprimées depuis : plus rien à planifier
+            for task_id in task_ids:
+                self._unschedule(task_id)
+
         for row in rows:
+            self._unschedule(row["id"])
             self._process_row(row, now)
         return True
 
+    def _schedule(self, task_id, due_at):
+        if due_at is None:
+            return
+        with self._due_lock:
+            self._due_at[task_id] = due_at
+            heapq.heappush(self._due_heap, (due_at, task_id))
+
+    def _unschedule(self, task_id):
+        with self._due_lock:
+            self._due_at.pop(task_id, None)
+
+    def _drop_stale_heads(self):
+        while self._due_heap:
+            due_at, task_id = self._due_heap[0]
+            if self._due_at.get(task_id) == due_at:
+                return
+            heapq.heappop(self._due_heap)
+
+    def next_due_at(self):
+        """Earliest known due time, or None when no idle task is scheduled."""
+        with self._due_lock:
+            self._drop_stale_heads()
+            return self._due_heap[0][0] if self._due_heap else None
+
+    def pop_due_task_ids(self, now):
+        """Remove and return the ids of the tasks due at `now`."""
+        due = set()
+        with self._due_lock:
+            self._drop_stale_heads()
+            while self._due_heap and self._due_heap[0][0] <= now:
+                due_at, task_id = heapq.heappop(self._due_heap)
+                if self._due_at.get(task_id) == due_at:
+                    del self._due_at[task_id]
+                    due.add(task_id)
+                self._drop_stale_heads()
+        return due
+
     def _process_row(self, row, now):
         task_id = row["id"]
         name = row["name"]
@@ -55,6 +128,8 @@ class TaskScheduler:
                     )
                 else:
                     self.logger.warning("Retry enqueue refused | task=%s | id=%s", name, task_id)
+            else:
+                self._schedule(task_id, next_retry_at)
             return
 
         schedule = row["schedule"]
@@ -71,7 +146,10 @@ class TaskScheduler:
             self.db.execute("UPDATE tasks SET next_run = ? WHERE id = ?", (next_exec, task_id))
 
         if last_run is None:
-            if next_exec > now or not self.enqueue(task_id):
+            if next_exec > now:
+                self._schedule(task_id, next_exec)
+                return
+            if not self.enqueue(task_id):
                 return
             self._advance(task_id, schedule, schedule_mode, interval_seconds, now)
             self.db.execute(
@@ -87,6 +165,8 @@ class TaskScheduler:
                 self.logger.warning("Scheduled enqueue refused | task=%s | id=%s", name, task_id)
                 return
             self._advance(task_id, schedule, schedule_mode, interval_seconds, now)
+            return
+        self._schedule(task_id, next_exec)
 
     def _advance(self, task_id, schedule, schedule_mode, interval_seconds, now):
         next_future = self.compute_next(schedule, schedule_mode, interval_seconds, now)
@@ -0,0 +1,142 @@
+import threading
+
+
+CONCURRENCY_REALTIME = "realtime"
+CONCURRENCY_SYNC = "sync"
+CONCURRENCY_BULK = "bulk"
+CONCURRENCY_DEFAULT = "default"
+CONCURRENCY_EXCLUSIVE = "exclusive"
+
+# Classe de concurrence par tâche. Une tâche absente tombe dans "default".
+TASK_CONCURRENCY_CLASSES = {
+    # Monitoring / enforcement : courts, doivent tourner pendant les longues syncs
+    "monitor_collect_sessions": CONCURRENCY_REALTIME,
+    "monitor_enqueue_refresh": CONCURRENCY_REALTIME,
+    "media_jobs_worker": CONCURRENCY_REALTIME,
+    "stream_enforcer": CONCURRENCY_REALTIME,
+
+    # Synchronisations fournisseurs / application des accès
+    "sync_plex": CONCURRENCY_SYNC,
+    "sync_jellyfin": CONCURRENCY_SYNC,
+    "apply_plex_access_updates": CONCURRENCY_SYNC,
+    "apply_jellyfin_access_updates": CONCURRENCY_SYNC,
+    "migration_worker": CONCURRENCY_SYNC,
+
+    # Traitements longs / volumineux
+    "import_tautulli": CONCURRENCY_BULK,
+    "cleanup_tautulli_imports": CONCURRENCY_BULK,
+    "cleanup_data_retention": CONCURRENCY_BULK,
+    "cleanup_data_consistency": CONCURRENCY_BULK,
+    "materialize_monitoring_daily_stats": CONCURRENCY_BULK,
+    "warmup_artwork_cache": CONCURRENCY_BULK,
+    "cleanup_artwork_cache": CONCURRENCY_BULK,
+    "auto_backup": CONCURRENCY_BULK,
+    "cleanup_backups": CONCURRENCY_BULK,
+
+    # Touchent la base entière : tournent seules
+    "restore_backup": CONCURRENCY_EXCLUSIVE,
+    "db_integrity_check": CONCURRENCY_EXCLUSIVE,
+}
+
+# Nombre de slots par classe (borné en plus par la taille globale du pool).
+DEFAULT_CLASS_SLOTS = {
+    CONCURRENCY_REALTIME: 2,
+    CONCURRENCY_SYNC: 1,
+    CONCURRENCY_BULK: 1,
+    CONCURRENCY_DEFAULT: 1,
+    CONCURRENCY_EXCLUSIVE: 1,
+}
+
+# Tâches qui ne doivent jamais se chevaucher, même si leurs classes ont des
+# slots libres (mêmes tables / même fournisseur).
+DEFAULT_TASK_CONFLICTS = (
+    frozenset({"sync_plex", "apply_plex_access_updates"}),
+    frozenset({"sync_jellyfin", "apply_jellyfin_access_updates"}),
+    frozenset({"import_tautulli", "cleanup_tautulli_imports"}),
+    frozenset({"auto_backup", "cleanup_backups"}),
+)
+
+
+def concurrency_class_for_task(task_name: str) -> str:
+    return TASK_CONCURRENCY_CLASSES.get(str(task_name or "").strip(), CONCURRENCY_DEFAULT)
+
+
+class TaskWorkerPool:
+    """
+    Thread-safe slot accounting for the parallel task workers.
+
+    The pool does not start threads itself: the dispatcher asks try_acquire()
+    before starting a worker and the worker calls release() when done. Rules:
+    - never more than max_workers tasks at once;
+    - never more than the class slots for a given concurrency class;
+    - a task never overlaps with itself or with a conflicting task;
+    - an "exclusive" task only starts on an empty pool and blocks all others.
+    """
+
+    def __init__(self, max_workers=4, *, class_slots=None, conflicts=DEFAULT_TASK_CONFLICTS,
+                 classifier=concurrency_class_for_task):
+        self.max_workers = max(1, int(max_workers))
+        self.class_slots = dict(DEFAULT_CLASS_SLOTS)
+        self.class_slots.update(class_slots or {})
+        self.conflicts = tuple(frozenset(group) for group in conflicts or ())
+        self.classifier = classifier
+        self._cond = threading.Condition(threading.Lock())
+        self._running = {}
+
+    def _blocked_reason(self, task_id, task_name, task_class):
+        if task_id in self._running:
+            return "already_running"
+        if len(self._running) >= self.max_workers:
+            return "pool_full"
+
+        running_classes = [entry[1] for entry in self._running.values()]
+        if CONCURRENCY_EXCLUSIVE in running_classes:
+            return "exclusive_running"
+        if task_class == CONCURRENCY_EXCLUSIVE and self._running:
+            return "exclusive_waiting"
+
+        if running_classes.count(task_class) >= max(1, int(self.class_slots.get(task_class, 1))):
+            return "class_full"
+
+        running_names = {entry[0] for entry in self._running.values()}
+        for group in self.conflicts:
+            if task_name in group and running_names & (group - {task_name}):
+                return "conflict"
+        return None
+
+    def try_acquire(self, task_id: int, task_name: str):
+        """
+        Reserve a slot for the task. Returns None on success, otherwise the
+        reason why the task cannot start now.
+        """
+        task_class = self.classifier(task_name)
+        with self._cond:
+            reason = self._blocked_reason(task_id, task_name, task_class)
+            if reason is None:
+                self._running[task_id] = (task_name, task_class)
+            return reason
+
+    def release(self, task_id: int):
+        with self._cond:
+            self._running.pop(task_id, None)
+            self._cond.notify_all()
+
+    def wait_for_release(self, timeout: float) -> None:
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def active_count(self) -> int:
+        with self._cond:
+            return len(self._running)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            running = [
+                {"task_id": task_id, "name": entry[0], "class": entry[1]}
+                for task_id, entry in sorted(self._running.items())
+            ]
+        return {
+            "max_workers": self.max_workers,
+            "class_slots": dict(self.class_slots),
+            "running": running,
+        }
@@ -23,6 +23,7 @@ def change_jellyfin_password(db, user_id: int, password: str, server_ids: set[in
         WHERE mu.vodum_user_id=? AND mu.type='jellyfin' AND s.type='jellyfin'
         """,
         (int(user_id),),
+        decrypt_servers=True,
     ) or []
     if selected:
         rows = [row for row in rows if int(row["server_id"]) in selected]
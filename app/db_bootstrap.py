@@ -3,7 +3,11 @@ import sys
 from db_manager import open_sqlite_connection
 from core.db_bootstrap_monitoring import ensure_import_monitoring_schema
 from core.db_bootstrap_migrations import ensure_migration_foundation_schema
-from core.db_bootstrap_tasks import migrate_task_scheduler_mode
+from core.db_bootstrap_tasks import (
+    ensure_task_checkpoint_schema,
+    ensure_task_runs_schema,
+    migrate_task_scheduler_mode,
+)
 from core.db_bootstrap_core import validate_and_upgrade_core_schema
 from core.db_bootstrap_usage_risk import ensure_usage_risk_schema
 from core.db_bootstrap_referrals import ensure_referral_schema
@@ -109,6 +113,9 @@ def run_migrations():
         ensure_column=ensure_column,
     )
 
+    ensure_task_checkpoint_schema(conn, cursor, ensure_column=ensure_column)
+    ensure_task_runs_schema(conn, cursor, table_exists=table_exists)
+
     validate_and_upgrade_core_schema(
         conn,
         cursor,
@@ -180,7 +187,12 @@ def run_migrations():
 
 
 
-    ensure_subscription_gift_schema(conn, cursor, table_exists=table_exists)
+    ensure_subscription_gift_schema(
+        conn,
+        cursor,
+        table_exists=table_exists,
+        ensure_column=ensure_column,
+    )
 
     ensure_monitoring_live_schema(conn, cursor, table_exists=table_exists)
 
@@ -1,7 +1,10 @@
 import sqlite3
 import threading
 import logging
-from typing import Any, Iterable, Optional
+import queue
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
 import os
 
 from secret_store import decrypt_server_record
@@ -51,19 +54,58 @@ def open_sqlite_connection(
     return conn
 
 
+
+
+DEFAULT_READ_POOL_SIZE = 4
+DEFAULT_READ_POOL_TIMEOUT_SECONDS = 30.0
+DEFAULT_ITER_CHUNK_SIZE = 500
+
+# Protège les compteurs capture_thread_metrics partagés entre threads.
+_THREAD_METRICS_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    raw = os.environ.get(name)
+    try:
+        value = int(raw) if raw is not None and str(raw).strip() else default
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, value)
+
+
+def _env_float(name: str, default: float, minimum: float = 0.0) -> float:
+    raw = os.environ.get(name)
+    try:
+        value = float(raw) if raw is not None and str(raw).strip() else default
+    except (TypeError, ValueError):
+        value = default
+    return max(minimum, value)
+
+
 class DBManager:
     """
     DBManager = 1 instance par chemin de base.
 
     - même chemin DB => même instance
     - autre chemin DB => autre instance
-    - connexion SQLite partagée par chemin
+    - une connexion d'écriture partagée par chemin, sérialisée par un verrou
+    - un pool de connexions en lecture seule (WAL) pour query/query_one,
+      afin que les lectures lentes ne bloquent plus les écritures
+    - transaction() pour regrouper plusieurs écritures en un seul commit
+    - iter_query()/iter_query_chunks() pour parcourir de gros volumes
+      sans tout charger en mémoire
     - accès thread-safe
     """
 
     _instances: dict[str, "DBManager"] = {}
     _instance_lock = threading.Lock()
 
+    @classmethod
+    def instances(cls) -> list["DBManager"]:
+        """Instances ouvertes (une par fichier de base)."""
+        with cls._instance_lock:
+            return list(cls._instances.values())
+
     @staticmethod
     def _resolve_db_path(db_path: str | None = None) -> str:
         raw_path = db_path or os.environ.get("DATABASE_PATH", "/appdata/database.db")
@@ -94,20 +136,253 @@ class DBManager:
             return
 
         self.db_path = resolved_path
-        self._lock = threading.Lock()
+
+        # Verrou du writer. Réentrant pour qu'un thread qui le détient déjà
+        # (ex: routes qui pilotent db.conn directement) puisse appeler execute().
+        self._lock = threading.RLock()
 
         self.conn = open_sqlite_connection(
             self.db_path,
             check_same_thread=False,
         )
 
+        # Thread propriétaire d'une transaction ouverte sur le writer
+        # (execute(..., commit=False) sans COMMIT). Ses lectures doivent voir
+        # ses propres écritures non commitées, donc passer par le writer.
+        self._writer_txn_owner: int | None = None
+
+        # Profondeur de db.transaction() pour le thread qui détient le writer.
+        # Protégé par self._lock : seul le détenteur du verrou la modifie.
+        self._txn_depth = 0
+
+        self._read_pool_size = _env_int("VODUM_DB_READ_POOL_SIZE", DEFAULT_READ_POOL_SIZE)
+        self._read_pool_timeout = _env_float(
+            "VODUM_DB_READ_POOL_TIMEOUT_SECONDS",
+            DEFAULT_READ_POOL_TIMEOUT_SECONDS,
+            minimum=0.1,
+        )
+        self._read_pool: queue.LifoQueue = queue.LifoQueue()
+        self._read_conns: list[sqlite3.Connection] = []
+        self._read_pool_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "reads": 0,
+            "reads_on_writer": 0,
+            "read_waits": 0,
+            "read_wait_ms_total": 0.0,
+            "read_wait_ms_max": 0.0,
+            "read_timeouts": 0,
+            "writes": 0,
+            "writer_waits": 0,
+            "writer_wait_ms_total": 0.0,
+            "writer_wait_ms_max": 0.0,
+        }
+
+        # Compteurs par thread (capture_thread_metrics), ex: une tâche.
+        self._thread_metrics = threading.local()
+
         self._initialized = True
         logging.getLogger(__name__).info(
-            "DBManager initialized for %s",
+            "DBManager initialized for %s (read pool size=%s)",
             self.db_path,
+            self._read_pool_size,
         )
 
+    # ------------------------------------------------------------------
+    # Pool / verrous
+    # ------------------------------------------------------------------
+    def _record_wait(self, prefix: str, waited_ms: float) -> None:
+        with self._stats_lock:
+            self._stats[f"{prefix}_waits"] += 1
+            self._stats[f"{prefix}_wait_ms_total"] += waited_ms
+            if waited_ms > self._stats[f"{prefix}_wait_ms_max"]:
+                self._stats[f"{prefix}_wait_ms_max"] = waited_ms
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _active_thread_metrics(self) -> dict | None:
+        return getattr(self._thread_metrics, "current", None)
+
+    @staticmethod
+    def _note_statement(
+        metrics: dict | None,
+        started: float,
+        rows_written: int = 0,
+        *,
+        new_statement: bool = True,
+    ) -> None:
+        if metrics is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        # Les compteurs peuvent être partagés avec des threads workers
+        # (bind_thread_metrics) : mise à jour sous verrou.
+        with _THREAD_METRICS_LOCK:
+            if new_statement:
+                metrics["statements"] += 1
+            metrics["db_ms"] += elapsed_ms
+            if rows_written > 0:
+                metrics["rows_written"] += rows_written
+
+    def current_thread_metrics(self) -> dict | None:
+        """Compteurs capture_thread_metrics actifs sur le thread courant."""
+        return self._active_thread_metrics()
+
+    @contextmanager
+    def bind_thread_metrics(self, metrics: dict | None) -> Iterator[dict | None]:
+        """
+        Rattache le thread courant aux compteurs d'un autre thread pendant le
+        bloc : les instructions d'un worker comptent dans la mesure de la
+        tâche qui l'a lancé.
+        """
+        previous = self._active_thread_metrics()
+        self._thread_metrics.current = metrics
+        try:
+            yield metrics
+        finally:
+            self._thread_metrics.current = previous
 
+    @contextmanager
+    def capture_thread_metrics(self) -> Iterator[dict]:
+        """
+        Compte les instructions SQL passées par ce DBManager depuis le thread
+        courant pendant le bloc : statements, db_ms (attente du verrou
+        comprise) et rows_written. Les accès directs à db.conn ne sont pas
+        comptés.
+        """
+        metrics = {"statements": 0, "db_ms": 0.0, "rows_written": 0}
+        previous = self._active_thread_metrics()
+        self._thread_metrics.current = metrics
+        try:
+            yield metrics
+        finally:
+            self._thread_metrics.current = previous
+
+    @contextmanager
+    def _writer(self):
+        """
+        Acquiert le verrou du writer en comptabilisant la contention.
+        """
+        if not self._lock.acquire(blocking=False):
+            started = time.perf_counter()
+            self._lock.acquire()
+            self._record_wait("writer", (time.perf_counter() - started) * 1000.0)
+        try:
+            yield self.conn
+        finally:
+            self._lock.release()
+
+    def _track_writer_txn(self) -> None:
+        conn = self.conn
+        if conn is not None and conn.in_transaction:
+            self._writer_txn_owner = threading.get_ident()
+        else:
+            self._writer_txn_owner = None
+
+    def _in_unit_of_work(self) -> bool:
+        return self._txn_depth > 0 and self._writer_txn_owner == threading.get_ident()
+
+    def _thread_owns_writer_txn(self) -> bool:
+        conn = self.conn
+        return (
+            conn is not None
+            and conn.in_transaction
+            and self._writer_txn_owner == threading.get_ident()
+        )
+
+    def _read_pool_enabled(self) -> bool:
+        return self._read_pool_size > 0 and os.path.basename(self.db_path) != ":memory:"
+
+    def _open_reader(self) -> Optional[sqlite3.Connection]:
+        with self._read_pool_lock:
+            if len(self._read_conns) >= self._read_pool_size:
+                return None
+            conn = open_sqlite_connection(
+                self.db_path,
+                check_same_thread=False,
+                read_only=True,
+            )
+            self._read_conns.append(conn)
+            return conn
+
+    @contextmanager
+    def _reader(self):
+        """
+        Emprunte une connexion en lecture seule au pool.
+
+        Les connexions sont ouvertes à la demande jusqu'à la taille du pool ;
+        au-delà, l'appelant attend qu'une connexion se libère.
+        """
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_reader()
+            if conn is None:
+                started = time.perf_counter()
+                try:
+                    conn = self._read_pool.get(timeout=self._read_pool_timeout)
+                except queue.Empty:
+                    self._count("read_timeouts")
+                    raise sqlite3.OperationalError(
+                        f"DBManager read pool exhausted after {self._read_pool_timeout:.1f}s "
+                        f"({self._read_pool_size} connections busy)"
+                    )
+                finally:
+                    self._record_wait("read", (time.perf_counter() - started) * 1000.0)
+
+        try:
+            yield conn
+        finally:
+            # Une connexion empruntée pendant close() ne doit pas revenir au pool.
+            if conn in self._read_conns:
+                self._read_pool.put(conn)
+
+    @contextmanager
+    def _read_connection(self):
+        """
+        Connexion à utiliser pour une lecture.
+
+        Le writer est utilisé si le thread courant a une transaction ouverte
+        (il doit voir ses propres écritures) ou si le pool est désactivé.
+        """
+        self._count("reads")
+        if self._thread_owns_writer_txn() or not self._read_pool_enabled():
+            self._count("reads_on_writer")
+            with self._writer() as conn:
+                yield conn
+            return
+
+        with self._reader() as conn:
+            yield conn
+
+    def stats(self) -> dict:
+        """
+        Compteurs du pool de lecture et de la contention sur le writer.
+        """
+        with self._stats_lock:
+            data = dict(self._stats)
+        with self._read_pool_lock:
+            opened = len(self._read_conns)
+        data.update(
+            {
+                "db_path": self.db_path,
+                "read_pool_size": self._read_pool_size,
+                "read_connections_open": opened,
+                "read_connections_idle": self._read_pool.qsize(),
+                "read_pool_timeout_seconds": self._read_pool_timeout,
+                "writer_in_transaction": bool(self.conn is not None and self.conn.in_transaction),
+                "transaction_depth": self._txn_depth,
+            }
+        )
+        for key in ("read_wait_ms_total", "read_wait_ms_max", "writer_wait_ms_total", "writer_wait_ms_max"):
+            data[key] = round(float(data[key]), 3)
+        return data
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
     def execute(
         self,
         sql: str,
@@ -115,17 +390,28 @@ class DBManager:
         *,
         commit: bool = True
     ) -> sqlite3.Cursor:
-        with self._lock:
-            cur = self.conn.cursor()
+        metrics = self._active_thread_metrics()
+        started = time.perf_counter()
+        with self._writer() as conn:
+            self._count("writes")
+            in_unit = self._in_unit_of_work()
+            cur = conn.cursor()
             try:
                 cur.execute(sql, params)
-                if commit:
-                    self.conn.commit()
+                if commit and not in_unit:
+                    conn.commit()
+                self._note_statement(metrics, started, cur.rowcount)
                 return cur
             except Exception:
-                self.conn.rollback()
+                # Dans db.transaction(), SQLite n'annule que l'instruction
+                # fautive : le rollback global est décidé par transaction().
+                if not in_unit:
+                    conn.rollback()
                 cur.close()
                 raise
+            finally:
+                if not in_unit:
+                    self._track_writer_txn()
 
     def executemany(
         self,
@@ -134,51 +420,243 @@ class DBManager:
         *,
         commit: bool = True
     ) -> None:
-        with self._lock:
-            cur = self.conn.cursor()
+        metrics = self._active_thread_metrics()
+        started = time.perf_counter()
+        with self._writer() as conn:
+            self._count("writes")
+            in_unit = self._in_unit_of_work()
+            cur = conn.cursor()
             try:
                 cur.executemany(sql, seq_of_params)
-                if commit:
-                    self.conn.commit()
+                if commit and not in_unit:
+                    conn.commit()
+                self._note_statement(metrics, started, cur.rowcount)
             except Exception:
-                self.conn.rollback()
+                if not in_unit:
+                    conn.rollback()
                 raise
             finally:
                 cur.close()
+                if not in_unit:
+                    self._track_writer_txn()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unité de travail : toutes les écritures du bloc partagent un seul
+        commit, et sont annulées ensemble si le bloc lève une exception.
+
+            with db.transaction():
+                db.execute(...)
+                db.executemany(...)
+
+        - le verrou du writer est tenu pendant tout le bloc : ne pas y faire
+          d'appels réseau
+        - execute(..., commit=True) ne commit plus à l'intérieur du bloc
+        - les lectures du thread passent par le writer et voient donc les
+          écritures non commitées
+        - les blocs imbriqués utilisent un SAVEPOINT
+        """
+        with self._writer() as conn:
+            depth = self._txn_depth
+            savepoint = f"vodum_txn_{depth}"
+
+            if depth == 0:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                self._writer_txn_owner = threading.get_ident()
+            else:
+                conn.execute(f"SAVEPOINT {savepoint}")
+
+            self._txn_depth = depth + 1
+            try:
+                yield self
+            except BaseException:
+                self._txn_depth = depth
+                try:
+                    if depth == 0:
+                        conn.rollback()
+                    else:
+                        conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                        conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                finally:
+                    if depth == 0:
+                        self._track_writer_txn()
+                raise
+            else:
+                self._txn_depth = depth
+                try:
+                    if depth == 0:
+                        conn.commit()
+                    else:
+                        conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                except Exception:
+                    if depth == 0:
+                        conn.rollback()
+                    raise
+                finally:
+                    if depth == 0:
+                        self._track_writer_txn()
 
     def query(
         self,
         sql: str,
-        params: Iterable[Any] = ()
+        params: Iterable[Any] = (),
+        *,
+        decrypt_servers: bool = False,
     ) -> list[sqlite3.Row | dict]:
-        with self._lock:
-            cur = self.conn.cursor()
+        """
+        decrypt_servers=True : déchiffre token / settings_json des lignes
+        `servers` (opt-in, seuls les appelants qui utilisent le secret paient
+        le coût Fernet ; résultat mis en cache par secret_store).
+        """
+        metrics = self._active_thread_metrics()
+        started = time.perf_counter()
+        with self._read_connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        self._note_statement(metrics, started)
+
+        return self._post_process_rows(rows, decrypt_servers)
+
+    def _post_process_rows(self, rows: list, decrypt_servers: bool) -> list:
+        if rows and decrypt_servers:
+            return [
+                decrypt_server_record(row)
+                if "token" in row.keys() or "settings_json" in row.keys()
+                else row
+                for row in rows
+            ]
+        return rows
+
+    def iter_query_chunks(
+        self,
+        sql: str,
+        params: Iterable[Any] = (),
+        *,
+        chunk_size: int = DEFAULT_ITER_CHUNK_SIZE,
+        decrypt_servers: bool = False,
+    ) -> Iterator[list]:
+        """
+        Itère le résultat d'une requête par blocs de `chunk_size` lignes
+        (cursor.fetchmany), sans jamais matérialiser la liste complète.
+
+        Le curseur vit sur une connexion du pool de lecture : le writer et
+        les autres lecteurs restent disponibles pendant tout le parcours.
+        Si la lecture doit passer par le writer (transaction ouverte du
+        thread, pool désactivé), le verrou n'est tenu que le temps de lire
+        chaque bloc.
+
+        Toujours consommer le générateur jusqu'au bout ou le fermer
+        (contextlib.closing) pour rendre la connexion au pool.
+        """
+        chunk_size = max(1, int(chunk_size))
+        self._count("reads")
+        metrics = self._active_thread_metrics()
+
+        if self._thread_owns_writer_txn() or not self._read_pool_enabled():
+            self._count("reads_on_writer")
+            yield from self._iter_chunks_on_writer(sql, params, chunk_size, decrypt_servers, metrics)
+            return
+
+        started = time.perf_counter()
+        with self._reader() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(sql, params)
+                self._note_statement(metrics, started)
+                while True:
+                    started = time.perf_counter()
+                    rows = cur.fetchmany(chunk_size)
+                    self._note_statement(metrics, started, new_statement=False)
+                    if not rows:
+                        break
+                    yield self._post_process_rows(rows, decrypt_servers)
+            finally:
+                cur.close()
+
+    def _iter_chunks_on_writer(
+        self,
+        sql: str,
+        params: Iterable[Any],
+        chunk_size: int,
+        decrypt_servers: bool,
+        metrics: dict | None = None,
+    ) -> Iterator[list]:
+        # Les curseurs du writer ne doivent pas survivre à un commit d'un
+        # autre thread : on lit donc tout sous le verrou, puis on découpe.
+        started = time.perf_counter()
+        with self._writer() as conn:
+            cur = conn.cursor()
             try:
                 cur.execute(sql, params)
                 rows = cur.fetchall()
-                if "servers" in sql.lower():
-                    return [
-                        decrypt_server_record(row)
-                        if "token" in row.keys() or "settings_json" in row.keys()
-                        else row
-                        for row in rows
-                    ]
-                return rows
             finally:
                 cur.close()
+        self._note_statement(metrics, started)
+
+        for start in range(0, len(rows), chunk_size):
+            yield self._post_process_rows(rows[start:start + chunk_size], decrypt_servers)
+
+    def iter_query(
+        self,
+        sql: str,
+        params: Iterable[Any] = (),
+        *,
+        chunk_size: int = DEFAULT_ITER_CHUNK_SIZE,
+        decrypt_servers: bool = False,
+    ) -> Iterator[sqlite3.Row | dict]:
+        """
+        Version ligne par ligne de iter_query_chunks().
+        """
+        for rows in self.iter_query_chunks(
+            sql, params, chunk_size=chunk_size, decrypt_servers=decrypt_servers
+        ):
+            yield from rows
+
+    def execute_in_chunks(
+        self,
+        sql: str,
+        params: Iterable[Any] = (),
+        *,
+        max_batches: int | None = None,
+    ) -> int:
+        """
+        Répète une écriture bornée (ex: DELETE ... WHERE rowid IN
+        (SELECT rowid ... LIMIT n)) jusqu'à ce qu'elle ne touche plus de
+        lignes. Chaque lot est commité séparément, ce qui libère le writer
+        entre deux lots. Retourne le nombre total de lignes modifiées.
+        """
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            cur = self.execute(sql, params)
+            changed = int(getattr(cur, "rowcount", 0) or 0)
+            cur.close()
+            batches += 1
+            total += max(0, changed)
+            if changed <= 0:
+                break
+        return total
 
     def query_one(
         self,
         sql: str,
-        params: Iterable[Any] = ()
+        params: Iterable[Any] = (),
+        *,
+        decrypt_servers: bool = False,
     ) -> Optional[sqlite3.Row]:
-        rows = self.query(sql, params)
+        rows = self.query(sql, params, decrypt_servers=decrypt_servers)
         return rows[0] if rows else None
 
     def close(self) -> None:
         """
-        Ferme la connexion associée à CETTE base uniquement
-        puis enlève l'instance du cache.
+        Ferme les connexions associées à CETTE base uniquement
+        (writer + pool de lecture) puis enlève l'instance du cache.
         """
         with self._lock:
             try:
@@ -193,8 +671,23 @@ class DBManager:
                 )
             finally:
                 self.conn = None
+                self._writer_txn_owner = None
+                self._txn_depth = 0
                 self._initialized = False
 
+        with self._read_pool_lock:
+            for reader in self._read_conns:
+                try:
+                    reader.close()
+                except Exception as e:
+                    logging.getLogger(__name__).warning(
+                        "DBManager reader close warning for %s: %s",
+                        getattr(self, "db_path", "<unknown>"),
+                        e,
+                    )
+            self._read_conns = []
+            self._read_pool = queue.LifoQueue()
+
         with type(self)._instance_lock:
             key = getattr(self, "_instance_key", None)
             if key and type(self)._instances.get(key) is self:
@@ -204,5 +697,3 @@ class DBManager:
             "DBManager connection closed + cache entry removed for %s",
             getattr(self, "db_path", "<unknown>"),
         )
-
-
@@ -1,9 +1,17 @@
-import time
+import hashlib
+import threading
+
 import requests
 from secret_store import decrypt_secret
+from core.discord_rate_limit import discord_rate_limiter, discord_route_key
 
 DISCORD_API = "https://discord.com/api/v10"
 
+# DM channel ids per (bot, recipient): avoids one channel-create call per message
+_DM_CHANNELS = {}
+_DM_CHANNELS_LOCK = threading.Lock()
+_DM_CHANNELS_MAX = 10000
+
 
 class DiscordSendError(Exception):
     pass
@@ -165,13 +173,56 @@ def fetch_discord_bot_identity(bot_token: str, timeout: int = 10) -> tuple[bool,
         return False, {"error": f"Discord validation failed: {e}"}
 
 
-def _sleep_from_429(resp: requests.Response) -> None:
-    try:
-        data = resp.json()
-        retry_after = float(data.get("retry_after", 1.0))
-    except Exception:
-        retry_after = 1.0
-    time.sleep(max(0.2, retry_after))
+def _discord_post(route_path: str, headers: dict, payload: dict, max_retries: int) -> requests.Response:
+    """
+    POST rate-limité par route : attend seulement si cette route (ou la
+    limite globale) est bloquée, et réessaie sur 429 sans bloquer les autres
+    envois.
+    """
+    limiter = discord_rate_limiter()
+    route = discord_route_key("POST", route_path)
+
+    for _ in range(max(1, max_retries)):
+        if not limiter.acquire(route):
+            raise DiscordSendError(f"Rate limited on {route_path}, retry later")
+
+        r = requests.post(
+            f"{DISCORD_API}/{route_path}",
+            headers=headers,
+            json=payload,
+            timeout=30,
+        )
+        if limiter.update(route, r) is not None:
+            continue
+        return r
+
+    raise DiscordSendError("Rate limit: max retries reached")
+
+
+def _dm_cache_key(bot_token: str, recipient_user_id: str) -> tuple:
+    return hashlib.sha256(bot_token.encode("utf-8")).hexdigest(), recipient_user_id
+
+
+def _dm_channel_id(bot_token: str, recipient_user_id: str, headers: dict, max_retries: int) -> str:
+    cache_key = _dm_cache_key(bot_token, recipient_user_id)
+    with _DM_CHANNELS_LOCK:
+        channel_id = _DM_CHANNELS.get(cache_key)
+    if channel_id:
+        return channel_id
+
+    r = _discord_post("users/@me/channels", headers, {"recipient_id": recipient_user_id}, max_retries)
+    if r.status_code >= 300:
+        raise DiscordSendError(f"DM channel create failed: {r.status_code} {r.text}")
+
+    channel_id = (r.json() or {}).get("id")
+    if not channel_id:
+        raise DiscordSendError("No channel_id returned by Discord")
+
+    with _DM_CHANNELS_LOCK:
+        if len(_DM_CHANNELS) >= _DM_CHANNELS_MAX:
+            _DM_CHANNELS.clear()
+        _DM_CHANNELS[cache_key] = channel_id
+    return channel_id
 
 
 def send_discord_dm(bot_token: str, recipient_user_id: str, content: str, max_retries: int = 4) -> None:
@@ -187,43 +238,15 @@ def send_discord_dm(bot_token: str, recipient_user_id: str, content: str, max_re
 
     headers = _auth_headers(bot_token)
 
-    # 1) Create/open DM channel
-    r = requests.post(
-        f"{DISCORD_API}/users/@me/channels",
-        headers=headers,
-        json={"recipient_id": recipient_user_id},
-        timeout=30,
-    )
-    if r.status_code == 429:
-        _sleep_from_429(r)
-        r = requests.post(
-            f"{DISCORD_API}/users/@me/channels",
-            headers=headers,
-            json={"recipient_id": recipient_user_id},
-            timeout=30,
-        )
-
-    if r.status_code >= 300:
-        raise DiscordSendError(f"DM channel create failed: {r.status_code} {r.text}")
-
-    channel_id = (r.json() or {}).get("id")
-    if not channel_id:
-        raise DiscordSendError("No channel_id returned by Discord")
+    # 1) Create/open DM channel (stable per recipient: cached)
+    channel_id = _dm_channel_id(bot_token, recipient_user_id, headers, max_retries)
 
     # 2) Send message (rate-limit friendly)
     payload = {"content": content[:1900]}
-    for _ in range(max_retries):
-        s = requests.post(
-            f"{DISCORD_API}/channels/{channel_id}/messages",
-            headers=headers,
-            json=payload,
-            timeout=30,
-        )
-        if s.status_code == 429:
-            _sleep_from_429(s)
-            continue
-        if s.status_code >= 300:
-            raise DiscordSendError(f"Message send failed: {s.status_code} {s.text}")
-        return
-
-    raise DiscordSendError("Rate limit: max retries reached")
+    s = _discord_post(f"channels/{channel_id}/messages", headers, payload, max_retries)
+    if s.status_code >= 300:
+        if s.status_code == 404:
+            # DM channel deleted since it was cached
+            with _DM_CHANNELS_LOCK:
+                _DM_CHANNELS.pop(_dm_cache_key(bot_token, recipient_user_id), None)
+        raise DiscordSendError(f"Message send failed: {s.status_code} {s.text}")
@@ -1,13 +1,34 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import smtplib
+import threading
+import time
+from contextlib import contextmanager
 from email.message import EmailMessage
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 from email_layout_utils import build_email_parts
+from logging_utils import get_logger
 from secret_store import decrypt_communication_settings
 
 
+log = get_logger("email_sender")
+
+SMTP_TIMEOUT_SECONDS = 30
+
+# Messages sent over one SMTP session before it is closed and reopened
+# (providers often cap messages per connection). 1 = one connection per message.
+SMTP_MAX_MESSAGES_PER_CONNECTION = max(1, int(os.environ.get("VODUM_SMTP_MAX_MESSAGES_PER_CONNECTION", "100")))
+
+# An idle pooled session older than this is closed instead of being reused.
+SMTP_IDLE_TIMEOUT_SECONDS = max(0.0, float(os.environ.get("VODUM_SMTP_IDLE_TIMEOUT_SECONDS", "30")))
+
+SMTP_POOL_MAX_IDLE = 4
+
+
+
 def smtp_auth_method(settings: Dict) -> str:
     method = (settings.get("smtp_auth_method") or "password").strip().lower()
     if method not in ("password", "oauth2"):
@@ -32,16 +53,20 @@ def authenticate_smtp(server: smtplib.SMTP, settings: Dict) -> None:
     server.login(smtp_user, settings.get("smtp_pass") or "")
 
 
-def send_email(subject: str, body: str, to_email: str, smtp_settings: Dict, attachments: list[dict] | None = None) -> Tuple[bool, str | None]:
-    """Send an email using current SMTP settings.
-
-    Returns (success, error_message).
-    """
-    smtp_settings = decrypt_communication_settings(smtp_settings)
+def _is_connection_error(exc: BaseException) -> bool:
+    """True when the session is dead (the message itself was not rejected)."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        # 421 = service closing the transmission channel
+        return exc.smtp_code == 421
+    if isinstance(exc, smtplib.SMTPException):
+        return False
+    # smtplib.SMTPException derives from OSError: socket errors only here
+    return isinstance(exc, OSError)
 
-    if not to_email:
-        return False, "Empty recipient email"
 
+def _smtp_endpoint(smtp_settings: Dict) -> Tuple[str, int, bool, str, str]:
     smtp_host = (smtp_settings.get("smtp_host") or "").strip()
     smtp_port = smtp_settings.get("smtp_port") or 587
     smtp_tls  = bool(smtp_settings.get("smtp_tls"))
@@ -53,6 +78,211 @@ def send_email(subject: str, body: str, to_email: str, smtp_settings: Dict, atta
     except (TypeError, ValueError):
         smtp_port = 587
 
+    return smtp_host, smtp_port, smtp_tls, smtp_user, mail_from
+
+
+def _smtp_pool_key(smtp_settings: Dict) -> tuple:
+    smtp_host, smtp_port, smtp_tls, smtp_user, _mail_from = _smtp_endpoint(smtp_settings)
+    method = smtp_auth_method(smtp_settings)
+    secret = smtp_settings.get("smtp_oauth_access_token") if method == "oauth2" else smtp_settings.get("smtp_pass")
+    # Changing credentials must never reuse a session opened with the old ones
+    secret_digest = hashlib.sha256(str(secret or "").encode("utf-8")).hexdigest()
+    return (smtp_host.lower(), smtp_port, smtp_tls, smtp_user, method, secret_digest)
+
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection reused for several messages.
+
+    - lazy connect (STARTTLS + auth once per connection)
+    - RSET between messages
+    - closed after max_messages, reopened on the next send
+    - one transparent reconnect when the server dropped the connection
+    """
+
+    def __init__(self, smtp_settings: Dict, max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.settings = smtp_settings
+        self.key = _smtp_pool_key(smtp_settings)
+        self.max_messages = max(1, int(max_messages))
+        self.server: smtplib.SMTP | None = None
+        self.messages_on_connection = 0
+        self.connections = 0
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        return self.server is not None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp_host, smtp_port, smtp_tls, _user, _mail_from = _smtp_endpoint(self.settings)
+        server = smtplib.SMTP(smtp_host, smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if smtp_tls:
+                server.starttls()
+            authenticate_smtp(server, self.settings)
+        except Exception:
+            _close_quietly(server)
+            raise
+
+        self.server = server
+        self.messages_on_connection = 0
+        self.connections += 1
+        return server
+
+    def close(self) -> None:
+        server, self.server = self.server, None
+        self.messages_on_connection = 0
+        if server is not None:
+            _close_quietly(server)
+
+    def _ready_server(self) -> tuple[smtplib.SMTP, bool]:
+        """Return (server, reused)."""
+        if self.server is None:
+            return self._connect(), False
+
+        if self.messages_on_connection >= self.max_messages:
+            self.close()
+            return self._connect(), False
+
+        try:
+            # Reset any half-finished transaction left by a failed message
+            self.server.rset()
+        except Exception as e:
+            if not isinstance(e, (OSError, smtplib.SMTPException)):
+                raise
+            self.close()
+            return self._connect(), False
+        return self.server, True
+
+    def send(self, msg: EmailMessage) -> None:
+        server, reused = self._ready_server()
+        try:
+            server.send_message(msg)
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            self.close()
+            if not reused:
+                raise
+            # The pooled connection was dropped by the server: retry once
+            log.debug(f"[SMTP] pooled session lost ({e}), reconnecting")
+            self._connect().send_message(msg)
+
+        self.messages_on_connection += 1
+        self.messages_sent += 1
+        self.last_used = time.monotonic()
+        if self.messages_on_connection >= self.max_messages:
+            self.close()
+
+
+def _close_quietly(server: smtplib.SMTP) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+class SMTPSessionPool:
+    """
+    Idle SMTP sessions shared by every sender of the process, keyed by
+    server + credentials. A session is used by one thread at a time.
+    """
+
+    def __init__(self, max_idle: int = SMTP_POOL_MAX_IDLE, idle_timeout: float = SMTP_IDLE_TIMEOUT_SECONDS):
+        self.max_idle = max(0, int(max_idle))
+        self.idle_timeout = float(idle_timeout)
+        self._idle: Dict[tuple, List[SMTPSession]] = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, session: SMTPSession, now: float) -> bool:
+        return not session.connected or now - session.last_used > self.idle_timeout
+
+    def acquire(self, smtp_settings: Dict) -> SMTPSession:
+        key = _smtp_pool_key(smtp_settings)
+        stale: List[SMTPSession] = []
+        session = None
+        now = time.monotonic()
+
+        with self._lock:
+            idle = self._idle.get(key) or []
+            while idle:
+                candidate = idle.pop()
+                if self._expired(candidate, now):
+                    stale.append(candidate)
+                    continue
+                session = candidate
+                break
+
+        for old in stale:
+            old.close()
+
+        if session is None:
+            return SMTPSession(smtp_settings)
+        # Same key: same server and credentials, refresh the other settings
+        session.settings = smtp_settings
+        return session
+
+    def release(self, session: SMTPSession, *, discard: bool = False) -> None:
+        if discard or not session.connected or self.max_idle == 0:
+            session.close()
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(session.key, [])
+            if len(idle) < self.max_idle:
+                idle.append(session)
+                return
+
+        session.close()
+
+    @contextmanager
+    def session(self, smtp_settings: Dict):
+        session = self.acquire(smtp_settings)
+        failed = False
+        try:
+            yield session
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(session, discard=failed)
+
+    def close_idle(self) -> int:
+        with self._lock:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle.clear()
+
+        for session in sessions:
+            session.close()
+        return len(sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "idle_sessions": sum(len(idle) for idle in self._idle.values()),
+                "endpoints": len(self._idle),
+            }
+
+
+_POOL = SMTPSessionPool()
+
+
+def smtp_session_pool() -> SMTPSessionPool:
+    return _POOL
+
+
+def close_idle_smtp_sessions() -> int:
+    """QUIT every idle pooled SMTP session (end of a batch)."""
+    return _POOL.close_idle()
+
+
+def build_email_message(subject: str, body: str, to_email: str, smtp_settings: Dict, attachments: list[dict] | None = None) -> EmailMessage:
+    _host, _port, _tls, _user, mail_from = _smtp_endpoint(smtp_settings)
+
     plain, full_html = build_email_parts(body, smtp_settings)
 
     msg = EmailMessage()
@@ -79,13 +309,33 @@ def send_email(subject: str, body: str, to_email: str, smtp_settings: Dict, atta
             # best effort: never fail the whole send just because one attachment is broken
             continue
 
+    return msg
+
+
+def send_email(subject: str, body: str, to_email: str, smtp_settings: Dict, attachments: list[dict] | None = None) -> Tuple[bool, str | None]:
+    """Send an email using current SMTP settings.
+
+    The message goes through a pooled SMTP session, so consecutive sends
+    (campaigns, expiration batches) share one connection and login.
+
+    Returns (success, error_message).
+    """
+    smtp_settings = decrypt_communication_settings(smtp_settings)
+
+    if not to_email:
+        return False, "Empty recipient email"
 
+    msg = build_email_message(subject, body, to_email, smtp_settings, attachments)
+
+    session = _POOL.acquire(smtp_settings)
     try:
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=30) as server:
-            if smtp_tls:
-                server.starttls()
-            authenticate_smtp(server, smtp_settings)
-            server.send_message(msg)
-        return True, None
+        session.send(msg)
     except Exception as e:
+        # A refused recipient leaves the connection usable; anything else
+        # (auth, TLS, protocol) must not be handed to the next sender.
+        recoverable = isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError))
+        _POOL.release(session, discard=not recoverable)
         return False, str(e)
+
+    _POOL.release(session)
+    return True, None
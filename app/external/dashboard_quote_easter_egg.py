@@ -187,7 +187,8 @@ def _get_servers():
                 OR cooldown_until <= CURRENT_TIMESTAMP
           )
         ORDER BY name
-        """
+        """,
+        decrypt_servers=True,
     )
 
     servers = [dict(r) for r in rows]
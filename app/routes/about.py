@@ -2,7 +2,7 @@
 import platform
 from importlib.metadata import version
 
-from flask import render_template
+from flask import jsonify, render_template
 
 from web.helpers import get_db, scheduler_db_provider, table_exists
 
@@ -21,6 +21,11 @@ def register(app):
             active_page="about"
         )
 
+    @app.route("/api/system/db-stats", methods=["GET"])
+    def api_system_db_stats():
+        # Taille du pool de lecture, attentes et contention sur le writer
+        return jsonify(get_db().stats())
+
 
 
 
@@ -429,7 +429,7 @@ def register(app):
 
         try:
             from flask import Response, abort, send_file
-            from core.monitoring.artwork_cache import ARTWORK_CACHE_TTL_SECONDS
+            from core.monitoring.artwork_cache import ARTWORK_CACHE_TTL_SECONDS, forget_artwork_cache
             from core.monitoring.artwork_proxy import ArtworkProxyError, fetch_monitoring_artwork
             from external.dashboard_quote_easter_egg import build_login_quote_artwork_request
 
@@ -447,6 +447,7 @@ def register(app):
                 LIMIT 1
                 """,
                 (int(artwork["server_id"]),),
+                decrypt_servers=True,
             )
             if not srv:
                 abort(404)
@@ -461,14 +462,19 @@ def register(app):
                     headers={"Cache-Control": cache_header, "X-VODUM-Artwork-Cache": "MISS"},
                 )
 
-            response = send_file(
-                result["path"],
-                mimetype=result["content_type"],
-                conditional=True,
-                max_age=result["max_age"],
-            )
+            try:
+                response = send_file(
+                    result["path"],
+                    mimetype=result["content_type"],
+                    conditional=True,
+                    max_age=result["max_age"],
+                )
+            except FileNotFoundError:
+                # Fichier supprimé hors de l'index : la prochaine requête le retélécharge
+                forget_artwork_cache(result["cache_key"])
+                raise
             response.headers["Cache-Control"] = f"public, max-age={result['max_age']}"
-            response.headers["X-VODUM-Artwork-Cache"] = "STALE" if result["is_stale"] else "HIT"
+            response.headers["X-VODUM-Artwork-Cache"] = result.get("cache_status") or "HIT"
             return response
         except ArtworkProxyError as exc:
             abort(exc.status_code)
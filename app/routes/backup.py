@@ -8,7 +8,8 @@ from werkzeug.utils import secure_filename
 from logging_utils import get_logger
 from tasks_engine import enable_and_run_task_by_name
 from core.i18n import get_translator
-from core.backup import list_backups
+from core.backup import ensure_backup_dir, is_incremental_archive, list_backups, request_full_backup
+from core.backup_retention import dependent_incrementals
 from core.app_paths import imports_dir as get_imports_dir
 from db_manager import open_sqlite_connection
 
@@ -176,6 +177,17 @@ def register(app):
 
             backup_path = _resolve_backup_path(filename)
 
+            # Une complète ne peut pas partir tant qu'un incrémental en dépend
+            dependents = dependent_incrementals(backup_path.parent, backup_path.name)
+            if dependents:
+                return {
+                    "success": False,
+                    "error": (
+                        "This full backup is required by incremental backup(s): "
+                        + ", ".join(dependents)
+                    ),
+                }, 409
+
             if backup_path.exists():
                 backup_path.unlink()
 
@@ -197,6 +209,8 @@ def register(app):
         # ───────────────────────────────
         if action == "create":
             try:
+                # auto_backup fera une sauvegarde complète (jamais un incrémental)
+                request_full_backup(ensure_backup_dir(get_backup_cfg()))
                 queued = enable_and_run_task_by_name("auto_backup")
                 if queued:
                     flash("Manual backup queued.", "success")
@@ -262,6 +276,18 @@ def register(app):
 
                     try:
                         file.save(temp_path)
+
+                        # Un incrémental n'est restaurable qu'avec sa complète
+                        # depuis le dossier des backups
+                        if original_suffix == ".zip" and is_incremental_archive(temp_path):
+                            temp_path.unlink()
+                            flash(
+                                "Incremental backups cannot be uploaded. Upload a full backup, "
+                                "or restore the incremental from the backup list.",
+                                "error",
+                            )
+                            return redirect(url_for("backup_page"))
+
                         request_path_file.write_text(str(temp_path), encoding="utf-8")
 
                         queued = enable_and_run_task_by_name("restore_backup")
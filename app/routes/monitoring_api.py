@@ -7,6 +7,7 @@ from flask import request, Response, current_app, jsonify, abort, send_file
 
 from core.monitoring.artwork_cache import (
     ARTWORK_CACHE_TTL_SECONDS,
+    forget_artwork_cache,
 )
 from core.monitoring.artwork_proxy import ArtworkProxyError, fetch_monitoring_artwork
 from web.helpers import get_db
@@ -60,34 +61,43 @@ def register(app):
             LIMIT 1
             """,
             (server_id,),
+            decrypt_servers=True,
         )
         if not srv:
             abort(404)
 
-        try:
-            result = fetch_monitoring_artwork(dict(srv), request.args)
-        except ArtworkProxyError as exc:
-            abort(exc.status_code)
-
-        if result["kind"] == "content":
-            return Response(
-                result["content"],
-                mimetype=result["content_type"],
-                headers={
-                    "Cache-Control": f"public, max-age={ARTWORK_CACHE_TTL_SECONDS}",
-                    "X-VODUM-Artwork-Cache": "MISS",
-                },
-            )
-
-        response = send_file(
-            result["path"],
-            mimetype=result["content_type"],
-            conditional=True,
-            max_age=result["max_age"],
-        )
-        response.headers["Cache-Control"] = f"public, max-age={result['max_age']}"
-        response.headers["X-VODUM-Artwork-Cache"] = "STALE" if result["is_stale"] else "HIT"
-        return response
+        for _ in range(2):
+            try:
+                result = fetch_monitoring_artwork(dict(srv), request.args)
+            except ArtworkProxyError as exc:
+                abort(exc.status_code)
+
+            if result["kind"] == "content":
+                return Response(
+                    result["content"],
+                    mimetype=result["content_type"],
+                    headers={
+                        "Cache-Control": f"public, max-age={ARTWORK_CACHE_TTL_SECONDS}",
+                        "X-VODUM-Artwork-Cache": "MISS",
+                    },
+                )
+
+            try:
+                response = send_file(
+                    result["path"],
+                    mimetype=result["content_type"],
+                    conditional=True,
+                    max_age=result["max_age"],
+                )
+            except FileNotFoundError:
+                # Fichier supprimé hors de l'index en mémoire : on le retélécharge
+                forget_artwork_cache(result["cache_key"])
+                continue
+            response.headers["Cache-Control"] = f"public, max-age={result['max_age']}"
+            response.headers["X-VODUM-Artwork-Cache"] = result.get("cache_status") or "HIT"
+            return response
+
+        abort(502)
 
     # =====================================================================
     # ⚠️ END MONITORING ROUTES
@@ -24,7 +24,12 @@ from core.library_bulk_access import (
     grant_libraries_to_active_users,
     remove_libraries_from_users,
 )
-from secret_store import encrypt_secret, encrypt_server_settings_json, keep_existing_secret
+from secret_store import (
+    encrypt_secret,
+    encrypt_server_settings_json,
+    invalidate_server_secret_cache,
+    keep_existing_secret,
+)
 from db_manager import open_sqlite_connection
 
 server_delete_logger = get_logger("server_delete")
@@ -256,6 +261,7 @@ def _background_delete_server(app, db_path, server_id, server_name):
         # 5) Final : supprimer le serveur
         conn.execute("DELETE FROM servers WHERE id = ?", (server_id,))
         conn.commit()
+        invalidate_server_secret_cache(server_id)
 
         server_delete_logger.info(
             "[server_delete] Done for server_id=%s name=%s | "
@@ -862,6 +868,7 @@ def register(app):
         row = db.query_one(
             "SELECT token, settings_json FROM servers WHERE id = ?",
             (server_id,),
+            decrypt_servers=True,
         )
 
         settings = {}
@@ -918,6 +925,7 @@ def register(app):
                 server_id,
             ),
         )
+        invalidate_server_secret_cache(server_id)
 
         # --------------------------------------------------
         # Wakeup auto-enable system
@@ -17,6 +17,7 @@ from tasks_engine import (
     mark_task_queue_failed,
 )
 from web.helpers import get_db, table_exists, add_log
+from core.tasks.run_metrics import format_duration_ms, load_task_run_stats
 from web.security import get_client_ip
 from secret_store import decrypt_communication_settings
 from notifications_utils import is_email_ready
@@ -66,9 +67,16 @@ def register(app):
         if debug_mode:
             task_logger.debug(f"Affichage page tasks → {len(tasks)} tâches détectées")
 
+        task_run_stats = load_task_run_stats(db) if table_exists(db, "task_runs") else {}
+        task_durations = {
+            name: f"{format_duration_ms(stats['p50_wall_ms'])} / {format_duration_ms(stats['p95_wall_ms'])}"
+            for name, stats in task_run_stats.items()
+        }
+
         return render_template(
             "tasks/tasks.html",
             tasks=tasks,
+            task_durations=task_durations,
             active_page="tasks",
         )
 
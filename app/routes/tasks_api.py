@@ -1,5 +1,11 @@
 # Auto-split from app.py (keep URLs/endpoints intact)
+from flask import request
+
 from core.i18n import get_translator
+from core.plex_rate_limit import plex_rate_limit_snapshot
+from core.tasks.run_metrics import format_duration_ms, load_task_run_stats
+from core.tasks.worker_pool import concurrency_class_for_task
+from tasks_engine import task_worker_pool
 
 from web.filters import cron_human, tz_filter
 from web.helpers import get_db, table_exists
@@ -52,6 +58,8 @@ def register(app):
                 """
             )
 
+        run_stats = load_task_run_stats(db) if table_exists(db, "task_runs") else {}
+
         tasks = []
         for r in rows:
             name = r["name"]
@@ -69,6 +77,12 @@ def register(app):
             last_run_human = tz_filter(r["last_run"]) if r["last_run"] else "-"
             next_run_human = tz_filter(r["next_run"]) if r["next_run"] else "-"
 
+            metrics = run_stats.get(name)
+            duration_human = (
+                f"{format_duration_ms(metrics['p50_wall_ms'])} / {format_duration_ms(metrics['p95_wall_ms'])}"
+                if metrics else "-"
+            )
+
             tasks.append({
                 "id": r["id"],
                 "name": name,
@@ -76,11 +90,14 @@ def register(app):
                 "schedule": schedule,
                 "status": r["status"],
                 "enabled": bool(r["enabled"]),
+                "concurrency_class": concurrency_class_for_task(name),
                 "name_label": name_label,
                 "description_label": desc_label,
                 "schedule_human": schedule_human,
                 "last_run_human": last_run_human,
                 "next_run_human": next_run_human,
+                "metrics": metrics,
+                "duration_human": duration_human,
             })
 
         return {"tasks": tasks}
@@ -88,6 +105,37 @@ def register(app):
 
 
 
+    @app.route("/api/tasks/<task_name>/runs", methods=["GET"])
+    def api_task_runs(task_name):
+        db = get_db()
+
+        if not table_exists(db, "task_runs"):
+            return {"task": task_name, "metrics": None, "runs": []}
+
+        try:
+            limit = max(1, min(500, int(request.args.get("limit", 50))))
+        except (TypeError, ValueError):
+            limit = 50
+
+        rows = db.query(
+            """
+            SELECT id, task_id, task_name, status, started_at, finished_at,
+                   wall_ms, cpu_ms, db_ms, db_statements, http_calls,
+                   rows_written, error
+            FROM task_runs
+            WHERE task_name = ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (task_name, limit),
+        )
+
+        return {
+            "task": task_name,
+            "metrics": load_task_run_stats(db, [task_name]).get(task_name),
+            "runs": [dict(r) for r in rows],
+        }
+
     @app.route("/api/tasks/activity", methods=["GET"])
     def api_tasks_activity():
         db = get_db()
@@ -116,7 +164,9 @@ def register(app):
         return {
             "active": active,
             "running": running,
-            "queued": queued
+            "queued": queued,
+            "workers": task_worker_pool.snapshot(),
+            "plex_rate_limit": plex_rate_limit_snapshot(),
         }
 
 
@@ -502,7 +502,7 @@ def register(app):
                 return
             changed_server_id = int(row["server_id"])
 
-            srv = db.query_one("SELECT token FROM servers WHERE id = ?", (changed_server_id,))
+            srv = db.query_one("SELECT token FROM servers WHERE id = ?", (changed_server_id,), decrypt_servers=True)
             if not srv:
                 return
             srv = dict(srv)
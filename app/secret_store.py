@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import hashlib
 import hmac
 import json
 import os
+import threading
 from pathlib import Path
 
 from cryptography.fernet import Fernet, InvalidToken
@@ -10,6 +12,13 @@ from cryptography.fernet import Fernet, InvalidToken
 
 SECRET_PREFIX = "enc:v1:"
 
+# Cache des secrets serveurs déchiffrés.
+# Clé = (server_id, empreinte du texte chiffré) : un token modifié change
+# l'empreinte, donc une entrée obsolète ne peut jamais être servie.
+_SERVER_SECRET_CACHE_MAX_ENTRIES = 256
+_server_secret_cache: dict[tuple, tuple] = {}
+_server_secret_cache_lock = threading.Lock()
+
 
 class SecretDecryptionError(ValueError):
     pass
@@ -96,6 +105,7 @@ def install_encryption_key(key_bytes: bytes) -> Path:
         os.chmod(key_file, 0o600)
     except OSError:
         pass
+    invalidate_server_secret_cache()
     return key_file
 
 
@@ -214,14 +224,53 @@ def decrypt_server_settings_json(settings_json: object) -> str | None:
     return _transform_tautulli_api_key(settings_json, decrypt_secret)
 
 
+def _server_secret_cache_key(record: dict) -> tuple:
+    digest = hashlib.sha256()
+    for field in ("token", "settings_json"):
+        value = record.get(field)
+        digest.update(field.encode("ascii"))
+        digest.update(b"\x00" if value is None else b"\x01" + str(value).encode("utf-8"))
+    return (record.get("id"), digest.hexdigest())
+
+
+def invalidate_server_secret_cache(server_id: int | None = None) -> None:
+    """
+    Vide le cache des secrets serveurs (tout, ou un seul serveur).
+    À appeler après modification/suppression d'un serveur ou changement de clé.
+    """
+    with _server_secret_cache_lock:
+        if server_id is None:
+            _server_secret_cache.clear()
+            return
+        for key in [key for key in _server_secret_cache if key[0] == server_id]:
+            _server_secret_cache.pop(key, None)
+
+
 def decrypt_server_record(record) -> dict:
     result = dict(record or {})
-    if "token" in result:
-        result["token"] = decrypt_secret(result.get("token"))
-    if "settings_json" in result:
-        result["settings_json"] = decrypt_server_settings_json(
-            result.get("settings_json")
+    has_token = "token" in result
+    has_settings = "settings_json" in result
+    if not has_token and not has_settings:
+        return result
+
+    cache_key = _server_secret_cache_key(result)
+    with _server_secret_cache_lock:
+        cached = _server_secret_cache.get(cache_key)
+
+    if cached is None:
+        cached = (
+            decrypt_secret(result.get("token")) if has_token else None,
+            decrypt_server_settings_json(result.get("settings_json")) if has_settings else None,
         )
+        with _server_secret_cache_lock:
+            if len(_server_secret_cache) >= _SERVER_SECRET_CACHE_MAX_ENTRIES:
+                _server_secret_cache.clear()
+            _server_secret_cache[cache_key] = cached
+
+    if has_token:
+        result["token"] = cached[0]
+    if has_settings:
+        result["settings_json"] = cached[1]
     return result
 
 
@@ -304,6 +353,7 @@ def encrypt_server_secrets(conn) -> int:
                 "UPDATE servers SET token = ?, settings_json = ? WHERE id = ?",
                 (encrypted_token, encrypted_settings, server_id),
             )
+            invalidate_server_secret_cache(server_id)
             updated += 1
 
     return updated
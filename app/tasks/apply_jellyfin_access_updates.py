@@ -188,7 +188,7 @@ def _mark_failure(db, job_id: int, err: str) -> None:
 
 
 def _get_server(db, server_id: int) -> Optional[Dict[str, Any]]:
-    row = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id = ?", (server_id,))
+    row = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id = ?", (server_id,), decrypt_servers=True)
     return dict(row) if row else None
 
 
@@ -21,6 +21,7 @@ from core.plex_access_jobs import (
     cleanup_old_jobs,
     get_plex_share_settings_from_user as _get_plex_share_settings_from_user,
     is_owner_media_user,
+    parse_bool,
     resolve_media_user,
 )
 from core.plex_access_runtime import (
@@ -30,17 +31,114 @@ from core.plex_access_runtime import (
 
 logger = get_logger("apply_plex_access_updates")
 
-def resolve_or_repair_plex_user(db, server_row, user_row, sections_for_repair):
+# Jobs traités par run (groupés par serveur, cf. PlexServerAccessBatch)
+MAX_JOBS_PER_RUN = 200
+
+SERVER_COLUMNS = "id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status"
+
+
+class PlexServerAccessBatch:
+    """
+    État Plex partagé par tous les jobs d'un même serveur pendant un run.
+
+    Connexion, compte plex.tv, account.users(), mapping des sections et
+    shared_servers sont chargés une seule fois (à la demande) au lieu d'une
+    fois par job. Chaque job calcule son diff en mémoire contre cet état ;
+    le cache est mis à jour après un PUT et invalidé après création ou
+    suppression d'un partage.
+    """
+
+    def __init__(self, server_row):
+        self.server_row = server_row
+        self._plex = None
+        self._account = None
+        self._connect_error = None
+        self._plex_users = None
+        self._title_to_id = None
+        self._shared = None
+        self.puts_sent = 0
+        self.puts_skipped = 0
+
+    @property
+    def plex(self):
+        if self._plex is None:
+            # Serveur injoignable : on n'essaie pas de reconnecter pour chaque job du lot
+            if self._connect_error is not None:
+                raise self._connect_error
+            try:
+                self._plex = get_plex(self.server_row)
+            except Exception as e:
+                self._connect_error = e
+                raise
+        return self._plex
+
+    @property
+    def account(self):
+        if self._account is None:
+            account = self.plex.myPlexAccount()
+            install_plex_http_logger(getattr(account, "_session", None), "PLEX_ACCOUNT")
+            self._account = account
+        return self._account
+
+    @property
+    def machine_id(self):
+        return self.plex.machineIdentifier
+
+    def plex_users(self):
+        """Liste account.users() ; None en cas d'échec (resolve_plex_user réessaiera)."""
+        if self._plex_users is None:
+            try:
+                self._plex_users = list(self.account.users())
+            except Exception:
+                logger.exception("Unable to list Plex users via account.users()")
+                return None
+        return self._plex_users
+
+    def title_to_id(self) -> dict:
+        if self._title_to_id is None:
+            self._title_to_id = _plex_title_to_id_map(self.account, self.machine_id)
+        return self._title_to_id
+
+    def shared_servers(self) -> list:
+        if self._shared is None:
+            self._shared = _get_shared_servers_for_machine(self.account, self.machine_id)
+        return self._shared
+
+    def invalidate_shared(self):
+        self._shared = None
+
+    def record_share_update(self, shared_server_id, section_ids, settings: dict):
+        """Reporte un PUT réussi dans le cache (évite de relire shared_servers)."""
+        if self._shared is None:
+            return
+        for ss in self._shared:
+            if str(ss.get("id") or "") == str(shared_server_id):
+                ss["section_ids"] = sorted({int(x) for x in section_ids})
+                ss["settings"] = dict(settings)
+                return
+        self.invalidate_shared()
+
+    def forget_share(self, shared_server_id):
+        if self._shared is None:
+            return
+        self._shared = [
+            ss for ss in self._shared
+            if str(ss.get("id") or "") != str(shared_server_id)
+        ]
+
+
+def resolve_or_repair_plex_user(db, server_row, user_row, sections_for_repair, batch=None):
     """
     Résout un user Plex sans jamais lancer d'invitation/réinvitation automatique
     pendant une simple tâche d'accès aux bibliothèques.
     """
-    plex = get_plex(server_row)
-    account = plex.myPlexAccount()
-    install_plex_http_logger(getattr(account, "_session", None), "PLEX_ACCOUNT")
+    if batch is None:
+        batch = PlexServerAccessBatch(server_row)
+    plex = batch.plex
+    account = batch.account
 
     try:
-        plex_user = resolve_plex_user(account, user_row)
+        plex_user = resolve_plex_user(account, user_row, plex_users=batch.plex_users())
         sync_media_user_identity_from_plex(db, user_row, plex_user)
         refreshed = db.query_one(
             "SELECT id, server_id, vodum_user_id, external_user_id, username, email, avatar, stored_password, type, role, joined_at, accepted_at, raw_json, details_json FROM media_users WHERE id = ?",
@@ -130,7 +228,7 @@ def _find_shared_server_id_for_machine(plex_user, machine_id: str):
 def _get_shared_servers_for_machine(account, machine_id: str):
     """
     GET https://plex.tv/api/servers/<machine_id>/shared_servers
-    Returns list of dicts: {id, username, email, userID, section_ids}
+    Returns list of dicts: {id, username, email, userID, invitedId, section_ids, settings}
     """
     url = f"https://plex.tv/api/servers/{machine_id}/shared_servers"
     resp = account.query(url, account._session.get)
@@ -167,6 +265,9 @@ def _get_shared_servers_for_machine(account, machine_id: str):
                 section_ids.append(int(part))
 
         for child in list(ss):
+            # <Section shared="0"> : section listée mais non partagée
+            if str(child.attrib.get("shared", "1")).strip() == "0":
+                continue
             child_id = (
                 child.attrib.get("id")
                 or child.attrib.get("key")
@@ -184,15 +285,28 @@ def _get_shared_servers_for_machine(account, machine_id: str):
                 "userID": ss.attrib.get("userID") or ss.attrib.get("userId"),
                 "invitedId": ss.attrib.get("invitedId") or ss.attrib.get("invitedID") or ss.attrib.get("invited_id"),
                 "section_ids": sorted(set(section_ids)),
+                # None si Plex ne renvoie pas l'attribut : considéré comme à mettre à jour
+                "settings": {key: ss.attrib.get(key) for key in SHARE_SETTING_KEYS},
             }
         )
 
     return out
 
 
-def _find_shared_server_id_for_user_on_machine(account, machine_id: str, plex_user_obj):
+def _find_shared_server_id_for_user_on_machine(account, machine_id: str, plex_user_obj, shared=None):
     """
     Retrouve le shared_server_id pour CE user sur CE serveur.
+    """
+    ss = _match_shared_server(
+        shared if shared is not None else _get_shared_servers_for_machine(account, machine_id),
+        plex_user_obj,
+    )
+    return ss.get("id") if ss else None
+
+
+def _match_shared_server(shared: list, plex_user_obj):
+    """
+    Retrouve l'entrée shared_servers de CE user.
     Match robuste:
     - userID / invitedId
     - username
@@ -211,43 +325,37 @@ def _find_shared_server_id_for_user_on_machine(account, machine_id: str, plex_us
     target_email = norm_lower(getattr(plex_user_obj, "email", None))
     target_title = norm_lower(getattr(plex_user_obj, "title", None))
 
-    shared = _get_shared_servers_for_machine(account, machine_id)
-
-    for ss in shared:
-        ss_id = ss.get("id")
+    for ss in shared or []:
         ss_uid = norm(ss.get("userID"))
         ss_invited = norm(ss.get("invitedId"))
         ss_username = norm_lower(ss.get("username"))
         ss_email = norm_lower(ss.get("email"))
 
+        if not ss.get("id"):
+            continue
+
         if target_uid and (ss_uid == target_uid or ss_invited == target_uid):
-            return ss_id
+            return ss
 
         if target_username and ss_username == target_username:
-            return ss_id
+            return ss
 
         if target_email and ss_email == target_email:
-            return ss_id
+            return ss
 
         if target_title and ss_username == target_title:
-            return ss_id
+            return ss
 
     return None
 
-def _find_shared_server_state_for_user_on_machine(account, machine_id: str, plex_user_obj):
+def _find_shared_server_state_for_user_on_machine(account, machine_id: str, plex_user_obj, shared=None):
     """
     Retourne l'état Plex actuel du partage pour CE user sur CE serveur.
-    Utilisé pour logger le diff réel avant modification.
+    Utilisé pour logger le diff réel et éviter les PUT sans changement.
     """
-    shared_id = _find_shared_server_id_for_user_on_machine(account, machine_id, plex_user_obj)
-    if not shared_id:
-        return None
-
-    for ss in _get_shared_servers_for_machine(account, machine_id):
-        if str(ss.get("id") or "").strip() == str(shared_id):
-            return ss
-
-    return {"id": shared_id, "section_ids": []}
+    if shared is None:
+        shared = _get_shared_servers_for_machine(account, machine_id)
+    return _match_shared_server(shared, plex_user_obj)
 
 
 def _log_access_diff(action: str, *, vodum_user_id, media_user_id, server_id, machine_id, shared_server_id, current_section_ids, expected_section_ids):
@@ -277,15 +385,15 @@ def _extract_already_shared_username(error_message: str) -> str | None:
         return None
     return m.group(1).strip().lower() or None
 
-def _ensure_shared_server(account, machine_id: str, plex_user_obj, section_ids: list):
+def _ensure_shared_server(account, machine_id: str, plex_user_obj, section_ids: list, shared=None):
     """
     Garantit que le share existe.
-    - si trouvé => retourne son id
+    - si trouvé (dans `shared` si fourni) => retourne son id
     - sinon tente création
     - si Plex répond "already sharing", on récupère l'id existant
       par username / email / id sans jamais réinviter
     """
-    shared_id = _find_shared_server_id_for_user_on_machine(account, machine_id, plex_user_obj)
+    shared_id = _find_shared_server_id_for_user_on_machine(account, machine_id, plex_user_obj, shared=shared)
     if shared_id:
         return shared_id
 
@@ -379,6 +487,57 @@ def _ensure_shared_server(account, machine_id: str, plex_user_obj, section_ids:
     return shared_id
 
 
+SHARE_SETTING_KEYS = (
+    "allowSync",
+    "allowCameraUpload",
+    "allowChannels",
+    "filterMovies",
+    "filterTelevision",
+    "filterMusic",
+)
+
+
+def _b01(v: bool) -> str:
+    return "1" if v else "0"
+
+
+def _share_settings(allowSync: bool, allowCameraUpload: bool, allowChannels: bool,
+                    filterMovies: str, filterTelevision: str, filterMusic: str) -> dict:
+    """Réglages du partage, sous la forme envoyée (et renvoyée) par plex.tv."""
+    return {
+        "allowSync": _b01(bool(allowSync)),
+        "allowCameraUpload": _b01(bool(allowCameraUpload)),
+        "allowChannels": _b01(bool(allowChannels)),
+        "filterMovies": str(filterMovies or ""),
+        "filterTelevision": str(filterTelevision or ""),
+        "filterMusic": str(filterMusic or ""),
+    }
+
+
+def _share_is_up_to_date(shared_state, section_ids: list, settings: dict) -> bool:
+    """
+    True si le partage Plex a déjà exactement ces sections et ces réglages.
+    Un réglage absent de la réponse Plex est considéré comme différent.
+    """
+    if not shared_state:
+        return False
+
+    current = {int(x) for x in (shared_state.get("section_ids") or []) if str(x).isdigit()}
+    if current != {int(x) for x in section_ids}:
+        return False
+
+    current_settings = shared_state.get("settings") or {}
+    for key, expected in settings.items():
+        value = current_settings.get(key)
+        if value is None:
+            return False
+        if key.startswith("allow"):
+            value = _b01(parse_bool(value))
+        if str(value) != expected:
+            return False
+    return True
+
+
 def _put_shared_server_form(account, machine_id: str, shared_server_id: str,
                             plex_user_obj,
                             section_ids: list,
@@ -396,30 +555,18 @@ def _put_shared_server_form(account, machine_id: str, shared_server_id: str,
     url = f"https://plex.tv/api/servers/{machine_id}/shared_servers/{shared_server_id}"
     invited_id = getattr(plex_user_obj, "id", None)
 
-    def b01(v: bool) -> str:
-        return "1" if v else "0"
+    settings = _share_settings(
+        allowSync, allowCameraUpload, allowChannels,
+        filterMovies, filterTelevision, filterMusic,
+    )
 
     data = []
 
     # ---- flags / filters : flat ----
-    data.extend([
-        ("allowSync", b01(bool(allowSync))),
-        ("allowCameraUpload", b01(bool(allowCameraUpload))),
-        ("allowChannels", b01(bool(allowChannels))),
-        ("filterMovies", str(filterMovies or "")),
-        ("filterTelevision", str(filterTelevision or "")),
-        ("filterMusic", str(filterMusic or "")),
-    ])
+    data.extend(settings.items())
 
     # ---- flags / filters : nested ----
-    data.extend([
-        ("shared_server[allowSync]", b01(bool(allowSync))),
-        ("shared_server[allowCameraUpload]", b01(bool(allowCameraUpload))),
-        ("shared_server[allowChannels]", b01(bool(allowChannels))),
-        ("shared_server[filterMovies]", str(filterMovies or "")),
-        ("shared_server[filterTelevision]", str(filterTelevision or "")),
-        ("shared_server[filterMusic]", str(filterMusic or "")),
-    ])
+    data.extend((f"shared_server[{key}]", value) for key, value in settings.items())
 
     # invited id (certaines variantes l'exigent)
     if invited_id is not None:
@@ -465,7 +612,74 @@ def update_friend_safe(account, plex, username, sections, removeSections=False):
         )
 
 
-def apply_grant_job(db, job):
+def _apply_shared_server_state(batch, action: str, *, vodum_user_id, media_user_id, server_id,
+                               plex_user, section_ids: list, settings: dict):
+    """
+    Diff en mémoire entre l'état shared_servers du lot et l'état attendu,
+    puis PUT uniquement si sections ou réglages diffèrent.
+    """
+    account = batch.account
+    machine_id = batch.machine_id
+
+    shared_state = _find_shared_server_state_for_user_on_machine(
+        account, machine_id, plex_user, shared=batch.shared_servers()
+    )
+    if shared_state:
+        shared_server_id = shared_state["id"]
+    else:
+        shared_server_id = _ensure_shared_server(
+            account, machine_id, plex_user, section_ids, shared=batch.shared_servers()
+        )
+        # Partage créé (ou récupéré) : on relit l'état réel une fois
+        batch.invalidate_shared()
+        shared_state = _find_shared_server_state_for_user_on_machine(
+            account, machine_id, plex_user, shared=batch.shared_servers()
+        )
+
+    _log_access_diff(
+        action,
+        vodum_user_id=vodum_user_id,
+        media_user_id=media_user_id,
+        server_id=server_id,
+        machine_id=machine_id,
+        shared_server_id=shared_server_id,
+        current_section_ids=(shared_state or {}).get("section_ids", []),
+        expected_section_ids=section_ids,
+    )
+
+    if _share_is_up_to_date(shared_state, section_ids, settings):
+        batch.puts_skipped += 1
+        logger.info(
+            f"[PLEX ACCESS] {action.upper()} noop: share {shared_server_id} already up to date"
+        )
+        return
+
+    _put_shared_server_form(
+        account=account,
+        machine_id=machine_id,
+        shared_server_id=str(shared_server_id),
+        plex_user_obj=plex_user,
+        section_ids=section_ids,
+        allowSync=settings["allowSync"] == "1",
+        allowCameraUpload=settings["allowCameraUpload"] == "1",
+        allowChannels=settings["allowChannels"] == "1",
+        filterMovies=settings["filterMovies"],
+        filterTelevision=settings["filterTelevision"],
+        filterMusic=settings["filterMusic"],
+    )
+    batch.puts_sent += 1
+    batch.record_share_update(shared_server_id, section_ids, settings)
+
+    logger.info(f"✅ {action.upper()} applied via plex.tv legacy shared_servers API")
+
+
+def _load_server_for_job(db, server_id, batch):
+    if batch is not None:
+        return batch.server_row
+    return db.query_one(f"SELECT {SERVER_COLUMNS} FROM servers WHERE id=?", (server_id,), decrypt_servers=True)
+
+
+def apply_grant_job(db, job, batch=None):
     """
     Ajoute une bibliothèque à un utilisateur Plex.
     Source de vérité = DB.
@@ -484,13 +698,15 @@ def apply_grant_job(db, job):
         )
         return
 
-    server = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id=?", (server_id,))
+    server = _load_server_for_job(db, server_id, batch)
     library = db.query_one("SELECT id, server_id, section_id, name, type, item_count FROM libraries WHERE id=?", (lib_id,))
 
     if not server:
         raise RuntimeError(f"Server not found (id={server_id})")
     if not library:
         raise RuntimeError(f"Library not found (id={lib_id})")
+    if batch is None:
+        batch = PlexServerAccessBatch(server)
 
     logger.info(f"Updating access: {user['username']} ← {library['name']} sur {server['name']}")
 
@@ -502,6 +718,7 @@ def apply_grant_job(db, job):
             server_row=server,
             user_row=user,
             sections_for_repair=sections_for_repair,
+            batch=batch,
         )
         logger.info(
             "Plex debug user: "
@@ -523,8 +740,6 @@ def apply_grant_job(db, job):
         )
         raise
 
-    machine_id = plex.machineIdentifier
-
     rows = db.query(
         """
         SELECT l.name
@@ -564,7 +779,7 @@ def apply_grant_job(db, job):
         filterMusic=filterMusic,
     )
 
-    title_to_id = _plex_title_to_id_map(account, machine_id)
+    title_to_id = batch.title_to_id()
     missing = [t for t in sections if t not in title_to_id]
     if missing:
         logger.warning(f"Some sections are unknown on Plex server (ignored): {missing}")
@@ -572,40 +787,22 @@ def apply_grant_job(db, job):
     if not section_ids:
         raise RuntimeError("No valid Plex section ids to grant (all titles missing on server)")
 
-    shared_state = _find_shared_server_state_for_user_on_machine(account, machine_id, plex_user)
-    shared_server_id = _ensure_shared_server(account, machine_id, plex_user, section_ids)
-    if not shared_state or str(shared_state.get("id") or "") != str(shared_server_id):
-        shared_state = _find_shared_server_state_for_user_on_machine(account, machine_id, plex_user)
-
-    _log_access_diff(
+    _apply_shared_server_state(
+        batch,
         "grant",
         vodum_user_id=vodum_user_id,
         media_user_id=user_id,
         server_id=server_id,
-        machine_id=machine_id,
-        shared_server_id=shared_server_id,
-        current_section_ids=(shared_state or {}).get("section_ids", []),
-        expected_section_ids=section_ids,
-    )
-
-    _put_shared_server_form(
-        account=account,
-        machine_id=machine_id,
-        shared_server_id=str(shared_server_id),
-        plex_user_obj=plex_user,
+        plex_user=plex_user,
         section_ids=section_ids,
-        allowSync=allowSync,
-        allowCameraUpload=allowCameraUpload,
-        allowChannels=allowChannels,
-        filterMovies=filterMovies,
-        filterTelevision=filterTelevision,
-        filterMusic=filterMusic,
+        settings=_share_settings(
+            allowSync, allowCameraUpload, allowChannels,
+            filterMovies, filterTelevision, filterMusic,
+        ),
     )
 
-    logger.info("✅ GRANT applied via plex.tv legacy shared_servers API")
 
-
-def apply_sync_job(db, job):
+def apply_sync_job(db, job, batch=None):
     """
     Synchronise TOUTES les bibliothèques autorisées (DB => Plex).
     API legacy /shared_servers + PUT form.
@@ -620,9 +817,11 @@ def apply_sync_job(db, job):
         logger.info(f"Skip SYNC (owner) : username={user['username']} server_id={server_id}")
         return
 
-    server = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id=?", (server_id,))
+    server = _load_server_for_job(db, server_id, batch)
     if not server:
         raise RuntimeError("Server not found (sync)")
+    if batch is None:
+        batch = PlexServerAccessBatch(server)
 
     logger.info(
         f"FULL ACCESS SYNC: {user['username']} on {server['name']} "
@@ -649,6 +848,7 @@ def apply_sync_job(db, job):
             server_row=server,
             user_row=user,
             sections_for_repair=sections,
+            batch=batch,
         )
         logger.info(
             "Plex debug user: "
@@ -696,9 +896,7 @@ def apply_sync_job(db, job):
         filterMusic=filterMusic,
     )
 
-    machine_id = plex.machineIdentifier
-
-    title_to_id = _plex_title_to_id_map(account, machine_id)
+    title_to_id = batch.title_to_id()
     missing = [t for t in sections if t not in title_to_id]
     if missing:
         logger.warning(f"Some sections are unknown on Plex server (ignored): {missing}")
@@ -711,40 +909,22 @@ def apply_sync_job(db, job):
             "Use an explicit revoke job to remove all Plex access."
         )
 
-    shared_state = _find_shared_server_state_for_user_on_machine(account, machine_id, plex_user)
-    shared_server_id = _ensure_shared_server(account, machine_id, plex_user, section_ids)
-    if not shared_state or str(shared_state.get("id") or "") != str(shared_server_id):
-        shared_state = _find_shared_server_state_for_user_on_machine(account, machine_id, plex_user)
-
-    _log_access_diff(
+    _apply_shared_server_state(
+        batch,
         "sync",
         vodum_user_id=vodum_user_id,
         media_user_id=user_id,
         server_id=server_id,
-        machine_id=machine_id,
-        shared_server_id=shared_server_id,
-        current_section_ids=(shared_state or {}).get("section_ids", []),
-        expected_section_ids=section_ids,
-    )
-
-    _put_shared_server_form(
-        account=account,
-        machine_id=machine_id,
-        shared_server_id=str(shared_server_id),
-        plex_user_obj=plex_user,
+        plex_user=plex_user,
         section_ids=section_ids,
-        allowSync=allowSync,
-        allowCameraUpload=allowCameraUpload,
-        allowChannels=allowChannels,
-        filterMovies=filterMovies,
-        filterTelevision=filterTelevision,
-        filterMusic=filterMusic,
+        settings=_share_settings(
+            allowSync, allowCameraUpload, allowChannels,
+            filterMovies, filterTelevision, filterMusic,
+        ),
     )
 
-    logger.info("✅ SYNC applied via plex.tv legacy shared_servers API")
-
 
-def apply_revoke_job(db, job):
+def apply_revoke_job(db, job, batch=None):
     """
     Retire TOUS les accès aux bibliothèques pour un utilisateur sur un serveur.
     DELETE /shared_servers/<id>
@@ -757,9 +937,11 @@ def apply_revoke_job(db, job):
         logger.info(f"Skip REVOKE (owner) : username={user['username']} server_id={server_id}")
         return
 
-    server = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id=?", (server_id,))
+    server = _load_server_for_job(db, server_id, batch)
     if not server:
         raise RuntimeError("Server not found (revoke)")
+    if batch is None:
+        batch = PlexServerAccessBatch(server)
 
     try:
         plex, account, user, plex_user = resolve_or_repair_plex_user(
@@ -767,6 +949,7 @@ def apply_revoke_job(db, job):
             server_row=server,
             user_row=user,
             sections_for_repair=[],
+            batch=batch,
         )
     except PendingPlexInvite as e:
         logger.info(str(e))
@@ -779,13 +962,15 @@ def apply_revoke_job(db, job):
         )
         raise
 
-    machine_id = plex.machineIdentifier
-    shared_server_id = _find_shared_server_id_for_user_on_machine(account, machine_id, plex_user)
-    if not shared_server_id:
+    machine_id = batch.machine_id
+    shared_state = _find_shared_server_state_for_user_on_machine(
+        account, machine_id, plex_user, shared=batch.shared_servers()
+    )
+    if not shared_state:
         logger.info("REVOKE: no existing share found (noop).")
         return
 
-    shared_state = _find_shared_server_state_for_user_on_machine(account, machine_id, plex_user)
+    shared_server_id = shared_state["id"]
     _log_access_diff(
         "revoke",
         vodum_user_id=vodum_user_id,
@@ -799,6 +984,7 @@ def apply_revoke_job(db, job):
 
     url = f"https://plex.tv/api/servers/{machine_id}/shared_servers/{shared_server_id}"
     account.query(url, account._session.delete)
+    batch.forget_share(shared_server_id)
     logger.info("✅ REVOKE applied via plex.tv legacy shared_servers API")
 
 
@@ -830,8 +1016,9 @@ def run(task_id: int, db):
           AND (run_after IS NULL OR run_after <= CURRENT_TIMESTAMP)
           AND (locked_until IS NULL OR locked_until <= CURRENT_TIMESTAMP)
         ORDER BY priority ASC, id ASC
-        LIMIT 50
-        """
+        LIMIT ?
+        """,
+        (MAX_JOBS_PER_RUN,),
     )
 
     if not jobs:
@@ -842,15 +1029,49 @@ def run(task_id: int, db):
 
     processed = 0
     errors = 0
+    puts_sent = 0
+    puts_skipped = 0
 
+    # Regroupement par serveur (ordre de priorité conservé dans chaque groupe) :
+    # un seul chargement de l'état Plex (users, sections, shared_servers) par lot.
+    jobs_by_server = {}
     for job in jobs:
-        job_id = job["id"]
-        server = db.query_one("SELECT id, name, server_identifier, type, url, local_url, public_url, token, settings_json, server_version, unavailable_since, cooldown_until, last_failure, last_checked, status FROM servers WHERE id=?", (job["server_id"],))
+        jobs_by_server.setdefault(job["server_id"], []).append(job)
+
+    for server_id, server_jobs in jobs_by_server.items():
+        server = db.query_one(f"SELECT {SERVER_COLUMNS} FROM servers WHERE id=?", (server_id,), decrypt_servers=True)
         if server and should_skip_unreachable_server(server):
             logger.info(
-                f"Skipping Plex job id={job_id}: server_id={job['server_id']} is in cooldown"
+                f"Skipping {len(server_jobs)} Plex job(s): server_id={server_id} is in cooldown"
             )
             continue
+
+        batch = PlexServerAccessBatch(server) if server else None
+        p, e = _process_server_jobs(db, task_id, server_jobs, batch)
+        processed += p
+        errors += e
+        if batch is not None:
+            puts_sent += batch.puts_sent
+            puts_skipped += batch.puts_skipped
+
+    cleanup_old_jobs(db)
+    logger.debug("=== APPLY PLEX ACCESS UPDATES : END ===")
+
+    return {
+        "processed": processed,
+        "errors": errors,
+        "servers": len(jobs_by_server),
+        "puts_sent": puts_sent,
+        "puts_skipped": puts_skipped,
+    }
+
+
+def _process_server_jobs(db, task_id: int, jobs, batch):
+    processed = 0
+    errors = 0
+
+    for job in jobs:
+        job_id = job["id"]
         locked_until = (datetime.utcnow() + timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S")
 
         claim = db.execute(
@@ -881,11 +1102,11 @@ def run(task_id: int, db):
 
         try:
             if job["action"] == "grant":
-                apply_grant_job(db, job)
+                apply_grant_job(db, job, batch)
             elif job["action"] == "sync":
-                apply_sync_job(db, job)
+                apply_sync_job(db, job, batch)
             elif job["action"] == "revoke":
-                apply_revoke_job(db, job)
+                apply_revoke_job(db, job, batch)
             else:
                 raise ValueError(f"Unknown action '{job['action']}'")
 
@@ -937,6 +1158,9 @@ def run(task_id: int, db):
 
         except Exception as e:
             errors += 1
+            # État shared_servers du lot potentiellement faux après une erreur Plex
+            if batch is not None:
+                batch.invalidate_shared()
             attempts = int(job["attempts"] or 0)
             max_attempts = int(job["max_attempts"] or 10)
             msg = str(e)
@@ -979,7 +1203,4 @@ def run(task_id: int, db):
                     (run_after, msg[:1000], job_id),
                 )
 
-    cleanup_old_jobs(db)
-    logger.debug("=== APPLY PLEX ACCESS UPDATES : END ===")
-
-    return {"processed": processed, "errors": errors}
+    return processed, errors
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+apply_subscription_gifts.py
+- Applique les runs de cadeaux d'abonnement créés par l'API (status='queued')
+- Les utilisateurs ciblés sont figés à la création du run (target_user_ids_json)
+- Traitement par paquets (core.subscription_gift_bulk) : chaque paquet et la
+  progression du run sont commités ensemble, un run interrompu ('running')
+  reprend au paquet suivant
+"""
+
+from __future__ import annotations
+
+import json
+
+from tasks_engine import task_logs
+from logging_utils import get_logger
+from core.subscription_gift_bulk import GIFT_CHUNK_SIZE, BulkGiftApplier
+
+log = get_logger("apply_subscription_gifts")
+
+
+def _load_target_ids(raw) -> list[int]:
+    try:
+        data = json.loads(raw or "[]")
+    except Exception:
+        return []
+    if not isinstance(data, list):
+        return []
+    ids = []
+    for value in data:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _next_run(db):
+    # 'running' : run interrompu (redémarrage pendant l'application), on le reprend
+    return db.query_one(
+        """
+        SELECT id, target_type, target_server_id, days_added, reason, status,
+               users_total, users_processed, target_user_ids_json
+        FROM subscription_gift_runs
+        WHERE status IN ('queued', 'running')
+        ORDER BY created_at ASC, id ASC
+        LIMIT 1
+        """
+    )
+
+
+def _apply_run(task_id, db, run) -> dict:
+    run_id = int(run["id"])
+    days = int(run["days_added"] or 0)
+    user_ids = _load_target_ids(run["target_user_ids_json"])
+    offset = max(0, int(run["users_processed"] or 0))
+
+    db.execute(
+        """
+        UPDATE subscription_gift_runs
+        SET status = 'running',
+            started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+            users_total = ?,
+            last_error = NULL
+        WHERE id = ?
+        """,
+        (len(user_ids), run_id),
+    )
+
+    if offset:
+        log.info(f"[GIFT RUN #{run_id}] resuming at {offset}/{len(user_ids)}")
+
+    applier = BulkGiftApplier(db, run_id=run_id, days=days, reason=run["reason"] or "gift")
+
+    try:
+        for start in range(offset, len(user_ids), GIFT_CHUNK_SIZE):
+            applier.apply_chunk(user_ids[start:start + GIFT_CHUNK_SIZE])
+    finally:
+        # Même en cas d'erreur, ce qui a été commité doit être propagé
+        applier.wake_workers()
+
+    db.execute(
+        """
+        UPDATE subscription_gift_runs
+        SET status = 'success',
+            finished_at = CURRENT_TIMESTAMP,
+            target_user_ids_json = NULL
+        WHERE id = ?
+        """,
+        (run_id,),
+    )
+
+    stats = applier.stats()
+    msg = (
+        f"[GIFT RUN #{run_id}] +{days}d target={run['target_type']} "
+        f"users={len(user_ids)} " + " ".join(f"{k}={v}" for k, v in stats.items())
+    )
+    log.info(msg)
+    task_logs(task_id, "info", msg)
+    return {"run_id": run_id, "status": "success", **stats}
+
+
+def run(task_id: int, db):
+    task_logs(task_id, "info", "Task apply_subscription_gifts started")
+
+    results = []
+    while True:
+        gift_run = _next_run(db)
+        if not gift_run:
+            break
+
+        run_id = int(gift_run["id"])
+        try:
+            results.append(_apply_run(task_id, db, gift_run))
+        except Exception as e:
+            log.error(f"[GIFT RUN #{run_id}] failed", exc_info=True)
+            task_logs(task_id, "error", f"Gift run #{run_id} failed: {e}")
+            db.execute(
+                """
+                UPDATE subscription_gift_runs
+                SET status = 'error',
+                    finished_at = CURRENT_TIMESTAMP,
+                    last_error = ?
+                WHERE id = ?
+                """,
+                (str(e)[:1000], run_id),
+            )
+            results.append({"run_id": run_id, "status": "error", "error": str(e)})
+
+    if not results:
+        log.info("No queued gift run")
+        return {"status": "idle", "message": "no queued gift run"}
+
+    task_logs(task_id, "info", f"Task apply_subscription_gifts finished ({len(results)} run(s))")
+    return {"status": "success", "processed": len(results), "results": results}
@@ -1,18 +1,24 @@
-import json
 import os
 import time
-import zipfile
-from datetime import datetime
 from pathlib import Path
 
-from logging_utils import get_logger, is_debug_mode_enabled
+from logging_utils import get_logger
 from tasks_engine import task_logs
 from config import Config
+from core.backup import (
+    build_backup_archive,
+    consume_full_backup_request,
+    incremental_backups_since,
+    latest_full_backup,
+)
 from core.backup_retention import prune_backups, safe_positive_int
-from secret_store import encryption_key_bytes
 
 log = get_logger("auto_backup")
 
+# 1 sauvegarde complète toutes les N (les autres ne stockent que les blocs
+# modifiés depuis la dernière complète) ; 1 = toujours complète
+BACKUP_FULL_EVERY = int(os.environ.get("VODUM_BACKUP_FULL_EVERY", "7"))
+
 
 def _row_value(row, key, default=None):
     if not row:
@@ -27,22 +33,15 @@ def _row_value(row, key, default=None):
     return default if val is None else val
 
 
-def _sqlite_checkpoint_if_possible(db):
-    try:
-        db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
-    except Exception as e:
-        if is_debug_mode_enabled():
-            log.debug(f"SQLite WAL checkpoint skipped/failed: {e}")
-
-
-def _add_dir_to_zip(zipf: zipfile.ZipFile, source_dir: Path, archive_root: str) -> None:
-    if not source_dir.exists() or not source_dir.is_dir():
-        return
-
-    for path in source_dir.rglob("*"):
-        if path.is_file():
-            rel = path.relative_to(source_dir)
-            zipf.write(path, f"{archive_root}/{rel.as_posix()}")
+def _incremental_base(backup_dir: Path):
+    if BACKUP_FULL_EVERY <= 1:
+        return None
+    base = latest_full_backup(backup_dir)
+    if base is None:
+        return None
+    if incremental_backups_since(backup_dir, base) >= BACKUP_FULL_EVERY - 1:
+        return None
+    return base
 
 
 def run(task_id: int, db):
@@ -61,48 +60,29 @@ def run(task_id: int, db):
 
         database_path = Path(Config.DATABASE)
         backup_dir = Path(os.environ.get("VODUM_BACKUP_DIR", "/appdata/backups"))
-        attachments_dir = database_path.parent / "attachments"
-        encryption_key = encryption_key_bytes()
 
         if not database_path.exists():
             raise FileNotFoundError(f"Database not found: {database_path}")
 
         backup_dir.mkdir(parents=True, exist_ok=True)
 
-        _sqlite_checkpoint_if_possible(db)
-
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"backup_{timestamp}.zip"
-        backup_path = backup_dir / backup_name
-        tmp_backup_path = backup_dir / f".{backup_name}.uploading"
-
-        manifest = {
-            "format": "vodum-full-backup",
-            "version": 2,
-            "created_at_utc": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-            "database": "database.db",
-            "includes": {
-                "database": True,
-                "attachments": attachments_dir.exists(),
-                "encryption_key": True,
-            },
-        }
-
-        log.info(f"Creating full backup: {backup_name}")
-
-        if tmp_backup_path.exists():
-            tmp_backup_path.unlink()
-
-        with zipfile.ZipFile(tmp_backup_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(database_path, "database.db")
-            zipf.writestr("vodum.encryption_key", encryption_key)
-            zipf.writestr("manifest.json", json.dumps(manifest, indent=2))
-            _add_dir_to_zip(zipf, attachments_dir, "attachments")
-
-        if tmp_backup_path.stat().st_size <= 0:
-            raise RuntimeError("Backup zip was created empty")
-
-        os.replace(tmp_backup_path, backup_path)
+        # Backup manuel (page Backup) : toujours complet, téléchargeable seul
+        if consume_full_backup_request(backup_dir):
+            base_backup = None
+        else:
+            base_backup = _incremental_base(backup_dir)
+        if base_backup:
+            log.info(f"Creating incremental backup (base {base_backup.name})")
+        else:
+            log.info("Creating full backup")
+
+        result = build_backup_archive(database_path, backup_dir, base_backup=base_backup)
+        backup_name = result["name"]
+        if result["kind"] == "incremental":
+            log.info(
+                f"Incremental backup {backup_name}: {result['changed_chunks']}/{result['total_chunks']} "
+                f"chunk(s) changed, {result['size']} bytes"
+            )
 
         stats = prune_backups(
             backup_dir,
@@ -121,12 +101,9 @@ def run(task_id: int, db):
         duration = time.monotonic() - start
         log.info(f"=== AUTO BACKUP : COMPLETED SUCCESSFULLY IN {duration:.2f}s ===")
 
+        return result
+
     except Exception as e:
         log.error("Error during AUTO BACKUP", exc_info=True)
-        try:
-            if "tmp_backup_path" in locals() and tmp_backup_path.exists():
-                tmp_backup_path.unlink()
-        except Exception:
-            log.warning("Unable to remove failed temporary auto-backup", exc_info=True)
         task_logs(task_id, "error", f"Auto-backup error: {e}")
         raise
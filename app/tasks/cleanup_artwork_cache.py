@@ -2,15 +2,22 @@
 """
 cleanup_artwork_cache.py
 - Nettoie le cache disque des posters/backdrops monitoring.
-- Supprime les fichiers .img/.json plus vieux que la rétention définie.
-- Supprime aussi les fichiers orphelins quand le binôme .img/.json n'existe plus.
+- Supprime les entrées (original + vignettes) plus vieilles que la rétention définie.
+- Applique le budget disque (VODUM_ARTWORK_CACHE_MAX_BYTES) en évinçant les
+  entrées les moins récemment servies.
+- Travaille sur l'index en mémoire du cache, puis purge à chaque run les
+  fichiers orphelins / .tmp restés sur le disque (un seul scandir).
 """
 
 from pathlib import Path
 from datetime import datetime, timedelta
 import os
 
-from core.monitoring.artwork_cache import ARTWORK_CACHE_DIR
+from core.monitoring.artwork_cache import (
+    ARTWORK_CACHE_DIR,
+    artwork_cache_index,
+    enforce_artwork_cache_budget,
+)
 from tasks_engine import task_logs
 from logging_utils import get_logger, is_debug_mode_enabled
 
@@ -29,18 +36,6 @@ def _safe_retention_days(value) -> int:
         return 30
 
 
-def _is_cache_file(path: Path) -> bool:
-    return path.is_file() and path.suffix.lower() in {".img", ".json", ".tmp"}
-
-
-def _counterpart_exists(path: Path) -> bool:
-    if path.suffix.lower() == ".img":
-        return path.with_suffix(".json").exists()
-    if path.suffix.lower() == ".json":
-        return path.with_suffix(".img").exists()
-    return True
-
-
 def run(task_id: int, db):
     task_logs(task_id, "info", "Task cleanup_artwork_cache started")
     log.info("=== CLEANUP ARTWORK CACHE : STARTING ===")
@@ -57,7 +52,8 @@ def run(task_id: int, db):
     cutoff = datetime.utcnow() - timedelta(days=retention_days)
     cutoff_ts = cutoff.timestamp()
 
-    scanned = 0
+    index = artwork_cache_index()
+    scanned = index.stats()["entries"]
     deleted = 0
     errors = 0
 
@@ -65,27 +61,29 @@ def run(task_id: int, db):
         log.debug(f"Artwork cache retention = {retention_days} days -> cutoff UTC = {cutoff}")
         log.debug(f"Artwork cache directory = {base}")
 
-    for path in base.iterdir():
-        if not _is_cache_file(path):
-            continue
-
-        scanned += 1
-
+    for cache_key in index.keys_older_than(cutoff_ts):
         try:
-            stat = path.stat()
-            too_old = stat.st_mtime < cutoff_ts
-            orphan = path.suffix.lower() in {".img", ".json"} and not _counterpart_exists(path)
-            tmp_file = path.suffix.lower() == ".tmp"
-
-            if too_old or orphan or tmp_file:
-                path.unlink()
+            if index.remove(cache_key):
                 deleted += 1
-
         except Exception as e:
             errors += 1
-            log.warning(f"Unable to process artwork cache file {path}: {e}", exc_info=True)
+            log.warning(f"Unable to remove artwork cache entry {cache_key}: {e}", exc_info=True)
 
-    msg = f"{deleted} artwork cache file(s) deleted (scanned {scanned}) — retention {retention_days} days."
+    evicted = enforce_artwork_cache_budget()
+
+    try:
+        orphans = index.sweep_orphans()
+    except Exception as e:
+        orphans = 0
+        errors += 1
+        log.warning(f"Unable to sweep orphan artwork cache files: {e}", exc_info=True)
+
+    stats = index.stats()
+
+    msg = (
+        f"{deleted} artwork cache entries deleted (scanned {scanned}) — retention {retention_days} days. "
+        f"{evicted} evicted over budget, {orphans} orphan file(s) removed, {stats['bytes']} bytes in cache."
+    )
     if errors:
         msg += f" Errors: {errors}."
 
@@ -97,5 +95,9 @@ def run(task_id: int, db):
         "scanned": scanned,
         "deleted": deleted,
         "errors": errors,
+        "evicted": evicted,
+        "orphans": orphans,
+        "cache_bytes": stats["bytes"],
+        "max_bytes": stats["max_bytes"],
         "retention_days": retention_days,
     }
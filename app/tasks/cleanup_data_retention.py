@@ -14,6 +14,10 @@ from logging_utils import get_logger
 
 log = get_logger("cleanup_data_retention")
 
+# Taille des lots de suppression : chaque lot est commité séparément pour
+# libérer le writer SQLite entre deux lots (tables d'historique volumineuses).
+DELETE_BATCH_SIZE = 5000
+
 
 def _row_value(row, key, default=None):
     if not row:
@@ -62,23 +66,32 @@ def run(task_id: int, db):
 
     total_deleted = 0
 
-    def _del(sql: str, params: tuple, label: str):
+    def _del(table: str, where_sql: str, params: tuple):
         nonlocal total_deleted
-        cur = db.execute(sql, params)
-        deleted = getattr(cur, "rowcount", 0) or 0
+        deleted = db.execute_in_chunks(
+            f"""
+            DELETE FROM {table}
+            WHERE rowid IN (
+                SELECT rowid FROM {table}
+                WHERE {where_sql}
+                LIMIT {int(DELETE_BATCH_SIZE)}
+            )
+            """,
+            params,
+        )
         total_deleted += deleted
-        task_logs(task_id, "info", f"{label}: deleted={deleted}")
-        log.info(f"{label}: deleted={deleted}")
+        task_logs(task_id, "info", f"{table}: deleted={deleted}")
+        log.info(f"{table}: deleted={deleted}")
 
     # -------------------------------------------------
     # Purges (historiques uniquement)
     # -------------------------------------------------
-    _del("DELETE FROM sent_emails WHERE sent_at < ?", (cutoff_iso,), "sent_emails")
-    _del("DELETE FROM sent_discord WHERE sent_at IS NOT NULL AND sent_at < ?", (cutoff_epoch,), "sent_discord")
-    _del("DELETE FROM media_session_history WHERE stopped_at < ?", (cutoff_iso,), "media_session_history")
-    _del("DELETE FROM media_events WHERE ts < ?", (cutoff_iso,), "media_events")
-    _del("DELETE FROM media_jobs WHERE created_at < ?", (cutoff_iso,), "media_jobs")
-    _del("DELETE FROM tautulli_import_jobs WHERE created_at < ?", (cutoff_iso,), "tautulli_import_jobs")
+    _del("sent_emails", "sent_at < ?", (cutoff_iso,))
+    _del("sent_discord", "sent_at IS NOT NULL AND sent_at < ?", (cutoff_epoch,))
+    _del("media_session_history", "stopped_at < ?", (cutoff_iso,))
+    _del("media_events", "ts < ?", (cutoff_iso,))
+    _del("media_jobs", "created_at < ?", (cutoff_iso,))
+    _del("tautulli_import_jobs", "created_at < ?", (cutoff_iso,))
 
     task_logs(task_id, "success", f"Cleanup finished. total_deleted={total_deleted}")
     log.info(f"=== CLEANUP DATA RETENTION : DONE (total_deleted={total_deleted}) ===")
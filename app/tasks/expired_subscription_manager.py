@@ -129,7 +129,7 @@ def _create_system_policy(db, vodum_user_id: int) -> int:
     text = "Your subscription has ended. Please renew to restore access."
     rule = _policy_rule(title, text)
 
-    db.execute(
+    cur = db.execute(
         """
         INSERT INTO stream_policies(
             scope_type, scope_id,
@@ -158,8 +158,7 @@ def _create_system_policy(db, vodum_user_id: int) -> int:
         """
     )
 
-    row = db.query_one("SELECT last_insert_rowid() AS id")
-    return int(row["id"]) if row else 0
+    return int(cur.lastrowid or 0)
 
 
 def _delete_policy(db, policy_id: int) -> None:
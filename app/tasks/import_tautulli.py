@@ -19,15 +19,25 @@ Rules:
 - Dedup:
   - unique index on (server_id, media_user_id, started_at, media_key, client_name)
   - started_at can be truncated to minute (env-controlled)
+- Incremental:
+  - high-water mark per (VODUM server, Tautulli pms_identifier) in tautulli_import_watermarks
+  - only session_history rows with a greater id are read; the mark is committed with
+    each batch so a crashed import resumes from the last committed batch
+  - full rescan when the import options change or the Tautulli DB was reset
+  - rows skipped for an unknown user / library can become importable after a VODUM
+    sync: the known user / library sets are fingerprinted into the options key, so a
+    change triggers one full rescan (re-read rows are deduplicated)
 - Delete uploaded tautulli.db after processing if configured.
 """
 
 from __future__ import annotations
 
+import hashlib
 import os
 import sqlite3
 import json
 import sys
+import time
 from db_manager import open_sqlite_connection
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
@@ -80,6 +90,10 @@ class ImportStats:
     skipped_duplicates: int = 0
     skipped_missing_required: int = 0
     skipped_unknown_server: int = 0
+    resumed_from_id: int = 0
+    last_history_id: int = 0
+    elapsed_s: float = 0.0
+    rows_per_s: float = 0.0
 
 
 def _norm(s: Optional[str]) -> str:
@@ -184,6 +198,80 @@ def _ensure_unique_index(conn: sqlite3.Connection) -> None:
 
 
 
+def _known_set_fingerprint(values) -> str:
+    digest = hashlib.sha1("\n".join(sorted(str(v) for v in values)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _options_key(
+    keep_all_users: bool,
+    keep_all_libraries: bool,
+    import_only_available_libraries: bool,
+    known_users: str = "",
+    known_libraries: str = "",
+) -> str:
+    # Des options différentes importent d'autres lignes : le mark n'est alors plus valable.
+    # Idem quand les users / libraries connus changent (lignes ignorées devenues importables).
+    key = (
+        f"users={int(bool(keep_all_users))};"
+        f"libraries={int(bool(keep_all_libraries))};"
+        f"only_available={int(bool(import_only_available_libraries))}"
+    )
+    if known_users:
+        key += f";known_users={known_users}"
+    if known_libraries:
+        key += f";known_libraries={known_libraries}"
+    return key
+
+
+def _load_watermark(db, server_id: int, pms_identifier: str) -> Optional[dict]:
+    row = db.query_one(
+        """
+        SELECT last_history_id, last_started, options_key, rows_imported
+        FROM tautulli_import_watermarks
+        WHERE server_id = ? AND pms_identifier = ?
+        """,
+        (int(server_id), pms_identifier),
+    )
+    return dict(row) if row else None
+
+
+def _save_watermark(
+    db,
+    server_id: int,
+    pms_identifier: str,
+    last_history_id: int,
+    last_started: Optional[int],
+    options_key: str,
+    inserted: int,
+    reset: bool = False,
+) -> None:
+    db.execute(
+        """
+        INSERT INTO tautulli_import_watermarks(
+          server_id, pms_identifier, last_history_id, last_started, options_key, rows_imported, updated_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(server_id, pms_identifier) DO UPDATE SET
+          last_history_id = excluded.last_history_id,
+          last_started = excluded.last_started,
+          options_key = excluded.options_key,
+          rows_imported = CASE WHEN ? THEN excluded.rows_imported
+                               ELSE tautulli_import_watermarks.rows_imported + excluded.rows_imported END,
+          updated_at = CURRENT_TIMESTAMP
+        """,
+        (
+            int(server_id),
+            pms_identifier,
+            int(last_history_id),
+            last_started,
+            options_key,
+            int(inserted),
+            1 if reset else 0,
+        ),
+    )
+
+
 def _get_known_library_section_ids(vodum_conn: sqlite3.Connection, server_id: int) -> Set[str]:
     """
     Load known Plex library section ids from VODUM.
@@ -283,7 +371,7 @@ def _vodum_find_or_create_expired_user(
     # 2) create vodum_user if missing (EXPIRED)
     if vodum_user_id is None:
         display_username = username or (email.split("@")[0] if email and "@" in email else "unknown")
-        db.execute(
+        cur = db.execute(
             """
             INSERT INTO vodum_users(username, email, expiration_date, status, status_changed_at, notes)
             VALUES (?, ?, datetime('now','-1 day'), 'expired', CURRENT_TIMESTAMP, ?)
@@ -294,7 +382,7 @@ def _vodum_find_or_create_expired_user(
                 "Auto-created from Tautulli import (expired to avoid mails/policies).",
             ),
         )
-        vodum_user_id = int(db.query_one("SELECT last_insert_rowid() AS id")["id"])
+        vodum_user_id = int(cur.lastrowid)
 
     # 3) find existing media_user
     r = db.query_one(
@@ -314,14 +402,14 @@ def _vodum_find_or_create_expired_user(
         return int(r["id"])
 
     # 4) create media_user
-    db.execute(
+    cur = db.execute(
         """
         INSERT INTO media_users(server_id, vodum_user_id, external_user_id, username, email, type, raw_json)
         VALUES (?, ?, ?, ?, ?, 'plex', NULL)
         """,
         (int(server_id), int(vodum_user_id), external_user_id or None, username or "unknown", email or None),
     )
-    return int(db.query_one("SELECT last_insert_rowid() AS id")["id"])
+    return int(cur.lastrowid)
 
 
 def import_tautulli_db(
@@ -331,9 +419,11 @@ def import_tautulli_db(
     keep_all_libraries: bool = False,
     import_only_available_libraries: bool = True,
     target_server_id: int = 0,
+    full_rescan: bool = False,
 ) -> ImportStats:
 
     stats = ImportStats()
+    logger = get_logger("task_import_tautulli")
 
     # Open Tautulli DB (read-only is not guaranteed with sqlite3 stdlib, but we only SELECT)
     tconn = open_sqlite_connection(
@@ -356,6 +446,7 @@ def import_tautulli_db(
         # - else pick by overlap of libraries (and if tie -> ask user to choose)
         # ------------------------------------------------------------
         forced_server_id = int(target_server_id or 0)
+        tautulli_server_identifier = _detect_pms_identifier(tconn)
 
         if forced_server_id > 0:
             chk = db.query_one("SELECT id FROM servers WHERE id=? AND type='plex'", (forced_server_id,))
@@ -364,8 +455,6 @@ def import_tautulli_db(
             vodum_server_id = forced_server_id
         else:
             # Try pms_identifier (some DBs have it)
-            tautulli_server_identifier = _detect_pms_identifier(tconn)
-
             if tautulli_server_identifier:
                 existing = db.query_one(
                     "SELECT id FROM servers WHERE type='plex' AND server_identifier=?",
@@ -399,37 +488,38 @@ def import_tautulli_db(
         tautulli_sections = _tautulli_list_library_sections(tconn)
 
         vodum_lib_map = {}  # section_id (str) -> library_id (int)
-        for s in tautulli_sections:
-            section_id = (s.get("section_id") or "").strip()
-            if not section_id:
-                continue
-
-            row = db.query_one(
-                "SELECT id FROM libraries WHERE server_id=? AND section_id=?",
-                (vodum_server_id, section_id),
-            )
-            if row:
-                vodum_lib_map[section_id] = int(row["id"])
-                continue
+        with db.transaction():
+            for s in tautulli_sections:
+                section_id = (s.get("section_id") or "").strip()
+                if not section_id:
+                    continue
 
-            if keep_all_libraries:
-                # create placeholder library in VODUM
-                db.execute(
-                    """
-                    INSERT OR IGNORE INTO libraries(server_id, section_id, name, type, item_count)
-                    VALUES (?, ?, ?, ?, NULL)
-                    """,
-                    (vodum_server_id, section_id, s.get("section_name") or f"Library {section_id}", s.get("section_type") or None),
-                )
-                row2 = db.query_one(
+                row = db.query_one(
                     "SELECT id FROM libraries WHERE server_id=? AND section_id=?",
                     (vodum_server_id, section_id),
                 )
-                if row2:
-                    vodum_lib_map[section_id] = int(row2["id"])
-            else:
-                # only_existing: do not map -> sessions in this library will be skipped
-                pass
+                if row:
+                    vodum_lib_map[section_id] = int(row["id"])
+                    continue
+
+                if keep_all_libraries:
+                    # create placeholder library in VODUM
+                    db.execute(
+                        """
+                        INSERT OR IGNORE INTO libraries(server_id, section_id, name, type, item_count)
+                        VALUES (?, ?, ?, ?, NULL)
+                        """,
+                        (vodum_server_id, section_id, s.get("section_name") or f"Library {section_id}", s.get("section_type") or None),
+                    )
+                    row2 = db.query_one(
+                        "SELECT id FROM libraries WHERE server_id=? AND section_id=?",
+                        (vodum_server_id, section_id),
+                    )
+                    if row2:
+                        vodum_lib_map[section_id] = int(row2["id"])
+                else:
+                    # only_existing: do not map -> sessions in this library will be skipped
+                    pass
 
         if import_only_available_libraries and not vodum_lib_map:
             raise RuntimeError(
@@ -441,12 +531,59 @@ def import_tautulli_db(
         # Build user map
         email_to_mu, username_to_mu = _build_user_maps(db.conn, vodum_server_id)
 
+        # ------------------------------------------------------------
+        # High-water mark (sans pms_identifier : import complet, comme avant)
+        # ------------------------------------------------------------
+        watermark_key = (tautulli_server_identifier or "").strip()
+        # Seuls les ensembles qui filtrent des lignes comptent (keep_all_users
+        # crée les users manquants : l'ensemble grossit à chaque import)
+        options_key = _options_key(
+            keep_all_users,
+            keep_all_libraries,
+            import_only_available_libraries,
+            known_users=(
+                ""
+                if keep_all_users
+                else _known_set_fingerprint(
+                    [f"e:{k}" for k in email_to_mu] + [f"u:{k}" for k in username_to_mu]
+                )
+            ),
+            known_libraries=(
+                _known_set_fingerprint(vodum_lib_map)
+                if import_only_available_libraries
+                else ""
+            ),
+        )
+        since_id = 0
+        reset_watermark = True
+
+        if watermark_key:
+            watermark = _load_watermark(db, vodum_server_id, watermark_key)
+            max_row = tconn.execute("SELECT MAX(id) FROM session_history").fetchone()
+            max_history_id = _safe_int(max_row[0] if max_row else 0)
+
+            if watermark and not full_rescan:
+                last_history_id = _safe_int(watermark.get("last_history_id"))
+                if watermark.get("options_key") != options_key:
+                    logger.info("Tautulli import options or known users / libraries changed since last import: full rescan")
+                elif last_history_id > max_history_id:
+                    logger.info("Tautulli session_history was reset (max id below watermark): full rescan")
+                else:
+                    since_id = last_history_id
+                    reset_watermark = False
+        else:
+            logger.info("No pms_identifier in this Tautulli DB: incremental import disabled, full scan")
+
+        stats.resumed_from_id = since_id
+        stats.last_history_id = since_id
+
         # ------------------------------------------------------------
         # Extract sessions
         # We use COALESCE(u.email, sh.user) for email.
         # ------------------------------------------------------------
         q = """
         SELECT
+          sh.id                  AS history_id,
           sh.reference_id        AS tautulli_reference_id,
           sh.started             AS started,
           sh.stopped             AS stopped,
@@ -477,11 +614,12 @@ def import_tautulli_db(
           ON u.user_id = sh.user_id
         LEFT JOIN session_history_metadata m
           ON m.id = sh.reference_id
-
-        ORDER BY sh.started ASC
+        WHERE sh.id > ?
+        ORDER BY sh.id ASC
         """
 
-        cur = tconn.execute(q)
+        started_clock = time.monotonic()
+        cur = tconn.execute(q, (since_id,))
 
         insert_sql = """
         INSERT OR IGNORE INTO media_session_history (
@@ -508,24 +646,54 @@ def import_tautulli_db(
         """
 
         batch: List[Tuple] = []
+        pending_rows = 0
+        last_started: Optional[int] = None
 
         def flush_batch() -> None:
-            nonlocal batch
-            if not batch:
+            nonlocal batch, pending_rows, reset_watermark
+            if not batch and not pending_rows:
                 return
 
-            before = db.conn.total_changes
-            db.executemany(insert_sql, batch)
-            after = db.conn.total_changes
+            # total_changes est lu sous le verrou du writer : les écritures
+            # des autres threads ne faussent plus le compteur d'insertions.
+            # Le mark avance dans la même transaction que le lot.
+            with db.transaction():
+                before = db.conn.total_changes
+                if batch:
+                    db.executemany(insert_sql, batch)
+                after = db.conn.total_changes
+
+                inserted_now = max(0, after - before)
+                if watermark_key:
+                    _save_watermark(
+                        db,
+                        vodum_server_id,
+                        watermark_key,
+                        stats.last_history_id,
+                        last_started,
+                        options_key,
+                        inserted_now,
+                        reset=reset_watermark,
+                    )
+                    reset_watermark = False
 
-            inserted_now = max(0, after - before)
             stats.inserted += inserted_now
             stats.skipped_duplicates += max(0, len(batch) - inserted_now)
 
             batch = []
+            pending_rows = 0
 
         for row in cur:
+            if pending_rows >= BATCH_SIZE:
+                # Lignes ignorées comprises : le mark progresse même sans insertion.
+                # Flush avant de compter la ligne courante : le mark ne couvre
+                # que des lignes entièrement traitées.
+                flush_batch()
+
             stats.scanned += 1
+            pending_rows += 1
+            stats.last_history_id = _safe_int(row["history_id"], stats.last_history_id)
+            last_started = _safe_int(row["started"]) or last_started
 
             section_id = str(row["section_id"] or "").strip()
 
@@ -559,13 +727,14 @@ def import_tautulli_db(
                         stats.skipped_missing_user_key += 1
                         continue
 
-                    media_user_id = _vodum_find_or_create_expired_user(
-                        db,
-                        server_id=vodum_server_id,
-                        email=email_raw or "",
-                        username=username_raw or "",
-                        external_user_id=external_user_id,
-                    )
+                    with db.transaction():
+                        media_user_id = _vodum_find_or_create_expired_user(
+                            db,
+                            server_id=vodum_server_id,
+                            email=email_raw or "",
+                            username=username_raw or "",
+                            external_user_id=external_user_id,
+                        )
                     # refresh maps
                     if email:
                         email_to_mu[email] = int(media_user_id)
@@ -667,10 +836,10 @@ def import_tautulli_db(
                 )
             )
 
-            if len(batch) >= BATCH_SIZE:
-                flush_batch()
-
         flush_batch()
+
+        stats.elapsed_s = round(time.monotonic() - started_clock, 3)
+        stats.rows_per_s = round(stats.scanned / stats.elapsed_s, 1) if stats.elapsed_s > 0 else 0.0
         return stats
 
     finally:
@@ -790,6 +959,10 @@ def run(task_id, db):
                 "skipped_unknown_library": stats.skipped_unknown_library,
                 "skipped_missing_user_key": stats.skipped_missing_user_key,
                 "skipped_missing_required": stats.skipped_missing_required,
+                "resumed_from_id": stats.resumed_from_id,
+                "last_history_id": stats.last_history_id,
+                "elapsed_s": stats.elapsed_s,
+                "rows_per_s": stats.rows_per_s,
             }
 
             db.execute(
@@ -861,6 +1034,7 @@ def build_cli_parser() -> argparse.ArgumentParser:
     parser.add_argument("--keep-all-users", action="store_true")
     parser.add_argument("--keep-all-libraries", action="store_true")
     parser.add_argument("--target-server-id", type=int, default=0)
+    parser.add_argument("--full-rescan", action="store_true", help="Ignore the incremental high-water mark")
     add_summary_only_argument(parser)
     return parser
 
@@ -879,6 +1053,7 @@ def main(argv=None):
         keep_all_libraries=bool(args.keep_all_libraries),
         import_only_available_libraries=not bool(args.keep_all_libraries),
         target_server_id=int(args.target_server_id or 0),
+        full_rescan=bool(args.full_rescan),
     )
 
     emit_task_result(
@@ -895,6 +1070,8 @@ def main(argv=None):
             f"Skipped (unknown user): {stats.skipped_unknown_user}",
             f"Skipped (unknown lib): {stats.skipped_unknown_library}",
             f"Skipped (invalid row): {stats.skipped_missing_required}",
+            f"Resumed after session_history.id: {stats.resumed_from_id} (now {stats.last_history_id})",
+            f"Throughput: {stats.rows_per_s} rows/s over {stats.elapsed_s}s",
         ),
     )
 
@@ -11,3 +11,5 @@ def run(task_id: int, db):
 
     # Log txt (logging_utils)
     logger.info(f"[TASK {task_id}] report={report}")
+
+    return report
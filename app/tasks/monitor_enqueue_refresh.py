@@ -1,9 +1,13 @@
 import json
 from datetime import datetime, timezone
 from core.server_cooldown import should_skip_unreachable_server
+from core.monitoring.push_channels import push_channel_connected
 
 DEFAULT_INTERVAL_SEC = 15
 MIN_INTERVAL_SEC = 15
+# Serveur suivi en push (websocket connecté) : le polling ne sert plus qu'au
+# reconcile de sécurité.
+PUSH_RECONCILE_INTERVAL_SEC = 120
 
 
 def _utcnow():
@@ -24,12 +28,13 @@ def run(task_id, db):
     Toutes les minutes:
     - regarde les serveurs plex/jellyfin
     - si le dernier refresh monitoring est trop ancien => enfile un job refresh
+    - serveurs avec websocket connecté : simple reconcile lent
     """
     servers = db.query("""
         SELECT id, type, settings_json, status, cooldown_until
         FROM servers
         WHERE LOWER(TRIM(type)) IN ('plex','jellyfin')
-    """)
+    """, decrypt_servers=True)
 
     now = _utcnow()
     enqueued = 0
@@ -54,6 +59,10 @@ def run(task_id, db):
         if interval < MIN_INTERVAL_SEC:
             interval = MIN_INTERVAL_SEC
 
+        push_connected = push_channel_connected(server_id)
+        if push_connected:
+            interval = max(interval, PUSH_RECONCILE_INTERVAL_SEC)
+
         last_refresh_row = db.query_one("""
             SELECT COALESCE(MAX(processed_at), MAX(created_at)) AS last_refresh
             FROM media_jobs
@@ -71,7 +80,10 @@ def run(task_id, db):
         due += 1
 
         dedupe_key = f"monitor:refresh:server={server_id}"
-        payload = json.dumps({"interval_sec": interval, "reason": "schedule"}, ensure_ascii=False)
+        payload = json.dumps(
+            {"interval_sec": interval, "reason": "reconcile" if push_connected else "schedule"},
+            ensure_ascii=False,
+        )
 
         existing = db.query_one("""
             SELECT id, status, run_after, locked_until
@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import sqlite3
@@ -13,6 +14,12 @@ from logging_utils import get_logger
 from tasks_engine import prepare_restored_database, task_logs
 from core.archive_safety import validate_zip_limits
 from core.app_paths import imports_dir as get_imports_dir
+from core.sqlite_backup import (
+    INCREMENTAL_BACKUP_FORMAT,
+    apply_delta,
+    digests_fingerprint,
+    read_full_backup_digests,
+)
 from secret_store import (
     encryption_key_file_path,
     install_encryption_key,
@@ -117,6 +124,47 @@ def _safe_extract_zip_dir(zipf: zipfile.ZipFile, archive_root: str, target_dir:
     return extracted
 
 
+def _read_zip_manifest(zipf: zipfile.ZipFile) -> dict:
+    if "manifest.json" not in zipf.namelist():
+        return {}
+    try:
+        manifest = json.loads(zipf.read("manifest.json"))
+    except ValueError:
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _rebuild_incremental_database(
+    backup_path: Path,
+    zipf: zipfile.ZipFile,
+    manifest: dict,
+    extracted_db: Path,
+) -> None:
+    """Extrait la base de la sauvegarde complète de référence puis applique le delta."""
+    base_name = str(manifest.get("base") or "")
+    if not base_name or Path(base_name).name != base_name or not base_name.endswith(".zip"):
+        raise ValueError("Invalid incremental backup: missing base backup name")
+
+    # La complète est à côté de l'incrémental, ou dans le dossier des backups
+    backup_dir = Path(os.environ.get("VODUM_BACKUP_DIR", "/appdata/backups"))
+    candidates = [backup_path.parent / base_name, backup_dir / base_name]
+    base_path = next((path for path in candidates if path.is_file()), None)
+    if base_path is None:
+        raise FileNotFoundError(
+            f"Incremental backup requires its full backup {base_name} in {backup_dir}"
+        )
+
+    base_digests = read_full_backup_digests(base_path)
+    if base_digests is None or digests_fingerprint(base_digests) != manifest.get("base_fingerprint"):
+        raise ValueError(f"Full backup {base_name} does not match this incremental backup")
+
+    with zipfile.ZipFile(base_path, "r") as base_zip:
+        validate_zip_limits(base_zip)
+        _safe_extract_zip_member(base_zip, "database.db", extracted_db)
+
+    apply_delta(extracted_db, zipf, manifest.get("delta") or {})
+
+
 def _prepare_restore_source(
     backup_path: Path,
     work_dir: Path,
@@ -146,17 +194,21 @@ def _prepare_restore_source(
     with zipfile.ZipFile(backup_path, "r") as zipf:
         validate_zip_limits(zipf)
         names = set(zipf.namelist())
+        manifest = _read_zip_manifest(zipf)
 
-        db_member = None
-        for candidate in ("database.db", "database.sqlite"):
-            if candidate in names:
-                db_member = candidate
-                break
+        if manifest.get("format") == INCREMENTAL_BACKUP_FORMAT:
+            _rebuild_incremental_database(backup_path, zipf, manifest, extracted_db)
+        else:
+            db_member = None
+            for candidate in ("database.db", "database.sqlite"):
+                if candidate in names:
+                    db_member = candidate
+                    break
 
-        if not db_member:
-            raise ValueError("Invalid VODUM full backup: database.db is missing")
+            if not db_member:
+                raise ValueError("Invalid VODUM full backup: database.db is missing")
 
-        _safe_extract_zip_member(zipf, db_member, extracted_db)
+            _safe_extract_zip_member(zipf, db_member, extracted_db)
 
         if "vodum.encryption_key" in names:
             _safe_extract_zip_member(
@@ -1,17 +1,27 @@
 from __future__ import annotations
 
+import time
+
 from logging_utils import get_logger
 from tasks_engine import task_logs
 from communications_engine import (
     fetch_campaign_attachments,
     send_to_user,
+    prepare_user_delivery,
     record_history,
     available_channels,
+    UserDelivery,
 )
+from core.communications.campaign_dispatcher import CampaignDispatcher, CampaignTargetJob
 from core.communications.campaign_recovery import recover_campaigns
+from email_sender import close_idle_smtp_sessions
 
 log = get_logger("send_comm_campaigns")
 
+# Targets read per batch; batches are chained until the run budget is spent
+CAMPAIGN_BATCH_SIZE = 100
+CAMPAIGN_RUN_BUDGET_SECONDS = 300
+
 
 def _split_channels(raw: str | None) -> set[str]:
     if not raw:
@@ -178,6 +188,234 @@ def _apply_campaign_status(db, campaign_ids: set[int]) -> None:
         )
 
 
+def _fetch_due_targets(db, limit: int = CAMPAIGN_BATCH_SIZE) -> list[dict]:
+    rows = db.query(
+        """
+        SELECT
+          ct.id AS target_id,
+          ct.campaign_id,
+          ct.user_id,
+          ct.status,
+          ct.attempt_count,
+          ct.max_attempts,
+          ct.next_attempt_at,
+          ct.last_attempt_at,
+          ct.last_error,
+          ct.channels_sent,
+          c.name AS campaign_name,
+          c.subject,
+          c.body,
+          c.server_id,
+          c.status AS campaign_status
+        FROM comm_campaign_targets ct
+        JOIN comm_campaigns c ON c.id = ct.campaign_id
+        WHERE c.is_test = 0
+          AND (
+                ct.status = 'pending'
+             OR (
+                    ct.status = 'error'
+                AND COALESCE(ct.attempt_count, 0) < COALESCE(ct.max_attempts, 10)
+                AND ct.next_attempt_at IS NOT NULL
+                AND datetime(ct.next_attempt_at) <= datetime('now')
+             )
+          )
+        ORDER BY
+          CASE WHEN ct.status = 'pending' THEN 0 ELSE 1 END,
+          ct.id ASC
+        LIMIT ?
+        """,
+        (int(limit),),
+    )
+    return [dict(r) for r in (rows or [])]
+
+
+def _load_target_user(db, user_id: int) -> dict | None:
+    user = db.query_one(
+        """
+        SELECT
+            u.id,
+            u.username,
+            u.firstname,
+            u.lastname,
+            u.email,
+            u.second_email,
+            u.discord_user_id,
+            u.notifications_order_override,
+            (
+        SELECT mu.preferred_language
+        FROM media_users mu
+        WHERE mu.vodum_user_id = u.id
+          AND TRIM(COALESCE(mu.preferred_language, '')) <> ''
+        ORDER BY mu.id ASC
+        LIMIT 1
+      ) AS preferred_language,
+            u.expiration_date,
+            u.subscription_template_id,
+            st.name AS subscription_name,
+            st.duration_days AS subscription_duration_days,
+            st.subscription_value AS subscription_value
+        FROM vodum_users u
+        LEFT JOIN subscription_templates st ON st.id = u.subscription_template_id
+        WHERE u.id = ?
+        """,
+        (user_id,),
+    )
+    return dict(user) if user else None
+
+
+def _mark_target_sent(db, target_id: int, channels_sent: set[str] | None = None) -> None:
+    db.execute(
+        """
+        UPDATE comm_campaign_targets
+        SET status='sent',
+            last_error=NULL,
+            next_attempt_at=NULL,
+            last_attempt_at=CURRENT_TIMESTAMP,
+            channels_sent=COALESCE(?, channels_sent),
+            updated_at=CURRENT_TIMESTAMP
+        WHERE id=?
+        """,
+        (_join_channels(channels_sent or set()), target_id),
+    )
+
+
+def _schedule_target_retry(db, row: dict, err: str, channels_sent: set[str] | None = None) -> None:
+    target_id = int(row["target_id"])
+    next_attempt = int(row.get("attempt_count") or 0) + 1
+    max_attempts = int(row.get("max_attempts") or 10)
+    # Dernière tentative : erreur finale, plus de next_attempt_at
+    retry_modifier = None if next_attempt >= max_attempts else _next_retry_modifier(next_attempt)
+    db.execute(
+        """
+        UPDATE comm_campaign_targets
+        SET status='error',
+            attempt_count=?,
+            next_attempt_at=CASE WHEN ? IS NULL THEN NULL ELSE datetime('now', ?) END,
+            last_attempt_at=CURRENT_TIMESTAMP,
+            last_error=?,
+            channels_sent=COALESCE(?, channels_sent),
+            updated_at=CURRENT_TIMESTAMP
+        WHERE id=?
+        """,
+        (next_attempt, retry_modifier, retry_modifier, err, _join_channels(channels_sent or set()), target_id),
+    )
+
+
+def _start_target(db, settings: dict, dispatcher: CampaignDispatcher, row: dict) -> bool | None:
+    """
+    Prépare un target et le confie au dispatcher.
+    Retourne True/False si le target est déjà terminé, None s'il est en cours d'envoi.
+    """
+    target_id = int(row["target_id"])
+    campaign_id = int(row["campaign_id"])
+    user_id = int(row["user_id"])
+
+    user = _load_target_user(db, user_id)
+    if not user:
+        _schedule_target_retry(db, row, "User not found")
+        return False
+
+    attachments = fetch_campaign_attachments(db, campaign_id)
+    already_sent_channels = _split_channels(row.get("channels_sent"))
+    mode = _send_mode(settings)
+    required_channels = _required_channels(db, settings, user)
+
+    if mode == "all":
+        missing_channels = [ch for ch in required_channels if ch not in already_sent_channels]
+        if not missing_channels and required_channels:
+            _mark_target_sent(db, target_id)
+            return True
+        forced_channels = missing_channels
+    else:
+        # Reprise après interruption : un canal déjà envoyé suffit en mode FIRST
+        if already_sent_channels:
+            _mark_target_sent(db, target_id)
+            return True
+        forced_channels = None
+
+    delivery = prepare_user_delivery(
+        db=db,
+        settings=settings,
+        user=user,
+        subject=row.get("subject") or "",
+        body=row.get("body") or "",
+        attachments=attachments,
+        forced_channels=forced_channels,
+    )
+    job = CampaignTargetJob(
+        row=row,
+        user=user,
+        delivery=delivery if isinstance(delivery, UserDelivery) else None,
+        already_sent=already_sent_channels,
+        required_channels=required_channels,
+    )
+
+    if not isinstance(delivery, UserDelivery):
+        # Rien à envoyer (compte jamais utilisé, aucun canal) : résultat immédiat
+        for att in delivery:
+            _record_attempt(db, job, att)
+        job.attempts = list(delivery)
+        return _finish_target(db, settings, row, job.attempts, already_sent_channels, required_channels)
+
+    dispatcher.start(job)
+    return None
+
+
+def _record_attempt(db, job: CampaignTargetJob, att) -> None:
+    row = job.row
+    campaign_id = int(row["campaign_id"])
+    record_history(
+        db=db,
+        kind="campaign",
+        template_id=None,
+        campaign_id=campaign_id,
+        user_id=int(row["user_id"]),
+        attempt=att,
+        meta={
+            "campaign_id": campaign_id,
+            "campaign_name": row.get("campaign_name"),
+            "server_id": row.get("server_id"),
+            "target_id": int(row["target_id"]),
+            "attachments": [a.get("filename") for a in ((job.delivery.attachments if job.delivery else None) or [])],
+        },
+    )
+
+    if att.status == "sent" and att.channel in ("email", "discord") and att.channel not in job.already_sent:
+        # Progression persistée par canal : un redémarrage ne renvoie pas ce canal
+        job.already_sent.add(att.channel)
+        db.execute(
+            """
+            UPDATE comm_campaign_targets
+            SET channels_sent=?,
+                updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+            """,
+            (_join_channels(job.already_sent), int(row["target_id"])),
+        )
+
+
+def _finish_target(db, settings: dict, row: dict, attempts: list, channels_sent: set[str], required_channels: list[str]) -> bool:
+    target_id = int(row["target_id"])
+    mode = _send_mode(settings)
+
+    skipped_only = bool(attempts) and all(a.status == "skipped" for a in attempts)
+
+    if skipped_only:
+        target_ok = True
+    elif mode == "all":
+        target_ok = bool(required_channels) and all(ch in channels_sent for ch in required_channels)
+    else:
+        target_ok = any(a.status == "sent" for a in attempts)
+
+    if target_ok:
+        _mark_target_sent(db, target_id, channels_sent)
+        return True
+
+    err = "; ".join([a.error for a in attempts if a.error])[:1000] if attempts else "No channel available"
+    _schedule_target_retry(db, row, err, channels_sent)
+    return False
+
+
 def run(task_id: int, db):
     task_logs(task_id, "start", "Task send_comm_campaigns started")
     log.debug("=== SEND COMM CAMPAIGNS : START ===")
@@ -203,43 +441,7 @@ def run(task_id: int, db):
         )
         test_campaigns = [dict(r) for r in (test_campaign_rows or [])]
 
-        rows = db.query(
-            """
-            SELECT
-              ct.id AS target_id,
-              ct.campaign_id,
-              ct.user_id,
-              ct.status,
-              ct.attempt_count,
-              ct.max_attempts,
-              ct.next_attempt_at,
-              ct.last_attempt_at,
-              ct.last_error,
-              ct.channels_sent,
-              c.name AS campaign_name,
-              c.subject,
-              c.body,
-              c.server_id,
-              c.status AS campaign_status
-            FROM comm_campaign_targets ct
-            JOIN comm_campaigns c ON c.id = ct.campaign_id
-            WHERE c.is_test = 0
-              AND (
-                    ct.status = 'pending'
-                 OR (
-                        ct.status = 'error'
-                    AND COALESCE(ct.attempt_count, 0) < COALESCE(ct.max_attempts, 10)
-                    AND ct.next_attempt_at IS NOT NULL
-                    AND datetime(ct.next_attempt_at) <= datetime('now')
-                 )
-              )
-            ORDER BY
-              CASE WHEN ct.status = 'pending' THEN 0 ELSE 1 END,
-              ct.id ASC
-            LIMIT 100
-            """
-        )
-        due = [dict(r) for r in (rows or [])]
+        due = _fetch_due_targets(db)
 
         if not test_campaigns and not due:
             task_logs(task_id, "debug", "No queued communication campaigns")
@@ -249,6 +451,7 @@ def run(task_id: int, db):
         success = 0
         failed = 0
         touched_campaign_ids: set[int] = set()
+        dispatch_stats = {}
 
         for campaign in test_campaigns:
             processed += 1
@@ -271,197 +474,41 @@ def run(task_id: int, db):
             else:
                 failed += 1
 
-        for row in due:
-            processed += 1
-            target_id = int(row["target_id"])
-            campaign_id = int(row["campaign_id"])
-            user_id = int(row["user_id"])
-            touched_campaign_ids.add(campaign_id)
-
-            user = db.query_one(
-                """
-                SELECT
-                    u.id,
-                    u.username,
-                    u.firstname,
-                    u.lastname,
-                    u.email,
-                    u.second_email,
-                    u.discord_user_id,
-                    u.notifications_order_override,
-                    (
-                SELECT mu.preferred_language
-                FROM media_users mu
-                WHERE mu.vodum_user_id = u.id
-                  AND TRIM(COALESCE(mu.preferred_language, '')) <> ''
-                ORDER BY mu.id ASC
-                LIMIT 1
-              ) AS preferred_language,
-                    u.expiration_date,
-                    u.subscription_template_id,
-                    st.name AS subscription_name,
-                    st.duration_days AS subscription_duration_days,
-                    st.subscription_value AS subscription_value
-                FROM vodum_users u
-                LEFT JOIN subscription_templates st ON st.id = u.subscription_template_id
-                WHERE u.id = ?
-                """,
-                (user_id,),
-            )
-            user = dict(user) if user else None
-            if not user:
-                next_attempt = int(row.get("attempt_count") or 0) + 1
-                max_attempts = int(row.get("max_attempts") or 10)
-                if next_attempt >= max_attempts:
-                    db.execute(
-                        """
-                        UPDATE comm_campaign_targets
-                        SET status='error',
-                            attempt_count=?,
-                            next_attempt_at=NULL,
-                            last_attempt_at=CURRENT_TIMESTAMP,
-                            last_error=?,
-                            updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                        """,
-                        (next_attempt, "User not found", target_id),
-                    )
-                else:
-                    db.execute(
-                        """
-                        UPDATE comm_campaign_targets
-                        SET status='error',
-                            attempt_count=?,
-                            next_attempt_at=datetime('now', ?),
-                            last_attempt_at=CURRENT_TIMESTAMP,
-                            last_error=?,
-                            updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                        """,
-                        (next_attempt, _next_retry_modifier(next_attempt), "User not found", target_id),
-                    )
-                failed += 1
-                continue
-
-            attachments = fetch_campaign_attachments(db, campaign_id)
-            already_sent_channels = _split_channels(row.get("channels_sent"))
-            mode = _send_mode(settings)
-            required_channels = _required_channels(db, settings, user)
-
-            if mode == "all":
-                missing_channels = [ch for ch in required_channels if ch not in already_sent_channels]
-                if not missing_channels and required_channels:
-                    db.execute(
-                        """
-                        UPDATE comm_campaign_targets
-                        SET status='sent',
-                            last_error=NULL,
-                            next_attempt_at=NULL,
-                            updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                        """,
-                        (target_id,),
-                    )
-                    success += 1
-                    continue
-                forced_channels = missing_channels
-            else:
-                forced_channels = None
-
-            attempts = send_to_user(
-                db=db,
-                settings=settings,
-                user=user,
-                subject=row.get("subject") or "",
-                body=row.get("body") or "",
-                attachments=attachments,
-                forced_channels=forced_channels,
-            )
-
-            updated_channels_sent = set(already_sent_channels)
-            for att in attempts:
-                if att.status == "sent":
-                    updated_channels_sent.add(att.channel)
-                record_history(
-                    db=db,
-                    kind="campaign",
-                    template_id=None,
-                    campaign_id=campaign_id,
-                    user_id=user_id,
-                    attempt=att,
-                    meta={
-                        "campaign_id": campaign_id,
-                        "campaign_name": row.get("campaign_name"),
-                        "server_id": row.get("server_id"),
-                        "target_id": target_id,
-                        "attachments": [a.get("filename") for a in (attachments or [])],
-                    },
-                )
-
-            skipped_only = bool(attempts) and all(a.status == "skipped" for a in attempts)
-
-            if skipped_only:
-                target_ok = True
-            elif mode == "all":
-                target_ok = bool(required_channels) and all(ch in updated_channels_sent for ch in required_channels)
-            else:
-                target_ok = any(a.status == "sent" for a in attempts)
-
-            if target_ok:
-                db.execute(
-                    """
-                    UPDATE comm_campaign_targets
-                    SET status='sent',
-                        last_error=NULL,
-                        next_attempt_at=NULL,
-                        last_attempt_at=CURRENT_TIMESTAMP,
-                        channels_sent=?,
-                        updated_at=CURRENT_TIMESTAMP
-                    WHERE id=?
-                    """,
-                    (_join_channels(updated_channels_sent), target_id),
-                )
-                success += 1
-            else:
-                next_attempt = int(row.get("attempt_count") or 0) + 1
-                max_attempts = int(row.get("max_attempts") or 10)
-                err = "; ".join([a.error for a in attempts if a.error])[:1000] if attempts else "No channel available"
-                if next_attempt >= max_attempts:
-                    db.execute(
-                        """
-                        UPDATE comm_campaign_targets
-                        SET status='error',
-                            attempt_count=?,
-                            next_attempt_at=NULL,
-                            last_attempt_at=CURRENT_TIMESTAMP,
-                            last_error=?,
-                            channels_sent=?,
-                            updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                        """,
-                        (next_attempt, err, _join_channels(updated_channels_sent), target_id),
-                    )
-                else:
-                    db.execute(
-                        """
-                        UPDATE comm_campaign_targets
-                        SET status='error',
-                            attempt_count=?,
-                            next_attempt_at=datetime('now', ?),
-                            last_attempt_at=CURRENT_TIMESTAMP,
-                            last_error=?,
-                            channels_sent=?,
-                            updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?
-                        """,
-                        (next_attempt, _next_retry_modifier(next_attempt), err, _join_channels(updated_channels_sent), target_id),
-                    )
-                failed += 1
+        with CampaignDispatcher() as dispatcher:
+            while due:
+                for row in due:
+                    processed += 1
+                    touched_campaign_ids.add(int(row["campaign_id"]))
+                    outcome = _start_target(db, settings, dispatcher, row)
+                    if outcome is True:
+                        success += 1
+                    elif outcome is False:
+                        failed += 1
+
+                # Each target is persisted as soon as its channels are done
+                for job, attempt, done in dispatcher.completed():
+                    _record_attempt(db, job, attempt)
+                    if done:
+                        if _finish_target(db, settings, job.row, job.attempts, job.already_sent, job.required_channels):
+                            success += 1
+                        else:
+                            failed += 1
+
+                if time.monotonic() - dispatcher.started_at >= CAMPAIGN_RUN_BUDGET_SECONDS:
+                    break
+                due = _fetch_due_targets(db)
+
+            dispatch_stats = dispatcher.stats()
 
         _apply_campaign_status(db, touched_campaign_ids)
 
         msg = f"send_comm_campaigns finished — processed={processed} success={success} failed={failed}"
-        task_logs(task_id, "success" if success else "debug", msg, details={"campaign_ids": sorted(touched_campaign_ids)})
+        task_logs(
+            task_id,
+            "success" if success else "debug",
+            msg,
+            details={"campaign_ids": sorted(touched_campaign_ids), "dispatch": dispatch_stats},
+        )
         if success or failed:
             log.info(msg)
         else:
@@ -473,4 +520,6 @@ def run(task_id: int, db):
         task_logs(task_id, "error", f"Error send_comm_campaigns: {e}")
         raise
     finally:
+        # Campaign batch done: QUIT the pooled SMTP sessions it kept open
+        close_idle_smtp_sessions()
         log.debug("=== SEND COMM CAMPAIGNS : END ===")
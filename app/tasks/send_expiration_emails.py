@@ -31,6 +31,13 @@ from communications_engine import (
     schedule_template_notification,
 )
 from core.communications_recovery import recover_missed_scheduled_emails
+from core.expiration_notification_index import (
+    ExpirationNotificationIndex,
+    comm_contexts_from_rows,
+    load_scheduled_by_dedupe_key,
+    plex_invite_pending,
+    scheduled_row_blocks_requeue,
+)
 from core.expiration_template_selection import (
     get_days_after as _get_after,
     get_days_before as _get_days_before,
@@ -39,28 +46,11 @@ from core.expiration_template_selection import (
     pick_expiration_template as _pick_expiration_template,
     safe_int as _safe_int,
 )
-#from email_sender import send_email
+from email_sender import close_idle_smtp_sessions
 from mailing_utils import build_user_context, render_mail
 
 log = get_logger("send_expiration_emails")
 
-def _row_value(row, key, default=None):
-    try:
-        return row[key]
-    except Exception:
-        return default
-
-
-def _json_dict_or_empty(raw):
-    if not raw:
-        return {}
-    try:
-        data = json.loads(raw) if isinstance(raw, str) else raw
-    except Exception:
-        return {}
-    return data if isinstance(data, dict) else {}
-
-
 def _user_has_pending_plex_invite(db, vodum_user_id: int) -> bool:
     """
     True si :
@@ -78,33 +68,7 @@ def _user_has_pending_plex_invite(db, vodum_user_id: int) -> bool:
         (vodum_user_id,),
     ) or []
 
-    if not rows:
-        return False
-
-    any_accepted = False
-    any_pending = False
-
-    for row in rows:
-        accepted_at = str(_row_value(row, "accepted_at") or "").strip()
-        if accepted_at:
-            any_accepted = True
-            continue
-
-        details = _json_dict_or_empty(_row_value(row, "details_json"))
-        invite_state = details.get("plex_invite_state") or {}
-
-        if isinstance(invite_state, dict) and bool(invite_state.get("is_pending")):
-            any_pending = True
-            continue
-
-        external_user_id = str(_row_value(row, "external_user_id") or "").strip()
-        email = str(_row_value(row, "email") or "").strip()
-        username = str(_row_value(row, "username") or "").strip()
-
-        if not external_user_id and (email or username):
-            any_pending = True
-
-    return any_pending and not any_accepted
+    return plex_invite_pending(rows)
 
 def _parse_payload(payload_raw) -> dict:
     if not payload_raw:
@@ -654,13 +618,9 @@ def _already_sent_any(db, user_id: int, template_keys: str | list[str], exp_iso:
     return _already_sent_email(db, user_id, template_keys, exp_iso) or _already_sent_discord(db, user_id, template_keys, exp_iso)
 
 
-def _already_sent_for_current_mode(db, settings: dict, user: dict, template_keys: str | list[str], exp_iso: str) -> bool:
-    avail = available_channels(db, settings, user)
-    mode = _send_mode(settings)
-
-    email_sent = _already_sent_email(db, int(user["id"]), template_keys, exp_iso)
-    discord_sent = _already_sent_discord(db, int(user["id"]), template_keys, exp_iso)
-
+def _sent_for_mode(mode: str, avail: dict, email_sent: bool, discord_sent: bool) -> bool:
+    # In FIRST mode: one successful channel is enough
+    # In ALL mode  : all available channels must have succeeded
     if mode == "all":
         required = []
         if avail.get("email"):
@@ -670,7 +630,8 @@ def _already_sent_for_current_mode(db, settings: dict, user: dict, template_keys
         return bool(required) and all(required)
 
     # FIRST
-    return (avail.get("email") and email_sent) or (avail.get("discord") and discord_sent)
+    return bool((avail.get("email") and email_sent) or (avail.get("discord") and discord_sent))
+
 
 def _format_message(
     subject: str,
@@ -759,28 +720,111 @@ def _get_user_comm_contexts(db, user_id: int) -> list[dict]:
         (user_id,),
     ) or []
 
-    contexts = []
-    seen = set()
+    return comm_contexts_from_rows(rows)
+
+
+def _plan_expiration_notifications(users, templates: list[dict], settings: dict, lookups, today: date) -> dict:
+    """
+    Calcule les notifications d'expiration dues, sans écrire en base.
+
+    lookups fournit has_pending_plex_invite / comm_contexts /
+    available_channels / sent_channels (ExpirationNotificationIndex en
+    production).
+    """
+    mode = _send_mode(settings)
+    due = []
+    pending_invites = 0
+
+    for u in users or []:
+        u = dict(u)
+        uid = int(u["id"])
+
+        # Ne jamais envoyer de mails d'expiration tant que l'invitation Plex
+        # n'est pas réellement acceptée.
+        if lookups.has_pending_plex_invite(uid):
+            pending_invites += 1
+            continue
+
+        exp = _parse_date_iso(u.get("expiration_date"))
+        if not exp:
+            continue
+
+        exp_iso = exp.isoformat()
+        days_left = (exp - today).days
+
+        comm_contexts = lookups.comm_contexts(uid)
+        providers = [ctx["provider"] for ctx in comm_contexts]
+
+        user_subscription_template_id = _safe_int(u.get("subscription_template_id"))
+        picked = _pick_expiration_template(days_left, templates, providers, user_subscription_template_id)
+
+        if not picked:
+            continue
+
+        tpl, provider, server_id = picked
 
-    for row in rows:
-        row = dict(row)
-        provider = (row.get("provider") or "").strip().lower()
-        server_id = row.get("server_id")
+        # If the queued provider matches a real media server for this user,
+        # keep its real server_id. Otherwise leave server_id as None.
+        if server_id is None and comm_contexts:
+            for ctx in comm_contexts:
+                if ctx["provider"] == provider:
+                    server_id = ctx.get("server_id")
+                    break
 
-        if provider not in ("plex", "jellyfin"):
+        template_marker = _stable_template_marker(tpl)
+        lookup_markers = _template_markers_for_lookup(tpl)
+
+        if not template_marker:
             continue
 
-        key = (provider, server_id)
-        if key in seen:
+        email_sent, discord_sent = lookups.sent_channels(u, lookup_markers, exp_iso)
+        if _sent_for_mode(mode, lookups.available_channels(u), email_sent, discord_sent):
             continue
-        seen.add(key)
 
-        contexts.append({
+        due.append({
+            "template_id": int(tpl["id"]),
+            "user_id": uid,
             "provider": provider,
             "server_id": server_id,
+            "dedupe_key": f"expiration:template:{template_marker}:user:{uid}:exp:{exp_iso}",
+            "payload": {
+                "trigger_event": "expiration",
+                "template_key": template_marker,
+                "expiration_date": exp_iso,
+                "days_left": days_left,
+            },
         })
 
-    return contexts
+    return {"due": due, "pending_invites": pending_invites}
+
+
+def _queue_expiration_notifications(db, due: list[dict], max_attempts: int = 10) -> int:
+    """Met en file les notifications dues dans une seule transaction."""
+    if not due:
+        return 0
+
+    existing = load_scheduled_by_dedupe_key(db, [item["dedupe_key"] for item in due])
+    queued = 0
+
+    with db.transaction():
+        for item in due:
+            if scheduled_row_blocks_requeue(existing.get(item["dedupe_key"]), max_attempts):
+                continue
+
+            schedule_template_notification(
+                db=db,
+                template_id=item["template_id"],
+                user_id=item["user_id"],
+                provider=item["provider"],
+                server_id=item["server_id"],
+                send_at_modifier=None,
+                payload=item["payload"],
+                dedupe_key=item["dedupe_key"],
+                max_attempts=max_attempts,
+            )
+            queued += 1
+
+    return queued
 
 def run(task_id: int | None = None, db=None):
     if db is None:
@@ -861,72 +905,17 @@ def run(task_id: int | None = None, db=None):
 
         task_logs(task_id, "info", f"{len(users)} Users analyzed")
 
-        for u in users or []:
-            u = dict(u)
-            uid = int(u["id"])
-
-            # Ne jamais envoyer de mails d'expiration tant que l'invitation Plex
-            # n'est pas réellement acceptée.
-            if _user_has_pending_plex_invite(db, uid):
-                log.info(f"[USER {uid}] pending Plex invite → expiration notifications skipped")
-                continue
-
-            exp = _parse_date_iso(u.get("expiration_date"))
-            if not exp:
-                continue
-
-            exp_iso = exp.isoformat()
-            days_left = (exp - today).days
+        # Planning ensembliste : quelques requêtes pour tous les utilisateurs
+        lookups = ExpirationNotificationIndex(db, settings)
+        plan = _plan_expiration_notifications(users, templates, settings, lookups, today)
+        if plan["pending_invites"]:
+            log.info(f"{plan['pending_invites']} user(s) with pending Plex invite → expiration notifications skipped")
 
-            comm_contexts = _get_user_comm_contexts(db, uid)
-            providers = [ctx["provider"] for ctx in comm_contexts]
-
-            user_subscription_template_id = _safe_int(u.get("subscription_template_id"))
-            picked = _pick_expiration_template(days_left, templates, providers, user_subscription_template_id)
-
-            if not picked:
-                continue
-
-            tpl, provider, server_id = picked
-
-            # If the queued provider matches a real media server for this user,
-            # keep its real server_id. Otherwise leave server_id as None.
-            if server_id is None and comm_contexts:
-                for ctx in comm_contexts:
-                    if ctx["provider"] == provider:
-                        server_id = ctx.get("server_id")
-                        break
-
-            template_marker = _stable_template_marker(tpl)
-            lookup_markers = _template_markers_for_lookup(tpl)
-
-            if not template_marker:
-                continue
-
-            # In FIRST mode: one successful channel is enough
-            # In ALL mode  : all available channels must have succeeded
-            if _already_sent_for_current_mode(db, settings, u, lookup_markers, exp_iso):
-                continue
-
-            dedupe_key = f"expiration:template:{template_marker}:user:{uid}:exp:{exp_iso}"
-            payload = {
-                "trigger_event": "expiration",
-                "template_key": template_marker,
-                "expiration_date": exp_iso,
-                "days_left": days_left,
-            }
-
-            schedule_template_notification(
-                db=db,
-                template_id=int(tpl["id"]),
-                user_id=uid,
-                provider=provider,
-                server_id=server_id,
-                send_at_modifier=None,
-                payload=payload,
-                dedupe_key=dedupe_key,
-                max_attempts=10,
-            )
+        queued_new = _queue_expiration_notifications(db, plan["due"])
+        log.info(
+            f"Expiration plan → due={len(plan['due'])} queued={queued_new} "
+            f"lookup_queries={lookups.queries}"
+        )
 
         # Flush again so newly queued expiration notifications can go out immediately
         queued_sent, queued_failed = _flush_comm_scheduled(db, settings, task_id)
@@ -943,3 +932,5 @@ def run(task_id: int | None = None, db=None):
         log.error("Error in send_expiration_emails", exc_info=True)
         task_logs(task_id, "error", f"Error send_expiration_emails : {e}")
         raise
+    finally:
+        close_idle_smtp_sessions()
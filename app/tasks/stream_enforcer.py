@@ -1,8 +1,10 @@
 import json
+import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
 from core.policy_transition_grace import should_defer_stream_violation
+from core.tasks.run_metrics import RunMetricsThreadPoolExecutor
 from logging_utils import get_logger, is_debug_mode_enabled
 from core.stream_policy_i18n import translate_policy
 from core.stream_policy_utils import (
@@ -14,14 +16,12 @@ from core.stream_policy_utils import (
     pick_kill_target as _pick_kill_target,
     is_global_policy as _is_global_policy,
     normalize_user_key as _normalize_user_key,
-    is_local_ip as _is_local_ip,
     is_ip_literal as _is_ip_literal,
     best_account_username as _best_account_username,
     same_actor_reference as _same_actor_reference,
 )
 from core.stream_enforcer_boost import refresh_boost_state, maybe_boost_after_expired_kill
 from core.stream_enforcement_snapshot import build_enforcement_snapshot as _build_enforcement_snapshot
-from core.stream_media_metadata import parse_media_height as _parse_media_height
 from core.stream_enforcer_repository import (
     load_user_stream_overrides,
     load_enabled_policies,
@@ -32,7 +32,14 @@ from core.stream_enforcement_store import (
     log_enforcement,
     upsert_state,
     already_warned_recently,
+    has_pending_action,
+    schedule_pending_action,
+    claim_pending_action,
+    finish_pending_action,
+    load_due_pending_actions,
+    seconds_until_next_pending_action,
 )
+from core.stream_enforcement_timer import StreamEnforcementTimer
 from core.stream_notification_delivery import (
     media_title_from_session as _media_title_from_session,
     policy_display_name as _policy_display_name,
@@ -47,7 +54,8 @@ from core.stream_provider_actions import (
     kill_session as _kill_session,
     warn_session as _warn_session,
 )
-from core.stream_policy_scope import has_vip_override, policy_applies as _policy_applies
+from core.stream_policy_scope import has_vip_override
+from core.stream_policy_index import SessionPolicyIndex, build_policy_index
 from core.stream_violation_recheck import select_rechecked_violation
 from core.stream_session_diagnostics import log_sessions as _debug_log_sessions
 from core.stream_enforcer_config import (
@@ -55,7 +63,8 @@ from core.stream_enforcer_config import (
     JELLYFIN_KILL_MESSAGE_SPAM_COUNT, JELLYFIN_KILL_MESSAGE_SPAM_SLEEP,
     JELLYFIN_KILL_MESSAGE_TIMEOUT_MS, JELLYFIN_PRE_KILL_DURATION_SECONDS,
     JELLYFIN_PRE_KILL_INTERVAL_SECONDS, HOUSEHOLD_MEMORY_SECONDS,
-    HOUSEHOLD_MEDIA_GRACE_SECONDS,
+    HOUSEHOLD_MEDIA_GRACE_SECONDS, PENDING_ACTION_MAX_LATENESS_SECONDS,
+    ENFORCEMENT_STEP_WORKERS,
 )
 from core.stream_session_identity import (
     extract_machine_identifier as _extract_machine_identifier,
@@ -116,7 +125,15 @@ def _load_live_sessions(stable_seconds: Optional[int] = None) -> List[dict]:
     return load_live_sessions(_db, LIVE_WINDOW_SECONDS, stable_seconds)
 
 
-def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
+def _evaluate_policy(policy: dict, sessions: List[dict],
+                     index: Optional[SessionPolicyIndex] = None) -> List[dict]:
+    """
+    `index` : index des sessions partagé par toutes les policies d'un cycle
+    (construit ici si absent).
+    """
+    if index is None:
+        index = build_policy_index(sessions)
+
     rule_type = policy.get("rule_type")
     rule = _loads_json(policy.get("rule_value_json"))
 
@@ -129,47 +146,8 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
 
     violations: List[dict] = []
 
-    # --------------------------------------------------
-    # Fast pre-checks to avoid useless policy scans
-    # --------------------------------------------------
-
-    scope_type = policy.get("scope_type")
-    scope_id = policy.get("scope_id")
-    server_id = policy.get("server_id")
-    provider = (policy.get("provider") or "").strip().lower()
-
-    # Skip provider instantly
-    if provider:
-        has_provider_match = any(
-            (s.get("provider") or "").strip().lower() == provider
-            for s in sessions
-        )
-
-        if not has_provider_match:
-            return violations
-
-    # Skip server instantly
-    if server_id:
-        has_server_match = any(
-            int(s.get("server_id", 0)) == int(server_id)
-            for s in sessions
-        )
-
-        if not has_server_match:
-            return violations
-
-    # Skip user instantly
-    if scope_type == "user" and scope_id:
-        has_user_match = any(
-            int(s.get("vodum_user_id") or 0) == int(scope_id)
-            for s in sessions
-        )
-
-        if not has_user_match:
-            return violations
-
-    # Real scoped filtering only if needed
-    scoped = [s for s in sessions if _policy_applies(policy, s)]
+    # Sessions dans le scope, via l'index (pas de scan complet par policy)
+    scoped = index.scoped(policy)
 
     # Nothing in scope
     if not scoped:
@@ -189,13 +167,7 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
     except Exception:
         pass
 
-
-    # Helper: regrouper par serveur (évite de kill avec le mauvais token)
-    def by_server(items: List[dict]) -> Dict[int, List[dict]]:
-        out: Dict[int, List[dict]] = {}
-        for x in items:
-            out.setdefault(int(x["server_id"]), []).append(x)
-        return out
+    # Regroupements par serveur : évite de kill avec le mauvais token
 
     if rule_type == "max_streams_per_user":
         max_streams = int(rule.get("max", 1))
@@ -207,19 +179,11 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
         # - Otherwise (scope=user without server_id) => count across all servers (user-wide limit)
         per_server_counting = bool(policy.get("server_id")) or (policy.get("scope_type") == "server")
 
-        by_key: Dict[Tuple[Optional[int], str, Optional[int]], List[dict]] = {}
-
-        if _is_global_policy(policy) or not per_server_counting:
-            # ✅ COMPTE SUR TOUS LES SERVEURS
-            for s in scoped:
-                vodum_user_id, ext = _normalize_user_key(s)
-                by_key.setdefault((vodum_user_id, ext, None), []).append(s)
-        else:
-            # ✅ COMPTE PAR SERVEUR
-            for s in scoped:
-                sid = int(s["server_id"])
-                vodum_user_id, ext = _normalize_user_key(s)
-                by_key.setdefault((vodum_user_id, ext, sid), []).append(s)
+        # ✅ global / user-wide => COMPTE SUR TOUS LES SERVEURS, sinon PAR SERVEUR
+        by_key = index.by_user(
+            policy,
+            per_server=not (_is_global_policy(policy) or not per_server_counting),
+        )
 
         for user_key, user_sessions in by_key.items():
             # Per-user override (vodum_users.max_streams_override) supersedes policy max.
@@ -234,7 +198,7 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
             # Optional LAN bypass: local IP sessions do not count.
             counted_sessions = user_sessions
             if allow_local_ip:
-                counted_sessions = [s for s in user_sessions if not _is_local_ip((s.get('ip') or '').strip())]
+                counted_sessions = [s for s in user_sessions if not index.is_local_ip(s)]
 
             counted_sessions = _deduplicate_user_stream_sessions(policy, user_key, counted_sessions)
 
@@ -295,13 +259,7 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
         allow_local_ip = bool(rule.get("allow_local_ip", False))
 
         # Group by user across ALL servers if global policy
-        by_user: Dict[Tuple[Optional[int], str], List[dict]] = {}
-
-        for s in scoped:
-            ukey = _normalize_user_key(s)
-            by_user.setdefault(ukey, []).append(s)
-
-        for user_key, user_sessions in by_user.items():
+        for user_key, user_sessions in index.by_user_key(policy).items():
             vodum_user_id = user_key[0]
             if _is_vip_override(vodum_user_id):
                 # VIP: override must supersede stream limitation policies
@@ -319,12 +277,12 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
             ips = set()
 
             for s in deduped_sessions:
-                ip = (s.get("ip") or "").strip() or "unknown"
+                ip = index.ip(s)
 
                 if ip == "unknown" and ignore_unknown:
                     continue
 
-                if allow_local_ip and _is_local_ip(ip):
+                if allow_local_ip and index.is_local_ip(s):
                     continue
 
                 ips.add(ip)
@@ -338,7 +296,7 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
             # ✅ On tue une session du user (selector), sur le serveur de la session ciblée
             candidates = deduped_sessions
             if allow_local_ip:
-                candidates = [s for s in deduped_sessions if not _is_local_ip((s.get('ip') or '').strip())]
+                candidates = [s for s in deduped_sessions if not index.is_local_ip(s)]
 
                 if not candidates:
                     candidates = deduped_sessions
@@ -374,25 +332,20 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
         per_server = bool(rule.get("per_server", True))
         allow_local_ip = bool(rule.get("allow_local_ip", False))
 
-        by_key: Dict[str, List[dict]] = {}
-
-        for s in scoped:
-            # VIP users should not be limited by per-IP stream policies
-            if _is_vip_override(s.get("vodum_user_id")):
-                continue
-
-            ip = (s.get("ip") or "").strip() or "unknown"
+        for key, ip_sessions in index.by_ip(policy, per_server=per_server).items():
+            ip = index.ip(ip_sessions[0])
 
             if ip == "unknown" and ignore_unknown:
                 continue
 
-            if allow_local_ip and _is_local_ip(ip):
+            if allow_local_ip and index.is_local_ip(ip_sessions[0]):
                 continue
 
-            key = f"{s['server_id']}|{ip}" if per_server else ip
-            by_key.setdefault(key, []).append(s)
+            # VIP users should not be limited by per-IP stream policies
+            ip_sessions = [s for s in ip_sessions if not _is_vip_override(s.get("vodum_user_id"))]
+            if not ip_sessions:
+                continue
 
-        for key, ip_sessions in by_key.items():
             counted_ip_sessions = _deduplicate_household_sessions(ip_sessions)
 
             if len(counted_ip_sessions) <= max_streams:
@@ -434,10 +387,8 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
         # => on applique PAR SERVEUR pour éviter kill cross-server
         max_trans = int(rule.get("max", 1))
 
-        trans = [s for s in scoped if int(s.get("is_transcode") or 0) == 1]
-        grouped = by_server(trans)
-
-        for server_id, trans_sessions in grouped.items():
+        for server_id, server_sessions in index.by_scoped_server(policy).items():
+            trans_sessions = [s for s in server_sessions if index.is_transcode(s)]
             if len(trans_sessions) > max_trans:
                 provider = trans_sessions[0]["provider"]
                 reason = f"max_transcodes_server: {len(trans_sessions)} > {max_trans}"
@@ -455,16 +406,13 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
                 })
 
     elif rule_type == "ban_4k_transcode":
-        viol = []
-        for s in scoped:
-            if int(s.get("is_transcode") or 0) != 1:
+        for server_id, server_sessions in index.by_scoped_server(policy).items():
+            ss = [
+                s for s in server_sessions
+                if index.is_transcode(s) and (index.media_height(s) or 0) >= 2160
+            ]
+            if not ss:
                 continue
-            h = _parse_media_height(s.get("provider"), s.get("raw_json"))
-            if h and h >= 2160:
-                viol.append(s)
-
-        grouped = by_server(viol)
-        for server_id, ss in grouped.items():
             provider = ss[0]["provider"]
             reason = "ban_4k_transcode: 4K transcode detected"
             violations.append({
@@ -482,17 +430,10 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
 
     elif rule_type == "max_bitrate_kbps":
         max_kbps = int(rule.get("max_kbps", 0))
-        viol = []
-        for s in scoped:
-            try:
-                b = int(s.get("bitrate") or 0)
-            except Exception:
-                b = 0
-            if max_kbps > 0 and b > max_kbps:
-                viol.append(s)
-
-        grouped = by_server(viol)
-        for server_id, ss in grouped.items():
+        for server_id, server_sessions in index.by_scoped_server(policy).items():
+            ss = [s for s in server_sessions if max_kbps > 0 and index.bitrate(s) > max_kbps]
+            if not ss:
+                continue
             provider = ss[0]["provider"]
             reason = f"max_bitrate_kbps: {len(ss)} session(s) above {max_kbps} kbps"
             violations.append({
@@ -521,14 +462,11 @@ def _evaluate_policy(policy: dict, sessions: List[dict]) -> List[dict]:
         if not allowed:
             return []
 
-        viol = []
-        for s in scoped:
-            dev = (s.get("device") or s.get("client_product") or "").strip().lower()
-            if dev and dev not in allowed:
-                viol.append(s)
-
-        grouped = by_server(viol)
-        for server_id, ss in grouped.items():
+        allowed = set(allowed)
+        for server_id, server_sessions in index.by_scoped_server(policy).items():
+            ss = [s for s in server_sessions if index.device(s) and index.device(s) not in allowed]
+            if not ss:
+                continue
             provider = ss[0]["provider"]
             reason = "device_allowlist: device not allowed"
             violations.append({
@@ -581,6 +519,11 @@ def _already_warned_recently(policy_id: int, server_id: int,
     )
 
 
+def _has_pending_action(policy_id: int, server_id: int,
+                        vodum_user_id: Optional[int], external_user_id: str) -> bool:
+    return has_pending_action(_db, policy_id, server_id, vodum_user_id, external_user_id)
+
+
 def _notification_policy_context(policy: dict, target: dict, related_sessions: list[dict] | None) -> dict:
     return build_notification_policy_context(policy, target, related_sessions, _policy_t)
 
@@ -616,13 +559,317 @@ def _load_server(server_id: int) -> Optional[dict]:
 
 
 def _recheck_violation(policy: dict, violation: dict) -> Optional[dict]:
-    time.sleep(RECHECK_DELAY_SECONDS)
-
-    sessions = _load_live_sessions()
-    v2 = _evaluate_policy(policy, sessions)
+    with _EVALUATION_LOCK:
+        sessions = _load_live_sessions()
+        v2 = _evaluate_policy(policy, sessions)
 
     return select_rechecked_violation(violation, v2)
 
+
+# -------------------------
+# Pending enforcement steps (timer)
+# -------------------------
+#
+# Chaque violation devient une petite machine à états stockée dans
+# stream_enforcement_state (pending_action / next_action_at / pending_json) :
+#
+#   warn ──(RECHECK_DELAY_SECONDS)──> recheck ──> [jellyfin] pre_kill ─┐
+#                                        │                            │
+#                                        └──────────> kill <──────────┘
+#
+# La tâche ne fait qu'évaluer et planifier ; les étapes sont exécutées par
+# un thread timer dédié, en parallèle pour plusieurs utilisateurs.
+
+# Évaluation des policies : caches de grâce partagés entre la tâche et le timer
+_EVALUATION_LOCK = threading.RLock()
+
+
+def _violation_to_json(violation: dict, **extra) -> str:
+    payload = {key: value for key, value in violation.items() if key != "policy"}
+    payload.update(extra)
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _violation_from_json(raw: Optional[str]) -> Optional[dict]:
+    payload = _loads_json(raw)
+    if not payload or "target_user" not in payload:
+        return None
+    # select_rechecked_violation compare des tuples
+    payload["target_user"] = tuple(payload["target_user"])
+    return payload
+
+
+def _schedule_step(action: str, violation: dict, delay_seconds: float = 0, **extra) -> None:
+    user_vodum_id, user_ext = violation["target_user"]
+    schedule_pending_action(
+        _db,
+        int(violation["policy"]["id"]),
+        int(violation["server_id"]),
+        user_vodum_id,
+        str(user_ext or ""),
+        action,
+        delay_seconds,
+        _violation_to_json(violation, **extra),
+    )
+    _ENFORCEMENT_TIMER.wake()
+
+
+def _kill_target(task_id: int, policy: dict, v: dict, *, warn_title: str, warn_text: str,
+                 immediate: bool = False) -> None:
+    policy_id = int(policy["id"])
+    server_id = int(v["server_id"])
+    provider_type = v["provider"]
+    user_vodum_id, user_ext = v["target_user"]
+    user_ext = str(user_ext or "")
+
+    server_row = _load_server(server_id)
+    if not server_row:
+        logger.warning(f"[TASK {task_id}] stream_enforcer: server {server_id} missing before kill")
+        return
+
+    sessions = v["sessions"]
+    target = _pick_kill_target(sessions, v.get("selector") or "kill_newest")
+    if not target:
+        return
+
+    session_key = str(target["session_key"])
+    reason = v.get("reason") or "policy violation"
+    # Pour Plex, le "reason" est affiché au moment du terminate
+    # => on veut un texte user-friendly (warn_text), pas un reason technique.
+    kill_reason_for_client = (v.get("warn_text") or warn_text or reason)
+
+    kill_live_sessions = _load_live_sessions(stable_seconds=0 if immediate else None)
+    kill_account_username, kill_ips_json, kill_details_json = _build_enforcement_snapshot(
+        target=target,
+        violation_sessions=sessions,
+        live_sessions=kill_live_sessions,
+        policy=policy,
+        reason=reason,
+    )
+
+    # Kill stream (Plex affichera kill_reason_for_client ; Jellyfin ignore reason, mais on a déjà envoyé un message)
+    ok = _kill_session(server_row, session_key, reason=kill_reason_for_client)
+
+    if ok:
+        _queue_stream_blocked_notification(
+            task_id=task_id,
+            policy=policy,
+            server_row=server_row,
+            target=target,
+            reason=reason,
+            kill_reason_for_client=kill_reason_for_client,
+            related_sessions=sessions,
+        )
+
+    _log_enforcement(
+        policy_id, server_id, provider_type, session_key,
+        user_vodum_id, user_ext,
+        "kill" if ok else "kill_failed", reason,
+        account_username=kill_account_username,
+        ips_json=kill_ips_json,
+        details_json=kill_details_json,
+    )
+    _upsert_state(policy_id, server_id, user_vodum_id, user_ext, warned=False, killed=ok, reason=reason)
+
+    logger.warning(
+        f"[TASK {task_id}] [{'KILL_IMMEDIATE' if immediate else 'KILL'}] policy={policy_id} server={server_id} "
+        f"provider={provider_type} session={session_key} ok={ok} reason={reason} "
+        f"target_vodum_user_id={user_vodum_id} target_external_user_id={user_ext} "
+        f"ip={target.get('ip')} device={target.get('device') or target.get('client_product')} "
+        f"is_transcode={target.get('is_transcode')} bitrate={target.get('bitrate')}"
+    )
+
+    if immediate:
+        maybe_boost_after_expired_kill(_db, task_id, policy_id, user_vodum_id)
+
+
+def _step_warn(task_id: int, policy: dict, v: dict) -> None:
+    """1) WARN (une fois) puis recheck après RECHECK_DELAY_SECONDS."""
+    policy_id = int(policy["id"])
+    server_id = int(v["server_id"])
+    provider_type = v["provider"]
+    user_vodum_id, user_ext = v["target_user"]
+    user_ext = str(user_ext or "")
+
+    if not _already_warned_recently(policy_id, server_id, user_vodum_id, user_ext, minutes=5):
+        server_row = _load_server(server_id)
+        target = _pick_kill_target(v["sessions"], v.get("selector") or "kill_newest")
+        if not server_row or not target:
+            return
+
+        session_key = str(target["session_key"])
+        reason = v.get("reason") or "policy violation"
+
+        warned_ok = False
+        if provider_type == "jellyfin":
+            warned_ok = _warn_session(
+                server_row,
+                _jellyfin_session_id_from_target(target, session_key),
+                v["warn_title"],
+                v["warn_text"],
+            )
+
+        warn_account_username, warn_ips_json, warn_details_json = _build_enforcement_snapshot(
+            target=target,
+            violation_sessions=v["sessions"],
+            live_sessions=_load_live_sessions(),
+            policy=policy,
+            reason=reason,
+        )
+        _log_enforcement(
+            policy_id, server_id, provider_type, session_key,
+            user_vodum_id, user_ext,
+            "warn", reason,
+            account_username=warn_account_username,
+            ips_json=warn_ips_json,
+            details_json=warn_details_json,
+        )
+        _upsert_state(policy_id, server_id, user_vodum_id, user_ext, warned=True, killed=False, reason=reason)
+
+        logger.warning(
+            f"[TASK {task_id}] [WARN] policy={policy_id} server={server_id} provider={provider_type} "
+            f"session={session_key} reason={reason} warned_ok={warned_ok} "
+            f"target_vodum_user_id={user_vodum_id} target_external_user_id={user_ext} "
+            f"ip={target.get('ip')} device={target.get('device') or target.get('client_product')} "
+            f"is_transcode={target.get('is_transcode')} bitrate={target.get('bitrate')}"
+        )
+
+    _schedule_step("recheck", dict(v, policy=policy), RECHECK_DELAY_SECONDS,
+                   warn_title=v["warn_title"], warn_text=v["warn_text"],
+                   task_id=task_id)
+
+
+def _step_recheck(task_id: int, policy: dict, v: dict) -> None:
+    """2) recheck -> si toujours violation -> pre_kill (Jellyfin) ou KILL."""
+    rechecked_violation = _recheck_violation(policy, v)
+    if not rechecked_violation:
+        if is_debug_mode_enabled():
+            logger.debug(
+                f"[TASK {task_id}] stream_enforcer: violation cleared after recheck "
+                f"(policy={policy['id']} server={v['server_id']})"
+            )
+        return
+
+    # La session ciblée peut avoir changé pendant le délai d'avertissement :
+    # la suite repart du relevé qui vient de confirmer la violation.
+    next_action = "pre_kill" if rechecked_violation["provider"] == "jellyfin" else "kill"
+    _schedule_step(next_action, dict(rechecked_violation, policy=policy), 0,
+                   warn_title=v["warn_title"], warn_text=v["warn_text"],
+                   task_id=task_id, pre_kill_started_at=time.time())
+
+
+def _step_pre_kill(task_id: int, policy: dict, v: dict) -> None:
+    """Jellyfin : affichage "pénible mais lisible" avant coupure, un message par tick."""
+    started = float(v.get("pre_kill_started_at") or time.time())
+    elapsed = time.time() - started
+    remaining = JELLYFIN_PRE_KILL_DURATION_SECONDS - elapsed
+    extra = {
+        "warn_title": v["warn_title"],
+        "warn_text": v["warn_text"],
+        "task_id": task_id,
+        "pre_kill_started_at": started,
+    }
+    if remaining <= 0:
+        _schedule_step("kill", dict(v, policy=policy), 0, **extra)
+        return
+
+    target = _pick_kill_target(v["sessions"], v.get("selector") or "kill_newest")
+    server_row = _load_server(int(v["server_id"]))
+    if target and server_row:
+        jf_message_key = _jellyfin_session_id_from_target(target, str(target["session_key"]))
+        try:
+            # Message visible JELLYFIN_KILL_MESSAGE_TIMEOUT_MS
+            _warn_session(
+                server_row,
+                jf_message_key,
+                v["warn_title"],
+                v["warn_text"],
+                timeout_ms=JELLYFIN_KILL_MESSAGE_TIMEOUT_MS
+            )
+        except Exception as e:
+            logger.warning(
+                f"[TASK {task_id}] jellyfin pre-kill message failed "
+                f"session={jf_message_key} server={v['server_id']}: {e}",
+                exc_info=True
+            )
+
+    # Prochain tick (toutes les JELLYFIN_PRE_KILL_INTERVAL_SECONDS)
+    _schedule_step("pre_kill", dict(v, policy=policy),
+                   min(float(JELLYFIN_PRE_KILL_INTERVAL_SECONDS), float(remaining)), **extra)
+
+
+def _step_kill(task_id: int, policy: dict, v: dict) -> None:
+    _kill_target(
+        task_id, policy, v,
+        warn_title=v["warn_title"],
+        warn_text=v["warn_text"],
+        immediate=bool(v.get("immediate")),
+    )
+
+
+_STEP_HANDLERS = {
+    "warn": _step_warn,
+    "recheck": _step_recheck,
+    "pre_kill": _step_pre_kill,
+    "kill": _step_kill,
+}
+
+
+def _run_pending_step(row: dict, policies: Dict[int, dict]) -> None:
+    action = row["pending_action"]
+    state_id = int(row["id"])
+    pending = _violation_from_json(row["pending_json"])
+    # L'étape est retirée de la file avant exécution : un handler qui échoue
+    # ne boucle pas, et un handler qui continue la machine replanifie la suite.
+    claim_pending_action(_db, state_id)
+
+    try:
+        policy = policies.get(int(row["policy_id"]))
+        handler = _STEP_HANDLERS.get(action)
+        if not pending or not policy or not handler:
+            return
+
+        task_id = int(pending.get("task_id") or 0)
+        if int(row["lateness_seconds"] or 0) > PENDING_ACTION_MAX_LATENESS_SECONDS:
+            logger.info(
+                f"[TASK {task_id}] stream_enforcer: dropping stale {action} step "
+                f"(policy={row['policy_id']} server={row['server_id']} actor={row['actor_key']})"
+            )
+            return
+
+        try:
+            handler(task_id, policy, pending)
+        except Exception as e:
+            logger.error(
+                f"[TASK {task_id}] stream_enforcer: {action} step failed "
+                f"policy={row['policy_id']} server={row['server_id']} actor={row['actor_key']}: {e}",
+                exc_info=True
+            )
+    finally:
+        finish_pending_action(_db, state_id)
+
+
+def _run_due_steps() -> Optional[float]:
+    """Runner du timer : exécute les étapes échues, retourne l'attente suivante."""
+    if _db is None:
+        return None
+
+    due = load_due_pending_actions(_db)
+    if due:
+        policies = {int(p["id"]): p for p in _load_enabled_policies()}
+        # Une étape = au plus un appel serveur : les étapes de plusieurs
+        # utilisateurs avancent en parallèle.
+        with RunMetricsThreadPoolExecutor(
+            max_workers=max(1, min(len(due), ENFORCEMENT_STEP_WORKERS)),
+            thread_name_prefix="stream-enforcer-step",
+        ) as executor:
+            list(executor.map(lambda row: _run_pending_step(row, policies), due))
+
+    return seconds_until_next_pending_action(_db)
+
+
+_ENFORCEMENT_TIMER = StreamEnforcementTimer(_run_due_steps)
+
 # -------------------------
 # Task entrypoint
 # -------------------------
@@ -631,8 +878,12 @@ def run(task_id: int, db):
     """
     ✅ MUST match tasks_engine signature: run(task_id, db)
     ✅ DO NOT instantiate DBManager here
+
+    Évalue les policies et planifie les étapes (warn / recheck / kill) :
+    aucune attente ni appel serveur ici, le timer s'en charge.
     """
     _set_db(db)
+    _ENFORCEMENT_TIMER.ensure_started()
     refresh_boost_state(_db, task_id)
 
     if is_debug_mode_enabled():
@@ -669,270 +920,51 @@ def run(task_id: int, db):
 
 
     violations: List[dict] = []
-    for p in policies:
-        if _is_strict_expired_subscription_policy(p):
-            violations.extend(_evaluate_policy(p, fresh_live_sessions))
-        else:
-            violations.extend(_evaluate_policy(p, live_sessions))
+    with _EVALUATION_LOCK:
+        # Index construits une fois par cycle, partagés par toutes les policies
+        live_index = build_policy_index(live_sessions)
+        fresh_index = build_policy_index(fresh_live_sessions)
+        for p in policies:
+            if _is_strict_expired_subscription_policy(p):
+                violations.extend(_evaluate_policy(p, fresh_live_sessions, fresh_index))
+            else:
+                violations.extend(_evaluate_policy(p, live_sessions, live_index))
 
     if not violations:
         if is_debug_mode_enabled():
             logger.debug(f"[TASK {task_id}] stream_enforcer: no violations")
         return
 
+    scheduled = 0
     for v in violations:
         policy = v["policy"]
         policy_id = int(policy["id"])
         server_id = int(v["server_id"])
-        provider_type = v["provider"]
 
         user_vodum_id, user_ext = v["target_user"]
         user_ext = str(user_ext or "")
 
-        server_row = _load_server(server_id)
-        if not server_row:
-            logger.warning(f"[TASK {task_id}] stream_enforcer: server {server_id} missing")
+        # Une machine est déjà en cours pour cet acteur : elle se recale
+        # elle-même au recheck.
+        if _has_pending_action(policy_id, server_id, user_vodum_id, user_ext):
             continue
 
-        sessions = v["sessions"]
-        selector = v.get("selector") or "kill_newest"
-        target = _pick_kill_target(sessions, selector)
-        if not target:
+        if not _pick_kill_target(v["sessions"], v.get("selector") or "kill_newest"):
             continue
 
-        session_key = str(target["session_key"])
-        jf_message_key = session_key
-        if provider_type == "jellyfin":
-            jf_message_key = _jellyfin_session_id_from_target(target, session_key)
-
-        reason = v.get("reason") or "policy violation"
-
-        warn_account_username, warn_ips_json, warn_details_json = _build_enforcement_snapshot(
-            target=target,
-            violation_sessions=sessions,
-            live_sessions=live_sessions,
-            policy=policy,
-            reason=reason,
-        )
-
-        # Message utilisateur (celui que tu veux voir côté client)
-        warn_title = v.get("warn_title", "Stream limit")
-        warn_text  = v.get("warn_text", "Limit reached.")
-
-        # Pour Plex, le "reason" est affiché au moment du terminate
-        # => on veut un texte user-friendly (warn_text), pas un reason technique.
-        kill_reason_for_client = warn_text or reason
+        extra = {
+            "warn_title": v.get("warn_title", "Stream limit"),
+            "warn_text": v.get("warn_text", "Limit reached."),
+            "task_id": task_id,
+        }
 
         # Policy système "abonnement expiré" :
         # on coupe immédiatement, sans warning, sans délai de recheck.
         if _is_strict_expired_subscription_policy(policy):
-            try:
-                kill_live_sessions = _load_live_sessions(stable_seconds=0)
-
-                kill_account_username, kill_ips_json, kill_details_json = _build_enforcement_snapshot(
-                    target=target,
-                    violation_sessions=sessions,
-                    live_sessions=kill_live_sessions,
-                    policy=policy,
-                    reason=reason,
-                )
-
-                ok = _kill_session(server_row, session_key, reason=kill_reason_for_client)
-
-                if ok:
-                    _queue_stream_blocked_notification(
-                        task_id=task_id,
-                        policy=policy,
-                        server_row=server_row,
-                        target=target,
-                        reason=reason,
-                        kill_reason_for_client=kill_reason_for_client,
-                        related_sessions=sessions,
-                    )
-
-                _log_enforcement(
-                    policy_id, server_id, provider_type, session_key,
-                    user_vodum_id, user_ext,
-                    "kill" if ok else "kill_failed", reason,
-                    account_username=kill_account_username,
-                    ips_json=kill_ips_json,
-                    details_json=kill_details_json,
-                )
-
-                _upsert_state(
-                    policy_id, server_id,
-                    user_vodum_id, user_ext,
-                    warned=False,
-                    killed=ok,
-                    reason=reason,
-                )
-
-                logger.warning(
-                    f"[TASK {task_id}] [KILL_IMMEDIATE] policy={policy_id} server={server_id} provider={provider_type} "
-                    f"session={session_key} ok={ok} reason={reason} "
-                    f"target_vodum_user_id={user_vodum_id} target_external_user_id={user_ext} "
-                    f"ip={target.get('ip')} device={target.get('device') or target.get('client_product')} "
-                    f"is_transcode={target.get('is_transcode')} bitrate={target.get('bitrate')}"
-                )
-
-                maybe_boost_after_expired_kill(
-                    _db,
-                    task_id,
-                    policy_id,
-                    user_vodum_id,
-                )
-
-            except Exception as e:
-                logger.error(
-                    f"[TASK {task_id}] stream_enforcer: immediate kill failed "
-                    f"server={server_id} session={session_key}: {e}",
-                    exc_info=True
-                )
-
-            continue
-
-        # 1) WARN (une fois) + recheck 30s
-        if not _already_warned_recently(policy_id, server_id, user_vodum_id, user_ext, minutes=5):
-            warned_ok = False
-            if provider_type == "jellyfin":
-                warned_ok = _warn_session(
-                    server_row,
-                    jf_message_key,
-                    v.get("warn_title", "Stream limit"),
-                    v.get("warn_text", "Limit reached.")
-                )
-
-            _log_enforcement(
-                policy_id, server_id, provider_type, session_key,
-                user_vodum_id, user_ext,
-                "warn", reason,
-                account_username=warn_account_username,
-                ips_json=warn_ips_json,
-                details_json=warn_details_json,
-            )
-            _upsert_state(policy_id, server_id, user_vodum_id, user_ext, warned=True, killed=False, reason=reason)
-
-            logger.warning(
-                f"[TASK {task_id}] [WARN] policy={policy_id} server={server_id} provider={provider_type} "
-                f"session={session_key} reason={reason} warned_ok={warned_ok} "
-                f"target_vodum_user_id={user_vodum_id} target_external_user_id={user_ext} "
-                f"ip={target.get('ip')} device={target.get('device') or target.get('client_product')} "
-                f"is_transcode={target.get('is_transcode')} bitrate={target.get('bitrate')}"
-            )
-
-
-        # 2) recheck 30s -> si toujours violation -> KILL
-        rechecked_violation = _recheck_violation(policy, v)
-        if not rechecked_violation:
-            if is_debug_mode_enabled():
-                logger.debug(f"[TASK {task_id}] stream_enforcer: violation cleared after recheck (policy={policy_id} server={server_id})")
-            continue
-
-        # La session ciblée peut avoir changé pendant le délai d'avertissement.
-        # Recalculer toute la cible depuis le relevé qui vient de confirmer la violation.
-        v = rechecked_violation
-        sessions = v["sessions"]
-        selector = v.get("selector") or "kill_newest"
-        target = _pick_kill_target(sessions, selector)
-        if not target:
-            continue
-
-        server_id = int(v["server_id"])
-        provider_type = v["provider"]
-        server_row = _load_server(server_id)
-        if not server_row:
-            logger.warning(f"[TASK {task_id}] stream_enforcer: server {server_id} missing after recheck")
-            continue
-
-        session_key = str(target["session_key"])
-        jf_message_key = session_key
-        if provider_type == "jellyfin":
-            jf_message_key = _jellyfin_session_id_from_target(target, session_key)
-
-        reason = v.get("reason") or reason
-        kill_reason_for_client = (v.get("warn_text") or reason)
-
-        kill_live_sessions = _load_live_sessions()
-        kill_account_username, kill_ips_json, kill_details_json = _build_enforcement_snapshot(
-            target=target,
-            violation_sessions=sessions,
-            live_sessions=kill_live_sessions,
-            policy=policy,
-            reason=reason,
-        )
-
-        try:
-            # Jellyfin : affichage "pénible mais lisible" avant coupure
-            if provider_type == "jellyfin":
-                try:
-                    start = time.time()
-                    while True:
-                        elapsed = time.time() - start
-                        if elapsed >= JELLYFIN_PRE_KILL_DURATION_SECONDS:
-                            break
-
-                        # Message visible 5s
-                        _warn_session(
-                            server_row,
-                            jf_message_key,
-                            warn_title,
-                            warn_text,
-                            timeout_ms=JELLYFIN_KILL_MESSAGE_TIMEOUT_MS
-                        )
-
-                        # Attendre jusqu'au prochain tick (toutes les 10s)
-                        remaining = JELLYFIN_PRE_KILL_DURATION_SECONDS - elapsed
-                        sleep_for = min(float(JELLYFIN_PRE_KILL_INTERVAL_SECONDS), float(remaining))
-                        if sleep_for > 0:
-                            time.sleep(sleep_for)
-                        else:
-                            break
-
-                except Exception as e:
-                    logger.warning(
-                        f"[TASK {task_id}] jellyfin pre-kill message loop failed "
-                        f"session={jf_message_key} server={server_id}: {e}",
-                        exc_info=True
-                    )
-
-
-
-
-            # Kill stream (Plex affichera kill_reason_for_client ; Jellyfin ignore reason, mais on a déjà envoyé un message)
-            ok = _kill_session(server_row, session_key, reason=kill_reason_for_client)
-
-            if ok:
-                _queue_stream_blocked_notification(
-                    task_id=task_id,
-                    policy=policy,
-                    server_row=server_row,
-                    target=target,
-                    reason=reason,
-                    kill_reason_for_client=kill_reason_for_client,
-                    related_sessions=sessions,
-                )
-
-            _log_enforcement(
-                policy_id, server_id, provider_type, session_key,
-                user_vodum_id, user_ext,
-                "kill" if ok else "kill_failed", reason,
-                account_username=kill_account_username,
-                ips_json=kill_ips_json,
-                details_json=kill_details_json,
-            )
-            _upsert_state(policy_id, server_id, user_vodum_id, user_ext, warned=False, killed=ok, reason=reason)
-
-            logger.warning(
-                f"[TASK {task_id}] [KILL] policy={policy_id} server={server_id} provider={provider_type} "
-                f"session={session_key} ok={ok} reason={reason} "
-                f"target_vodum_user_id={user_vodum_id} target_external_user_id={user_ext} "
-                f"ip={target.get('ip')} device={target.get('device') or target.get('client_product')} "
-                f"is_transcode={target.get('is_transcode')} bitrate={target.get('bitrate')}"
-            )
-
-        except Exception as e:
-            logger.error(f"[TASK {task_id}] stream_enforcer: kill failed server={server_id} session={session_key}: {e}", exc_info=True)
-
+            _schedule_step("kill", v, 0, immediate=True, **extra)
+        else:
+            _schedule_step("warn", v, 0, **extra)
+        scheduled += 1
 
     if is_debug_mode_enabled():
-        logger.debug(f"[TASK {task_id}] stream_enforcer: done")
+        logger.debug(f"[TASK {task_id}] stream_enforcer: done (scheduled_steps={scheduled})")
@@ -1,7 +1,9 @@
 from typing import Any, Dict, List, Optional, Tuple
 
 import json
+import os
 import requests
+from core.tasks.run_metrics import RunMetricsThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
@@ -18,6 +20,16 @@ from core.jellyfin_http import (
 
 logger = get_logger("sync_jellyfin")
 
+INACTIVE_VODUM_STATUSES = ("expired", "disabled", "removed")
+
+
+def _sync_workers_from_env() -> int:
+    """Appels /Users/{id} en parallèle par serveur (1 = mode séquentiel historique)."""
+    try:
+        return max(1, int(os.environ.get("VODUM_JELLYFIN_SYNC_WORKERS", "8")))
+    except (TypeError, ValueError):
+        return 8
+
 
 # ----------------------------
 # helpers
@@ -183,7 +195,8 @@ def _get_jellyfin_servers(db):
         SELECT id, name, url, local_url, public_url, token, status, cooldown_until
         FROM servers
         WHERE type = 'jellyfin'
-        """
+        """,
+        decrypt_servers=True,
     )
 
 
@@ -661,6 +674,394 @@ def _sync_libraries_for_server(
 
 
 
+def _mark_absent_jellyfin_accounts(db, server_id: int, seen_jellyfin_ids) -> int:
+    """Marque provider_presence=removed les comptes absents de /Users."""
+    existing_accounts = db.query(
+        """
+        SELECT id, external_user_id, details_json
+        FROM media_users
+        WHERE server_id = ?
+          AND type = 'jellyfin'
+          AND TRIM(COALESCE(external_user_id, '')) <> ''
+        """,
+        (server_id,),
+    ) or []
+    removed_count = 0
+    with db.transaction():
+        for raw_account in existing_accounts:
+            account = dict(raw_account)
+            external_user_id = str(account.get("external_user_id") or "").strip()
+            if external_user_id in seen_jellyfin_ids:
+                continue
+            details = {}
+            try:
+                parsed = json.loads(account.get("details_json") or "{}")
+                if isinstance(parsed, dict):
+                    details = parsed
+            except (TypeError, ValueError):
+                pass
+            details.update(
+                {
+                    "provider_presence": "removed",
+                    "provider_presence_external_user_id": external_user_id,
+                    "provider_presence_checked_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+            )
+            db.execute(
+                "UPDATE media_users SET details_json = ? WHERE id = ?",
+                (json.dumps(details, ensure_ascii=False), int(account["id"])),
+            )
+            removed_count += 1
+
+    if removed_count:
+        logger.warning(
+            f"[SYNC JELLYFIN] {removed_count} account(s) marked removed "
+            f"because they are absent from Jellyfin (server_id={server_id})"
+        )
+    return removed_count
+
+
+def _allowed_library_ids(policy: Dict[str, Any], lib_map_itemid_to_dbid: Dict[str, int]) -> List[int]:
+    if policy.get("EnableAllFolders"):
+        return list(lib_map_itemid_to_dbid.values())
+
+    allowed_db_lib_ids: List[int] = []
+    enabled_folders = policy.get("EnabledFolders") or []
+    if isinstance(enabled_folders, list):
+        for folder_id in enabled_folders:
+            if not folder_id:
+                continue
+            lib_db_id = lib_map_itemid_to_dbid.get(str(folder_id))
+            if lib_db_id:
+                allowed_db_lib_ids.append(lib_db_id)
+    return allowed_db_lib_ids
+
+
+def _load_jellyfin_server_snapshot(db, server_id: int) -> Dict[str, Any]:
+    """
+    Précharge en 4 requêtes l'état DB d'un serveur Jellyfin (au lieu de
+    plusieurs SELECT par utilisateur) :
+    media_users, user_identities, vodum_users liés et media_user_libraries.
+    """
+    media_users = {
+        str(r["external_user_id"]): dict(r)
+        for r in db.query(
+            """
+            SELECT id, vodum_user_id, external_user_id, username
+            FROM media_users
+            WHERE server_id = ?
+              AND type = 'jellyfin'
+              AND external_user_id IS NOT NULL
+            """,
+            (server_id,),
+        )
+    }
+    identities = {
+        str(r["external_user_id"]): int(r["vodum_user_id"])
+        for r in db.query(
+            """
+            SELECT vodum_user_id, external_user_id
+            FROM user_identities
+            WHERE type = 'jellyfin'
+              AND server_id = ?
+              AND vodum_user_id IS NOT NULL
+            """,
+            (server_id,),
+        )
+    }
+    vodum_users = {
+        int(r["id"]): dict(r)
+        for r in db.query(
+            """
+            SELECT id, username, status
+            FROM vodum_users
+            WHERE id IN (
+                SELECT vodum_user_id FROM user_identities
+                WHERE type = 'jellyfin' AND server_id = ?
+                UNION
+                SELECT vodum_user_id FROM media_users
+                WHERE type = 'jellyfin' AND server_id = ?
+            )
+            """,
+            (server_id, server_id),
+        )
+    }
+    libraries: Dict[int, set] = {}
+    for r in db.query(
+        """
+        SELECT mul.media_user_id, mul.library_id
+        FROM media_user_libraries mul
+        JOIN libraries l ON l.id = mul.library_id
+        WHERE l.server_id = ?
+        """,
+        (server_id,),
+    ):
+        libraries.setdefault(int(r["media_user_id"]), set()).add(int(r["library_id"]))
+
+    return {
+        "media_users": media_users,
+        "identities": identities,
+        "vodum_users": vodum_users,
+        "libraries": libraries,
+    }
+
+
+def _upsert_media_user_from_snapshot(db, snapshot, server_id: int, jellyfin_id: str, username: str) -> Tuple[int, int]:
+    """
+    Équivalent de _upsert_media_user_by_jellyfin_id pour Jellyfin (identité =
+    server_id + external_user_id, jamais de merge par username), en
+    s'appuyant sur l'état préchargé : seules les écritures utiles sont faites.
+    """
+    vodum_user_id = snapshot["identities"].get(jellyfin_id)
+    if vodum_user_id is None:
+        cur = db.execute(
+            "INSERT INTO vodum_users (username, status) VALUES (?, 'active')",
+            (username,),
+        )
+        vodum_user_id = int(cur.lastrowid)
+        db.execute(
+            """
+            INSERT OR IGNORE INTO user_identities (vodum_user_id, type, server_id, external_user_id)
+            VALUES (?, 'jellyfin', ?, ?)
+            """,
+            (vodum_user_id, server_id, jellyfin_id),
+        )
+        snapshot["identities"][jellyfin_id] = vodum_user_id
+        snapshot["vodum_users"][vodum_user_id] = {"id": vodum_user_id, "username": username, "status": "active"}
+    else:
+        vodum_user = snapshot["vodum_users"].get(vodum_user_id)
+        if vodum_user is not None and vodum_user.get("username") is None:
+            db.execute(
+                "UPDATE vodum_users SET username = COALESCE(username, ?) WHERE id = ?",
+                (username, vodum_user_id),
+            )
+            vodum_user["username"] = username
+
+    row = snapshot["media_users"].get(jellyfin_id)
+    if row:
+        media_user_id = int(row["id"])
+        if row.get("username") != username or row.get("vodum_user_id") != vodum_user_id:
+            db.execute(
+                """
+                UPDATE media_users
+                SET username = ?,
+                    vodum_user_id = ?
+                WHERE id = ?
+                """,
+                (username, vodum_user_id, media_user_id),
+            )
+            row.update({"username": username, "vodum_user_id": vodum_user_id})
+        return media_user_id, vodum_user_id
+
+    cur = db.execute(
+        """
+        INSERT INTO media_users (server_id, vodum_user_id, external_user_id, username, type)
+        VALUES (?, ?, ?, ?, 'jellyfin')
+        """,
+        (server_id, vodum_user_id, jellyfin_id, username),
+    )
+    media_user_id = int(cur.lastrowid)
+    snapshot["media_users"][jellyfin_id] = {
+        "id": media_user_id,
+        "vodum_user_id": vodum_user_id,
+        "external_user_id": jellyfin_id,
+        "username": username,
+    }
+    return media_user_id, vodum_user_id
+
+
+def _fetch_user_detail(session: requests.Session, url: str, token: str, jellyfin_id: str) -> Dict[str, Any]:
+    detail_url = _build_api_url(url, f"/Users/{jellyfin_id}", token)
+    return _get_json(session, detail_url, timeout=30, token=token) or {}
+
+
+def _sync_users_and_policies_pipelined(
+    session: requests.Session,
+    db,
+    server_id: int,
+    url: str,
+    token: str,
+    lib_map_itemid_to_dbid: Dict[str, int],
+    workers: int,
+) -> Tuple[int, int]:
+    """
+    Mode pipeline de _sync_users_and_policies_for_server :
+    - les /Users/{id} partent en parallèle (pool borné, même session HTTP) et
+      sont tous résolus avant d'ouvrir la moindre transaction : aucun appel
+      réseau ne se fait avec le verrou d'écriture ;
+    - l'état DB du serveur est préchargé en dictionnaires ;
+    - toutes les écritures (media_users, policies, état, bibliothèques,
+      comptes absents) sont faites dans une seule transaction par serveur,
+      un SAVEPOINT par utilisateur, et media_user_libraries n'est modifié
+      que pour le diff.
+    """
+    users_url = _build_api_url(url, "/Users", token)
+    logger.info(f"Jellyfin users: GET {users_url}")
+
+    users = _get_json(session, users_url, timeout=30, token=token) or []
+    if not isinstance(users, list):
+        return 0, 0
+
+    entries = []
+    seen_jellyfin_ids = set()
+    for u in users:
+        if not isinstance(u, dict):
+            continue
+        jellyfin_id = u.get("Id")
+        username = u.get("Name")
+        if not jellyfin_id or not username:
+            continue
+        jellyfin_id = str(jellyfin_id)
+        if jellyfin_id in seen_jellyfin_ids:
+            continue
+        seen_jellyfin_ids.add(jellyfin_id)
+        entries.append((jellyfin_id, str(username), u))
+
+    snapshot = _load_jellyfin_server_snapshot(db, server_id)
+
+    def vodum_status(vodum_user_id) -> str:
+        vodum_user = snapshot["vodum_users"].get(vodum_user_id) if vodum_user_id is not None else None
+        return str((vodum_user or {}).get("status") or "").strip().lower()
+
+    # 1) Détails : tous résolus hors transaction (statut connu inactif : pas d'appel)
+    details: Dict[str, Dict[str, Any]] = {}
+    policy_ok = 0
+    executor = RunMetricsThreadPoolExecutor(
+        max_workers=max(1, min(workers, len(entries) or 1)),
+        thread_name_prefix=f"jellyfin-sync-{server_id}",
+    )
+    try:
+        futures = {
+            jellyfin_id: (username, executor.submit(_fetch_user_detail, session, url, token, jellyfin_id))
+            for jellyfin_id, username, _u in entries
+            if vodum_status(snapshot["identities"].get(jellyfin_id)) not in INACTIVE_VODUM_STATUSES
+        }
+        for jellyfin_id, (username, future) in futures.items():
+            try:
+                details[jellyfin_id] = future.result()
+                policy_ok += 1
+            except Exception as e:
+                logger.warning(
+                    f"Impossible de récupérer Policy pour user={username} ({jellyfin_id}) "
+                    f"sur server_id={server_id}: {e}"
+                )
+                details[jellyfin_id] = {}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # 2) Écritures : une transaction pour tout le serveur
+    processed = 0
+    with db.transaction():
+        accounts = []
+        for jellyfin_id, username, u in entries:
+            media_user_id, vodum_user_id = _upsert_media_user_from_snapshot(
+                db, snapshot, server_id, jellyfin_id, username
+            )
+            accounts.append((jellyfin_id, username, u, media_user_id, vodum_user_id))
+
+        for jellyfin_id, username, u, media_user_id, vodum_user_id in accounts:
+            user_status = vodum_status(vodum_user_id)
+            if user_status in INACTIVE_VODUM_STATUSES:
+                logger.info(
+                    f"[SYNC JELLYFIN] ignored user status={user_status} "
+                    f"(vodum_user_id={vodum_user_id}, "
+                    f"media_user_id={media_user_id}, "
+                    f"server_id={server_id})"
+                )
+                continue
+
+            try:
+                with db.transaction():
+                    _apply_user_detail(
+                        db,
+                        snapshot,
+                        server_id,
+                        jellyfin_id,
+                        u,
+                        # Sans détail, Policy du résumé /Users
+                        details.get(jellyfin_id) or {},
+                        media_user_id,
+                        vodum_user_id,
+                        lib_map_itemid_to_dbid,
+                    )
+            except Exception as e:
+                logger.warning(
+                    f"[SYNC JELLYFIN] unable to apply policy for user={username} ({jellyfin_id}) "
+                    f"on server_id={server_id}: {e}"
+                )
+                continue
+
+            processed += 1
+
+        _mark_absent_jellyfin_accounts(db, server_id, seen_jellyfin_ids)
+
+    logger.info(
+        f"Jellyfin users/policies (pipeline x{workers}): {processed} users traités, "
+        f"policy récupérée pour {policy_ok} users (server_id={server_id})"
+    )
+    return processed, policy_ok
+
+
+def _apply_user_detail(
+    db,
+    snapshot,
+    server_id: int,
+    jellyfin_id: str,
+    user_summary: Dict[str, Any],
+    detail: Dict[str, Any],
+    media_user_id: int,
+    vodum_user_id: int,
+    lib_map_itemid_to_dbid: Dict[str, int],
+) -> None:
+    if isinstance(detail, dict) and detail:
+        _store_full_user_json_and_fields(db, media_user_id, jellyfin_id, detail)
+
+    policy = (
+        (detail.get("Policy") or user_summary.get("Policy") or {})
+        if isinstance(detail, dict)
+        else {}
+    )
+    if not isinstance(policy, dict):
+        policy = {}
+
+    # Force expiration override for Jellyfin admins
+    if policy.get("IsAdministrator"):
+        db.execute(
+            "UPDATE vodum_users SET expiration_date_override = 1 WHERE id = ?",
+            (vodum_user_id,),
+        )
+
+    last_seen_at = None
+    if isinstance(detail, dict):
+        last_seen_at = detail.get("LastActivityDate") or detail.get("LastLoginDate") or None
+
+    allowed = set(_allowed_library_ids(policy, lib_map_itemid_to_dbid))
+    _set_media_user_state(
+        db,
+        media_user_id=media_user_id,
+        server_id=server_id,
+        owned=0,
+        all_libraries=1 if policy.get("EnableAllFolders") else 0,
+        num_libraries=len(allowed),
+        last_seen_at=last_seen_at,
+    )
+
+    current = snapshot["libraries"].get(media_user_id, set())
+    removed = current - allowed
+    added = allowed - current
+    if removed:
+        db.executemany(
+            "DELETE FROM media_user_libraries WHERE media_user_id = ? AND library_id = ?",
+            [(media_user_id, lib_id) for lib_id in sorted(removed)],
+        )
+    if added:
+        db.executemany(
+            "INSERT OR IGNORE INTO media_user_libraries (media_user_id, library_id) VALUES (?, ?)",
+            [(media_user_id, lib_id) for lib_id in sorted(added)],
+        )
+    snapshot["libraries"][media_user_id] = allowed
+
+
 def _sync_users_and_policies_for_server(
     session: requests.Session,
     db,
@@ -674,6 +1075,12 @@ def _sync_users_and_policies_for_server(
     - Pour chacun, récupère /Users/{id} pour Policy
     - Met à jour media_users + media_user_libraries (DB v2)
     """
+    workers = _sync_workers_from_env()
+    if workers > 1:
+        return _sync_users_and_policies_pipelined(
+            session, db, server_id, url, token, lib_map_itemid_to_dbid, workers
+        )
+
     users_url = _build_api_url(url, "/Users", token)
     logger.info(f"Jellyfin users: GET {users_url}")
 
@@ -698,9 +1105,10 @@ def _sync_users_and_policies_for_server(
         username = str(username)
         seen_jellyfin_ids.add(jellyfin_id)
 
-        media_user_id, vodum_user_id = _upsert_media_user_by_jellyfin_id(
-            db, server_id, jellyfin_id, username
-        )
+        with db.transaction():
+            media_user_id, vodum_user_id = _upsert_media_user_by_jellyfin_id(
+                db, server_id, jellyfin_id, username
+            )
 
         # Ignore inactive Vodum users
         vodum_user = db.query_one(
@@ -718,7 +1126,7 @@ def _sync_users_and_policies_for_server(
             else ""
         )
 
-        if user_status in ("expired", "disabled", "removed"):
+        if user_status in INACTIVE_VODUM_STATUSES:
             logger.info(
                 f"[SYNC JELLYFIN] ignored user status={user_status} "
                 f"(vodum_user_id={vodum_user_id}, "
@@ -739,127 +1147,89 @@ def _sync_users_and_policies_for_server(
             )
             detail = {}
 
-        # Stockage "max info" : JSON brut + champs utiles (role/joined_at/avatar)
-        try:
-            if isinstance(detail, dict):
-                _store_full_user_json_and_fields(db, media_user_id, jellyfin_id, detail)
-        except Exception as e:
-            logger.warning(
-                f"Impossible de stocker raw_json/role/joined_at pour user={username} ({jellyfin_id}) "
-                f"sur server_id={server_id}: {e}"
-            )
+        # Écritures du user (après l'appel HTTP) en un seul commit
+        with db.transaction():
+            # Stockage "max info" : JSON brut + champs utiles (role/joined_at/avatar)
+            try:
+                if isinstance(detail, dict):
+                    _store_full_user_json_and_fields(db, media_user_id, jellyfin_id, detail)
+            except Exception as e:
+                logger.warning(
+                    f"Impossible de stocker raw_json/role/joined_at pour user={username} ({jellyfin_id}) "
+                    f"sur server_id={server_id}: {e}"
+                )
 
 
-        policy = (
-            (detail.get("Policy") or u.get("Policy") or {})
-            if isinstance(detail, dict)
-            else {}
-        )
+            policy = (
+                (detail.get("Policy") or u.get("Policy") or {})
+                if isinstance(detail, dict)
+                else {}
+            )
 
-        # Force expiration override for Jellyfin admins
-        try:
-            is_admin = bool(policy.get("IsAdministrator"))
+            # Force expiration override for Jellyfin admins
+            try:
+                is_admin = bool(policy.get("IsAdministrator"))
+
+                if is_admin:
+                    db.execute(
+                        """
+                        UPDATE vodum_users
+                        SET expiration_date_override = 1
+                        WHERE id = ?
+                        """,
+                        (vodum_user_id,),
+                    )
 
-            if is_admin:
-                db.execute(
-                    """
-                    UPDATE vodum_users
-                    SET expiration_date_override = 1
-                    WHERE id = ?
-                    """,
-                    (vodum_user_id,),
+            except Exception as e:
+                logger.warning(
+                    f"[SYNC JELLYFIN] unable to force expiration override "
+                    f"for vodum_user_id={vodum_user_id}: {e}"
                 )
 
-        except Exception as e:
-            logger.warning(
-                f"[SYNC JELLYFIN] unable to force expiration override "
-                f"for vodum_user_id={vodum_user_id}: {e}"
-            )
 
+            enable_all = 1 if policy.get("EnableAllFolders") else 0
+            enabled_folders = policy.get("EnabledFolders") or []
 
-        enable_all = 1 if policy.get("EnableAllFolders") else 0
-        enabled_folders = policy.get("EnabledFolders") or []
+            # last activity info (si présent)
+            last_seen_at = None
+            if isinstance(detail, dict):
+                last_seen_at = (
+                    detail.get("LastActivityDate")
+                    or detail.get("LastLoginDate")
+                    or None
+                )
 
-        # last activity info (si présent)
-        last_seen_at = None
-        if isinstance(detail, dict):
-            last_seen_at = (
-                detail.get("LastActivityDate")
-                or detail.get("LastLoginDate")
-                or None
+            # Calcul libraries autorisées
+            allowed_db_lib_ids: List[int] = []
+            if enable_all:
+                allowed_db_lib_ids = list(lib_map_itemid_to_dbid.values())
+            else:
+                if isinstance(enabled_folders, list):
+                    for folder_id in enabled_folders:
+                        if not folder_id:
+                            continue
+                        lib_db_id = lib_map_itemid_to_dbid.get(str(folder_id))
+                        if lib_db_id:
+                            allowed_db_lib_ids.append(lib_db_id)
+
+            _set_media_user_state(
+                db,
+                media_user_id=media_user_id,
+                server_id=server_id,
+                owned=0,
+                all_libraries=enable_all,
+                num_libraries=len(allowed_db_lib_ids),
+                last_seen_at=last_seen_at,
             )
 
-        # Calcul libraries autorisées
-        allowed_db_lib_ids: List[int] = []
-        if enable_all:
-            allowed_db_lib_ids = list(lib_map_itemid_to_dbid.values())
-        else:
-            if isinstance(enabled_folders, list):
-                for folder_id in enabled_folders:
-                    if not folder_id:
-                        continue
-                    lib_db_id = lib_map_itemid_to_dbid.get(str(folder_id))
-                    if lib_db_id:
-                        allowed_db_lib_ids.append(lib_db_id)
-
-        _set_media_user_state(
-            db,
-            media_user_id=media_user_id,
-            server_id=server_id,
-            owned=0,
-            all_libraries=enable_all,
-            num_libraries=len(allowed_db_lib_ids),
-            last_seen_at=last_seen_at,
-        )
-
-        _refresh_shared_libraries_for_server(
-            db, media_user_id, server_id, allowed_db_lib_ids
-        )
+            _refresh_shared_libraries_for_server(
+                db, media_user_id, server_id, allowed_db_lib_ids
+            )
 
         # Si accès réel → init expiration_date sur le vodum_user
         processed += 1
 
-    existing_accounts = db.query(
-        """
-        SELECT id, external_user_id, details_json
-        FROM media_users
-        WHERE server_id = ?
-          AND type = 'jellyfin'
-          AND TRIM(COALESCE(external_user_id, '')) <> ''
-        """,
-        (server_id,),
-    ) or []
-    removed_count = 0
-    for raw_account in existing_accounts:
-        account = dict(raw_account)
-        external_user_id = str(account.get("external_user_id") or "").strip()
-        if external_user_id in seen_jellyfin_ids:
-            continue
-        details = {}
-        try:
-            parsed = json.loads(account.get("details_json") or "{}")
-            if isinstance(parsed, dict):
-                details = parsed
-        except (TypeError, ValueError):
-            pass
-        details.update(
-            {
-                "provider_presence": "removed",
-                "provider_presence_external_user_id": external_user_id,
-                "provider_presence_checked_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-            }
-        )
-        db.execute(
-            "UPDATE media_users SET details_json = ? WHERE id = ?",
-            (json.dumps(details, ensure_ascii=False), int(account["id"])),
-        )
-        removed_count += 1
-
-    if removed_count:
-        logger.warning(
-            f"[SYNC JELLYFIN] {removed_count} account(s) marked removed "
-            f"because they are absent from Jellyfin (server_id={server_id})"
-        )
+    _mark_absent_jellyfin_accounts(db, server_id, seen_jellyfin_ids)
 
     logger.info(
         f"Jellyfin users/policies: {processed} users traités, "
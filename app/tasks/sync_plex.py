@@ -1,5 +1,6 @@
 
 import time
+from functools import partial
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Set, Tuple, Optional
 
@@ -33,6 +34,7 @@ from core.plex_library_access import (
 )
 from core.plex_owner_sync import sync_plex_owner_for_server
 from core.plex_library_sync import plex_get_libraries, sync_plex_libraries
+from core.plex_user_access_index import PlexUserAccessIndex
 
 # ---------------------------------------------------------------------------
 # CONFIG & LOGGER
@@ -287,7 +289,7 @@ def plex_get_user_access(db, plex, server_name, media_user_id: int):
 
     return out
 
-def sync_plex_user_library_access(db, plex, server):
+def sync_plex_user_library_access(db, plex, server, access_index=None):
     server_id = server["id"]
     server_name = server["name"]
 
@@ -316,6 +318,7 @@ def sync_plex_user_library_access(db, plex, server):
             mu.vodum_user_id AS vodum_user_id,
             mu.role AS role,
             mu.username AS username,
+            mu.email AS media_email,
             mu.external_user_id AS external_user_id,
             mu.accepted_at AS accepted_at,
             mu.details_json AS details_json
@@ -337,6 +340,17 @@ def sync_plex_user_library_access(db, plex, server):
     preserved_pending = 0
     skipped_pending_jobs = 0
 
+    # Index bulk (users + shared_servers chargés une fois) ; à défaut,
+    # lookup individuel par utilisateur comme avant.
+    if access_index is None:
+        access_index = PlexUserAccessIndex()
+    use_index = access_index.prepare(plex, server)
+    if not use_index:
+        log.warning(
+            f"[SYNC ACCESS] Bulk access index unavailable for server={server_name}, "
+            "falling back to per-user Plex lookups"
+        )
+
     # 3️⃣ Resync accès pour chaque user
     for u in users:
         email = u["email"]
@@ -421,7 +435,22 @@ def sync_plex_user_library_access(db, plex, server):
                 skipped_no_email += 1
                 continue
 
-            access = plex_get_user_access(db, plex, server_name, media_user_id)
+            if use_index:
+                # Comme plex_get_user_access : compte Plex du media_user
+                # (son email Plex peut différer de l'email VODUM)
+                access = access_index.user_access(
+                    plex,
+                    server,
+                    _row_value(u, "media_email", ""),
+                    username,
+                )
+                if access is None:
+                    log.warning(
+                        f"[ACCESS] Plex user not found in account users "
+                        f"(media_user_id={media_user_id}, username={username!r})"
+                    )
+            else:
+                access = plex_get_user_access(db, plex, server_name, media_user_id)
 
             # ⚠️ Si Plex répond mal / erreur API, on ne supprime rien
             if access is None:
@@ -440,12 +469,14 @@ def sync_plex_user_library_access(db, plex, server):
 
             has_access = bool(desired_library_ids)
 
-        before_ids, added_ids, removed_ids = _apply_media_user_library_diff_for_server(
-            db,
-            media_user_id=media_user_id,
-            server_id=server_id,
-            desired_library_ids=desired_library_ids,
-        )
+        # Ajouts + suppressions du user en un seul commit
+        with db.transaction():
+            before_ids, added_ids, removed_ids = _apply_media_user_library_diff_for_server(
+                db,
+                media_user_id=media_user_id,
+                server_id=server_id,
+                desired_library_ids=desired_library_ids,
+            )
 
         if added_ids or removed_ids:
             log.info(
@@ -496,7 +527,8 @@ def sync_users_from_api(db) -> None:
           AND token IS NOT NULL
           AND token != ''
         ORDER BY id
-        """
+        """,
+        decrypt_servers=True,
     )
     if not server_rows:
         raise RuntimeError("[SYNC USERS] Aucun serveur Plex avec token en base.")
@@ -663,230 +695,233 @@ def sync_users_from_api(db) -> None:
     # 4) Upsert vodum_users + media_users (IDENTIQUE à ton code)
     #     + logs si machineIdentifier non mappable
     # ----------------------------------------------------
-    today = datetime.utcnow().date()
-    seen_plex_ids: Set[str] = set()
-    seen_media_pairs: Set[Tuple[str, int]] = set()
-
-    for plex_id, data in users_data.items():
-        seen_plex_ids.add(plex_id)
+    # Toutes les écritures vodum_users / media_users du run dans une seule
+    # transaction : les appels plex.tv sont terminés à ce stade.
+    with db.transaction():
+        today = datetime.utcnow().date()
+        seen_plex_ids: Set[str] = set()
+        seen_media_pairs: Set[Tuple[str, int]] = set()
 
-        username = data["username"]
-        email = data["email"] or None
-        avatar = data["avatar"]
-        plex_role = data["plex_role"]
+        for plex_id, data in users_data.items():
+            seen_plex_ids.add(plex_id)
 
+            username = data["username"]
+            email = data["email"] or None
+            avatar = data["avatar"]
+            plex_role = data["plex_role"]
 
 
-        joined_at = data.get("joined_at")
-        accepted_at = data.get("accepted_at")
 
-        # 4.1) VODUM_USERS (identique)
-        vodum_user_id = None
+            joined_at = data.get("joined_at")
+            accepted_at = data.get("accepted_at")
 
-        row = db.query_one(
-            """
-            SELECT vodum_user_id
-            FROM user_identities
-            WHERE type = 'plex'
-              AND server_id IS NULL
-              AND external_user_id = ?
-            """,
-            (plex_id,),
-        )
-        if row:
-            vodum_user_id = row["vodum_user_id"]
+            # 4.1) VODUM_USERS (identique)
+            vodum_user_id = None
 
-        if vodum_user_id is None and email:
-            row = db.query_one("SELECT id FROM vodum_users WHERE email = ?", (email,))
-            if row:
-                vodum_user_id = row["id"]
-                db.execute(
-                    "UPDATE vodum_users SET username = COALESCE(username, ?) WHERE id = ?",
-                    (username, vodum_user_id),
-                )
-
-        if vodum_user_id is None:
-            cur_v = db.execute(
+            row = db.query_one(
                 """
-                INSERT INTO vodum_users(username, email, created_at, status)
-                VALUES (?, ?, ?, 'active')
+                SELECT vodum_user_id
+                FROM user_identities
+                WHERE type = 'plex'
+                  AND server_id IS NULL
+                  AND external_user_id = ?
                 """,
-                (username, email, today.isoformat()),
+                (plex_id,),
             )
-            vodum_user_id = cur_v.lastrowid
-            log.info(f"[SYNC USERS] New vodum_user created vodum_user_id={vodum_user_id} (plex_id={plex_id})")
-
-        db.execute(
-            """
-            INSERT OR IGNORE INTO user_identities(vodum_user_id, type, server_id, external_user_id)
-            VALUES (?, 'plex', NULL, ?)
-            """,
-            (vodum_user_id, plex_id),
-        )
-
-        # 4.2) MEDIA_USERS (identique + log mismatch)
-        for srv in data.get("servers", []):
-            machine_id = (srv.get("machineIdentifier") or "").strip()
-            if not machine_id:
-                continue
+            if row:
+                vodum_user_id = row["vodum_user_id"]
+
+            if vodum_user_id is None and email:
+                row = db.query_one("SELECT id FROM vodum_users WHERE email = ?", (email,))
+                if row:
+                    vodum_user_id = row["id"]
+                    db.execute(
+                        "UPDATE vodum_users SET username = COALESCE(username, ?) WHERE id = ?",
+                        (username, vodum_user_id),
+                    )
 
-            server_id = server_id_by_machine.get(machine_id)
-            if not server_id:
-                # 🔥 log crucial : tu verras immédiatement quel machineIdentifier ne matche pas ta DB
-                log.warning(
-                    f"[SYNC USERS] machineIdentifier not mapped in the database: {machine_id} "
-                    f"(user plex_id={plex_id}, username={username!r})"
+            if vodum_user_id is None:
+                cur_v = db.execute(
+                    """
+                    INSERT INTO vodum_users(username, email, created_at, status)
+                    VALUES (?, ?, ?, 'active')
+                    """,
+                    (username, email, today.isoformat()),
                 )
-                continue
-
-            seen_media_pairs.add((plex_id, server_id))
-
-            # Rôle PAR SERVEUR (source de vérité)
-            # - owner : uniquement si plex_id == owner du serveur (via /users/account du token serveur)
-            # - home  : si user est home (ou srv.home)
-            # - friend: sinon
-            srv_home = 1 if str(srv.get("home") or "0") == "1" else 0
-
-            server_owner_plex_id = owner_plex_id_by_server_id.get(int(server_id))
-            if server_owner_plex_id and str(plex_id) == str(server_owner_plex_id):
-                role_for_server = "owner"
-            elif (data.get("home") or 0) == 1 or srv_home == 1 or (data.get("plex_role") or "").lower() == "home":
-                role_for_server = "home"
-            else:
-                role_for_server = "friend"
-
-
+                vodum_user_id = cur_v.lastrowid
+                log.info(f"[SYNC USERS] New vodum_user created vodum_user_id={vodum_user_id} (plex_id={plex_id})")
 
-
-            details_json = json.dumps(
-                {
-                    "plex_share": {
-                        "allowSync": 1 if data.get("allow_sync") else 0,
-                        "allowCameraUpload": 1 if data.get("allow_camera_upload") else 0,
-                        "allowChannels": 1 if data.get("allow_channels") else 0,
-                        "filterMovies": data.get("filter_movies") or "",
-                        "filterTelevision": data.get("filter_television") or "",
-                        "filterMusic": data.get("filter_music") or "",
-                    },
-                    "plex_user": {
-                        "subscription_active": data.get("subscription_active"),
-                        "subscription_status": data.get("subscription_status"),
-                        "subscription_plan": data.get("subscription_plan"),
-                        "joined_at": data.get("joined_at"),
-                        "accepted_at": data.get("accepted_at"),
-                        "username": data.get("username"),
-                        "email": data.get("email"),
-                        "avatar": data.get("avatar"),
-                    },
-                    "plex_invite_state": plex_invite_state_payload("friend"),
-                },
-                ensure_ascii=False
-            )
-
-            row_mu = db.query_one(
+            db.execute(
                 """
-                SELECT id
-                FROM media_users
-                WHERE server_id = ?
-                  AND external_user_id = ?
-                  AND type = 'plex'
+                INSERT OR IGNORE INTO user_identities(vodum_user_id, type, server_id, external_user_id)
+                VALUES (?, 'plex', NULL, ?)
                 """,
-                (server_id, plex_id),
+                (vodum_user_id, plex_id),
             )
 
-            pending_mu = db.query_one(
-                """
-                SELECT id
-                FROM media_users
-                WHERE server_id = ?
-                  AND type = 'plex'
-                  AND COALESCE(NULLIF(TRIM(external_user_id), ''), '') = ''
-                  AND COALESCE(NULLIF(TRIM(accepted_at), ''), '') = ''
-                  AND (
-                    vodum_user_id = ?
-                    OR (? <> '' AND lower(COALESCE(email, '')) = lower(?))
-                    OR (? <> '' AND lower(COALESCE(username, '')) = lower(?))
-                  )
-                ORDER BY id ASC
-                LIMIT 1
-                """,
-                (server_id, vodum_user_id, email or "", email or "", username or "", username or ""),
-            )
+            # 4.2) MEDIA_USERS (identique + log mismatch)
+            for srv in data.get("servers", []):
+                machine_id = (srv.get("machineIdentifier") or "").strip()
+                if not machine_id:
+                    continue
 
-            if row_mu and pending_mu and int(row_mu["id"]) != int(pending_mu["id"]):
-                merge_accepted_plex_media_user(
-                    db,
-                    accepted_id=row_mu["id"],
-                    pending_id=pending_mu["id"],
-                )
-                log.info(
-                    f"[SYNC USERS] Removed accepted Plex invite duplicate id={pending_mu['id']} "
-                    f"in favor of media_user id={row_mu['id']}"
-                )
-            elif not row_mu and pending_mu:
-                row_mu = pending_mu
-                log.info(
-                    f"[SYNC USERS] Reconciled pending Plex invite media_user id={row_mu['id']} "
-                    f"with accepted plex_id={plex_id}"
+                server_id = server_id_by_machine.get(machine_id)
+                if not server_id:
+                    # 🔥 log crucial : tu verras immédiatement quel machineIdentifier ne matche pas ta DB
+                    log.warning(
+                        f"[SYNC USERS] machineIdentifier not mapped in the database: {machine_id} "
+                        f"(user plex_id={plex_id}, username={username!r})"
+                    )
+                    continue
+
+                seen_media_pairs.add((plex_id, server_id))
+
+                # Rôle PAR SERVEUR (source de vérité)
+                # - owner : uniquement si plex_id == owner du serveur (via /users/account du token serveur)
+                # - home  : si user est home (ou srv.home)
+                # - friend: sinon
+                srv_home = 1 if str(srv.get("home") or "0") == "1" else 0
+
+                server_owner_plex_id = owner_plex_id_by_server_id.get(int(server_id))
+                if server_owner_plex_id and str(plex_id) == str(server_owner_plex_id):
+                    role_for_server = "owner"
+                elif (data.get("home") or 0) == 1 or srv_home == 1 or (data.get("plex_role") or "").lower() == "home":
+                    role_for_server = "home"
+                else:
+                    role_for_server = "friend"
+
+
+
+
+                details_json = json.dumps(
+                    {
+                        "plex_share": {
+                            "allowSync": 1 if data.get("allow_sync") else 0,
+                            "allowCameraUpload": 1 if data.get("allow_camera_upload") else 0,
+                            "allowChannels": 1 if data.get("allow_channels") else 0,
+                            "filterMovies": data.get("filter_movies") or "",
+                            "filterTelevision": data.get("filter_television") or "",
+                            "filterMusic": data.get("filter_music") or "",
+                        },
+                        "plex_user": {
+                            "subscription_active": data.get("subscription_active"),
+                            "subscription_status": data.get("subscription_status"),
+                            "subscription_plan": data.get("subscription_plan"),
+                            "joined_at": data.get("joined_at"),
+                            "accepted_at": data.get("accepted_at"),
+                            "username": data.get("username"),
+                            "email": data.get("email"),
+                            "avatar": data.get("avatar"),
+                        },
+                        "plex_invite_state": plex_invite_state_payload("friend"),
+                    },
+                    ensure_ascii=False
                 )
 
-            if row_mu:
-                db.execute(
+                row_mu = db.query_one(
                     """
-                    UPDATE media_users
-                    SET vodum_user_id   = ?,
-                        external_user_id = ?,
-                        username         = ?,
-                        email            = ?,
-                        avatar           = ?,
-                        type             = 'plex',
-                        role             = ?,
-                        joined_at        = ?,
-                        accepted_at      = ?,
-                        details_json     = ?
-                    WHERE id = ?
+                    SELECT id
+                    FROM media_users
+                    WHERE server_id = ?
+                      AND external_user_id = ?
+                      AND type = 'plex'
                     """,
-                    (
-                        vodum_user_id,
-                        plex_id,
-                        username,
-                        email,
-                        avatar,
-                        role_for_server,
-                        joined_at,
-                        accepted_at,
-                        details_json,
-                        row_mu["id"],
-                    ),
+                    (server_id, plex_id),
                 )
-            else:
-                cur_mu = db.execute(
+
+                pending_mu = db.query_one(
                     """
-                    INSERT INTO media_users(
-                        server_id, vodum_user_id, external_user_id,
-                        username, email, avatar,
-                        type, role, joined_at, accepted_at, details_json
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, 'plex', ?, ?, ?, ?)
+                    SELECT id
+                    FROM media_users
+                    WHERE server_id = ?
+                      AND type = 'plex'
+                      AND COALESCE(NULLIF(TRIM(external_user_id), ''), '') = ''
+                      AND COALESCE(NULLIF(TRIM(accepted_at), ''), '') = ''
+                      AND (
+                        vodum_user_id = ?
+                        OR (? <> '' AND lower(COALESCE(email, '')) = lower(?))
+                        OR (? <> '' AND lower(COALESCE(username, '')) = lower(?))
+                      )
+                    ORDER BY id ASC
+                    LIMIT 1
                     """,
-                    (
-                        server_id,
-                        vodum_user_id,
-                        plex_id,
-                        username,
-                        email,
-                        avatar,
-                        role_for_server,
-                        joined_at,
-                        accepted_at,
-                        details_json,
-                    ),
-                )
-                log.info(
-                    f"[SYNC USERS] New media_user created id={cur_mu.lastrowid} "
-                    f"(server_id={server_id}, plex_id={plex_id})"
+                    (server_id, vodum_user_id, email or "", email or "", username or "", username or ""),
                 )
 
+                if row_mu and pending_mu and int(row_mu["id"]) != int(pending_mu["id"]):
+                    merge_accepted_plex_media_user(
+                        db,
+                        accepted_id=row_mu["id"],
+                        pending_id=pending_mu["id"],
+                    )
+                    log.info(
+                        f"[SYNC USERS] Removed accepted Plex invite duplicate id={pending_mu['id']} "
+                        f"in favor of media_user id={row_mu['id']}"
+                    )
+                elif not row_mu and pending_mu:
+                    row_mu = pending_mu
+                    log.info(
+                        f"[SYNC USERS] Reconciled pending Plex invite media_user id={row_mu['id']} "
+                        f"with accepted plex_id={plex_id}"
+                    )
+
+                if row_mu:
+                    db.execute(
+                        """
+                        UPDATE media_users
+                        SET vodum_user_id   = ?,
+                            external_user_id = ?,
+                            username         = ?,
+                            email            = ?,
+                            avatar           = ?,
+                            type             = 'plex',
+                            role             = ?,
+                            joined_at        = ?,
+                            accepted_at      = ?,
+                            details_json     = ?
+                        WHERE id = ?
+                        """,
+                        (
+                            vodum_user_id,
+                            plex_id,
+                            username,
+                            email,
+                            avatar,
+                            role_for_server,
+                            joined_at,
+                            accepted_at,
+                            details_json,
+                            row_mu["id"],
+                        ),
+                    )
+                else:
+                    cur_mu = db.execute(
+                        """
+                        INSERT INTO media_users(
+                            server_id, vodum_user_id, external_user_id,
+                            username, email, avatar,
+                            type, role, joined_at, accepted_at, details_json
+                        )
+                        VALUES (?, ?, ?, ?, ?, ?, 'plex', ?, ?, ?, ?)
+                        """,
+                        (
+                            server_id,
+                            vodum_user_id,
+                            plex_id,
+                            username,
+                            email,
+                            avatar,
+                            role_for_server,
+                            joined_at,
+                            accepted_at,
+                            details_json,
+                        ),
+                    )
+                    log.info(
+                        f"[SYNC USERS] New media_user created id={cur_mu.lastrowid} "
+                        f"(server_id={server_id}, plex_id={plex_id})"
+                    )
+
     log.info(
         f"=== [SYNC USERS] Finished : users_uniques={len(seen_plex_ids)}, liens_media_users={len(seen_media_pairs)} ==="
     )
@@ -900,11 +935,12 @@ def sync_users_from_api(db) -> None:
 # SYNC GLOBALE (pour compat avec l'ancien sync_all)
 # ---------------------------------------------------------------------------
 
-def sync_all(task_id=None, db=None) -> None:
+def sync_all(task_id=None, db=None) -> dict:
     if db is None:
         raise RuntimeError("sync_all() doit recevoir un DBManager")
 
     log.info("=== [SYNC ALL] Starting Plex synchronization ===")
+    access_index = PlexUserAccessIndex()
     result = sync_all_servers(
         db,
         ensure_server_identity=_ensure_plex_server_identity,
@@ -913,14 +949,20 @@ def sync_all(task_id=None, db=None) -> None:
         sync_libraries=sync_plex_libraries,
         sync_owner=sync_plex_owner_for_server,
         find_base_url=_find_working_plex_base_url,
-        sync_user_access=sync_plex_user_library_access,
+        sync_user_access=partial(sync_plex_user_library_access, access_index=access_index),
     )
+    stats = access_index.stats()
     if not result["success"]:
         if result["skipped_unreachable"] == result["server_count"]:
             log.warning("[SYNC ALL] All Plex servers are down or in cooldown; sync skipped.")
-            return
+            return stats
         raise RuntimeError("No Plex server could be synchronized")
-    log.info("=== [SYNC ALL] Plex synchronization completed ===")
+    log.info(
+        "=== [SYNC ALL] Plex synchronization completed "
+        f"(access HTTP calls={stats['access_http_calls']}, "
+        f"saved≈{stats['access_http_calls_saved']}) ==="
+    )
+    return stats
 
 
 # ---------------------------------------------------------------------------
@@ -940,7 +982,7 @@ def run(task_id: int, db):
     start = time.monotonic()
 
     try:
-        sync_all(task_id, db=db)
+        stats = sync_all(task_id, db=db)
 
         duration = time.monotonic() - start
         log.info(f"=== [SYNC_PLEX] Completed successfully in {duration:.2f}s ===")
@@ -951,6 +993,8 @@ def run(task_id: int, db):
         else:
             task_logs(task_id, "info", "Plex synchronization completed — no users found.")
 
+        return stats
+
     except Exception as e:
         duration = time.monotonic() - start
         log.error(
@@ -4,17 +4,28 @@ warmup_artwork_cache.py
 - Précharge le cache disque des posters/backdrops monitoring.
 - Couvre les sessions live/récentes ET les cartes Top by library.
 - Utilise le même resolver artwork que l'interface pour éviter de précharger des références obsolètes.
+- Téléchargements en parallèle (pool borné + limite par serveur, rate limiter Plex),
+  sessions live/récentes en premier, curseur de reprise si la tâche est interrompue.
 """
 
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
 from core.monitoring.artwork import _resolve_row_artwork
 from core.monitoring.artwork_cache import (
     artwork_cache_key,
     is_artwork_cache_fresh,
     write_artwork_cache,
 )
-from core.plex_rate_limit import wait_for_plex_slot
+from core.plex_rate_limit import record_plex_response, wait_for_plex_slot
 from core.http_security import server_http_session
+from core.tasks.run_metrics import RunMetricsThreadPoolExecutor
+from core.tasks.checkpoints import (
+    clear_task_checkpoint,
+    load_task_checkpoint,
+    save_task_checkpoint,
+)
 from logging_utils import get_logger, is_debug_mode_enabled
 from tasks_engine import task_logs
 
@@ -23,6 +34,14 @@ log = get_logger("warmup_artwork_cache")
 WARMUP_RECENT_LIMIT = int(os.environ.get("VODUM_ARTWORK_WARMUP_RECENT_LIMIT", "200"))
 WARMUP_LIBRARY_TOP_PER_LIBRARY = int(os.environ.get("VODUM_ARTWORK_WARMUP_LIBRARY_TOP_PER_LIBRARY", "6"))
 REQUEST_TIMEOUT = int(os.environ.get("VODUM_ARTWORK_WARMUP_TIMEOUT", "10"))
+WARMUP_WORKERS = int(os.environ.get("VODUM_ARTWORK_WARMUP_WORKERS", "8"))
+WARMUP_PER_SERVER = int(os.environ.get("VODUM_ARTWORK_WARMUP_PER_SERVER", "4"))
+
+TASK_NAME = "warmup_artwork_cache"
+# Sauvegarde du curseur toutes les N images traitées
+CHECKPOINT_EVERY = 50
+# Au-delà, le cache a pu être purgé entre-temps : on repart de zéro
+CHECKPOINT_MAX_AGE_SECONDS = 24 * 3600
 
 
 def _safe_int(value, default=0):
@@ -50,14 +69,14 @@ def _server_bases(server):
     return bases
 
 
-def _fetch_plex(server, ref):
+def _fetch_plex(server, ref, http=None):
     path = (ref.get("path") or "").strip()
     token = server.get("token")
     if not path or not token:
         return None
 
     headers = {"X-Plex-Token": token}
-    http = server_http_session(server)
+    http = http or server_http_session(server)
 
     candidate_paths = [path]
     if path.endswith("/art"):
@@ -69,6 +88,7 @@ def _fetch_plex(server, ref):
             try:
                 wait_for_plex_slot(base)
                 response = http.get(base + candidate_path, headers=headers, timeout=REQUEST_TIMEOUT)
+                record_plex_response(base, response)
                 response.raise_for_status()
                 return response.content, response.headers.get("Content-Type") or "image/jpeg"
             except Exception as e:
@@ -80,7 +100,7 @@ def _fetch_plex(server, ref):
     return None
 
 
-def _fetch_jellyfin(server, ref):
+def _fetch_jellyfin(server, ref, http=None):
     item_id = ref.get("item_id")
     if not item_id or not server.get("token"):
         return None
@@ -96,7 +116,7 @@ def _fetch_jellyfin(server, ref):
 
     headers = {"X-Emby-Token": server.get("token")}
     params = {"maxWidth": width, "quality": quality}
-    http = server_http_session(server)
+    http = http or server_http_session(server)
 
     last_error = None
     for base in _server_bases(server):
@@ -155,7 +175,8 @@ def _load_servers(db):
         WHERE LOWER(TRIM(type)) IN ('plex','jellyfin')
           AND token IS NOT NULL
           AND TRIM(token) != ''
-        """
+        """,
+        decrypt_servers=True,
     )
     return {int(row["id"]): _row_to_dict(row) for row in rows}
 
@@ -357,7 +378,8 @@ def _load_candidates(db):
         (top_per_library,),
     )
 
-    return _dedupe_candidates(live_rows + library_top_rows + recent_history_rows)
+    # Priorité : sessions live, puis historique récent, puis Top by library
+    return _dedupe_candidates(live_rows + recent_history_rows + library_top_rows)
 
 
 def _resolve_refs(db, row):
@@ -375,30 +397,64 @@ def _resolve_refs(db, row):
         return None, None
 
 
-def _warmup_one(server, ref):
+def _warmup_one(server, ref, http=None):
+    """Retourne (résultat, octets téléchargés)."""
     ref = ref or {}
     provider = (ref.get("provider") or "").strip().lower()
     server_id = server.get("id")
     cache_key = _cache_key_for_ref(server_id, ref)
 
     if not cache_key:
-        return "skipped"
+        return "skipped", 0
 
     if is_artwork_cache_fresh(cache_key):
-        return "hit"
+        return "hit", 0
 
     if provider == "plex":
-        fetched = _fetch_plex(server, ref)
+        fetched = _fetch_plex(server, ref, http)
     elif provider == "jellyfin":
-        fetched = _fetch_jellyfin(server, ref)
+        fetched = _fetch_jellyfin(server, ref, http)
     else:
-        return "skipped"
+        return "skipped", 0
 
     if not fetched:
-        return "error"
+        return "error", 0
 
     content, content_type = fetched
-    return "warmed" if write_artwork_cache(cache_key, content, content_type) else "error"
+    if not write_artwork_cache(cache_key, content, content_type):
+        return "error", 0
+    return "warmed", len(content or b"")
+
+
+class _ServerPools:
+    """Une session HTTP et une limite de requêtes simultanées par serveur."""
+
+    def __init__(self, per_server: int):
+        self._per_server = max(1, int(per_server))
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._slots = {}
+
+    def _get(self, server):
+        server_id = server.get("id")
+        with self._lock:
+            if server_id not in self._sessions:
+                self._sessions[server_id] = server_http_session(server)
+                self._slots[server_id] = threading.BoundedSemaphore(self._per_server)
+            return self._sessions[server_id], self._slots[server_id]
+
+    def warmup(self, server, ref):
+        http, slot = self._get(server)
+        with slot:
+            return _warmup_one(server, ref, http)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                try:
+                    session.close()
+                except Exception:
+                    pass
 
 
 def run(task_id: int, db):
@@ -414,58 +470,132 @@ def run(task_id: int, db):
 
     candidates = _load_candidates(db)
 
-    seen = set()
-    warmed = 0
-    hit = 0
-    skipped = 0
-    errors = 0
-
-    for row in candidates:
-        server_id = _safe_int(row.get("server_id"))
-        server = servers.get(server_id)
-        if not server:
-            skipped += 1
-            continue
+    # Reprise : les refs déjà traitées par un run interrompu ne sont pas refaites
+    checkpoint = load_task_checkpoint(db, TASK_NAME)
+    done_keys = set()
+    if time.time() - _safe_int(checkpoint.get("saved_at")) <= CHECKPOINT_MAX_AGE_SECONDS:
+        done_keys = set(checkpoint.get("done_keys") or [])
+    if done_keys:
+        log.info(f"Resuming artwork warmup: {len(done_keys)} ref(s) already processed")
 
-        poster_ref, backdrop_ref = _resolve_refs(db, row)
+    seen = set()
+    counts = {"warmed": 0, "hit": 0, "skipped": 0, "errors": 0}
+    resumed = 0
+    bytes_downloaded = 0
+    started = time.monotonic()
+
+    workers = max(1, _safe_int(WARMUP_WORKERS, 8))
+    pools = _ServerPools(_safe_int(WARMUP_PER_SERVER, 4))
+    executor = RunMetricsThreadPoolExecutor(max_workers=workers, thread_name_prefix="artwork-warmup")
+    in_flight = {}
+    since_checkpoint = 0
+
+    def collect(return_when):
+        nonlocal bytes_downloaded, since_checkpoint
+        done, _pending = wait(list(in_flight), return_when=return_when)
+        for future in done:
+            cache_key, server_id = in_flight.pop(future)
+            try:
+                result, size = future.result()
+            except Exception as e:
+                result, size = "error", 0
+                log.warning(f"Unable to warm artwork cache for server={server_id}: {e}", exc_info=True)
 
-        for ref in (poster_ref, backdrop_ref):
-            if not ref:
+            if result == "warmed":
+                counts["warmed"] += 1
+                bytes_downloaded += size
+            elif result == "hit":
+                counts["hit"] += 1
+            elif result == "skipped":
+                counts["skipped"] += 1
+            else:
+                counts["errors"] += 1
+                # Pas de checkpoint : un run repris retente le téléchargement
                 continue
 
-            cache_key = _cache_key_for_ref(server_id, ref)
-            if not cache_key or cache_key in seen:
+            done_keys.add(cache_key)
+            since_checkpoint += 1
+
+        if since_checkpoint >= CHECKPOINT_EVERY:
+            since_checkpoint = 0
+            _save_progress(db, done_keys)
+
+    try:
+        for row in candidates:
+            server_id = _safe_int(row.get("server_id"))
+            server = servers.get(server_id)
+            if not server:
+                counts["skipped"] += 1
                 continue
 
-            seen.add(cache_key)
+            poster_ref, backdrop_ref = _resolve_refs(db, row)
 
-            try:
-                result = _warmup_one(server, ref)
-                if result == "warmed":
-                    warmed += 1
-                elif result == "hit":
-                    hit += 1
-                elif result == "skipped":
-                    skipped += 1
-                else:
-                    errors += 1
-            except Exception as e:
-                errors += 1
-                log.warning(f"Unable to warm artwork cache for server={server_id}: {e}", exc_info=True)
+            for ref in (poster_ref, backdrop_ref):
+                if not ref:
+                    continue
+
+                cache_key = _cache_key_for_ref(server_id, ref)
+                if not cache_key or cache_key in seen:
+                    continue
+
+                seen.add(cache_key)
+                if cache_key in done_keys:
+                    resumed += 1
+                    continue
+
+                # File bornée : on ne résout pas tout l'historique d'avance
+                while len(in_flight) >= workers * 2:
+                    collect(FIRST_COMPLETED)
+
+                in_flight[executor.submit(pools.warmup, server, ref)] = (cache_key, server_id)
+
+        while in_flight:
+            collect(FIRST_COMPLETED)
+
+    except BaseException:
+        # Interruption : on garde le curseur pour reprendre au prochain run
+        _save_progress(db, done_keys)
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        pools.close()
+
+    clear_task_checkpoint(db, TASK_NAME)
+
+    elapsed = max(0.001, time.monotonic() - started)
+    images_per_s = round(counts["warmed"] / elapsed, 2)
+    bytes_per_s = int(bytes_downloaded / elapsed)
 
     msg = (
         f"Artwork warmup finished: candidates={len(candidates)}, unique_refs={len(seen)}, "
-        f"warmed={warmed}, already_cached={hit}, skipped={skipped}, errors={errors}."
+        f"warmed={counts['warmed']}, already_cached={counts['hit']}, skipped={counts['skipped']}, "
+        f"errors={counts['errors']}, resumed={resumed}, "
+        f"{images_per_s} img/s, {bytes_per_s} B/s over {elapsed:.1f}s."
     )
-    task_logs(task_id, "success" if errors == 0 else "warning", msg)
+    task_logs(task_id, "success" if counts["errors"] == 0 else "warning", msg)
     log.info(msg)
     log.info("=== WARMUP ARTWORK CACHE : FINISHED ===")
 
     return {
         "candidates": len(candidates),
         "unique_refs": len(seen),
-        "warmed": warmed,
-        "hit": hit,
-        "skipped": skipped,
-        "errors": errors,
+        "warmed": counts["warmed"],
+        "hit": counts["hit"],
+        "skipped": counts["skipped"],
+        "errors": counts["errors"],
+        "resumed": resumed,
+        "bytes": bytes_downloaded,
+        "elapsed_s": round(elapsed, 3),
+        "images_per_s": images_per_s,
+        "bytes_per_s": bytes_per_s,
     }
+
+
+def _save_progress(db, done_keys):
+    try:
+        save_task_checkpoint(db, TASK_NAME, {
+            "done_keys": sorted(done_keys),
+            "saved_at": int(time.time()),
+        })
+    except Exception as e:
+        log.warning(f"Unable to save artwork warmup checkpoint: {e}")
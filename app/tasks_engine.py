@@ -14,9 +14,11 @@ from core.tasks.result_validation import validate_task_result
 from core.tasks.runtime_signals import TaskRuntimeSignals
 from core.tasks.sequences import TaskSequenceRunner, discovery_sequence_for_provider
 from core.tasks.worker_lease import WorkerLease
+from core.tasks.worker_pool import TaskWorkerPool, concurrency_class_for_task
 from core.tasks.auto_enable import TaskAutoEnableService
 from core.tasks.configuration import TaskConfigurationService
 from core.tasks.execution import TaskExecutionRunner
+from core.tasks.run_metrics import TaskRunMetricsRecorder
 from core.tasks.scheduler import TaskScheduler
 from core.tasks.runtime import SchedulerRuntime
 
@@ -67,7 +69,17 @@ def _cron_jobs_enabled() -> bool:
 # -------------------------------------------------------------------
 # LOCKS / QUEUES
 # -------------------------------------------------------------------
+def _task_workers_from_env() -> int:
+    try:
+        return max(1, int(os.environ.get("VODUM_TASK_WORKERS", "4")))
+    except (TypeError, ValueError):
+        return 4
+
+
+# Le lease protège le dispatcher (un seul à la fois) ; le pool borne les
+# workers qui exécutent réellement les tâches, par classe de concurrence.
 task_worker_lease = WorkerLease()
+task_worker_pool = TaskWorkerPool(_task_workers_from_env())
 
 
 # In-memory signals are isolated from the scheduler orchestration so their
@@ -82,6 +94,13 @@ def mark_auto_enable_dirty():
 def consume_auto_enable_dirty() -> bool:
 	return runtime_signals.consume_auto_enable_dirty()
 
+def request_scheduler_refresh(task_id=None):
+	"""
+	Réveille la boucle scheduler (tâche précise, ou relecture complète).
+	"""
+	runtime_signals.request_scheduler_refresh(task_id)
+
+
 def force_task_run(task_name: str):
 	"""
 	Force une tâche à être exécutée au prochain tick scheduler,
@@ -100,8 +119,9 @@ def consume_forced_task_run(task_name: str) -> bool:
 
 def _start_task_worker():
     """
-    Démarre le worker de tâches.
-    L'attribution thread-safe garantit qu'un seul worker est demarre.
+    Démarre le dispatcher de tâches.
+    L'attribution thread-safe garantit qu'un seul dispatcher est demarre ;
+    c'est lui qui lance les workers du pool.
     """
     if not task_worker_lease.claim():
         return False
@@ -109,7 +129,7 @@ def _start_task_worker():
     try:
         threading.Thread(
             target=_task_worker,
-            name="vodum-task-worker",
+            name="vodum-task-dispatcher",
             daemon=True
         ).start()
     except Exception:
@@ -217,6 +237,8 @@ def _mark_task_retry_or_error(task_id: int, task_name: str, error_message: str):
             exc_info=True,
         )
 
+    request_scheduler_refresh(task_id)
+
 # -------------------------------------------------------------------
 # Compatibilité avec app.py (ne rien changer)
 # -------------------------------------------------------------------
@@ -293,31 +315,45 @@ configuration_service = TaskConfigurationService(db)
 
 
 def set_task_enabled(task_id: int, enabled: int):
-    return configuration_service.set_task_enabled(task_id, enabled)
+    result = configuration_service.set_task_enabled(task_id, enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def set_tasks_enabled_by_names(task_names, enabled: int):
-    return configuration_service.set_tasks_enabled_by_names(task_names, enabled)
+    result = configuration_service.set_tasks_enabled_by_names(task_names, enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def set_task_enabled_for_auto_mode(task_id: int, enabled: int):
-    return configuration_service.set_task_enabled_for_auto_mode(task_id, enabled)
+    result = configuration_service.set_task_enabled_for_auto_mode(task_id, enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def set_tasks_enabled_by_names_for_auto_mode(task_names, enabled: int):
-    return configuration_service.set_tasks_enabled_by_names_for_auto_mode(task_names, enabled)
+    result = configuration_service.set_tasks_enabled_by_names_for_auto_mode(task_names, enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def ensure_tasks_enabled(task_names):
-    return configuration_service.ensure_tasks_enabled(task_names)
+    result = configuration_service.ensure_tasks_enabled(task_names)
+    request_scheduler_refresh()
+    return result
 
 
 def apply_cron_master_switch(enabled: int):
-    return configuration_service.apply_cron_master_switch(enabled)
+    result = configuration_service.apply_cron_master_switch(enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def sync_expiry_tasks_from_settings(expiry_mode: str, cron_enabled: int):
-    return configuration_service.sync_expiry_tasks_from_settings(expiry_mode, cron_enabled)
+    result = configuration_service.sync_expiry_tasks_from_settings(expiry_mode, cron_enabled)
+    request_scheduler_refresh()
+    return result
 
 
 def prepare_restored_database(restored_db):
@@ -331,7 +367,7 @@ def prepare_restored_database(restored_db):
 def recover_stuck_tasks(max_minutes=30):
     # A live worker may legitimately own a long-running task. Resetting its DB
     # state here would allow the scheduler to enqueue a duplicate execution.
-    if task_worker_lease.is_claimed():
+    if task_worker_lease.is_claimed() or task_worker_pool.active_count() > 0:
         return
 
     try:
@@ -508,6 +544,7 @@ def enqueue_task(task_id: int):
 
     # Démarrage du worker SI nécessaire
     _start_task_worker()
+    request_scheduler_refresh(task_id)
 
     return True
 
@@ -539,14 +576,58 @@ def _kick_worker_if_needed():
         logger.warning(f"[WORKER] Kick worker: {pending} queued task(s) detected in DB")
 
 
+def _run_pooled_task(task_id: int, task_name: str):
+    try:
+        run_task(task_id)
+    except Exception as e:
+        # run_task gère déjà beaucoup de cas, mais on sécurise
+        logger.error(f"[WORKER] Unhandled error while running task id={task_id}: {e}", exc_info=True)
+        try:
+            task_logs(task_id, "error", f"Unhandled worker error: {e}")
+        except Exception as log_exc:
+            logger.warning(
+                f"[WORKER] Unable to write task_logs for task id={task_id}: {log_exc}",
+                exc_info=True,
+            )
+    finally:
+        task_worker_pool.release(task_id)
+        # Le dispatcher a pu s'arrêter pendant l'exécution : on le relance
+        # si d'autres tâches attendent.
+        _kick_worker_if_needed()
+
+
+def _start_pooled_task(task_id: int, task_name: str) -> bool:
+    task_class = concurrency_class_for_task(task_name)
+    try:
+        threading.Thread(
+            target=_run_pooled_task,
+            args=(task_id, task_name),
+            name=f"vodum-task-{task_class}-{task_id}",
+            daemon=True,
+        ).start()
+    except Exception as e:
+        task_worker_pool.release(task_id)
+        logger.error(f"[WORKER] Unable to start worker for task id={task_id}: {e}", exc_info=True)
+        return False
+
+    if is_debug_mode_enabled():
+        logger.debug(f"[WORKER] Task '{task_name}' (id={task_id}) started in class '{task_class}'")
+    return True
+
+
 def _task_worker():
+    """
+    Dispatcher : lit les tâches en file d'attente (par priorité) et démarre
+    chacune dans le pool dès qu'un slot de sa classe de concurrence est libre.
+    Une longue sync n'empêche donc plus le monitoring de tourner.
+    """
     try:
         while True:
-            # 1) Récupère une tâche en file d'attente
+            # 1) Récupère les tâches en file d'attente
             try:
-                row = db.query_one(
+                rows = db.query(
                     """
-                    SELECT id
+                    SELECT id, name
                     FROM tasks
                     WHERE queued_count > 0
                       AND enabled = 1
@@ -560,42 +641,45 @@ def _task_worker():
                         END ASC,
                         updated_at ASC,
                         id ASC
-                    LIMIT 1
                     """
                 )
             except Exception as e:
-                logger.error(f"[WORKER] DB error while fetching queued task: {e}", exc_info=True)
+                logger.error(f"[WORKER] DB error while fetching queued tasks: {e}", exc_info=True)
                 return
 
-            # 2) Plus rien à traiter => on sort et on libère le worker
-            if not row:
+            # 2) Plus rien à traiter => on sort et on libère le dispatcher
+            #    (les workers encore actifs le relanceront si besoin)
+            if not rows:
                 return
 
-            task_id = int(row["id"])
-
-            # 3) Exécute réellement la tâche
-            try:
-                run_task(task_id)
-            except Exception as e:
-                # run_task gère déjà beaucoup de cas, mais on sécurise
-                logger.error(f"[WORKER] Unhandled error while running task id={task_id}: {e}", exc_info=True)
-                try:
-                    task_logs(task_id, "error", f"Unhandled worker error: {e}")
-                except Exception as log_exc:
-                    logger.warning(
-                        f"[WORKER] Unable to write task_logs for task id={task_id}: {log_exc}",
-                        exc_info=True,
-                    )
-
-            # 4) Petite pause pour éviter de marteler la DB
-            time.sleep(0.2)
+            # 3) Démarre tout ce que les règles de concurrence autorisent
+            started = 0
+            for row in rows:
+                task_id = int(row["id"])
+                task_name = str(row["name"] or "")
+                reason = task_worker_pool.try_acquire(task_id, task_name)
+                if reason is None:
+                    if _start_pooled_task(task_id, task_name):
+                        started += 1
+                    continue
+                if reason in ("pool_full", "exclusive_waiting", "exclusive_running"):
+                    # Une tâche exclusive en attente bloque les suivantes
+                    # pour ne pas être affamée.
+                    break
+
+            # 4) Attend qu'un worker se libère (ou petite pause si on vient
+            #    d'en démarrer) pour éviter de marteler la DB
+            if started:
+                time.sleep(0.2)
+            else:
+                task_worker_pool.wait_for_release(1.0)
 
     finally:
-        # GARANTIE : le worker se libère toujours
+        # GARANTIE : le dispatcher se libère toujours
         task_worker_lease.release()
 
-        # Si une tâche a été ajoutée juste avant l'arrêt du worker,
-        # on relance immédiatement un worker pour ne rien laisser bloqué.
+        # Si une tâche a été ajoutée juste avant l'arrêt du dispatcher,
+        # on le relance immédiatement pour ne rien laisser bloqué.
         _kick_worker_if_needed()
 
 
@@ -619,12 +703,12 @@ def _load_task_run_callable(task_name: str):
 
 def _execute_task_run_callable(run_func, task_id: int, task_name: str, max_duration: int):
     """
-    Execute the task inside the single scheduler worker.
+    Execute the task inside its pool worker.
 
     Python cannot safely stop a timed-out thread. The previous helper allowed
     that thread to continue while the worker started following tasks, creating
     hidden concurrency. Duration is still checked after return by
-    _process_task_result(), without allowing scheduler tasks to overlap.
+    _process_task_result(); overlap is governed by TaskWorkerPool rules only.
     """
     return run_func(task_id, db)
 
@@ -722,6 +806,8 @@ def _handle_task_success(task_id: int, task_name: str, schedule):
             logger.error(f"Schedule error after execution: {e}")
             task_logs(task_id, "warning", f"Schedule error after execution: {e}")
 
+    request_scheduler_refresh(task_id)
+
 
 
 
@@ -867,6 +953,7 @@ task_execution_runner = TaskExecutionRunner(
     task_logs,
     logger,
     is_debug_mode_enabled,
+    run_metrics=TaskRunMetricsRecorder(db, logger),
 )
 
 sequence_runner = TaskSequenceRunner(db, enqueue_task, logger, is_debug_mode_enabled)
@@ -922,10 +1009,19 @@ task_scheduler = TaskScheduler(
     logger,
 )
 
+def _scheduler_resync_seconds_from_env() -> int:
+    try:
+        return max(1, int(os.environ.get("VODUM_SCHEDULER_RESYNC_SECONDS", "300")))
+    except (TypeError, ValueError):
+        return 300
+
+
 scheduler_runtime = SchedulerRuntime(
     db, task_scheduler, _cron_jobs_enabled, _kick_worker_if_needed,
     consume_auto_enable_dirty, run_auto_enable_pass, _watchdog_loop,
     _compute_next_task_run, logger, is_debug_mode_enabled,
+    wait_for_refresh=runtime_signals.wait_for_scheduler_refresh,
+    resync_seconds=_scheduler_resync_seconds_from_env(),
 )
 
 
@@ -265,3 +265,14 @@ def tz_filter(dt):
         return dt.astimezone(local_tz).strftime("%Y-%m-%d %H:%M:%S")
     except Exception:
         return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def artwork_size(url, size):
+    """
+    Ajoute ?size= aux URLs du proxy artwork pour recevoir la vignette
+    adaptée à la taille affichée. Les autres URLs sont laissées intactes.
+    """
+    if not url or "/api/monitoring/poster/" not in str(url):
+        return url
+    separator = "&" if "?" in str(url) else "?"
+    return f"{url}{separator}size={int(size)}"
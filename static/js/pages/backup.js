@@ -112,9 +112,14 @@
       headers: { "Content-Type": "application/json" },
       credentials: "same-origin",
       body: JSON.stringify({ filename })
-    }).then(() => {
-      window.location.reload();
-    });
+    })
+      .then((res) => res.json().catch(() => ({})))
+      .then((data) => {
+        if (data && data.success === false && data.error) {
+          window.alert(data.error);
+        }
+        window.location.reload();
+      });
   }
   function renderBackupRows(backups) {
     const tbody = document.getElementById("backups-table-body");
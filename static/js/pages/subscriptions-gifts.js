@@ -237,7 +237,12 @@
       const duration = `+${run.days_added} ${i18n.giftHistoryDays || "days"}`;
       const comment = run.reason ? escapeHtml(run.reason) : "-";
       const created = run.created_at && window.vodumFormatDateTime ? escapeHtml(window.vodumFormatDateTime(run.created_at)) : "";
-      const usersCount = `${run.users_updated || 0} ${i18n.giftHistoryUser || "users"}`;
+      let usersCount = `${run.users_updated || 0} ${i18n.giftHistoryUser || "users"}`;
+      if (run.job_status === "queued" || run.job_status === "running") {
+        usersCount = `${i18n.giftInProgress || "Gift in progress"} ${run.users_processed || 0} / ${run.users_total || 0}`;
+      } else if (run.job_status === "error") {
+        usersCount = `${i18n.giftFailed || "Gift failed"} - ${usersCount}`;
+      }
       return `
         <button type="button" class="gift-row w-full text-left px-4 py-3 bg-slate-950/30 hover:bg-slate-950/60 transition" data-run-index="${index}">
           <div class="flex items-start justify-between gap-4">
@@ -286,13 +291,65 @@
       });
   }
 
+  function showGiftDone(response) {
+    showAlert("success", `<strong>${response.users_updated}</strong> ${escapeHtml(i18n.usersUpdated || "users updated")} (+${response.days_added} ${escapeHtml(i18n.daysAdded || "days added")})`);
+    loadGiftHistory();
+  }
+
+  // Polling : 1 s tant que le run avance, ralenti jusqu'à 10 s sinon ;
+  // abandon (le run continue côté serveur) après 5 min sans progression.
+  const GIFT_POLL_MIN_MS = 1000;
+  const GIFT_POLL_MAX_MS = 10000;
+  const GIFT_POLL_STALL_LIMIT_MS = 5 * 60 * 1000;
+
+  function pollGiftRun(runId, state) {
+    state = state || { delay: GIFT_POLL_MIN_MS, processed: -1, lastProgressAt: Date.now() };
+    fetch(`/api/subscriptions/gifts/${runId}/status`, { cache: "no-store" })
+      .then(function (response) { return response.json(); })
+      .then(function (response) {
+        if (!response || response.status !== "ok") {
+          showAlert("error", escapeHtml(response?.error || i18n.unknownError || "Unknown error"));
+          return;
+        }
+        if (response.job_status === "success") {
+          showGiftDone(response);
+          return;
+        }
+        if (response.job_status === "error") {
+          showAlert("error", `${escapeHtml(i18n.giftFailed || "Gift failed")}: ${escapeHtml(response.last_error || i18n.unknownError || "Unknown error")}`);
+          loadGiftHistory();
+          return;
+        }
+        const processed = Number(response.users_processed || 0);
+        if (processed !== state.processed) {
+          state.processed = processed;
+          state.lastProgressAt = Date.now();
+          state.delay = GIFT_POLL_MIN_MS;
+        } else {
+          state.delay = Math.min(GIFT_POLL_MAX_MS, Math.round(state.delay * 1.5));
+        }
+        if (Date.now() - state.lastProgressAt > GIFT_POLL_STALL_LIMIT_MS) {
+          showAlert("success", escapeHtml(i18n.giftStillRunning || "Gift is still being applied in the background; check the history below later"));
+          loadGiftHistory();
+          return;
+        }
+        showAlert("success", `${escapeHtml(i18n.giftInProgress || "Gift in progress")}... <strong>${processed}</strong> / ${response.users_total || 0}`);
+        window.setTimeout(function () { pollGiftRun(runId, state); }, state.delay);
+      })
+      .catch(function () {
+        showAlert("error", escapeHtml(i18n.requestFailed || "Request failed"));
+      });
+  }
+
   function submitGift(form) {
     fetch(form.action, { method: "POST", body: new FormData(form), credentials: "same-origin" })
       .then(function (response) { return response.json(); })
       .then(function (response) {
-        if (response.status === "ok") {
-          showAlert("success", `<strong>${response.users_updated}</strong> ${escapeHtml(i18n.usersUpdated || "users updated")} (+${response.days_added} ${escapeHtml(i18n.daysAdded || "days added")})`);
+        if (response.status === "ok" && response.run_id && ["queued", "running"].includes(response.job_status)) {
           loadGiftHistory();
+          pollGiftRun(response.run_id);
+        } else if (response.status === "ok") {
+          showGiftDone(response);
         } else {
           showAlert("error", escapeHtml(response.error || i18n.unknownError || "Unknown error"));
         }
@@ -40,6 +40,7 @@
           <td class="p-2">${renderStatus(task)}</td>
           <td class="p-2">${escapeHtml(task.last_run_human || "-")}</td>
           <td class="p-2">${escapeHtml(task.next_run_human || "-")}</td>
+          <td class="p-2 whitespace-nowrap">${escapeHtml(task.duration_human || "-")}</td>
           <td class="p-2 text-center">${renderAction(task)}</td>
         </tr>
       `).join("");
@@ -539,9 +539,32 @@ CREATE TABLE IF NOT EXISTS tasks (
     last_attempt_at TIMESTAMP,
     next_retry_at TIMESTAMP,
 
+    -- Curseur de reprise d'une tâche longue interrompue (JSON)
+    checkpoint_json TEXT DEFAULT NULL,
+
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Historique d'exécution des tâches (durées, DB, HTTP) pour p50 / p95
+CREATE TABLE IF NOT EXISTS task_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL,
+    task_name TEXT NOT NULL,
+    status TEXT NOT NULL,             -- success, error
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    wall_ms INTEGER NOT NULL DEFAULT 0,
+    cpu_ms INTEGER NOT NULL DEFAULT 0,
+    db_ms INTEGER NOT NULL DEFAULT 0,
+    db_statements INTEGER NOT NULL DEFAULT 0,
+    http_calls INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_runs_task_name_id
+ON task_runs(task_name, id);
+
 -- ------------------------------------------------------------
 -- MEDIA JOBS (queue générique Plex/Jellyfin/Autre)
 -- ------------------------------------------------------------
@@ -645,15 +668,27 @@ CREATE TABLE IF NOT EXISTS subscription_gift_runs (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
-  target_type TEXT NOT NULL,            -- 'all' | 'server'
+  target_type TEXT NOT NULL,            -- 'all' | 'server' | 'user'
   target_server_id INTEGER NULL,
 
   days_added INTEGER NOT NULL,
   reason TEXT NULL,
 
-  users_updated INTEGER NOT NULL DEFAULT 0
+  users_updated INTEGER NOT NULL DEFAULT 0,
+
+  -- exécution en arrière-plan (tâche apply_subscription_gifts)
+  status TEXT NOT NULL DEFAULT 'success',   -- 'queued' | 'running' | 'success' | 'error'
+  users_total INTEGER NOT NULL DEFAULT 0,
+  users_processed INTEGER NOT NULL DEFAULT 0,
+  target_user_ids_json TEXT NULL,           -- cibles figées à la création, vidé en fin de run
+  last_error TEXT NULL,
+  started_at TIMESTAMP NULL,
+  finished_at TIMESTAMP NULL
 );
 
+CREATE INDEX IF NOT EXISTS idx_subscription_gift_runs_status
+ON subscription_gift_runs(status, created_at);
+
 CREATE TABLE IF NOT EXISTS subscription_gift_run_users (
   run_id INTEGER NOT NULL,
   vodum_user_id INTEGER NOT NULL,
@@ -884,6 +919,12 @@ CREATE TABLE IF NOT EXISTS stream_enforcement_state (
   killed_at TIMESTAMP,
   last_reason TEXT,
 
+  -- étape en attente (warn / recheck / pre_kill / kill), exécutée par le
+  -- timer du stream_enforcer quand next_action_at est atteint
+  pending_action TEXT,
+  next_action_at TIMESTAMP,
+  pending_json TEXT,
+
   UNIQUE(policy_id, server_id, actor_key),
 
   FOREIGN KEY(policy_id) REFERENCES stream_policies(id) ON DELETE CASCADE,
@@ -894,6 +935,9 @@ CREATE INDEX IF NOT EXISTS idx_stream_state_actor
 ON stream_enforcement_state(actor_key);
 CREATE INDEX IF NOT EXISTS idx_stream_enforcement_state_server
 ON stream_enforcement_state(server_id);
+CREATE INDEX IF NOT EXISTS idx_stream_enforcement_state_next_action
+ON stream_enforcement_state(next_action_at)
+WHERE pending_action IS NOT NULL;
 
 
 -----------------------------------------------------------------------
@@ -1220,6 +1264,18 @@ CREATE TABLE IF NOT EXISTS tautulli_import_jobs (
 CREATE INDEX IF NOT EXISTS idx_tautulli_import_jobs_status ON tautulli_import_jobs(status, created_at);
 CREATE INDEX IF NOT EXISTS idx_tautulli_import_jobs_server ON tautulli_import_jobs(server_id);
 
+-- High-water mark des imports Tautulli (par serveur VODUM et par PMS source)
+CREATE TABLE IF NOT EXISTS tautulli_import_watermarks (
+    server_id INTEGER NOT NULL,
+    pms_identifier TEXT NOT NULL,
+    last_history_id INTEGER NOT NULL DEFAULT 0,
+    last_started INTEGER,
+    options_key TEXT,
+    rows_imported INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (server_id, pms_identifier)
+);
+
 -- ----------------------------
 -- Monitoring snapshots (for peak streams)
 -- ----------------------------
@@ -0,0 +1,244 @@
+"""
+Benchmark du planning des notifications d'expiration.
+
+Construit une base SQLite temporaire (tables.sql) avec des utilisateurs,
+media_users et marqueurs sent_* synthétiques, puis compare :
+- per_user : anciens lookups, plusieurs requêtes par utilisateur ;
+- set_based : ExpirationNotificationIndex, quelques requêtes par run.
+
+Les deux modes doivent produire exactement le même ensemble de
+notifications dues.
+
+    python tools/benchmarks/expiration_notification_benchmark.py --users 5000
+
+Outil de développement : hors du package app, il n'est pas livré dans l'image.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Les modules applicatifs sont importés depuis app/
+REPO_DIR = Path(__file__).resolve().parents[2]
+APP_DIR = REPO_DIR / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+
+BENCH_SETTINGS = {
+    "mailing_enabled": 1,
+    "smtp_host": "smtp.bench.invalid",
+    "smtp_port": 587,
+    "smtp_user": "bench",
+    "smtp_pass": "bench",
+    "mail_from": "bench@bench.invalid",
+    "discord_enabled": 0,
+    "notifications_send_mode": "first",
+}
+
+BENCH_TEMPLATES = (
+    ("preavis", 30, None),
+    ("relance", 7, None),
+    ("fin", 0, None),
+)
+
+
+def _default_schema_path() -> Path:
+    return REPO_DIR / "tables.sql"
+
+
+class _CountingDB:
+    """Enveloppe DBManager qui compte les requêtes de lecture."""
+
+    def __init__(self, db):
+        self._db = db
+        self.queries = 0
+
+    def query(self, *args, **kwargs):
+        self.queries += 1
+        return self._db.query(*args, **kwargs)
+
+    def query_one(self, *args, **kwargs):
+        self.queries += 1
+        return self._db.query_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class _PerUserLookups:
+    """Lookups historiques du task : une série de requêtes par utilisateur."""
+
+    def __init__(self, db, settings: dict):
+        from communications_engine import available_channels
+
+        self._available_channels = available_channels
+        self.db = db
+        self.settings = settings
+
+    def has_pending_plex_invite(self, user_id: int) -> bool:
+        from tasks.send_expiration_emails import _user_has_pending_plex_invite
+
+        return _user_has_pending_plex_invite(self.db, user_id)
+
+    def comm_contexts(self, user_id: int) -> list[dict]:
+        from tasks.send_expiration_emails import _get_user_comm_contexts
+
+        return _get_user_comm_contexts(self.db, user_id)
+
+    def available_channels(self, user: dict) -> dict:
+        return self._available_channels(self.db, self.settings, user)
+
+    def sent_channels(self, user: dict, markers: list[str], exp_iso: str) -> tuple[bool, bool]:
+        from tasks.send_expiration_emails import _already_sent_discord, _already_sent_email
+
+        uid = int(user["id"])
+        return (
+            _already_sent_email(self.db, uid, markers, exp_iso),
+            _already_sent_discord(self.db, uid, markers, exp_iso),
+        )
+
+
+def build_synthetic_database(path: Path, schema_path: Path, users: int, seed: int) -> None:
+    rng = random.Random(seed)
+    today = date.today()
+
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.executescript(schema_path.read_text(encoding="utf-8"))
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        servers = [(1, "plex"), (2, "plex"), (3, "jellyfin")]
+        conn.executemany(
+            "INSERT INTO servers(id, name, server_identifier, type) VALUES (?, ?, ?, ?)",
+            [(sid, f"bench-{sid}", f"bench-{sid}", kind) for sid, kind in servers],
+        )
+        conn.executemany(
+            """
+            INSERT INTO comm_templates(key, name, enabled, trigger_event, days_before, days_after, subject, body)
+            VALUES (?, ?, 1, 'expiration', ?, ?, ?, ?)
+            """,
+            [(key, key, before, after, key, key) for key, before, after in BENCH_TEMPLATES],
+        )
+
+        user_rows = []
+        media_rows = []
+        sent_rows = []
+        for uid in range(1, users + 1):
+            exp = today + timedelta(days=rng.randint(-5, 40))
+            user_rows.append((uid, f"user{uid}", f"user{uid}@bench.invalid", f"{exp.isoformat()} 00:00:00"))
+
+            for server_id, kind in rng.sample(servers, rng.randint(1, 2)):
+                pending = kind == "plex" and rng.random() < 0.1
+                media_rows.append((
+                    server_id,
+                    uid,
+                    None if pending else f"ext-{server_id}-{uid}",
+                    f"user{uid}",
+                    kind,
+                    None if pending else "2025-01-01 00:00:00",
+                ))
+
+            if rng.random() < 0.4:
+                sent_rows.append((uid, rng.choice(BENCH_TEMPLATES)[0], exp.isoformat()))
+
+        conn.executemany(
+            "INSERT INTO vodum_users(id, username, email, expiration_date) VALUES (?, ?, ?, ?)",
+            user_rows,
+        )
+        conn.executemany(
+            """
+            INSERT INTO media_users(server_id, vodum_user_id, external_user_id, username, type, accepted_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            media_rows,
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO sent_emails(user_id, template_type, expiration_date) VALUES (?, ?, ?)",
+            sent_rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_benchmark(users=5000, repeat=3, seed=42, schema_path=None) -> dict:
+    # Import tardif : le module de tâche tire toute la stack applicative
+    from db_manager import DBManager
+    from core.expiration_notification_index import ExpirationNotificationIndex
+    from tasks.send_expiration_emails import (
+        _get_expiration_templates,
+        _plan_expiration_notifications,
+    )
+
+    schema_path = Path(schema_path) if schema_path else _default_schema_path()
+
+    with tempfile.TemporaryDirectory(prefix="vodum-expiration-bench-") as tmp:
+        db_path = Path(tmp) / "bench.db"
+        build_synthetic_database(db_path, schema_path, users, seed)
+        db = DBManager(str(db_path))
+
+        templates = _get_expiration_templates(db)
+        user_rows = [dict(row) for row in db.query("SELECT * FROM vodum_users WHERE expiration_date IS NOT NULL")]
+        today = date.today()
+
+        result = {"users": len(user_rows), "repeat": int(repeat)}
+        plans = {}
+        for label in ("per_user", "set_based"):
+            timings = []
+            queries = 0
+            for _ in range(max(1, int(repeat))):
+                counting = _CountingDB(db)
+                started = time.perf_counter()
+                if label == "set_based":
+                    lookups = ExpirationNotificationIndex(counting, BENCH_SETTINGS)
+                else:
+                    lookups = _PerUserLookups(counting, BENCH_SETTINGS)
+                plan = _plan_expiration_notifications(user_rows, templates, BENCH_SETTINGS, lookups, today)
+                timings.append((time.perf_counter() - started) * 1000.0)
+                queries = counting.queries
+            timings.sort()
+            plans[label] = sorted(item["dedupe_key"] for item in plan["due"])
+            result[label] = {
+                "due": len(plan["due"]),
+                "pending_invites": plan["pending_invites"],
+                "queries": queries,
+                "median_ms": round(timings[len(timings) // 2], 3),
+                "min_ms": round(timings[0], 3),
+            }
+
+        result["same_plan"] = plans["per_user"] == plans["set_based"]
+        per_user = result["per_user"]["median_ms"]
+        set_based = result["set_based"]["median_ms"]
+        result["speedup"] = round(per_user / set_based, 2) if set_based else None
+        db.close()
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark expiration notification planning")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--schema", default=None, help="Path to tables.sql")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        users=args.users,
+        repeat=args.repeat,
+        seed=args.seed,
+        schema_path=args.schema,
+    )
+    print(json.dumps(result, indent=2))
+    return 0 if result["same_plan"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
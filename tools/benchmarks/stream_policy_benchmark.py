@@ -0,0 +1,169 @@
+"""
+Micro-benchmark de l'évaluation des policies du stream_enforcer.
+
+Compare, sur des sessions et policies synthétiques :
+- per_policy : chaque policy construit son propre index (ancien coût : un scan
+  complet des sessions par policy) ;
+- shared_index : un seul index par cycle, partagé par toutes les policies.
+
+    python tools/benchmarks/stream_policy_benchmark.py --sessions 300 --policies 60
+
+Outil de développement : hors du package app, il n'est pas livré dans l'image.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Les modules applicatifs sont importés depuis app/
+APP_DIR = Path(__file__).resolve().parents[2] / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+
+RULE_TYPES = (
+    "max_streams_per_user",
+    "max_ips_per_user",
+    "max_streams_per_ip",
+    "max_transcodes_global",
+    "ban_4k_transcode",
+    "max_bitrate_kbps",
+    "device_allowlist",
+)
+
+DEVICES = ("Chrome", "Android TV", "Roku", "Apple TV", "Firefox", "Xbox", "iPhone")
+
+
+def build_synthetic_sessions(count: int, users: int, servers: int, rng: random.Random) -> list[dict]:
+    sessions = []
+    for i in range(count):
+        user = rng.randrange(users)
+        server_id = 1 + (user + rng.randrange(2)) % servers
+        provider = "plex" if server_id % 2 else "jellyfin"
+        height = rng.choice((720, 1080, 1080, 2160))
+        raw = {"Media": [{"height": height}]} if provider == "plex" else {"NowPlayingItem": {"Height": height}}
+        sessions.append({
+            "server_id": server_id,
+            "provider": provider,
+            "session_key": f"s{i}",
+            "media_user_id": user,
+            "external_user_id": f"ext{user}",
+            "vodum_user_id": user if user % 5 else None,
+            "media_key": f"m{rng.randrange(500)}",
+            "state": "playing",
+            "is_transcode": int(rng.random() < 0.3),
+            "bitrate": rng.choice((2000, 8000, 20000, 40000)),
+            "device": rng.choice(DEVICES),
+            "client_name": "bench",
+            "client_product": "bench",
+            "ip": f"203.0.{user % 50}.{rng.randrange(4)}",
+            "started_at": f"2026-01-01 00:{i % 60:02d}:00",
+            "last_seen_at": "2026-01-01 01:00:00",
+            "raw_json": json.dumps(raw),
+            "_parsed_raw_json": raw,
+        })
+    return sessions
+
+
+def build_synthetic_policies(count: int, users: int, servers: int, rng: random.Random) -> list[dict]:
+    policies = []
+    for i in range(count):
+        rule_type = RULE_TYPES[i % len(RULE_TYPES)]
+        scope_type = rng.choice(("global", "global", "server", "user"))
+        scope_id = None
+        if scope_type == "server":
+            scope_id = 1 + rng.randrange(servers)
+        elif scope_type == "user":
+            scope_id = 1 + rng.randrange(users - 1)
+
+        rule = {"max": rng.choice((1, 2, 3))}
+        if rule_type == "max_bitrate_kbps":
+            rule = {"max_kbps": 10000}
+        elif rule_type == "device_allowlist":
+            rule = {"allowed": list(DEVICES[:4])}
+
+        policies.append({
+            "id": i + 1,
+            "scope_type": scope_type,
+            "scope_id": scope_id,
+            "provider": None,
+            "server_id": None,
+            "is_enabled": 1,
+            "priority": 100,
+            "rule_type": rule_type,
+            "rule_value_json": json.dumps(rule),
+        })
+    return policies
+
+
+def _run_cycle(evaluate, build_index, policies, sessions, shared: bool) -> int:
+    index = build_index(sessions) if shared else None
+    violations = 0
+    for policy in policies:
+        violations += len(evaluate(policy, sessions, index))
+    return violations
+
+
+def run_benchmark(sessions_count=300, policies_count=60, users=120, servers=12,
+                  repeat=20, seed=42) -> dict:
+    # Import tardif : le module de tâche tire toute la stack applicative
+    from tasks.stream_enforcer import _evaluate_policy
+    from core.stream_policy_index import build_policy_index
+
+    rng = random.Random(seed)
+    sessions = build_synthetic_sessions(sessions_count, users, servers, rng)
+    policies = build_synthetic_policies(policies_count, users, servers, rng)
+
+    result = {
+        "sessions": len(sessions),
+        "policies": len(policies),
+        "repeat": int(repeat),
+    }
+    for label, shared in (("per_policy", False), ("shared_index", True)):
+        timings = []
+        violations = 0
+        for _ in range(max(1, int(repeat))):
+            started = time.perf_counter()
+            violations = _run_cycle(_evaluate_policy, build_policy_index, policies, sessions, shared)
+            timings.append((time.perf_counter() - started) * 1000.0)
+        timings.sort()
+        result[label] = {
+            "violations": violations,
+            "median_ms": round(timings[len(timings) // 2], 3),
+            "min_ms": round(timings[0], 3),
+        }
+
+    per_policy = result["per_policy"]["median_ms"]
+    shared = result["shared_index"]["median_ms"]
+    result["speedup"] = round(per_policy / shared, 2) if shared else None
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark stream policy evaluation")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--policies", type=int, default=60)
+    parser.add_argument("--users", type=int, default=120)
+    parser.add_argument("--servers", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        sessions_count=args.sessions,
+        policies_count=args.policies,
+        users=args.users,
+        servers=args.servers,
+        repeat=args.repeat,
+        seed=args.seed,
+    )
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())